@@ -9,13 +9,17 @@ from pathlib import Path
 
 from admin.components.team_leader_service import get_team_leader_service
 from utils.session_logger import log_logout, log_activity
-from utils.logger import log_file_operation
+from utils.logger import log_file_operation, PerformanceTimer
+from utils.tracing import span
+from utils.dialog import show_confirm_dialog, show_reason_dialog
 from admin.components.role_colors import create_role_badge, get_role_color
 from user.components.dialogs import DialogManager
 from admin.components.preview_panel import create_preview_section_container
 from admin.components.file_utils import FileOperationHandler
 from utils.config_loader import get_config
 from utils.file_manager import get_file_manager
+from services.change_feed import publish_event
+from services.approved_location_index import get_approved_location_index
 
 
 class TeamLeaderFileHandler:
@@ -40,6 +44,9 @@ class TeamLeaderFileHandler:
             if not file_path or not os.path.exists(file_path):
                 # Try to find the file in its new location if it's an approved file
                 current_location = file_data.get('current_location')
+                if not current_location or not os.path.exists(current_location):
+                    # Listed location is gone - check the index entry and search again
+                    current_location = get_approved_location_index().locate(file_data, verify=True)
                 if current_location and os.path.exists(current_location):
                     file_path = current_location
                     print(f"[OPEN_FILE] Using moved file location: {file_path}")
@@ -496,7 +503,7 @@ class TeamLeaderActionHandler:
             
             # Write comment to centralized JSON files instead of TL service memory
             success = self._add_comment_to_centralized_files(
-                file_data['file_id'], self.username, comment_text.strip()
+                file_data['file_id'], self.username, comment_text.strip(), recipient=file_data.get('user_id')
             )
             
             if success:
@@ -505,6 +512,9 @@ class TeamLeaderActionHandler:
                 
                 # Trigger user notification about new comment
                 self._notify_user_about_comment(file_data, self.username, comment_text.strip())
+                publish_event('comment_added', file_id=file_data['file_id'], user_id=file_data.get('user_id'),
+                              filename=file_data.get('original_filename'), author=self.username,
+                              author_role='team_leader', comment=comment_text.strip(), notified=True)
                 
                 if refresh_callback:
                     refresh_callback()
@@ -568,31 +578,84 @@ class TeamLeaderActionHandler:
             self.dialog_manager.show_error_notification("Error rejecting file")
             return False
     
-    def _add_comment_to_centralized_files(self, file_id: str, tl_user: str, comment_text: str) -> bool:
-        """🚨 NEW: Add comment to centralized JSON files."""
+    def handle_bulk_approve(self, files: List[Dict], refresh_callback):
+        """Approve all checked files with one batched service call."""
+        if not files:
+            self.dialog_manager.show_error_notification("No files selected")
+            return False
+        
+        show_confirm_dialog(
+            self.page,
+            "Confirm Approval",
+            f"Approve {len(files)} selected file(s) and send them to admin?",
+            lambda: self._execute_bulk_approval(files, refresh_callback)
+        )
+        return True
+    
+    def _execute_bulk_approval(self, files: List[Dict], refresh_callback):
+        """Run the bulk approval and report the per-file results."""
         try:
-            import os
-            import json
-            from datetime import datetime
-            from utils.path_config import DATA_PATHS
+            results = self.tl_service.approve_files([f['file_id'] for f in files], self.username)
             
-            # Use approval_comments.json for team leader comments
-            approval_comments_file = os.path.join(DATA_PATHS.approvals_dir, "approval_comments.json")
-            os.makedirs(DATA_PATHS.approvals_dir, exist_ok=True)
+            approved = [f for f in files if results.get(f['file_id'], (False, ""))[0]]
+            for file_data in approved:
+                log_activity(self.username, f"Approved file: {file_data.get('original_filename', 'Unknown')}")
             
-            # Load existing comments
-            approval_comments = {}
-            if os.path.exists(approval_comments_file):
-                try:
-                    with open(approval_comments_file, 'r', encoding='utf-8') as f:
-                        approval_comments = json.load(f)
-                except Exception as e:
-                    print(f"Error loading approval comments: {e}")
-                    approval_comments = {}
+            self._show_bulk_result("approved and sent to admin", approved, files, results)
+            if refresh_callback:
+                refresh_callback()
+                
+        except Exception as e:
+            print(f"Error approving files: {e}")
+            self.dialog_manager.show_error_notification("Error approving files")
+    
+    def handle_bulk_reject(self, files: List[Dict], refresh_callback):
+        """Ask for one rejection reason, then reject all checked files."""
+        if not files:
+            self.dialog_manager.show_error_notification("No files selected")
+            return False
+        
+        show_reason_dialog(
+            self.page,
+            "Confirm Rejection",
+            f"Reject {len(files)} selected file(s)?",
+            lambda reason: self._execute_bulk_rejection(files, reason, refresh_callback),
+            confirm_text="Reject"
+        )
+        return True
+    
+    def _execute_bulk_rejection(self, files: List[Dict], reason: str, refresh_callback):
+        """Run the bulk rejection and report the per-file results."""
+        try:
+            results = self.tl_service.reject_files([f['file_id'] for f in files], self.username, reason)
+            
+            rejected = [f for f in files if results.get(f['file_id'], (False, ""))[0]]
+            for file_data in rejected:
+                log_activity(self.username, f"Rejected file: {file_data.get('original_filename', 'Unknown')} - Reason: {reason}")
             
-            # Add new comment
-            if file_id not in approval_comments:
-                approval_comments[file_id] = []
+            self._show_bulk_result("rejected", rejected, files, results)
+            if refresh_callback:
+                refresh_callback()
+                
+        except Exception as e:
+            print(f"Error rejecting files: {e}")
+            self.dialog_manager.show_error_notification("Error rejecting files")
+    
+    def _show_bulk_result(self, action: str, succeeded: List[Dict], files: List[Dict], results: Dict):
+        """Show a summary notification for a bulk action."""
+        if len(succeeded) == len(files):
+            self.dialog_manager.show_success_notification(f"{len(succeeded)} file(s) {action}")
+            return
+        
+        failed = [results.get(f['file_id'], (False, "Unknown error"))[1] for f in files if f not in succeeded]
+        self.dialog_manager.show_error_notification(
+            f"{len(succeeded)} of {len(files)} file(s) {action}. First error: {failed[0]}")
+    
+    def _add_comment_to_centralized_files(self, file_id: str, tl_user: str, comment_text: str,
+                                          recipient: str = None) -> bool:
+        """🚨 NEW: Add comment to the centralized comment store."""
+        try:
+            from services.comment_store import get_comment_store
             
             new_comment = {
                 'tl_id': tl_user,
@@ -601,11 +664,8 @@ class TeamLeaderActionHandler:
                 'source': 'team_leader'
             }
             
-            approval_comments[file_id].append(new_comment)
-            
-            # Save updated comments
-            with open(approval_comments_file, 'w', encoding='utf-8') as f:
-                json.dump(approval_comments, f, indent=2)
+            if not get_comment_store().add_comment(file_id, new_comment, recipient=recipient):
+                return False
             
             print(f"[SUCCESS] Added TL comment to centralized file for file {file_id}")
             return True
@@ -660,6 +720,7 @@ class TeamLeaderPanel:
         self.files_table = None
         self.preview_panel_widget = None  # Changed from preview_panel to preview_panel_widget
         self.selected_row_index = None  # Track selected row for highlighting
+        self.checked_files = {}  # file_id -> file_data for bulk actions
         self.user_team = self.tl_service.get_user_team(username)
         
         # Initialize config and preview manager for preview panel integration
@@ -684,6 +745,13 @@ class TeamLeaderPanel:
         
         # Current filtered files for statistics
         self.current_filtered_files = []
+        
+        # Paging - the views include archived approvals, so only one page is fetched
+        self.current_page = 1
+        self.page_size = 50
+        self.total_pages = 1
+        self.current_total = 0
+        self.pager_row = None
     
     def create_interface(self) -> ft.Container:
         """Create the main team leader interface."""
@@ -868,7 +936,7 @@ class TeamLeaderPanel:
         
         # Define columns that will be shown based on container size
         def get_columns_for_size(col_config):
-            columns = []
+            columns = [ft.DataColumn(self.select_all_checkbox)]
             if col_config.get("file", True):
                 columns.append(ft.DataColumn(ft.Text("File", weight=ft.FontWeight.BOLD, size=16)))
             if col_config.get("user", True):
@@ -889,6 +957,14 @@ class TeamLeaderPanel:
             "lg": {"file": True, "user": True, "size": True, "submitted": True, "status": True}
         }
         
+        # Multi-select controls for bulk approve / reject
+        self.select_all_checkbox = ft.Checkbox(
+            tooltip="Select all pending files",
+            on_change=self._on_select_all_changed
+        )
+        self.bulk_actions_bar = self._create_bulk_actions_bar()
+        self.pager_row = self._create_pager_row()
+        
         # Create responsive data table
         self.files_table = ft.DataTable(
             columns=get_columns_for_size(column_configs["lg"]),  # Start with all columns
@@ -927,13 +1003,69 @@ class TeamLeaderPanel:
                     ft.Text(f"Team: {self.user_team}", size=18, color=ft.Colors.GREY_600)
                 ]),
                 ft.Divider(),
+                self.bulk_actions_bar,
                 ft.Container(height=10),
-                table_content  # Use responsive approach
+                table_content,  # Use responsive approach
+                self.pager_row
             ], expand=True, spacing=0),
             expand=True,
             padding=0
         )
     
+    def _create_pager_row(self) -> ft.Row:
+        """Create previous / next page controls."""
+        self.page_info_text = ft.Text("", size=14, color=ft.Colors.GREY_600)
+        self.prev_page_button = ft.IconButton(
+            ft.Icons.CHEVRON_LEFT, tooltip="Previous page", on_click=lambda e: self._go_to_page(self.current_page - 1))
+        self.next_page_button = ft.IconButton(
+            ft.Icons.CHEVRON_RIGHT, tooltip="Next page", on_click=lambda e: self._go_to_page(self.current_page + 1))
+        return ft.Row([
+            self.prev_page_button,
+            self.page_info_text,
+            self.next_page_button
+        ], alignment=ft.MainAxisAlignment.CENTER, visible=False)
+    
+    def _update_pager(self, total: int):
+        """Show the pager only when there is more than one page."""
+        if self.pager_row is None:
+            return
+        self.pager_row.visible = self.total_pages > 1
+        self.page_info_text.value = f"Page {self.current_page} of {self.total_pages} ({total} files)"
+        self.prev_page_button.disabled = self.current_page <= 1
+        self.next_page_button.disabled = self.current_page >= self.total_pages
+    
+    def _go_to_page(self, page_number: int):
+        """Show another page of the current view."""
+        if 1 <= page_number <= self.total_pages and page_number != self.current_page:
+            self.current_page = page_number
+            self.refresh_files_table()
+    
+    def _create_bulk_actions_bar(self) -> ft.Row:
+        """Create the bulk action bar for checked files."""
+        self.bulk_selection_text = ft.Text("No files selected", size=16, color=ft.Colors.GREY_600)
+        self.bulk_approve_button = ft.ElevatedButton(
+            "Approve Selected",
+            icon=ft.Icons.CHECK,
+            disabled=True,
+            on_click=lambda e: self.tl_action_handler.handle_bulk_approve(
+                list(self.checked_files.values()), self._bulk_refresh),
+            style=self._get_button_style("success")
+        )
+        self.bulk_reject_button = ft.ElevatedButton(
+            "Reject Selected",
+            icon=ft.Icons.CLOSE,
+            disabled=True,
+            on_click=lambda e: self.tl_action_handler.handle_bulk_reject(
+                list(self.checked_files.values()), self._bulk_refresh),
+            style=self._get_button_style("danger")
+        )
+        return ft.Row([
+            self.bulk_selection_text,
+            ft.Container(expand=True),
+            self.bulk_approve_button,
+            self.bulk_reject_button
+        ], spacing=10)
+    
     def _create_preview_section(self) -> ft.Container:
         """Create preview section using PreviewPanelManager."""
         self.preview_panel_widget = self.preview_manager.create_empty_preview_panel()
@@ -942,58 +1074,56 @@ class TeamLeaderPanel:
     def refresh_files_table(self):
         """Refresh the files table with enhanced filtering."""
         try:
-            # Get files based on current view mode
-            if self.current_view_mode == "pending_only":
-                all_files = self.tl_service.get_pending_files_for_team_leader(self.username)
-            elif self.current_view_mode == "my_approved":
-                files_by_status = self.tl_service.get_team_files_by_status(self.username)
-                all_files = files_by_status.get('pending_admin', []) + files_by_status.get('approved', [])
-            elif self.current_view_mode == "my_rejected":
-                files_by_status = self.tl_service.get_team_files_by_status(self.username)
-                all_files = files_by_status.get('rejected_by_tl', [])
-            else:  # all_team
-                files_by_status = self.tl_service.get_team_files_by_status(self.username)
-                all_files = []
-                for status_files in files_by_status.values():
-                    all_files.extend(status_files)
-            
-            # Apply search filter
-            if self.search_query:
-                search_lower = self.search_query.lower()
-                all_files = [
-                    f for f in all_files
-                    if (search_lower in f.get('original_filename', '').lower() or
-                        search_lower in f.get('user_id', '').lower() or
-                        search_lower in f.get('description', '').lower())
-                ]
-            
-            # Apply sorting
-            all_files = self._sort_files(all_files)
-            
-            # Store current filtered files for statistics
-            self.current_filtered_files = all_files
-            
-            # Update statistics cards dynamically
-            self._update_statistics_cards()
-            
-            # Clear and populate table
-            self.files_table.rows.clear()
-            
-            # Reset selection when table is refreshed
-            self.selected_row_index = None
-            
-            if not all_files:
-                self._add_empty_table_row()
-            else:
-                for i, file_data in enumerate(all_files):
-                    try:
-                        row = self._create_table_row(file_data, i)
-                        self.files_table.rows.append(row)
-                    except Exception as row_error:
-                        print(f"Error creating table row: {row_error}")
-                        continue
-            
-            self.page.update()
+            with PerformanceTimer("TLPanel", "refresh_files_table"):
+                # Get the page of the current view mode - search and sorting are applied by
+                # the service, archived approvals come from the archive indexes
+                with span("load_files", "ui", view=self.current_view_mode, page=self.current_page) as load_span:
+                    result = self.tl_service.get_team_files_page(
+                        self.username, self.current_view_mode, self.search_query, self.current_sort,
+                        self.current_page, self.page_size)
+                    load_span.set_tags(rows=len(result['items']), total=result['total'])
+                if not result['items'] and self.current_page > 1 and result['total']:
+                    # The page shrank away (files processed meanwhile) - show the last one
+                    self.current_page = result['pages']
+                    return self.refresh_files_table()
+                all_files = result['items']
+                self.total_pages = result['pages']
+                self.current_total = result['total']
+                
+                # Store current filtered files for statistics
+                self.current_filtered_files = all_files
+                
+                # Keep only checked files that are still visible and actionable
+                visible = {f.get('file_id'): f for f in all_files if self._is_bulk_actionable(f)}
+                self.checked_files = {file_id: visible[file_id] 
+                                      for file_id in self.checked_files if file_id in visible}
+                
+                # Update statistics cards dynamically
+                with span("update_statistics", "ui"):
+                    self._update_statistics_cards()
+                
+                # Clear and populate table
+                with span("render_rows", "ui", rows=len(all_files)):
+                    self.files_table.rows.clear()
+                    
+                    # Reset selection when table is refreshed
+                    self.selected_row_index = None
+                    
+                    if not all_files:
+                        self._add_empty_table_row()
+                    else:
+                        for i, file_data in enumerate(all_files):
+                            try:
+                                row = self._create_table_row(file_data, i)
+                                self.files_table.rows.append(row)
+                            except Exception as row_error:
+                                print(f"Error creating table row: {row_error}")
+                                continue
+                
+                self._update_pager(result['total'])
+                self._update_bulk_actions()
+                with span("page_update", "ui"):
+                    self.page.update()
             
         except Exception as e:
             print(f"Error refreshing files table: {e}")
@@ -1008,17 +1138,17 @@ class TeamLeaderPanel:
             # Update card values based on view mode
             if self.current_view_mode == "pending_only":
                 # Show actual filtered counts
-                pending_text = str(len(self.current_filtered_files))
+                pending_text = str(self.current_total)
                 approved_text = str(overall_counts['approved_by_tl'])
                 rejected_text = str(overall_counts['rejected_by_tl'])
             elif self.current_view_mode == "my_approved":
                 pending_text = str(overall_counts['pending_team_leader'])
-                approved_text = str(len(self.current_filtered_files))
+                approved_text = str(self.current_total)
                 rejected_text = str(overall_counts['rejected_by_tl'])
             elif self.current_view_mode == "my_rejected":
                 pending_text = str(overall_counts['pending_team_leader'])
                 approved_text = str(overall_counts['approved_by_tl'])
-                rejected_text = str(len(self.current_filtered_files))
+                rejected_text = str(self.current_total)
             else:  # all_team
                 # Show dynamic counts from filtered files
                 pending_text = str(overall_counts['pending_team_leader'])
@@ -1036,21 +1166,6 @@ class TeamLeaderPanel:
         except Exception as e:
             print(f"Error updating statistics cards: {e}")
     
-    def _sort_files(self, files: List[Dict]) -> List[Dict]:
-        """Sort files based on current sort option."""
-        try:
-            if self.current_sort == "original_filename":
-                return sorted(files, key=lambda x: x.get('original_filename', '').lower())
-            elif self.current_sort == "user_id":
-                return sorted(files, key=lambda x: x.get('user_id', '').lower())
-            elif self.current_sort == "file_size":
-                return sorted(files, key=lambda x: x.get('file_size', 0), reverse=True)
-            else:  # submission_date
-                return sorted(files, key=lambda x: x.get('submission_date', ''), reverse=True)
-        except Exception as e:
-            print(f"Error sorting files: {e}")
-            return files
-    
     def _create_table_row(self, file_data: Dict, row_index: int) -> ft.DataRow:
         """Create table row with dynamic column visibility based on current configuration."""
         file_size = file_data.get('file_size', 0)
@@ -1074,7 +1189,12 @@ class TeamLeaderPanel:
             "file": True, "user": True, "size": True, "submitted": True, "status": True
         })
         
-        cells = []
+        checkable = self._is_bulk_actionable(file_data)
+        cells = [ft.DataCell(ft.Checkbox(
+            value=checkable and file_data.get('file_id') in self.checked_files,
+            disabled=not checkable,
+            on_change=lambda e, data=file_data: self._on_file_checked(data, e.control.value)
+        ))]
         
         if col_config.get("file", True):
             cells.append(ft.DataCell(ft.Text(
@@ -1213,6 +1333,53 @@ class TeamLeaderPanel:
 
 
     
+    def _bulk_refresh(self):
+        """Refresh callback for bulk actions."""
+        self.checked_files.clear()
+        self._clear_selection()
+        self.refresh_files_table()
+    
+    def _is_bulk_actionable(self, file_data: Dict) -> bool:
+        """Only files waiting for team leader review can be bulk approved / rejected."""
+        return bool(file_data.get('file_id')) and file_data.get('status') in ['pending_team_leader', 'pending']
+    
+    def _on_file_checked(self, file_data: Dict, checked: bool):
+        """Handle a row checkbox change."""
+        try:
+            if checked:
+                self.checked_files[file_data['file_id']] = file_data
+            else:
+                self.checked_files.pop(file_data['file_id'], None)
+            self._update_bulk_actions()
+            self.page.update()
+        except Exception as e:
+            print(f"Error updating bulk selection: {e}")
+    
+    def _on_select_all_changed(self, e):
+        """Check or uncheck every actionable file in the current view."""
+        try:
+            if e.control.value:
+                self.checked_files = {f['file_id']: f for f in self.current_filtered_files 
+                                      if self._is_bulk_actionable(f)}
+            else:
+                self.checked_files = {}
+            self.refresh_files_table()
+        except Exception as error:
+            print(f"Error handling select all: {error}")
+    
+    def _update_bulk_actions(self):
+        """Sync bulk action bar and select-all checkbox with the checked files."""
+        count = len(self.checked_files)
+        actionable = sum(1 for f in self.current_filtered_files if self._is_bulk_actionable(f))
+        
+        if getattr(self, 'bulk_selection_text', None):
+            self.bulk_selection_text.value = f"{count} file(s) selected" if count else "No files selected"
+            self.bulk_approve_button.disabled = count == 0
+            self.bulk_reject_button.disabled = count == 0
+        if getattr(self, 'select_all_checkbox', None):
+            self.select_all_checkbox.value = actionable > 0 and count == actionable
+            self.select_all_checkbox.disabled = actionable == 0
+    
     def _clear_selection(self):
         """Clear current file selection."""
         # Clear row highlighting
@@ -1256,23 +1423,15 @@ class TeamLeaderPanel:
         }.get(self.current_view_mode, "No files found")
         
         self.files_table.rows.append(ft.DataRow(cells=[
-            ft.DataCell(ft.Text(empty_message, style=ft.TextStyle(italic=True), color=ft.Colors.GREY_600)),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text(""))
-        ]))
+            ft.DataCell(ft.Text(empty_message, style=ft.TextStyle(italic=True), color=ft.Colors.GREY_600))
+        ] + [ft.DataCell(ft.Text("")) for _ in range(len(self.files_table.columns) - 1)]))
     
     def _show_table_error(self, error_msg: str):
         """Show error message in the table."""
         self.files_table.rows.clear()
         self.files_table.rows.append(ft.DataRow(cells=[
-            ft.DataCell(ft.Text(f"Error loading files: {error_msg}", color=ft.Colors.RED)),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text("")),
-            ft.DataCell(ft.Text(""))
-        ]))
+            ft.DataCell(ft.Text(f"Error loading files: {error_msg}", color=ft.Colors.RED))
+        ] + [ft.DataCell(ft.Text("")) for _ in range(len(self.files_table.columns) - 1)]))
         self.page.update()
     
     def _format_file_size(self, size_bytes: int) -> str:
@@ -1351,6 +1510,7 @@ class TeamLeaderPanel:
         """Handle search input change."""
         try:
             self.search_query = e.control.value.lower()
+            self.current_page = 1
             self.refresh_files_table()
         except Exception as error:
             print(f"Error handling search change: {error}")
@@ -1359,6 +1519,7 @@ class TeamLeaderPanel:
         """Handle view mode change."""
         try:
             self.current_view_mode = e.control.value
+            self.current_page = 1
             self._clear_selection()  # Clear selection when switching views
             self.refresh_files_table()
         except Exception as error:
@@ -1368,6 +1529,7 @@ class TeamLeaderPanel:
         """Handle sort option change."""
         try:
             self.current_sort = e.control.value
+            self.current_page = 1
             self.refresh_files_table()
         except Exception as error:
             print(f"Error handling sort change: {error}")
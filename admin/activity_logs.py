@@ -2,16 +2,25 @@ import flet as ft
 from flet import FontWeight
 import json
 import os
+import threading
+from datetime import datetime
 from utils.dialog import show_center_sheet
-from fpdf import FPDF
-import pathlib
+from utils.activity_log import get_activity_log
+from utils.log_export import LogExportJob
 
 USERS_FILE = r"\\KMTI-NAS\Shared\data\users.json"
-ACTIVITY_LOGS_FILE = r"\\KMTI-NAS\Shared\data\logs\activity_logs.json"
 BACKGROUND = ft.Colors.GREY_100
 PANEL_COLOR = "#FFFFFF"
 PANEL_RADIUS = 14
 
+# Rows shown per page - refresh cost depends on this, not on the size of the log
+PAGE_SIZE = 50
+
+# Delay for debounce (in seconds)
+SEARCH_DEBOUNCE = 0.3
+
+ALL = "ALL"
+
 def load_json(file_path, default):
     """Utility to load JSON safely."""
     if not os.path.exists(file_path):
@@ -22,16 +31,25 @@ def load_json(file_path, default):
     except Exception:
         return default
 
+def _parse_day(value: str):
+    """'YYYY-MM-DD' or None for empty input; raises ValueError on anything else"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
 def activity_logs(content: ft.Column, username: str):
     # Clear previous content
     content.controls.clear()
 
     # Load data
     users = load_json(USERS_FILE, {})
-    logs = load_json(ACTIVITY_LOGS_FILE, [])
+    activity_log = get_activity_log()
 
     # Build user info lookup
     user_info = {}
+    user_teams = {}
     for email, data in users.items():
         uname = data.get("username")
         if uname:
@@ -43,67 +61,76 @@ def activity_logs(content: ft.Column, username: str):
                 "role": data.get("role", ""),
                 "team": team_str,
             }
-
-    # Function to build rows from logs with optional filter
-    def build_rows(search_text: str = ""):
-        filtered_rows = []
-        search_text = search_text.lower()
-
-        # Iterate reversed so newest logs appear first
-        for log in reversed(logs):
-            uname = log.get("username", "")
-            info = user_info.get(uname, {
-                "fullname": uname,
-                "email": "",
-                "role": "",
-                "team": ""
-            })
-
-            dt_display = log.get("date", "-")
-            description = log.get("activity", "")
-
-            # Combine all searchable fields
-            combined = " ".join([
-                info["fullname"],
-                info["email"],
-                uname,
-                info["role"],
-                info["team"],
-                dt_display,
-                description
-            ]).lower()
-
-            if search_text in combined:
-                # Create role badge
-                role = info["role"].upper()
-                role_color = {
-                                "ADMIN": ft.Colors.RED,
-                                "TEAM LEADER": ft.Colors.BLUE,
-                                "USER": ft.Colors.GREEN
-                            }.get(role, ft.Colors.GREY)
-
-                role_badge = ft.Container(
-                    content=ft.Text(role, color=ft.Colors.WHITE, size=12, weight=FontWeight.BOLD),
-                    bgcolor=role_color,
-                    padding=ft.padding.symmetric(horizontal=8, vertical=4),
-                    border_radius=4
-                ) if role else ft.Text("", size=16)
-
-                filtered_rows.append(
-                    ft.DataRow(
-                        cells=[
-                            ft.DataCell(ft.Text(info["fullname"], size=16, weight=FontWeight.BOLD)),
-                            ft.DataCell(ft.Text(info["email"], size=16)),
-                            ft.DataCell(ft.Text(uname, size=16)),
-                            ft.DataCell(role_badge),
-                            ft.DataCell(ft.Text(info["team"], size=16)),
-                            ft.DataCell(ft.Text(dt_display, size=16)),
-                            ft.DataCell(ft.Text(description, size=16)),
-                        ]
-                    )
-                )
-
-        return filtered_rows
+            user_teams[uname] = set(team) if isinstance(team, list) else ({str(team)} if team else set())
+
+    state = {"page": 1, "pages": None}
+    search_timer = {"timer": None}
+
+    def get_info(uname: str):
+        return user_info.get(uname, {
+            "fullname": uname,
+            "email": "",
+            "role": "",
+            "team": ""
+        })
+
+    def current_filters():
+        """Filters for ActivityLog.query / iter_entries from the controls (user, role and team resolve to usernames)"""
+        usernames = None
+        if user_dropdown.value and user_dropdown.value != ALL:
+            usernames = {user_dropdown.value}
+        if role_dropdown.value and role_dropdown.value != ALL:
+            with_role = {uname for uname, info in user_info.items() if info["role"] == role_dropdown.value}
+            usernames = with_role if usernames is None else usernames & with_role
+        if team_dropdown.value and team_dropdown.value != ALL:
+            in_team = {uname for uname, teams in user_teams.items() if team_dropdown.value in teams}
+            usernames = in_team if usernames is None else usernames & in_team
+
+        search_text = (search_field.value or "").strip()
+
+        return {
+            "date_from": _parse_day(date_from_field.value),
+            "date_to": _parse_day(date_to_field.value),
+            "username": usernames,
+            # All words must match (prefixes of activity, name, email, role, team or dates like 2026-06 / june)
+            "search": search_text or None,
+        }
+
+    def has_filters(filters) -> bool:
+        return any(value is not None for value in filters.values())
+
+    def build_row(log):
+        uname = log.get("username", "")
+        info = get_info(uname)
+        dt_display = log.get("date", "-")
+        description = log.get("activity", "")
+
+        # Create role badge
+        role = info["role"].upper()
+        role_color = {
+                        "ADMIN": ft.Colors.RED,
+                        "TEAM LEADER": ft.Colors.BLUE,
+                        "USER": ft.Colors.GREEN
+                    }.get(role, ft.Colors.GREY)
+
+        role_badge = ft.Container(
+            content=ft.Text(role, color=ft.Colors.WHITE, size=12, weight=FontWeight.BOLD),
+            bgcolor=role_color,
+            padding=ft.padding.symmetric(horizontal=8, vertical=4),
+            border_radius=4
+        ) if role else ft.Text("", size=16)
+
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(info["fullname"], size=16, weight=FontWeight.BOLD)),
+                ft.DataCell(ft.Text(info["email"], size=16)),
+                ft.DataCell(ft.Text(uname, size=16)),
+                ft.DataCell(role_badge),
+                ft.DataCell(ft.Text(info["team"], size=16)),
+                ft.DataCell(ft.Text(dt_display, size=16)),
+                ft.DataCell(ft.Text(description, size=16)),
+            ]
+        )
 
     table = ft.DataTable(
         columns=[
@@ -115,7 +142,7 @@ def activity_logs(content: ft.Column, username: str):
             ft.DataColumn(ft.Text("Date & Time", weight=FontWeight.BOLD, size=16)),
             ft.DataColumn(ft.Text("Activity", weight=FontWeight.BOLD, size=16)),
         ],
-        rows=build_rows(),
+        rows=[],
         expand=False,
         data_row_color={ft.ControlState.HOVERED: "#B9B9B9"},
         column_spacing=80,
@@ -124,128 +151,152 @@ def activity_logs(content: ft.Column, username: str):
         data_row_min_height=50,
     )
 
-    # Function to refresh table with search text
-    def refresh_table(e=None):
+    page_info_text = ft.Text("", size=14, color=ft.Colors.GREY_600)
+    prev_page_button = ft.IconButton(
+        ft.Icons.CHEVRON_LEFT, tooltip="Previous page", on_click=lambda e: go_to_page(state["page"] - 1))
+    next_page_button = ft.IconButton(
+        ft.Icons.CHEVRON_RIGHT, tooltip="Next page", on_click=lambda e: go_to_page(state["page"] + 1))
+
+    # Function to load the current page of matching logs into the table
+    def refresh_table(e=None, reset_page: bool = False, update: bool = True):
+        if reset_page:
+            state["page"] = 1
+        try:
+            filters = current_filters()
+            date_from_field.error_text = None
+            date_to_field.error_text = None
+        except ValueError:
+            date_from_field.error_text = "Use YYYY-MM-DD" if not _is_day(date_from_field.value) else None
+            date_to_field.error_text = "Use YYYY-MM-DD" if not _is_day(date_to_field.value) else None
+            if update:
+                content.update()
+            return
+
+        result = activity_log.query(page=state["page"], limit=PAGE_SIZE, **filters)
+        if not result["items"] and state["page"] > 1:
+            # The page emptied (e.g. after Clear Filtered) - fall back to the first one
+            state["page"] = 1
+            result = activity_log.query(page=1, limit=PAGE_SIZE, **filters)
+
         table.rows.clear()
-        table.rows.extend(build_rows(search_field.value or ""))
-        table.update()
+        table.rows.extend(build_row(log) for log in result["items"])
+
+        state["pages"] = result["pages"]
+        if result["total"] is not None:
+            page_info_text.value = f"Page {result['page']} of {result['pages']} ({result['total']} entries)"
+        else:
+            page_info_text.value = f"Page {result['page']}"
+        prev_page_button.disabled = result["page"] <= 1
+        next_page_button.disabled = not result["has_more"]
+        if update:
+            content.update()
+
+    def _is_day(value) -> bool:
+        try:
+            _parse_day(value)
+            return True
+        except ValueError:
+            return False
+
+    def go_to_page(page_number: int):
+        """Show another page of the current filter."""
+        if page_number < 1 or (state["pages"] is not None and page_number > state["pages"]):
+            return
+        state["page"] = page_number
+        refresh_table()
+
+    def on_filter_changed(e=None):
+        refresh_table(reset_page=True)
+
+    def on_search_changed(e=None):
+        # Debounce: only query once typing pauses
+        if search_timer["timer"]:
+            search_timer["timer"].cancel()
+        search_timer["timer"] = threading.Timer(SEARCH_DEBOUNCE, lambda: refresh_table(reset_page=True))
+        search_timer["timer"].daemon = True
+        search_timer["timer"].start()
 
     # Function to clear only filtered logs
     def clear_logs_action(e):
-        search_text = (search_field.value or "").lower()
-        print(f"[DEBUG] clear_logs_action called with filter: '{search_text}'")
+        try:
+            filters = current_filters()
+        except ValueError:
+            print("[DEBUG] Invalid date filter, nothing to delete.")
+            return
+        print(f"[DEBUG] clear_logs_action called with filter: '{search_field.value or ''}'")
 
-        if not search_text:
+        if not has_filters(filters):
             print("[DEBUG] No filter applied, nothing to delete.")
             return
 
-        remaining_logs = []
-        for log in logs:
-            uname = log.get("username", "")
-            info = user_info.get(uname, {
-                "fullname": uname,
-                "email": "",
-                "role": "",
-                "team": ""
-            })
-            dt_display = log.get("date", "-")
-            description = log.get("activity", "")
-            combined = " ".join([
-                info["fullname"],
-                info["email"],
-                uname,
-                info["role"],
-                info["team"],
-                dt_display,
-                description
-            ]).lower()
-
-            if search_text not in combined:
-                remaining_logs.append(log)
-
-        with open(ACTIVITY_LOGS_FILE, "w") as f:
-            json.dump(remaining_logs, f, indent=4)
-
-        logs.clear()
-        logs.extend(remaining_logs)
+        # Only the day files in range that hold matches are rewritten
+        removed = activity_log.delete_where(**filters)
+        print(f"[DEBUG] Deleted {removed} filtered log(s)")
         refresh_table()
 
-    # Ensure default export directory
-    default_export_dir = pathlib.Path(r"\\KMTI-NAS\Shared\data\export")
-    default_export_dir.mkdir(parents=True, exist_ok=True)
-
     # File picker (still appended in case needed later)
     file_picker = ft.FilePicker()
     content.page.overlay.append(file_picker)
 
-    # Function to export logs to PDF
+    export_state = {"job": None}
+
+    def on_export_progress(written, total):
+        if total:
+            export_progress.value = min(1.0, written / total)
+            export_status.value = f"Exporting {written} / {total}"
+        else:
+            export_progress.value = None
+            export_status.value = f"Exporting {written}"
+        content.update()
+
+    def on_export_done(job):
+        export_state["job"] = None
+        export_progress.visible = False
+        cancel_export_button.visible = False
+        export_button.disabled = False
+        if job.status == "completed":
+            names = ", ".join(os.path.basename(path) for path in job.files)
+            export_status.value = f"Exported {job.written} entries to {names}" if job.written else "No logs found to export."
+        elif job.status == "cancelled":
+            export_status.value = "Export cancelled"
+        else:
+            export_status.value = f"Export failed: {job.error}"
+        print(f"[DEBUG] Export {job.status}: {job.files}")
+        content.update()
+
+    # Function to export logs - runs on a worker, streaming from the log store
     def export_logs_action(e):
-        search_text = (search_field.value or "").lower()
-        print(f"[DEBUG] export_logs_action called with filter: '{search_text}'")
-
-        filtered = []
-        for log in reversed(logs):
-            uname = log.get("username", "")
-            info = user_info.get(uname, {
-                "fullname": uname,
-                "email": "",
-                "role": "",
-                "team": ""
-            })
-            dt_display = log.get("date", "-")
-            description = log.get("activity", "")
-            combined = " ".join([
-                info["fullname"],
-                info["email"],
-                uname,
-                info["role"],
-                info["team"],
-                dt_display,
-                description
-            ]).lower()
-
-            if search_text in combined:
-                filtered.append({
-                    "fullname": info["fullname"],
-                    "email": info["email"],
-                    "username": uname,
-                    "role": info["role"],
-                    "team": info["team"],
-                    "date": dt_display,
-                    "activity": description
-                })
-
-        if not filtered:
-            print("[DEBUG] No logs found to export.")
+        if export_state["job"] is not None:
             return
-
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(200, 10, txt="Exported Activity Logs", ln=True, align="C")
-        pdf.ln(5)
-
-        headers = ["Full Name", "Email", "Username", "Role", "Team", "Date & Time", "Activity"]
-        header_line = " | ".join(headers)
-        pdf.multi_cell(0, 8, header_line)
-        pdf.ln(2)
-
-        for entry in filtered:
-            line = f"{entry['fullname']} | {entry['email']} | {entry['username']} | {entry['role']} | {entry['team']} | {entry['date']} | {entry['activity']}"
-            pdf.multi_cell(0, 8, line)
-            pdf.ln(1)
-
-        # Find a unique filename
-        base_filename = "exported_logs"
-        ext = ".pdf"
-        counter = 0
-        export_file = default_export_dir / f"{base_filename}{ext}"
-        while export_file.exists():
-            counter += 1
-            export_file = default_export_dir / f"{base_filename}_{counter}{ext}"
-
-        pdf.output(str(export_file))
-        print(f"[DEBUG] Logs exported to {export_file}")
+        try:
+            filters = current_filters()
+        except ValueError:
+            print("[DEBUG] Invalid date filter, nothing to export.")
+            return
+        print(f"[DEBUG] export_logs_action called with filter: '{search_field.value or ''}' as {format_dropdown.value}")
+
+        job = LogExportJob(
+            format_dropdown.value,
+            filters,
+            progress=on_export_progress,
+            done=on_export_done,
+            user_info=user_info,
+        )
+        export_state["job"] = job
+        export_button.disabled = True
+        export_progress.value = 0
+        export_progress.visible = True
+        cancel_export_button.visible = True
+        export_status.value = "Starting export..."
+        content.update()
+        job.start()
+
+    def cancel_export_action(e):
+        job = export_state["job"]
+        if job is not None:
+            job.cancel()
+            export_status.value = "Cancelling..."
+            content.update()
 
     # Controls with dashboard styling
     search_field = ft.TextField(
@@ -254,10 +305,65 @@ def activity_logs(content: ft.Column, username: str):
         border_radius=10,
         border_color=ft.Colors.GREY_400,
         bgcolor=ft.Colors.WHITE,
-        on_change=refresh_table,
+        on_change=on_search_changed,
         text_size=16
     )
-    
+
+    user_dropdown = ft.Dropdown(
+        label="User",
+        width=200,
+        value=ALL,
+        options=[ft.dropdown.Option(ALL, "All Users")] + [
+            ft.dropdown.Option(uname, info["fullname"])
+            for uname, info in sorted(user_info.items(), key=lambda item: item[1]["fullname"].lower())
+        ],
+        on_change=on_filter_changed
+    )
+
+    role_dropdown = ft.Dropdown(
+        label="Role",
+        width=160,
+        value=ALL,
+        options=[ft.dropdown.Option(ALL, "All Roles")] + [
+            ft.dropdown.Option(role) for role in sorted({info["role"] for info in user_info.values() if info["role"]})
+        ],
+        on_change=on_filter_changed
+    )
+
+    team_dropdown = ft.Dropdown(
+        label="Team",
+        width=160,
+        value=ALL,
+        options=[ft.dropdown.Option(ALL, "All Teams")] + [
+            ft.dropdown.Option(team) for team in sorted(set().union(*user_teams.values()) if user_teams else [])
+        ],
+        on_change=on_filter_changed
+    )
+
+    date_from_field = ft.TextField(
+        label="From",
+        hint_text="YYYY-MM-DD",
+        width=150,
+        border_radius=10,
+        border_color=ft.Colors.GREY_400,
+        bgcolor=ft.Colors.WHITE,
+        on_submit=on_filter_changed,
+        on_blur=on_filter_changed,
+        text_size=16
+    )
+
+    date_to_field = ft.TextField(
+        label="To",
+        hint_text="YYYY-MM-DD",
+        width=150,
+        border_radius=10,
+        border_color=ft.Colors.GREY_400,
+        bgcolor=ft.Colors.WHITE,
+        on_submit=on_filter_changed,
+        on_blur=on_filter_changed,
+        text_size=16
+    )
+
     export_button = ft.ElevatedButton(
         "Export Logs",
         icon=ft.Icons.UPLOAD_OUTLINED,
@@ -273,6 +379,27 @@ def activity_logs(content: ft.Column, username: str):
         )
     )
 
+    format_dropdown = ft.Dropdown(
+        label="Format",
+        width=110,
+        value="pdf",
+        options=[
+            ft.dropdown.Option("pdf", "PDF"),
+            ft.dropdown.Option("csv", "CSV"),
+            ft.dropdown.Option("jsonl", "JSONL"),
+        ]
+    )
+
+    export_progress = ft.ProgressBar(width=200, value=0, visible=False)
+    export_status = ft.Text("", size=14, color=ft.Colors.GREY_600)
+    cancel_export_button = ft.IconButton(
+        ft.Icons.CANCEL_OUTLINED,
+        tooltip="Cancel export",
+        icon_color=ft.Colors.RED,
+        visible=False,
+        on_click=cancel_export_action
+    )
+
     clear_button = ft.ElevatedButton(
         "Clear Filtered",
         icon=ft.Icons.CLEAR_OUTLINED,
@@ -299,6 +426,7 @@ def activity_logs(content: ft.Column, username: str):
             ft.Text("ACTIVITY LOGS", size=24, weight=FontWeight.BOLD, color="#111111"),
             ft.Container(expand=True),
             search_field,
+            format_dropdown,
             export_button,
             clear_button,
         ],
@@ -306,27 +434,48 @@ def activity_logs(content: ft.Column, username: str):
         spacing=10
     )
 
+    filter_controls = ft.Row(
+        controls=[
+            user_dropdown,
+            role_dropdown,
+            team_dropdown,
+            date_from_field,
+            date_to_field,
+            export_progress,
+            export_status,
+            cancel_export_button,
+        ],
+        alignment=ft.MainAxisAlignment.END,
+        spacing=10,
+        wrap=True
+    )
+
+    pager_row = ft.Row(
+        [prev_page_button, page_info_text, next_page_button],
+        alignment=ft.MainAxisAlignment.CENTER
+    )
+
     # Create scrollable table container - ONLY the table scrolls, not the whole page
     scrollable_table_container = ft.Container(
         content=ft.Column(
             [
                 ft.Row(
                     [table],
-                    scroll=ft.ScrollMode.AUTO,  
+                    scroll=ft.ScrollMode.AUTO,
                     expand=True
                 )
             ],
-            scroll=ft.ScrollMode.AUTO, 
+            scroll=ft.ScrollMode.AUTO,
             expand=True
         ),
         expand=True,
-        height=800,  
+        height=800,
         padding=10
     )
 
     # Table container with dashboard styling
     table_container = ft.Container(
-        content=scrollable_table_container,
+        content=ft.Column([scrollable_table_container, pager_row], expand=True),
         bgcolor=PANEL_COLOR,
         border_radius=PANEL_RADIUS,
         padding=20,
@@ -335,16 +484,16 @@ def activity_logs(content: ft.Column, username: str):
             spread_radius=1,
             color=ft.Colors.with_opacity(0.08, ft.Colors.BLACK),
         ),
-        expand=True  
+        expand=True
     )
 
-
-
-
+    # First page only - older entries are read when paged to
+    refresh_table(update=False)
 
     # Add content with proper spacing - no whole page scroll
     content.controls.extend([
         top_controls,
+        filter_controls,
         ft.Container(height=20),
         table_container  # This container handles all scrolling internally
     ])
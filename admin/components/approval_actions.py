@@ -1,11 +1,12 @@
 
 import flet as ft
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 from utils.logger import log_approval_action, log_security_event, log_file_operation
-from utils.dialog import show_confirm_dialog
+from utils.dialog import show_confirm_dialog, show_reason_dialog
 from services.approval_service import ApprovalStatus
+from services.change_feed import publish_event
 
 
 class ApprovalActionHandler:
@@ -31,15 +32,9 @@ class ApprovalActionHandler:
             )
             
             if success:
-                self.notification_service.notify_approval_status(
-                    file_data['user_id'],
-                    file_data['original_filename'],
-                    ApprovalStatus.APPROVED.value,
-                    self.admin_user
-                )
-                
+                # The approval job notifies the user once the file has been moved
                 filename = file_data.get('original_filename', 'Unknown')
-                self._show_snackbar(f"File '{filename}' approved!", ft.Colors.GREEN)
+                self._show_snackbar(f"File '{filename}' approved - moving in background", ft.Colors.GREEN)
                 
                 log_approval_action(self.admin_user, file_data['user_id'], 
                                   file_data['file_id'], "APPROVE")
@@ -88,14 +83,14 @@ class ApprovalActionHandler:
                                refresh_callback, permanent: bool = False):
 
         try:
-            success = self.approval_service.reject_file(
-                file_data['file_id'],
+            result = self.approval_service.reject_files(
+                [file_data['file_id']],
                 self.admin_user,
                 rejection_reason,
                 permanent
-            )
+            )[file_data['file_id']]
             
-            if success:
+            if result['success']:
                 self.notification_service.notify_approval_status(
                     file_data['user_id'],
                     file_data['original_filename'],
@@ -113,12 +108,107 @@ class ApprovalActionHandler:
                 refresh_callback()
                 
             else:
-                self._show_snackbar("Failed to reject file", ft.Colors.RED)
+                self._show_snackbar(f"Failed to reject file: {result['message']}", ft.Colors.RED)
                 
         except Exception as e:
             self.enhanced_logger.general_logger.error(f"Error executing file rejection: {e}")
             self._show_snackbar("Error rejecting file", ft.Colors.RED)
     
+    def handle_bulk_approve(self, files: List[Dict], refresh_callback) -> bool:
+        """Approve all selected files with one batched service call."""
+        try:
+            if not files:
+                self._show_snackbar("No files selected", ft.Colors.ORANGE)
+                return False
+            
+            show_confirm_dialog(
+                self.page,
+                "Confirm Approval",
+                f"Approve {len(files)} selected file(s)?",
+                lambda: self._execute_bulk_approval(files, refresh_callback)
+            )
+            return True
+            
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error handling bulk approval: {e}")
+            self._show_snackbar("Error processing bulk approval", ft.Colors.RED)
+            return False
+    
+    def _execute_bulk_approval(self, files: List[Dict], refresh_callback):
+        
+        try:
+            # Queues approval jobs; workers move the files and notify users per user
+            results = self.approval_service.approve_files(
+                [f['file_id'] for f in files], self.admin_user)
+            
+            approved = [f for f in files if results.get(f['file_id'], {}).get('success')]
+            for file_data in approved:
+                log_approval_action(self.admin_user, file_data['user_id'], 
+                                  file_data['file_id'], "APPROVE")
+            
+            self._show_bulk_result("queued for approval", len(approved), len(files))
+            refresh_callback()
+            
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error executing bulk approval: {e}")
+            self._show_snackbar("Error approving files", ft.Colors.RED)
+    
+    def handle_bulk_reject(self, files: List[Dict], refresh_callback, 
+                          request_changes: bool = False) -> bool:
+        """Ask for one reason, then reject (or request changes on) all selected files."""
+        try:
+            if not files:
+                self._show_snackbar("No files selected", ft.Colors.ORANGE)
+                return False
+            
+            action = "Request changes on" if request_changes else "Reject"
+            show_reason_dialog(
+                self.page,
+                "Request Changes" if request_changes else "Confirm Rejection",
+                f"{action} {len(files)} selected file(s)?",
+                lambda reason: self._execute_bulk_rejection(files, reason, 
+                                                           refresh_callback, request_changes),
+                confirm_text="Request Changes" if request_changes else "Reject"
+            )
+            return True
+            
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error handling bulk rejection: {e}")
+            self._show_snackbar("Error processing bulk rejection", ft.Colors.RED)
+            return False
+    
+    def _execute_bulk_rejection(self, files: List[Dict], rejection_reason: str, 
+                               refresh_callback, request_changes: bool = False):
+        
+        try:
+            results = self.approval_service.reject_files(
+                [f['file_id'] for f in files], self.admin_user, 
+                rejection_reason, request_changes)
+            
+            rejected = [f for f in files if results.get(f['file_id'], {}).get('success')]
+            for file_data in rejected:
+                log_approval_action(self.admin_user, file_data['user_id'], 
+                                  file_data['file_id'], 
+                                  "REQUEST_CHANGES" if request_changes else "REJECT", 
+                                  rejection_reason)
+            
+            self._show_bulk_result("sent back for changes" if request_changes else "rejected", 
+                                   len(rejected), len(files))
+            refresh_callback()
+            
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error executing bulk rejection: {e}")
+            self._show_snackbar("Error rejecting files", ft.Colors.RED)
+    
+    def _show_bulk_result(self, action: str, succeeded: int, total: int):
+        
+        if succeeded == total:
+            self._show_snackbar(f"{succeeded} file(s) {action}", ft.Colors.GREEN)
+        elif succeeded:
+            self._show_snackbar(f"{succeeded} of {total} file(s) {action}", ft.Colors.ORANGE)
+        else:
+            self._show_snackbar(f"No files {action}", ft.Colors.RED)
+    
     def handle_add_comment(self, file_data: Dict, comment_text: str, 
                           refresh_callback) -> bool:
         """🚨 FIXED: Add comment to centralized JSON files instead of approval service memory."""
@@ -134,7 +224,7 @@ class ApprovalActionHandler:
             
             # Write comment to centralized JSON files instead of approval service
             success = self._add_comment_to_centralized_files(
-                file_data['file_id'], self.admin_user, comment_text
+                file_data['file_id'], self.admin_user, comment_text, recipient=file_data.get('user_id')
             )
             
             if success:
@@ -146,6 +236,9 @@ class ApprovalActionHandler:
                     self.admin_user,  # comment_author
                     comment_text
                 )
+                publish_event('comment_added', file_id=file_data['file_id'], user_id=file_data['user_id'],
+                              filename=file_data['original_filename'], author=self.admin_user,
+                              author_role='admin', comment=comment_text, notified=True)
                 
                 self._show_snackbar("Comment added and user notified!", ft.Colors.GREEN)
                 refresh_callback()
@@ -163,31 +256,11 @@ class ApprovalActionHandler:
             self._show_snackbar("Error adding comment", ft.Colors.RED)
             return False
     
-    def _add_comment_to_centralized_files(self, file_id: str, admin_user: str, comment_text: str) -> bool:
-        """🚨 NEW: Add admin comment to centralized JSON files."""
+    def _add_comment_to_centralized_files(self, file_id: str, admin_user: str, comment_text: str,
+                                          recipient: str = None) -> bool:
+        """🚨 NEW: Add admin comment to the centralized comment store."""
         try:
-            import os
-            import json
-            from datetime import datetime
-            from utils.path_config import DATA_PATHS
-            
-            # Use approval_comments.json for admin comments
-            approval_comments_file = os.path.join(DATA_PATHS.approvals_dir, "approval_comments.json")
-            os.makedirs(DATA_PATHS.approvals_dir, exist_ok=True)
-            
-            # Load existing comments
-            approval_comments = {}
-            if os.path.exists(approval_comments_file):
-                try:
-                    with open(approval_comments_file, 'r', encoding='utf-8') as f:
-                        approval_comments = json.load(f)
-                except Exception as e:
-                    print(f"Error loading approval comments: {e}")
-                    approval_comments = {}
-            
-            # Add new comment
-            if file_id not in approval_comments:
-                approval_comments[file_id] = []
+            from services.comment_store import get_comment_store
             
             new_comment = {
                 'admin_id': admin_user,
@@ -196,11 +269,8 @@ class ApprovalActionHandler:
                 'source': 'admin'
             }
             
-            approval_comments[file_id].append(new_comment)
-            
-            # Save updated comments
-            with open(approval_comments_file, 'w', encoding='utf-8') as f:
-                json.dump(approval_comments, f, indent=2)
+            if not get_comment_store().add_comment(file_id, new_comment, recipient=recipient):
+                return False
             
             print(f"[SUCCESS] Added admin comment to centralized file for file {file_id}")
             return True
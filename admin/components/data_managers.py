@@ -1,7 +1,7 @@
 from typing import Dict, List, Optional
 from utils.logger import PerformanceTimer, log_performance_metric
-import json
-import os
+from services.approval_queue_store import get_approval_queue_store
+from services.approval_archive import get_approval_archive
 
 
 class FileDataManager:
@@ -151,28 +151,11 @@ class FileDataManager:
     def _get_admin_pending_files(self, admin_user: str, admin_teams: List[str]) -> List[Dict]:
         """Get files pending admin review (status = 'pending_admin')."""
         try:
-            approvals_file = os.path.join(r"\\KMTI-NAS\Shared\data", "approvals", "file_approvals.json")
-            if not os.path.exists(approvals_file):
-                return []
-            
-            with open(approvals_file, 'r', encoding='utf-8') as f:
-                queue = json.load(f)
+            # Check team access if admin has team restrictions
+            team_scope = admin_teams if admin_teams and admin_teams != ['ALL'] else None
             
-            pending_admin_files = []
-            for file_id, file_data in queue.items():
-                status = file_data.get('status', '')
-                
-                # Admin sees files that are pending_admin (approved by TL, waiting for admin)
-                if status == 'pending_admin':
-                    # Check team access if admin has team restrictions
-                    if admin_teams and admin_teams != ['ALL']:
-                        file_team = file_data.get('user_team', '')
-                        if file_team not in admin_teams:
-                            continue
-                    
-                    pending_admin_files.append(file_data)
-            
-            return pending_admin_files
+            # Admin sees files that are pending_admin (approved by TL, waiting for admin)
+            return get_approval_queue_store().query(status='pending_admin', user_team=team_scope)
             
         except Exception as e:
             self.enhanced_logger.general_logger.error(f"Error getting admin pending files: {e}")
@@ -182,35 +165,19 @@ class FileDataManager:
                                status_filter: Optional[str] = None) -> List[Dict]:
         """Get all files accessible to admin with optional status filtering - EXCLUDES pending_team_leader."""
         try:
-            approvals_file = os.path.join(r"\\KMTI-NAS\Shared\data", "approvals", "file_approvals.json")
-            
             all_files = []
             
-            # Get files from active queue
-            if os.path.exists(approvals_file):
-                with open(approvals_file, 'r', encoding='utf-8') as f:
-                    queue = json.load(f)
+            # Get files from active queue (status/team filters go to the store's indexes)
+            team_scope = admin_teams if admin_teams and admin_teams != ['ALL'] else None
+            queue_files = get_approval_queue_store().query(status=status_filter or None, user_team=team_scope)
+            
+            for file_data in queue_files:
+                # 🚨 CRITICAL FIX: Admin should NOT see files pending team leader review
+                # These files are still in the TL workflow and should not appear in admin panel
+                if file_data.get('status', '') == 'pending_team_leader':
+                    continue  # Skip files pending team leader approval
                 
-                for file_id, file_data in queue.items():
-                    file_status = file_data.get('status', '')
-                    
-                    # 🚨 CRITICAL FIX: Admin should NOT see files pending team leader review
-                    # These files are still in the TL workflow and should not appear in admin panel
-                    if file_status == 'pending_team_leader':
-                        continue  # Skip files pending team leader approval
-                    
-                    # Check team access if admin has team restrictions
-                    if admin_teams and admin_teams != ['ALL']:
-                        file_team = file_data.get('user_team', '')
-                        if file_team not in admin_teams:
-                            continue
-                    
-                    # Apply status filter if provided
-                    if status_filter:
-                        if file_status != status_filter:
-                            continue
-                    
-                    all_files.append(file_data)
+                all_files.append(file_data)
             
             # Also check archived approved/rejected files if needed
             if not status_filter or status_filter in ['approved', 'rejected_admin']:
@@ -223,6 +190,60 @@ class FileDataManager:
             self.enhanced_logger.general_logger.error(f"Error getting all files for admin: {e}")
             return []
     
+    # Archive kinds shown for each admin status filter (None = all statuses)
+    ARCHIVE_KINDS_BY_STATUS = {
+        None: ['approved', 'rejected_admin'],
+        'approved': ['approved'],
+        'rejected_admin': ['rejected_admin'],
+    }
+    
+    def get_admin_files_page(self, admin_user: str, admin_teams: List[str], status_filter: Optional[str] = None,
+                             team_filter: Optional[str] = None, search: str = "", sort: str = "submission_date",
+                             page: int = 1, page_size: int = 50) -> Dict:
+        """
+        One page of the admin file list - live queue files and archived files merged
+        in sort order. Archived files are filtered, sorted and counted by the archive's
+        indexes and only the page shown is copied.
+        
+        Returns {'items', 'total', 'page', 'pages', 'counts': {'pending', 'approved', 'rejected', 'total'}}
+        """
+        try:
+            with PerformanceTimer("FileApprovalPanel", "get_admin_files_page"):
+                team_scope = admin_teams if admin_teams and admin_teams != ['ALL'] else None
+                if team_filter and team_filter != "ALL":
+                    team_scope = [team_filter] if team_scope is None or team_filter in team_scope else []
+                
+                # Live queue (small) - admins never see files still pending team leader review
+                queue_files = [
+                    f for f in get_approval_queue_store().query(status=status_filter or None, user_team=team_scope)
+                    if f.get('status', '') != 'pending_team_leader'
+                ]
+                if search:
+                    search_lower = search.lower()
+                    queue_files = [
+                        f for f in queue_files
+                        if (search_lower in f.get('original_filename', '').lower() or
+                            search_lower in f.get('user_id', '').lower() or
+                            search_lower in f.get('description', '').lower())
+                    ]
+                
+                result = get_approval_archive().query(
+                    kinds=self.ARCHIVE_KINDS_BY_STATUS.get(status_filter or None, []),
+                    teams=team_scope, search=search or None, sort=sort, page=page, limit=page_size,
+                    exclude_ids={f.get('file_id') for f in queue_files}, merge_with=queue_files)
+                
+                counts = self._calculate_counts_from_files(queue_files)
+                counts['approved'] += result['totals'].get('approved', 0)
+                counts['rejected'] += result['totals'].get('rejected_admin', 0)
+                counts['total'] = result['total']
+                result['counts'] = counts
+                return result
+            
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error getting admin files page: {e}")
+            return {'items': [], 'total': 0, 'page': 1, 'pages': 1,
+                    'counts': {'pending': 0, 'approved': 0, 'rejected': 0, 'total': 0}}
+    
     def _get_admin_approved_files(self, admin_user: str, admin_teams: List[str]) -> List[Dict]:
         """Get files approved by admin (may be archived)."""
         try:
@@ -262,52 +283,25 @@ class FileDataManager:
             return []
     
     def _get_archived_files(self, admin_teams: List[str], status_filter: Optional[str] = None) -> List[Dict]:
-        """Get archived approved/rejected files from archive directory."""
+        """Get archived approved/rejected files from the monthly archive segments."""
         try:
             archived_files = []
-            archive_dir = os.path.join(r"\\KMTI-NAS\Shared\data", "approvals", "archived")
+            archive = get_approval_archive()
             
-            if not os.path.exists(archive_dir):
-                return []
-            
-            # Check for status-specific archive files
-            archive_files = {
-                'approved': os.path.join(archive_dir, 'approved_files.json'),
-                'rejected_admin': os.path.join(archive_dir, 'rejected_files.json'),
-                'all': os.path.join(archive_dir, 'all_processed_files.json')
-            }
-            
-            files_to_check = []
-            if status_filter and status_filter in archive_files:
-                files_to_check = [archive_files[status_filter]]
-            elif not status_filter:
-                files_to_check = [archive_files['all']] if os.path.exists(archive_files['all']) else list(archive_files.values())
+            # Check the status-specific archives
+            kinds = [status_filter] if status_filter else ['approved', 'rejected_admin']
+            teams = admin_teams if admin_teams and admin_teams != ['ALL'] else None
             
-            for archive_file in files_to_check:
-                if os.path.exists(archive_file):
-                    try:
-                        with open(archive_file, 'r', encoding='utf-8') as f:
-                            archive_data = json.load(f)
-                        
-                        # Handle both dict (file_id -> file_data) and list formats
-                        if isinstance(archive_data, dict):
-                            file_list = list(archive_data.values())
-                        else:
-                            file_list = archive_data
-                        
-                        # Filter by team access
-                        for file_data in file_list:
-                            if admin_teams and admin_teams != ['ALL']:
-                                file_team = file_data.get('user_team', '')
-                                if file_team not in admin_teams:
-                                    continue
-                            
-                            archived_files.append(file_data)
-                            
-                    except Exception as file_error:
-                        self.enhanced_logger.general_logger.warning(
-                            f"Error reading archive file {archive_file}: {file_error}")
-                        continue
+            for kind in kinds:
+                if kind not in archive.KINDS:
+                    continue
+                try:
+                    # Filter by team access (segments without the teams are not read)
+                    archived_files.extend(archive.query(kinds=kind, teams=teams, limit=None)['items'])
+                except Exception as file_error:
+                    self.enhanced_logger.general_logger.warning(
+                        f"Error reading {kind} archive: {file_error}")
+                    continue
             
             return archived_files
             
@@ -434,7 +428,11 @@ def cleanup_resources(admin_user: str, file_manager, enhanced_logger):
             file_manager.invalidate_cache()
         
         from utils.logger import log_action
+        from utils.log_writer import flush_logs
         log_action(admin_user, "File approval panel session ended")
+        # Write out everything the panel queued on the log writer
+        if not flush_logs():
+            enhanced_logger.general_logger.warning("Log writer did not flush before timeout")
         
         enhanced_logger.general_logger.info("File approval panel cleanup completed")
     except Exception as e:
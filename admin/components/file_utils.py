@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Dict, Optional
 from utils.file_manager import SecurityError
 from utils.logger import log_file_operation, log_security_event
+from services.approved_location_index import get_approved_location_index
 
 
 class FileOperationHandler:
@@ -69,6 +70,9 @@ class FileOperationHandler:
             if not file_path or not os.path.exists(file_path):
                 # Try to find the file in its new location if it's an approved file
                 current_location = file_data.get('current_location')
+                if not current_location or not os.path.exists(current_location):
+                    # Listed location is gone - check the index entry and search again
+                    current_location = get_approved_location_index().locate(file_data, verify=True)
                 if current_location and os.path.exists(current_location):
                     file_path = current_location
                     print(f"[OPEN_FILE] Using moved file location: {file_path}")
@@ -58,8 +58,13 @@ class TableHelper:
         return columns
     
     def create_table_row(self, file_data: Dict, size_category: str, 
-                        on_file_select: Callable) -> ft.DataRow:
-        """Create responsive table row with dynamic column visibility."""
+                        on_file_select: Callable, on_check_changed: Optional[Callable] = None,
+                        checked: bool = False, checkable: bool = True) -> ft.DataRow:
+        """
+        Create responsive table row with dynamic column visibility.
+        With on_check_changed a leading checkbox cell is added for multi-select;
+        it is called as on_check_changed(file_data, checked).
+        """
         # Use dynamic column configuration if available
         config = getattr(self, 'current_column_config', None)
         if not config:
@@ -85,6 +90,15 @@ class TableHelper:
         
         cells = []
         
+        if on_check_changed:
+            cells.append(ft.DataCell(
+                ft.Checkbox(
+                    value=checked and checkable,
+                    disabled=not checkable,
+                    on_change=lambda e, data=file_data: on_check_changed(data, e.control.value)
+                )
+            ))
+        
         if config.get("file", True):
             cells.append(ft.DataCell(
                 ft.Container(
@@ -156,8 +170,24 @@ class TableHelper:
         
         config = status_configs.get(status, {'text': status.upper(), 'color': ft.Colors.GREY})
         
+        # Background approval job state overrides the queue status
+        job = (file_data or {}).get('approval_job') or {}
+        job_configs = {
+            'queued': {'text': 'APPROVING', 'color': ft.Colors.BLUE},
+            'moving': {'text': 'MOVING', 'color': ft.Colors.BLUE_700},
+            'failed': {'text': 'MOVE FAILED', 'color': ft.Colors.RED}
+        }
+        if job.get('state') in job_configs:
+            config = job_configs[job['state']]
+            if job['state'] == 'moving' and job.get('progress') is not None:
+                config = dict(config, text=f"MOVING {job['progress']}%")
+        
         # Add reviewer info for approved/rejected files
         tooltip_text = f"Status: {status}"
+        if job.get('state') in job_configs:
+            tooltip_text += f"\nApproval job: {job['state']} (attempt {job.get('attempts', 0)}/{job.get('max_attempts', '?')})"
+            if job.get('last_error'):
+                tooltip_text += f"\nLast error: {job['last_error']}"
         if file_data and status == 'pending_admin' and file_data.get('tl_approved_by'):
             tooltip_text += f"\nApproved by: {file_data['tl_approved_by']}"
         elif file_data and status == 'rejected_team_leader' and file_data.get('tl_rejected_by'):
@@ -6,11 +6,15 @@ with improved team filtering, statistics synchronization, and role-based access
 """
 
 import os
-import json
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from utils.path_config import DATA_PATHS
+from services.approval_queue_store import get_approval_queue_store
+from services.approval_archive import get_approval_archive
+from services.approved_location_index import get_approved_location_index
+from services.change_feed import publish_event
+from utils.json_cache import load_json_cached
 
 
 class TeamLeaderApprovalService:
@@ -21,38 +25,25 @@ class TeamLeaderApprovalService:
         self.users_file = DATA_PATHS.users_file
         # Ensure network directories exist
         DATA_PATHS.ensure_network_dirs()
+        self.queue_store = get_approval_queue_store()
     
     def load_global_queue(self) -> Dict:
         """Load global approval queue."""
-        try:
-            if os.path.exists(self.global_queue_file):
-                with open(self.global_queue_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading global queue: {e}")
-        return {}
+        return self.queue_store.load_all()
     
     def save_global_queue(self, queue: Dict) -> bool:
-        """Save global approval queue."""
-        try:
-            with open(self.global_queue_file, 'w', encoding='utf-8') as f:
-                json.dump(queue, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error saving global queue: {e}")
-            return False
+        """Save global approval queue (full replace - prefer per-record store methods)."""
+        return self.queue_store.save_all(queue)
     
     def get_user_team(self, username: str) -> str:
         """Get user's team from users.json."""
         try:
-            if os.path.exists(self.users_file):
-                with open(self.users_file, 'r', encoding='utf-8') as f:
-                    users = json.load(f)
-                
-                for email, user_data in users.items():
-                    if user_data.get('username') == username:
-                        teams = user_data.get('team_tags', [])
-                        return teams[0] if teams else "DEFAULT"
+            users = load_json_cached(self.users_file, {}, copy_result=False) or {}
+            
+            for email, user_data in users.items():
+                if user_data.get('username') == username:
+                    teams = user_data.get('team_tags', [])
+                    return teams[0] if teams else "DEFAULT"
         except Exception as e:
             print(f"Error getting user team: {e}")
         return "DEFAULT"
@@ -75,29 +66,14 @@ class TeamLeaderApprovalService:
             include_filters: Optional filters {'team': str, 'status': str, 'search': str}
         """
         try:
-            queue = self.load_global_queue()
             team_leader_team = self.get_user_team(team_leader_username)
-            pending_files = []
             
             print(f"[DEBUG] TL Service: Looking for files for team '{team_leader_team}' (TL: {team_leader_username})")
             
-            for file_id, file_data in queue.items():
-                file_status = file_data.get('status', '')
-                file_team = file_data.get('user_team', '')
-                
-                print(f"[DEBUG] File {file_data.get('original_filename', 'Unknown')}: status='{file_status}', team='{file_team}'")
-                
-                # Team Leader should only see files from their assigned team
-                if file_team != team_leader_team:
-                    print(f"[DEBUG] ❌ Skipping file (team mismatch: {file_team} != {team_leader_team})")
-                    continue
-                
-                # Only show files that are pending team leader review
-                if file_status == 'pending_team_leader' or file_status == 'pending':
-                    print(f"[DEBUG] ✅ Adding file to pending list")
-                    pending_files.append(file_data)
-                else:
-                    print(f"[DEBUG] ❌ Skipping file (status not pending TL: {file_status})")
+            # Team Leader should only see files from their assigned team that are
+            # pending team leader review (indexed lookup on status + user_team)
+            pending_files = self.queue_store.query(
+                status=['pending_team_leader', 'pending'], user_team=team_leader_team)
             
             # Apply additional filters if provided
             if include_filters:
@@ -134,14 +110,15 @@ class TeamLeaderApprovalService:
         
         return filtered_files
     
-    def get_team_files_by_status(self, team_leader_username: str, status_filter: str = None) -> Dict[str, List[Dict]]:
+    def get_team_files_by_status(self, team_leader_username: str, status_filter: str = None,
+                                 include_archived: bool = True) -> Dict[str, List[Dict]]:
         """
         Get all files from team leader's team organized by status.
-        🚨 ENHANCED: Now includes approved files that have been moved to project directories.
+        🚨 ENHANCED: Now includes approved files that have been moved to project directories
+        (unless include_archived is False - the paged views query the archive themselves).
         Used for comprehensive statistics and filtering.
         """
         try:
-            queue = self.load_global_queue()
             team_leader_team = self.get_user_team(team_leader_username)
             
             files_by_status = {
@@ -152,14 +129,9 @@ class TeamLeaderApprovalService:
                 'rejected_by_admin': []
             }
             
-            # Get files from current queue (pending and in-process files)
-            for file_id, file_data in queue.items():
+            # Get files from current queue (pending and in-process files) - only the team leader's team
+            for file_data in self.queue_store.query(user_team=team_leader_team):
                 file_status = file_data.get('status', '')
-                file_team = file_data.get('user_team', '')
-                
-                # Only files from the team leader's team
-                if file_team != team_leader_team:
-                    continue
                 
                 # Categorize files by status
                 if file_status in ['pending_team_leader', 'pending']:
@@ -174,8 +146,9 @@ class TeamLeaderApprovalService:
                     files_by_status['rejected_by_admin'].append(file_data)
             
             # 🚨 ENHANCED: Also get approved files from archives (they've been moved out of queue)
-            archived_approved_files = self._get_archived_approved_files_for_team_leader(team_leader_username, team_leader_team)
-            files_by_status['approved'].extend(archived_approved_files)
+            if include_archived:
+                archived_approved_files = self._get_archived_approved_files_for_team_leader(team_leader_username, team_leader_team)
+                files_by_status['approved'].extend(archived_approved_files)
             
             # If status filter is specified, return only that status
             if status_filter and status_filter in files_by_status:
@@ -199,12 +172,11 @@ class TeamLeaderApprovalService:
             Tuple[bool, str]: (success, message)
         """
         try:
-            queue = self.load_global_queue()
+            file_data = self.queue_store.get_record(file_id)
             
-            if file_id not in queue:
+            if not file_data:
                 return False, "File not found in queue"
             
-            file_data = queue[file_id]
             current_status = file_data.get('status', '')
             
             if current_status != 'my_files':
@@ -223,7 +195,7 @@ class TeamLeaderApprovalService:
                 'comment': 'File submitted for team leader review'
             })
             
-            if self.save_global_queue(queue):
+            if self.queue_store.upsert_record(file_data):
                 return True, "File submitted for team leader review"
             else:
                 return False, "Failed to save submission"
@@ -244,53 +216,77 @@ class TeamLeaderApprovalService:
         Returns:
             Tuple[bool, str]: (success, message)
         """
-        try:
-            queue = self.load_global_queue()
-            
-            if file_id not in queue:
-                return False, "File not found in queue"
-            
-            file_data = queue[file_id]
-            current_status = file_data.get('status', '')
-            
-            if current_status not in ['pending_team_leader', 'pending']:
-                return False, f"File cannot be approved from status: {current_status}"
-            
-            # Verify team leader is from the same team as the file
-            reviewer_team = self.get_user_team(reviewer)
-            file_team = file_data.get('user_team', '')
-            
-            if reviewer_team != file_team:
-                return False, "Team leader can only approve files from their own team"
-            
-            # Update status and add approval info
-            file_data['status'] = 'pending_admin'
-            file_data['tl_approved_by'] = reviewer
-            file_data['tl_approved_date'] = datetime.now().isoformat()
-            
-            if 'status_history' not in file_data:
-                file_data['status_history'] = []
+        return self.approve_files([file_id], reviewer)[file_id]
+    
+    def approve_files(self, file_ids: List[str], reviewer: str) -> Dict[str, Tuple[bool, str]]:
+        """
+        Approve several files as team leader with one queue read and one queue write.
+        User status and notification writes are grouped per user.
+        
+        Args:
+            file_ids: File IDs to approve
+            reviewer: Team leader username
             
-            file_data['status_history'].append({
-                'status': 'pending_admin',
-                'timestamp': datetime.now().isoformat(),
-                'reviewer': reviewer,
-                'comment': f'Approved by team leader {reviewer}'
-            })
+        Returns:
+            Dict[str, Tuple[bool, str]]: (success, message) per file_id
+        """
+        results = {file_id: (False, "File not found in queue") for file_id in file_ids}
+        try:
+            records = self.queue_store.get_records(file_ids)
+            reviewer_team = self.get_user_team(reviewer) if records else ""
             
-            if self.save_global_queue(queue):
-                # Send notification to user about team leader approval
-                print(f"[INFO] Sending TL approval notification for file {file_data.get('original_filename')}")
-                self._notify_user_status_update(file_data, 'pending_admin', reviewer, 
-                    f"Approved by team leader {reviewer} - now pending admin review")
+            approved = []
+            for file_id, file_data in records.items():
+                current_status = file_data.get('status', '')
                 
-                return True, f"File approved by team leader and sent to admin review"
-            else:
-                return False, "Failed to save approval"
+                if current_status not in ['pending_team_leader', 'pending']:
+                    results[file_id] = (False, f"File cannot be approved from status: {current_status}")
+                    continue
+                
+                # Verify team leader is from the same team as the file
+                if reviewer_team != file_data.get('user_team', ''):
+                    results[file_id] = (False, "Team leader can only approve files from their own team")
+                    continue
+                
+                # Update status and add approval info
+                file_data['status'] = 'pending_admin'
+                file_data['tl_approved_by'] = reviewer
+                file_data['tl_approved_date'] = datetime.now().isoformat()
+                
+                if 'status_history' not in file_data:
+                    file_data['status_history'] = []
+                
+                file_data['status_history'].append({
+                    'status': 'pending_admin',
+                    'timestamp': datetime.now().isoformat(),
+                    'reviewer': reviewer,
+                    'comment': f'Approved by team leader {reviewer}'
+                })
+                approved.append(file_data)
+            
+            if not approved:
+                return results
+            
+            if not self.queue_store.commit_batch(upserts=approved):
+                for file_data in approved:
+                    results[file_data['file_id']] = (False, "Failed to save approval")
+                return results
+            
+            # Send notifications to users about team leader approval
+            print(f"[INFO] Sending TL approval notifications for {len(approved)} file(s)")
+            self._notify_user_status_updates(
+                [(file_data, 'pending_admin', f"Approved by team leader {reviewer} - now pending admin review")
+                 for file_data in approved], reviewer)
+            
+            for file_data in approved:
+                results[file_data['file_id']] = (True, "File approved by team leader and sent to admin review")
                 
         except Exception as e:
             print(f"Error approving file as team leader: {e}")
-            return False, f"Error: {str(e)}"
+            for file_id, result in results.items():
+                if not result[0]:
+                    results[file_id] = (False, f"Error: {str(e)}")
+        return results
     
     def reject_as_team_leader(self, file_id: str, reviewer: str, reason: str) -> Tuple[bool, str]:
         """
@@ -305,60 +301,88 @@ class TeamLeaderApprovalService:
         Returns:
             Tuple[bool, str]: (success, message)
         """
-        try:
-            if not reason or not reason.strip():
-                return False, "Rejection reason is required"
-            
-            queue = self.load_global_queue()
-            
-            if file_id not in queue:
-                return False, "File not found in queue"
-            
-            file_data = queue[file_id]
-            current_status = file_data.get('status', '')
-            
-            if current_status not in ['pending_team_leader', 'pending']:
-                return False, f"File cannot be rejected from status: {current_status}"
-            
-            # Verify team leader is from the same team as the file
-            reviewer_team = self.get_user_team(reviewer)
-            file_team = file_data.get('user_team', '')
-            
-            if reviewer_team != file_team:
-                return False, "Team leader can only reject files from their own team"
-            
-            # Update status and add rejection info
-            file_data['status'] = 'rejected_team_leader'
-            file_data['tl_rejected_by'] = reviewer
-            file_data['tl_rejected_date'] = datetime.now().isoformat()
-            file_data['tl_rejection_reason'] = reason.strip()
-            
-            if 'status_history' not in file_data:
-                file_data['status_history'] = []
+        return self.reject_files([file_id], reviewer, reason)[file_id]
+    
+    def reject_files(self, file_ids: List[str], reviewer: str, reason: str) -> Dict[str, Tuple[bool, str]]:
+        """
+        Reject several files as team leader with one queue read, one queue write
+        and one archive write. User status and notification writes are grouped per user.
+        
+        Args:
+            file_ids: File IDs to reject
+            reviewer: Team leader username
+            reason: Rejection reason (applied to every file)
             
-            file_data['status_history'].append({
-                'status': 'rejected_team_leader',
-                'timestamp': datetime.now().isoformat(),
-                'reviewer': reviewer,
-                'comment': f'Rejected by team leader {reviewer}: {reason.strip()}'
-            })
+        Returns:
+            Dict[str, Tuple[bool, str]]: (success, message) per file_id
+        """
+        if not reason or not reason.strip():
+            return {file_id: (False, "Rejection reason is required") for file_id in file_ids}
+        
+        reason = reason.strip()
+        results = {file_id: (False, "File not found in queue") for file_id in file_ids}
+        try:
+            records = self.queue_store.get_records(file_ids)
+            reviewer_team = self.get_user_team(reviewer) if records else ""
             
-            if self.save_global_queue(queue):
-                # Send notification to user about team leader rejection
-                print(f"[INFO] Sending TL rejection notification for file {file_data.get('original_filename')}")
-                self._notify_user_status_update(file_data, 'rejected_team_leader', reviewer, 
-                    f"Rejected by team leader {reviewer}: {reason.strip()}")
+            rejected = []
+            for file_id, file_data in records.items():
+                current_status = file_data.get('status', '')
                 
-                # Archive the rejected file
-                self._archive_file(file_data, 'rejected_team_leader')
+                if current_status not in ['pending_team_leader', 'pending']:
+                    results[file_id] = (False, f"File cannot be rejected from status: {current_status}")
+                    continue
                 
-                return True, f"File rejected by team leader"
-            else:
-                return False, "Failed to save rejection"
+                # Verify team leader is from the same team as the file
+                if reviewer_team != file_data.get('user_team', ''):
+                    results[file_id] = (False, "Team leader can only reject files from their own team")
+                    continue
+                
+                # Update status and add rejection info
+                file_data['status'] = 'rejected_team_leader'
+                file_data['tl_rejected_by'] = reviewer
+                file_data['tl_rejected_date'] = datetime.now().isoformat()
+                file_data['tl_rejection_reason'] = reason
+                
+                if 'status_history' not in file_data:
+                    file_data['status_history'] = []
+                
+                file_data['status_history'].append({
+                    'status': 'rejected_team_leader',
+                    'timestamp': datetime.now().isoformat(),
+                    'reviewer': reviewer,
+                    'comment': f'Rejected by team leader {reviewer}: {reason}'
+                })
+                rejected.append(file_data)
+            
+            if not rejected:
+                return results
+            
+            if not self.queue_store.commit_batch(upserts=rejected):
+                for file_data in rejected:
+                    results[file_data['file_id']] = (False, "Failed to save rejection")
+                return results
+            
+            # Send notifications to users about team leader rejection
+            print(f"[INFO] Sending TL rejection notifications for {len(rejected)} file(s)")
+            self._notify_user_status_updates(
+                [(file_data, 'rejected_team_leader', f"Rejected by team leader {reviewer}: {reason}")
+                 for file_data in rejected], reviewer)
+            
+            # Archive the rejected files (the rejection itself is saved - only the history entry is missing)
+            message = "File rejected by team leader"
+            if not self._archive_files(rejected, 'rejected_team_leader'):
+                message += " (history archive could not be updated)"
+            
+            for file_data in rejected:
+                results[file_data['file_id']] = (True, message)
                 
         except Exception as e:
             print(f"Error rejecting file as team leader: {e}")
-            return False, f"Error: {str(e)}"
+            for file_id, result in results.items():
+                if not result[0]:
+                    results[file_id] = (False, f"Error: {str(e)}")
+        return results
     
     def get_file_counts_for_team_leader(self, team_leader_username: str, filtered_files: List[Dict] = None) -> Dict[str, int]:
         """
@@ -390,14 +414,18 @@ class TeamLeaderApprovalService:
                 
                 return counts
             else:
-                # Count from all team files (for full statistics)
-                files_by_status = self.get_team_files_by_status(team_leader_username)
+                # Count from all team files (for full statistics) - archived approvals
+                # are counted from the archive index instead of being loaded
+                files_by_status = self.get_team_files_by_status(team_leader_username, include_archived=False)
+                archived_approved = get_approval_archive().count(
+                    kinds='approved', teams=self.get_user_team(team_leader_username),
+                    reviewer=team_leader_username, reviewer_field='tl_approved_by')
                 
                 return {
                     'pending_team_leader': len(files_by_status['pending_team_leader']),
-                    'approved_by_tl': len(files_by_status['pending_admin']) + len(files_by_status['approved']),
+                    'approved_by_tl': len(files_by_status['pending_admin']) + len(files_by_status['approved']) + archived_approved,
                     'rejected_by_tl': len(files_by_status['rejected_by_tl']),
-                    'total_team_files': sum(len(files) for files in files_by_status.values())
+                    'total_team_files': sum(len(files) for files in files_by_status.values()) + archived_approved
                 }
             
         except Exception as e:
@@ -410,27 +438,11 @@ class TeamLeaderApprovalService:
         These files are no longer in the main queue but should still be visible to team leaders
         """
         try:
-            archived_approved_files = []
-            
-            # Load approved files from archive
-            archive_dir = os.path.join(DATA_PATHS.SHARED_BASE, "approvals", "archived")
-            approved_archive_file = os.path.join(archive_dir, "approved_files.json")
-            
-            if os.path.exists(approved_archive_file):
-                with open(approved_archive_file, 'r', encoding='utf-8') as f:
-                    archived_files = json.load(f)
-                
-                for file_id, file_data in archived_files.items():
-                    # Only include files from the team leader's team that they approved
-                    if (file_data.get('user_team') == team_leader_team and 
-                        file_data.get('tl_approved_by') == team_leader_username):
-                        
-                        # 🚨 ENHANCED: Add project file location information
-                        file_data['current_location'] = self._get_approved_file_current_location(file_data)
-                        file_data['file_moved_to_project'] = file_data.get('moved_to_project', True)
-                        file_data['display_status'] = 'approved_and_moved'
-                        
-                        archived_approved_files.append(file_data)
+            # Only files from the team leader's team that they approved (archive indexes)
+            archived_approved_files = get_approval_archive().query(
+                kinds='approved', teams=team_leader_team, reviewer=team_leader_username,
+                reviewer_field='tl_approved_by', limit=None)['items']
+            self._annotate_archived_approved_files(archived_approved_files)
             
             print(f"[DEBUG] Found {len(archived_approved_files)} archived approved files for TL {team_leader_username}")
             return archived_approved_files
@@ -439,33 +451,71 @@ class TeamLeaderApprovalService:
             print(f"[ERROR] Error getting archived approved files for team leader: {e}")
             return []
     
-    def _get_approved_file_current_location(self, file_data: Dict) -> Optional[str]:
+    def _annotate_archived_approved_files(self, files: List[Dict]):
+        """Mark archived approved files as moved and add their project location"""
+        for file_data in files:
+            file_data['file_moved_to_project'] = file_data.get('moved_to_project', True)
+            file_data['display_status'] = 'approved_and_moved'
+        
+        # 🚨 ENHANCED: Add project file location information (one index read, files
+        # missing from the index are searched once and added to it)
+        locations = get_approved_location_index().locate_many(files)
+        for file_data in files:
+            file_data['current_location'] = locations.get(file_data.get('file_id'))
+    
+    def get_team_files_page(self, team_leader_username: str, view_mode: str = "all_team", search: str = "",
+                            sort: str = "submission_date", page: int = 1, page_size: int = 50) -> Dict:
         """
-        🚨 NEW: Find the current location of an approved file using the enhanced path config
+        One page of a team leader view (pending_only, my_approved, my_rejected, all_team).
+        
+        Queue files and the team leader's archived approvals are merged in sort order;
+        archived files are filtered, sorted and counted by the archive indexes, and only
+        the files on the page get their project location looked up.
+        Returns {'items', 'total', 'page', 'pages', 'totals'}.
         """
         try:
-            original_filename = file_data.get('original_filename')
-            team_tag = file_data.get('user_team', 'DEFAULT')
-            
-            if not original_filename:
-                return None
-            
-            # Try to find the file in possible project locations
-            current_path = DATA_PATHS.find_approved_file(original_filename, team_tag)
+            team_leader_team = self.get_user_team(team_leader_username)
+            include_archive = view_mode in ("my_approved", "all_team")
             
-            if current_path and os.path.exists(current_path):
-                print(f"[DEBUG] Found approved file {original_filename} at: {current_path}")
-                return current_path
+            if view_mode == "pending_only":
+                queue_files = self.get_pending_files_for_team_leader(team_leader_username)
             else:
-                # Check if it's in the stored project file path
-                stored_path = file_data.get('project_file_path')
-                if stored_path and os.path.exists(stored_path):
-                    print(f"[DEBUG] Found approved file {original_filename} at stored path: {stored_path}")
-                    return stored_path
-                
-                print(f"[WARNING] Could not locate approved file {original_filename} for team {team_tag}")
-                return None
-                
+                files_by_status = self.get_team_files_by_status(team_leader_username, include_archived=False)
+                if view_mode == "my_approved":
+                    queue_files = files_by_status['pending_admin'] + files_by_status['approved']
+                elif view_mode == "my_rejected":
+                    queue_files = files_by_status['rejected_by_tl']
+                else:  # all_team
+                    queue_files = [f for status_files in files_by_status.values() for f in status_files]
+            
+            if search:
+                queue_files = self._apply_filters(queue_files, {'search': search})
+            queue_ids = {f.get('file_id') for f in queue_files}
+            
+            result = get_approval_archive().query(
+                kinds=['approved'] if include_archive else [], teams=team_leader_team,
+                reviewer=team_leader_username, reviewer_field='tl_approved_by', search=search or None,
+                sort=sort, page=page, limit=page_size, exclude_ids=queue_ids, merge_with=queue_files)
+            
+            self._annotate_archived_approved_files(
+                [f for f in result['items'] if f.get('file_id') not in queue_ids])
+            return result
+            
+        except Exception as e:
+            print(f"[ERROR] Error getting team leader files page: {e}")
+            return {'items': [], 'total': 0, 'page': 1, 'pages': 1, 'totals': {}}
+    
+    def _get_approved_file_current_location(self, file_data: Dict) -> Optional[str]:
+        """
+        🚨 NEW: Find the current location of an approved file (through the location
+        index; the indexed path is checked and searched again if it is gone)
+        """
+        try:
+            current_path = get_approved_location_index().locate(file_data, verify=True)
+            if not current_path:
+                print(f"[WARNING] Could not locate approved file {file_data.get('original_filename')} "
+                      f"for team {file_data.get('user_team', 'DEFAULT')}")
+            return current_path
         except Exception as e:
             print(f"[ERROR] Error finding approved file location: {e}")
             return None
@@ -476,12 +526,11 @@ class TeamLeaderApprovalService:
             if not comment or not comment.strip():
                 return False, "Comment cannot be empty"
             
-            queue = self.load_global_queue()
+            file_data = self.queue_store.get_record(file_id)
             
-            if file_id not in queue:
+            if not file_data:
                 return False, "File not found in queue"
             
-            file_data = queue[file_id]
             
             # Verify team leader is from the same team as the file
             reviewer_team = self.get_user_team(reviewer)
@@ -499,7 +548,10 @@ class TeamLeaderApprovalService:
                 'timestamp': datetime.now().isoformat()
             })
             
-            if self.save_global_queue(queue):
+            if self.queue_store.upsert_record(file_data):
+                publish_event('comment_added', file_id=file_id, user_id=file_data.get('user_id'),
+                              filename=file_data.get('original_filename'), author=reviewer,
+                              author_role='team_leader', comment=comment.strip(), notified=False)
                 return True, "Comment added successfully"
             else:
                 return False, "Failed to save comment"
@@ -511,97 +563,106 @@ class TeamLeaderApprovalService:
 
     def _notify_user_status_update(self, file_data: Dict, status: str, reviewer: str, comment: str = ""):
         """Send notification to user about status updates from team leader actions."""
-        try:
+        self._notify_user_status_updates([(file_data, status, comment)], reviewer)
+    
+    def _notify_user_status_updates(self, updates: List[Tuple[Dict, str, str]], reviewer: str):
+        """
+        Update users' approval status and send notifications for (file_data, status, comment)
+        tuples - one status write and one notification write per user.
+        """
+        by_user: Dict[str, List[Tuple[str, str, str]]] = {}
+        for file_data, status, comment in updates:
             user_id = file_data.get('user_id')
             original_filename = file_data.get('original_filename')
             
             if not user_id or not original_filename:
                 print(f"[WARNING] Missing user_id ({user_id}) or filename ({original_filename}) for TL notification")
-                return
-            
-            # Import here to avoid circular dependencies
-            from services.notification_service import NotificationService
-            notification_service = NotificationService()
-            
-            # Update user's approval status file directly
-            user_upload_folder = DATA_PATHS.get_user_upload_dir(user_id)
-            if os.path.exists(user_upload_folder):
-                # Get the user approval service to update their local status
-                from user.services.approval_file_service import ApprovalFileService
-                user_approval_service = ApprovalFileService(user_upload_folder, user_id)
+                continue
+            by_user.setdefault(user_id, []).append((original_filename, status, comment))
+        
+        if not by_user:
+            return
+        
+        # Import here to avoid circular dependencies
+        from services.notification_service import NotificationService
+        from user.services.approval_file_service import ApprovalFileService
+        notification_service = NotificationService()
+        
+        for user_id, user_updates in by_user.items():
+            try:
+                # Update user's approval status file directly
+                user_upload_folder = DATA_PATHS.get_user_upload_dir(user_id)
+                if os.path.exists(user_upload_folder):
+                    # Get the user approval service to update their local status
+                    user_approval_service = ApprovalFileService(user_upload_folder, user_id)
+                    
+                    # Update local approval status
+                    outcomes = user_approval_service.update_file_statuses([{
+                        "filename": filename,
+                        "new_status": status,
+                        "admin_comment": comment,
+                        "admin_id": reviewer
+                    } for filename, status, comment in user_updates])
+                    
+                    for filename, status, _ in user_updates:
+                        if outcomes.get(filename):
+                            print(f"[SUCCESS] Updated user {user_id} file status: {filename} -> {status}")
+                        else:
+                            print(f"[WARNING] Failed to update user {user_id} file status: {filename}")
                 
-                # Update local approval status
-                success = user_approval_service.update_file_status(original_filename, status, comment, reviewer)
+                # Send notifications based on status
+                notifications = []
+                for filename, status, comment in user_updates:
+                    if status == "pending_admin":
+                        notifications.append({
+                            'filename': filename, 'status': "approved_by_team_leader", 'admin_id': reviewer,
+                            'reason': f"Your file has been approved by the team leader and is now pending admin review."})
+                    elif status == "rejected_team_leader":
+                        notifications.append({
+                            'filename': filename, 'status': "rejected_by_team_leader", 'admin_id': reviewer,
+                            'reason': f"Your file has been rejected by the team leader. Reason: {comment}"})
+                notification_service.notify_approval_statuses(user_id, notifications)
                 
-                if success:
-                    print(f"[SUCCESS] Updated user {user_id} file status: {original_filename} -> {status}")
-                else:
-                    print(f"[WARNING] Failed to update user {user_id} file status: {original_filename}")
-            
-            # Send notification based on status
-            if status == "pending_admin":
-                notification_service.notify_approval_status(
-                    user_id, original_filename, "approved_by_team_leader", reviewer,
-                    f"Your file has been approved by the team leader and is now pending admin review.")
-            elif status == "rejected_team_leader":
-                notification_service.notify_approval_status(
-                    user_id, original_filename, "rejected_by_team_leader", reviewer,
-                    f"Your file has been rejected by the team leader. Reason: {comment}")
-            
-            print(f"[SUCCESS] Notification sent to user {user_id} for TL action on {original_filename}")
-            
-        except Exception as e:
-            print(f"[ERROR] Error sending TL notification to user: {e}")
-            import traceback
-            traceback.print_exc()
+                print(f"[SUCCESS] Notification sent to user {user_id} for TL action on {len(user_updates)} file(s)")
+                
+            except Exception as e:
+                print(f"[ERROR] Error sending TL notification to user: {e}")
+                import traceback
+                traceback.print_exc()
     
-    def _archive_file(self, file_data: Dict, status: str):
+    def _archive_file(self, file_data: Dict, status: str) -> bool:
         """Archive rejected files from team leader actions."""
+        return self._archive_files([file_data], status)
+    
+    def _archive_files(self, files: List[Dict], status: str) -> bool:
+        """Archive several team leader rejections with a single archive append (False if it failed)."""
+        if not files:
+            return True
         try:
             import uuid
             
-            archive_dir = os.path.join(DATA_PATHS.SHARED_BASE, "approvals", "archived")
-            os.makedirs(archive_dir, exist_ok=True)
-            
             # Team leader rejections go to a separate archive
-            if status == 'rejected_team_leader':
-                archive_file = os.path.join(archive_dir, 'tl_rejected_files.json')
-            else:
-                return  # Don't archive other statuses from TL
-            
-            # Load existing archived files
-            archived_files = {}
-            if os.path.exists(archive_file):
-                try:
-                    with open(archive_file, 'r', encoding='utf-8') as f:
-                        archived_files = json.load(f)
-                except Exception as e:
-                    print(f"[WARNING] Error loading TL archive file {archive_file}: {e}")
-                    archived_files = {}
-            
-            # Add current file to archive
-            file_id = file_data.get('file_id', str(uuid.uuid4()))
-            file_data['archived_date'] = datetime.now().isoformat()
-            archived_files[file_id] = file_data
-            
-            # Keep only last 1000 archived files
-            if len(archived_files) > 1000:
-                # Sort by archived_date and keep newest 1000
-                sorted_files = sorted(archived_files.items(), 
-                                     key=lambda x: x[1].get('archived_date', ''), 
-                                     reverse=True)
-                archived_files = dict(sorted_files[:1000])
-            
-            # Save updated archive
-            with open(archive_file, 'w', encoding='utf-8') as f:
-                json.dump(archived_files, f, indent=2)
-            
-            print(f"[INFO] TL Archived file {file_data.get('original_filename')} with status {status}")
+            if status != 'rejected_team_leader':
+                return True  # Don't archive other statuses from TL
+            
+            archived_date = datetime.now().isoformat()
+            for file_data in files:
+                file_data.setdefault('file_id', str(uuid.uuid4()))
+                file_data['archived_date'] = archived_date
+            
+            # Monthly append-only segments - history is no longer truncated
+            if not get_approval_archive().append(status, files):
+                return False
+            
+            for file_data in files:
+                print(f"[INFO] TL Archived file {file_data.get('original_filename')} with status {status}")
+            return True
             
         except Exception as e:
             print(f"[ERROR] Error archiving TL file: {e}")
             import traceback
             traceback.print_exc()
+            return False
 
 
 def get_team_leader_service() -> TeamLeaderApprovalService:
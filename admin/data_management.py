@@ -8,6 +8,7 @@ import json
 import shutil
 import threading
 from utils.config_loader import get_base_dir
+from utils.tracing import span
 from utils.dialog import show_confirm_dialog, show_input_dialog
 from admin.components.details_pane import DetailsPane
 from watchdog.observers import Observer
@@ -52,17 +53,21 @@ def build_index(base_dir: Path, page: Optional[ft.Page] = None):
     Runs silently in background without loading overlay.
     """
     print(f"[DEBUG] Building index for {base_dir} ...")
-    start_time = time.time()
+    start_time = time.perf_counter()
     index = []
 
     # Build index without loading overlay to avoid continuous loading issues
-    for root, dirs, files in os.walk(base_dir):
-        for d in dirs:
-            index.append(str(Path(root) / d))
-        for f in files:
-            index.append(str(Path(root) / f))
-
-    elapsed = time.time() - start_time
+    with span("build_index", "index", path=str(base_dir)) as index_span:
+        directories = 0
+        for root, dirs, files in os.walk(base_dir):
+            directories += 1
+            for d in dirs:
+                index.append(str(Path(root) / d))
+            for f in files:
+                index.append(str(Path(root) / f))
+        index_span.set_tags(entries=len(index), directories_scanned=directories)
+
+    elapsed = time.perf_counter() - start_time
     print(f"[DEBUG] Index built with {len(index)} entries in {elapsed:.2f} seconds.")
 
     return index
@@ -118,9 +123,11 @@ def refresh_index(page=None):
     """
     global global_file_index
     start_time = time.time()
-    with index_lock:
-        global_file_index = build_index(BASE_DIR, page)
-    save_index_to_cache()
+    with span("refresh_index", "index"):
+        with index_lock:
+            global_file_index = build_index(BASE_DIR, page)
+        with span("save_index_cache", "index", entries=len(global_file_index)):
+            save_index_to_cache()
     elapsed = time.time() - start_time
     print(f"[DEBUG] Index refreshed in {elapsed:.2f} seconds.")
     if page:
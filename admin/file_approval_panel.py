@@ -1,8 +1,10 @@
 import flet as ft
+import threading
 from typing import Dict, List, Optional
 from utils.config_loader import get_config
 from utils.file_manager import get_file_manager, SecurityError
 from utils.logger import get_enhanced_logger, log_file_operation, PerformanceTimer
+from utils.tracing import span
 from utils.auth import get_enhanced_authenticator
 
 # Import component modules
@@ -13,6 +15,7 @@ from admin.components.ui_helpers import UIComponentHelper, TeamLoader, create_sn
 from admin.components.preview_panel import PreviewPanelManager, create_preview_section_container
 from admin.components.data_managers import FileDataManager, StatisticsManager, ServiceInitializer, cleanup_resources
 from admin.components.role_permissions import RoleValidator
+from services.approval_job_service import get_approval_job_service
 
 
 class EnhancedFileApprovalPanel:
@@ -51,6 +54,12 @@ class EnhancedFileApprovalPanel:
         self.stat_approved_card = None
         self.stat_rejected_card = None
         
+        # Approvals run as background jobs - refresh the table as their state changes
+        self._job_refresh_lock = threading.Lock()
+        self._job_refresh_timer = None
+        self.approval_jobs = get_approval_job_service()
+        self.approval_jobs.add_listener(self._on_approval_jobs_changed)
+        
         self.enhanced_logger.general_logger.info(
             f"Enhanced file approval panel initialized for admin: {self.admin_user}")
     
@@ -124,6 +133,7 @@ class EnhancedFileApprovalPanel:
     def _initialize_ui_state(self):
         """Initialize UI state variables with enhanced filtering options."""
         self.selected_file = None
+        self.checked_files = {}  # file_id -> file_data for bulk actions
         self.files_table = None
         self.preview_panel_widget = None
         self.current_team_filter = "ALL"
@@ -131,6 +141,13 @@ class EnhancedFileApprovalPanel:
         self.search_query = ""
         self.current_status_filter = "ALL"
         self.current_view_mode = "pending_admin"  # For admins, default to files pending admin review
+        
+        # Paging for the history views (queue + archive); counts come from the page query
+        self.current_page = 1
+        self.page_size = 50
+        self.total_pages = 1
+        self.current_counts = None
+        self.pager_row = None
     
     def create_approval_interface(self) -> ft.Container:
         """Create the enhanced approval interface."""
@@ -359,7 +376,7 @@ class EnhancedFileApprovalPanel:
         
         # Define columns that will be shown based on container size - similar to TLPanel
         def get_columns_for_size(col_config):
-            columns = []
+            columns = [ft.DataColumn(self.select_all_checkbox)]
             if col_config.get("file", True):
                 columns.append(ft.DataColumn(ft.Text("File", weight=ft.FontWeight.BOLD, size=16)))
             if col_config.get("user", True):
@@ -382,6 +399,14 @@ class EnhancedFileApprovalPanel:
             "lg": {"file": True, "user": True, "team": True, "size": True, "submitted": True, "status": True}
         }
         
+        # Multi-select controls for bulk approve / reject
+        self.select_all_checkbox = ft.Checkbox(
+            tooltip="Select all pending files",
+            on_change=self._on_select_all_changed
+        )
+        self.bulk_actions_bar = self._create_bulk_actions_bar()
+        self.pager_row = self._create_pager_row()
+        
         # Create responsive data table
         self.files_table = self.table_helper.create_responsive_table(self.select_file)
         
@@ -415,6 +440,7 @@ class EnhancedFileApprovalPanel:
                     ft.Text(f"Access Level: {self.access_level}", size=16, color=ft.Colors.GREY_600)
                 ]),
                 ft.Divider(),
+                self.bulk_actions_bar,
                 ft.Container(height=10),
                 # Create scrollable table container
                 ft.Container(
@@ -422,12 +448,77 @@ class EnhancedFileApprovalPanel:
                         table_content  # Use responsive approach
                     ], scroll=ft.ScrollMode.AUTO),
                     expand=True
-                )
+                ),
+                self.pager_row
             ], expand=True, spacing=0),
             expand=True,
             padding=0
         )
     
+    def _create_pager_row(self) -> ft.Row:
+        """Create previous / next page controls for the history views."""
+        self.page_info_text = ft.Text("", size=14, color=ft.Colors.GREY_600)
+        self.prev_page_button = ft.IconButton(
+            ft.Icons.CHEVRON_LEFT, tooltip="Previous page", on_click=lambda e: self._go_to_page(self.current_page - 1))
+        self.next_page_button = ft.IconButton(
+            ft.Icons.CHEVRON_RIGHT, tooltip="Next page", on_click=lambda e: self._go_to_page(self.current_page + 1))
+        return ft.Row([
+            self.prev_page_button,
+            self.page_info_text,
+            self.next_page_button
+        ], alignment=ft.MainAxisAlignment.CENTER, visible=False)
+    
+    def _update_pager(self, total: int):
+        """Show the pager only when there is more than one page."""
+        if self.pager_row is None:
+            return
+        self.pager_row.visible = self.total_pages > 1
+        self.page_info_text.value = f"Page {self.current_page} of {self.total_pages} ({total} files)"
+        self.prev_page_button.disabled = self.current_page <= 1
+        self.next_page_button.disabled = self.current_page >= self.total_pages
+    
+    def _go_to_page(self, page_number: int):
+        """Show another page of the current view."""
+        if 1 <= page_number <= self.total_pages and page_number != self.current_page:
+            self.current_page = page_number
+            self.refresh_files_table()
+    
+    def _create_bulk_actions_bar(self) -> ft.Row:
+        """Create the bulk action bar for checked files."""
+        self.bulk_selection_text = ft.Text("No files selected", size=16, color=ft.Colors.GREY_600)
+        self.bulk_approve_button = ft.ElevatedButton(
+            "Approve Selected",
+            icon=ft.Icons.CHECK,
+            disabled=True,
+            on_click=lambda e: self.approval_handler.handle_bulk_approve(
+                list(self.checked_files.values()), self._get_bulk_refresh_callback()),
+            style=self._get_button_style("success")
+        )
+        self.bulk_reject_button = ft.ElevatedButton(
+            "Reject Selected",
+            icon=ft.Icons.CLOSE,
+            disabled=True,
+            on_click=lambda e: self.approval_handler.handle_bulk_reject(
+                list(self.checked_files.values()), self._get_bulk_refresh_callback()),
+            style=self._get_button_style("danger")
+        )
+        self.bulk_changes_button = ft.ElevatedButton(
+            "Request Changes",
+            icon=ft.Icons.EDIT_NOTE,
+            disabled=True,
+            on_click=lambda e: self.approval_handler.handle_bulk_reject(
+                list(self.checked_files.values()), self._get_bulk_refresh_callback(),
+                request_changes=True),
+            style=self._get_button_style("secondary")
+        )
+        return ft.Row([
+            self.bulk_selection_text,
+            ft.Container(expand=True),
+            self.bulk_approve_button,
+            self.bulk_reject_button,
+            self.bulk_changes_button
+        ], spacing=10)
+    
     def _create_preview_section(self) -> ft.Container:
         """Create preview section."""
         self.preview_panel_widget = self.preview_manager.create_empty_preview_panel()
@@ -443,75 +534,97 @@ class EnhancedFileApprovalPanel:
         """Refresh the files table with enhanced filtering and dynamic statistics."""
         try:
             with PerformanceTimer("EnhancedFileApprovalPanel", "refresh_files_table"):
-                # Get files based on role and filters
-                if self.admin_role.upper() == 'ADMIN':
-                    # Admin sees files based on status filter
-                    if self.current_status_filter == "ALL":
-                        all_files = self.data_manager.get_all_files_for_admin(
-                            self.admin_user, self.admin_teams, None)  # Get all files
-                    elif self.current_status_filter == "pending_admin":
-                        all_files = self.data_manager._get_admin_pending_files(
-                            self.admin_user, self.admin_teams)
-                    elif self.current_status_filter == "approved":
-                        all_files = self.data_manager._get_admin_approved_files(
-                            self.admin_user, self.admin_teams)
-                    elif self.current_status_filter == "rejected_admin":
-                        all_files = self.data_manager._get_admin_rejected_files(
-                            self.admin_user, self.admin_teams)
+                with span("load_files", "ui", status=self.current_status_filter, page=self.current_page) as load_span:
+                    # Get files based on role and filters
+                    if self.admin_role.upper() == 'ADMIN' and self.current_status_filter != "pending_admin":
+                        # History views include the archive - fetch only the page being shown,
+                        # already filtered and sorted, with totals from the archive indexes
+                        result = self.data_manager.get_admin_files_page(
+                            self.admin_user, self.admin_teams,
+                            None if self.current_status_filter == "ALL" else self.current_status_filter,
+                            self.current_team_filter, self.search_query, self.current_sort,
+                            self.current_page, self.page_size)
+                        if result['items'] == [] and self.current_page > 1 and result['total']:
+                            # The page shrank away (files processed meanwhile) - show the last one
+                            self.current_page = result['pages']
+                            return self.refresh_files_table()
+                        filtered_files = result['items']
+                        self.current_counts = result['counts']
+                        self.total_pages = result['pages']
+                        total_files = result['total']
                     else:
-                        all_files = self.data_manager.get_all_files_for_admin(
-                            self.admin_user, self.admin_teams, self.current_status_filter)
-                else:
-                    # Team leaders and others
-                    all_files = self.data_manager.get_filtered_pending_files(
-                        self.admin_user, self.admin_teams, self.admin_role)
-                
-                # Apply team filter
-                if self.current_team_filter != "ALL":
-                    all_files = [f for f in all_files 
-                                if f.get('user_team', '') == self.current_team_filter]
-                
-                # Apply search filter
-                if self.search_query:
-                    search_lower = self.search_query.lower()
-                    all_files = [
-                        f for f in all_files
-                        if (search_lower in f.get('original_filename', '').lower() or
-                            search_lower in f.get('user_id', '').lower() or
-                            search_lower in f.get('description', '').lower())
-                    ]
-                
-                # Apply sorting
-                filtered_files = self._sort_files(all_files)
+                        if self.admin_role.upper() == 'ADMIN':
+                            all_files = self.data_manager._get_admin_pending_files(
+                                self.admin_user, self.admin_teams)
+                        else:
+                            # Team leaders and others
+                            all_files = self.data_manager.get_filtered_pending_files(
+                                self.admin_user, self.admin_teams, self.admin_role)
+                    
+                        # Apply team filter
+                        if self.current_team_filter != "ALL":
+                            all_files = [f for f in all_files 
+                                        if f.get('user_team', '') == self.current_team_filter]
+                    
+                        # Apply search filter
+                        if self.search_query:
+                            search_lower = self.search_query.lower()
+                            all_files = [
+                                f for f in all_files
+                                if (search_lower in f.get('original_filename', '').lower() or
+                                    search_lower in f.get('user_id', '').lower() or
+                                    search_lower in f.get('description', '').lower())
+                            ]
+                    
+                        # Apply sorting
+                        filtered_files = self._sort_files(all_files)
+                        self.current_counts = None
+                        self.current_page = self.total_pages = 1
+                        total_files = len(filtered_files)
+                    load_span.set_tags(rows=len(filtered_files), total=total_files)
                 
                 # Store current filtered files for statistics
                 self.current_filtered_files = filtered_files
                 
+                # Keep only checked files that are still visible and actionable
+                visible = {f.get('file_id'): f for f in filtered_files if self._is_bulk_actionable(f)}
+                self.checked_files = {file_id: visible[file_id] 
+                                      for file_id in self.checked_files if file_id in visible}
+                
                 # Update statistics cards dynamically
-                self._update_statistics_cards()
+                with span("update_statistics", "ui"):
+                    self._update_statistics_cards()
                 
                 # Clear and populate table
-                self.files_table.rows.clear()
-                
-                if not filtered_files:
-                    self.table_helper.add_empty_table_row(self.files_table)
-                else:
-                    size_category = self.table_helper.get_size_category_from_page_width(
-                        self.page.width)
+                with span("render_rows", "ui", rows=len(filtered_files)):
+                    self.files_table.rows.clear()
                     
-                    for file_data in filtered_files:
-                        try:
-                            row = self.table_helper.create_table_row(
-                                file_data, size_category, self.select_file)
-                            self.files_table.rows.append(row)
-                        except Exception as row_error:
-                            self.enhanced_logger.general_logger.error(
-                                f"Error creating table row: {row_error}")
-                            continue
+                    if not filtered_files:
+                        self.table_helper.add_empty_table_row(self.files_table)
+                    else:
+                        size_category = self.table_helper.get_size_category_from_page_width(
+                            self.page.width)
+                        
+                        for file_data in filtered_files:
+                            try:
+                                file_data = self._with_move_progress(file_data)
+                                row = self.table_helper.create_table_row(
+                                    file_data, size_category, self.select_file,
+                                    on_check_changed=self._on_file_checked,
+                                    checked=file_data.get('file_id') in self.checked_files,
+                                    checkable=self._is_bulk_actionable(file_data))
+                                self.files_table.rows.append(row)
+                            except Exception as row_error:
+                                self.enhanced_logger.general_logger.error(
+                                    f"Error creating table row: {row_error}")
+                                continue
                 
-                self.page.update()
+                self._update_pager(total_files)
+                self._update_bulk_actions()
+                with span("page_update", "ui"):
+                    self.page.update()
                 self.enhanced_logger.general_logger.debug(
-                    f"Files table refreshed with {len(filtered_files)} files")
+                    f"Files table refreshed with {len(filtered_files)} of {total_files} files")
             
         except Exception as e:
             self.enhanced_logger.general_logger.error(f"Error refreshing files table: {e}")
@@ -520,8 +633,8 @@ class EnhancedFileApprovalPanel:
     def _update_statistics_cards(self):
         """Update statistics cards with current filtered files."""
         try:
-            # Calculate dynamic counts from current filtered files
-            dynamic_counts = self.data_manager.get_file_counts_safely(
+            # Paged views bring their counts along; otherwise count the filtered files
+            dynamic_counts = self.current_counts or self.data_manager.get_file_counts_safely(
                 self.admin_user, self.admin_teams, self.admin_role, self.current_filtered_files)
             
             # Update stat card values
@@ -598,6 +711,87 @@ class EnhancedFileApprovalPanel:
             self.refresh_interface()
         return refresh
     
+    def _get_bulk_refresh_callback(self):
+        """Get refresh callback for bulk actions (also clears checked files)."""
+        refresh = self._get_refresh_callback()
+        def bulk_refresh():
+            self.checked_files.clear()
+            refresh()
+        return bulk_refresh
+    
+    def _is_bulk_actionable(self, file_data: Dict) -> bool:
+        """Only files waiting for admin review (and not already being approved) can be bulk actioned."""
+        job_state = (file_data.get('approval_job') or {}).get('state')
+        return (bool(file_data.get('file_id')) and file_data.get('status') == 'pending_admin'
+                and job_state not in ('queued', 'moving'))
+    
+    def _with_move_progress(self, file_data: Dict) -> Dict:
+        """Attach the copy progress of a file that is being moved (for the status badge)."""
+        job = file_data.get('approval_job') or {}
+        if job.get('state') != 'moving':
+            return file_data
+        progress = self.approval_jobs.get_progress(file_data.get('file_id'))
+        if not progress:
+            return file_data
+        return dict(file_data, approval_job=dict(job, progress=progress['percent']))
+    
+    def _on_approval_jobs_changed(self, file_ids: List[str]):
+        """Approval job state changed (worker thread) - refresh the table, coalescing bursts."""
+        with self._job_refresh_lock:
+            if self._job_refresh_timer is not None:
+                return
+            self._job_refresh_timer = threading.Timer(0.5, self._refresh_after_job_change)
+            self._job_refresh_timer.daemon = True
+            self._job_refresh_timer.start()
+    
+    def _refresh_after_job_change(self):
+        with self._job_refresh_lock:
+            self._job_refresh_timer = None
+        try:
+            if self.files_table is not None:
+                self.refresh_files_table()
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error refreshing after approval job update: {e}")
+    
+    def _on_file_checked(self, file_data: Dict, checked: bool):
+        """Handle a row checkbox change."""
+        try:
+            if checked:
+                self.checked_files[file_data['file_id']] = file_data
+            else:
+                self.checked_files.pop(file_data['file_id'], None)
+            self._update_bulk_actions()
+            self.page.update()
+        except Exception as e:
+            self.enhanced_logger.general_logger.error(f"Error updating bulk selection: {e}")
+    
+    def _on_select_all_changed(self, e):
+        """Check or uncheck every actionable file in the current view."""
+        try:
+            if e.control.value:
+                self.checked_files = {f['file_id']: f for f in getattr(self, 'current_filtered_files', [])
+                                      if self._is_bulk_actionable(f)}
+            else:
+                self.checked_files = {}
+            self.refresh_files_table()
+        except Exception as error:
+            self.enhanced_logger.general_logger.error(f"Error handling select all: {error}")
+    
+    def _update_bulk_actions(self):
+        """Sync bulk action bar and select-all checkbox with the checked files."""
+        count = len(self.checked_files)
+        actionable = sum(1 for f in getattr(self, 'current_filtered_files', []) 
+                         if self._is_bulk_actionable(f))
+        
+        if getattr(self, 'bulk_selection_text', None):
+            self.bulk_selection_text.value = f"{count} file(s) selected" if count else "No files selected"
+            self.bulk_approve_button.disabled = count == 0
+            self.bulk_reject_button.disabled = count == 0
+            self.bulk_changes_button.disabled = count == 0
+        if getattr(self, 'select_all_checkbox', None):
+            self.select_all_checkbox.value = actionable > 0 and count == actionable
+            self.select_all_checkbox.disabled = actionable == 0
+    
     def _clear_selection(self):
         """Clear current file selection."""
         self.selected_file = None
@@ -627,6 +821,7 @@ class EnhancedFileApprovalPanel:
         """Handle search input change."""
         try:
             self.search_query = e.control.value.lower()
+            self.current_page = 1
             self.refresh_files_table()
         except Exception as error:
             self.enhanced_logger.general_logger.error(f"Error handling search change: {error}")
@@ -635,6 +830,7 @@ class EnhancedFileApprovalPanel:
         """Handle team filter change."""
         try:
             self.current_team_filter = e.control.value
+            self.current_page = 1
             self._clear_selection()  # Clear selection when changing filters
             self.refresh_files_table()
         except Exception as error:
@@ -644,6 +840,7 @@ class EnhancedFileApprovalPanel:
         """Handle status filter change."""
         try:
             self.current_status_filter = e.control.value
+            self.current_page = 1
             self._clear_selection()  # Clear selection when changing filters
             self.refresh_files_table()
         except Exception as error:
@@ -653,6 +850,7 @@ class EnhancedFileApprovalPanel:
         """Handle sort option change."""
         try:
             self.current_sort = e.control.value
+            self.current_page = 1
             self.refresh_files_table()
         except Exception as error:
             self.enhanced_logger.general_logger.error(f"Error handling sort change: {error}")
@@ -672,6 +870,7 @@ class EnhancedFileApprovalPanel:
     
     def cleanup(self):
         """Cleanup resources when panel is destroyed."""
+        self.approval_jobs.remove_listener(self._on_approval_jobs_changed)
         cleanup_resources(self.admin_user, self.file_manager, self.enhanced_logger)
 
 
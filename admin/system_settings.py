@@ -4,6 +4,8 @@ from typing import Optional
 import json
 import os
 from utils.session_logger import log_activity
+from utils.perf_metrics import get_metrics_registry
+from utils.tracing import export_chrome_trace, get_tracer
 
 TEAMS_FILE = r"\\KMTI-NAS\Shared\data\teams.json"
 CONFIG_FILE = r"\\KMTI-NAS\Shared\data\config.json"
@@ -185,6 +187,75 @@ def system_settings(content: ft.Column, username: Optional[str]):
             dlg.open = True
             content.page.update()
 
+    # ------------ Performance Metrics Section ------------
+    metrics_table = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("Operation")),
+            ft.DataColumn(ft.Text("Count"), numeric=True),
+            ft.DataColumn(ft.Text("Mean (ms)"), numeric=True),
+            ft.DataColumn(ft.Text("p50 (ms)"), numeric=True),
+            ft.DataColumn(ft.Text("p95 (ms)"), numeric=True),
+            ft.DataColumn(ft.Text("p99 (ms)"), numeric=True),
+            ft.DataColumn(ft.Text("Max (ms)"), numeric=True),
+        ],
+        rows=[]
+    )
+    metrics_window = ft.Dropdown(
+        label="Window",
+        width=180,
+        value="recent",
+        options=[
+            ft.dropdown.Option("recent", "Last hour"),
+            ft.dropdown.Option("all", "Since start"),
+        ],
+    )
+    counters_text = ft.Text("", size=14, color=ft.Colors.GREY_700)
+
+    def refresh_metrics(update: bool = True):
+        registry = get_metrics_registry()
+        stats = registry.get_timer_stats(recent=metrics_window.value == "recent")
+        metrics_table.rows.clear()
+        for name, summary in stats.items():
+            metrics_table.rows.append(
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(name)),
+                    ft.DataCell(ft.Text(str(summary["count"]))),
+                    ft.DataCell(ft.Text(f"{summary['mean_ms']:.1f}")),
+                    ft.DataCell(ft.Text(f"{summary['p50_ms']:.1f}")),
+                    ft.DataCell(ft.Text(f"{summary['p95_ms']:.1f}")),
+                    ft.DataCell(ft.Text(f"{summary['p99_ms']:.1f}")),
+                    ft.DataCell(ft.Text(f"{summary['max_ms']:.1f}")),
+                ])
+            )
+        if not stats:
+            metrics_table.rows.append(
+                ft.DataRow(cells=[ft.DataCell(ft.Text("No measurements yet"))] +
+                                 [ft.DataCell(ft.Text("")) for _ in range(6)])
+            )
+        counters = registry.get_counters()
+        counters_text.value = ("Counters: " + ", ".join(f"{name} = {value}" for name, value in counters.items())
+                               if counters else "Counters: none")
+        if update:
+            content.update()
+
+    metrics_window.on_change = lambda _: refresh_metrics()
+
+    trace_status = ft.Text("", size=14, color=ft.Colors.GREY_700)
+
+    def export_trace(_):
+        spans = len(get_tracer().get_spans())
+        if not spans:
+            trace_status.value = "No traced operations yet."
+        else:
+            try:
+                path = export_chrome_trace()
+                trace_status.value = f"Exported {spans} spans to {os.path.abspath(path)} (open in chrome://tracing or ui.perfetto.dev)"
+                log_activity(username, f"Exported performance trace ({spans} spans)")
+            except Exception as ex:
+                trace_status.value = f"Trace export failed: {ex}"
+        content.update()
+    refresh_metrics(update=False)
+
     # ------------ Main Layout (Single Scrollable Page) ------------
     main_content = ft.Column(
         controls=[
@@ -274,6 +345,54 @@ def system_settings(content: ft.Column, username: Optional[str]):
                     )
             ),
             
+            # Performance Metrics Section
+            ft.Container(
+                content=ft.Column([
+                    ft.Text("Performance Metrics", size=22, weight=FontWeight.BOLD),
+                    ft.Divider(),
+                    ft.Row([
+                        metrics_window,
+                        ft.ElevatedButton("Refresh", on_click=lambda _: refresh_metrics(),
+                                          style=ft.ButtonStyle(
+                                            bgcolor={ft.ControlState.DEFAULT: ft.Colors.WHITE,
+                                                    ft.ControlState.HOVERED: ft.Colors.BLUE},
+                                            color={ft.ControlState.DEFAULT: ft.Colors.BLUE,
+                                                    ft.ControlState.HOVERED: ft.Colors.WHITE},
+                                            side={ft.ControlState.DEFAULT: ft.BorderSide(1, ft.Colors.BLUE)},
+                                            shape=ft.RoundedRectangleBorder(radius=5))),
+                        ft.ElevatedButton("Export Trace", on_click=export_trace,
+                                          style=ft.ButtonStyle(
+                                            bgcolor={ft.ControlState.DEFAULT: ft.Colors.WHITE,
+                                                    ft.ControlState.HOVERED: ft.Colors.GREEN},
+                                            color={ft.ControlState.DEFAULT: ft.Colors.GREEN,
+                                                    ft.ControlState.HOVERED: ft.Colors.WHITE},
+                                            side={ft.ControlState.DEFAULT: ft.BorderSide(1, ft.Colors.GREEN)},
+                                            shape=ft.RoundedRectangleBorder(radius=5))),
+                    ]),
+                    trace_status,
+                    ft.Container(
+                        content=metrics_table,
+                        alignment=ft.alignment.center
+                    ),
+                    counters_text,
+                    ft.Text(
+                        "Latencies measured in this session. Snapshots are saved to data/logs/metrics.json.",
+                        size=14,
+                        italic=True,
+                        color=ft.Colors.GREY_600
+                    )
+                ], spacing=10),
+                bgcolor="white",
+                border_radius=12,
+                padding=20,
+                margin=ft.margin.only(bottom=50),
+                shadow=ft.BoxShadow(
+                    blur_radius=8,
+                    spread_radius=1,
+                    color=ft.Colors.with_opacity(0.08, ft.Colors.BLACK),
+                    )
+            ),
+            
             # About Section
             ft.Container(
                 content=ft.Column([
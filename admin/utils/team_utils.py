@@ -1,5 +1,6 @@
 import os
 import json
+from utils.json_cache import load_json_cached
 
 TEAMS_FILE = r"\\KMTI-NAS\Shared\data\teams.json"
 
@@ -37,4 +38,8 @@ def save_teams(teams):
 
 def get_team_options():
     """Return the latest list of team options."""
+    teams = load_json_cached(TEAMS_FILE)
+    if isinstance(teams, list) and teams:
+        return teams
+    # Missing, empty or corrupt file - let ensure_teams_file repair it
     return ensure_teams_file()
@@ -12,10 +12,13 @@ from admin.user_management import user_management
 from utils.session_logger import log_logout, log_activity
 from admin.file_approval_panel import FileApprovalPanel
 from admin.components.role_colors import get_role_color, create_role_badge, get_role_display_name
+from utils.path_config import DATA_PATHS
+from utils.network_health import get_network_prober
+from utils.activity_log import get_activity_log
+from services.approval_job_service import start_approval_jobs
 
 
 USERS_FILE = r"\\KMTI-NAS\Shared\data\users.json"
-ACTIVITY_LOGS_FILE = r"\\KMTI-NAS\Shared\data\logs\activity_logs.json"
 ACTIVITY_METADATA_FILE = r"\\KMTI-NAS\Shared\data\logs\activity_metadata.json"
 SESSION_ROOT = "data/sessions"  
 
@@ -31,8 +34,9 @@ def load_json(path, default):
 def load_users():
     return load_json(USERS_FILE, {})
 
-def load_logs():
-    return load_json(ACTIVITY_LOGS_FILE, [])
+def load_recent_logs(limit: int = 10):
+    """Newest activity entries, newest first (only the last few day files are read)"""
+    return get_activity_log().get_recent(limit)
 
 def load_metadata():
     return load_json(ACTIVITY_METADATA_FILE, {})
@@ -107,6 +111,10 @@ def admin_panel(page: ft.Page, username: Optional[str], initial_tab: int = 0):
         login_view(page)
         return
     
+    # Approval jobs run (and interrupted moves are recovered) from admin startup,
+    # not from the first time the approval panel is opened
+    start_approval_jobs()
+
     page.title = "KMTI Data Management Admin"
     page.vertical_alignment = ft.MainAxisAlignment.START
     page.horizontal_alignment = ft.CrossAxisAlignment.START
@@ -131,11 +139,8 @@ def admin_panel(page: ft.Page, username: Optional[str], initial_tab: int = 0):
     )
 
     def get_last_activity_entry(username_lookup: str):
-        fresh_logs = load_logs()
-        for entry in reversed(fresh_logs):
-            if entry.get("username") == username_lookup:
-                return entry
-        return None
+        # Answered from the activity index - no log files are opened
+        return get_activity_log().get_last_entry(username_lookup)
 
     def is_user_online(user_data) -> bool:
         uname = user_data.get("username")
@@ -155,19 +160,20 @@ def admin_panel(page: ft.Page, username: Optional[str], initial_tab: int = 0):
     def show_dashboard():
         content.controls.clear()
         users = load_users()
-        fresh_logs = load_logs()
-
-        def parse_datetime(log):
-            try:
-                return datetime.strptime(log.get("date", ""), "%Y-%m-%d %H:%M:%S")
-            except Exception:
-                return datetime.min
-
-        fresh_logs.sort(key=parse_datetime)
 
         total_users = len(users)
         active_users = sum(1 for u in users.values() if is_user_online(u))
-        recent_activity_count = len(fresh_logs)
+        recent_activity_count = get_activity_log().count()
+
+        # NAS health as last measured by the background prober (no network I/O here)
+        nas_state = get_network_prober().get_state(DATA_PATHS.SHARED_BASE)
+        if nas_state is None:
+            nas_status, nas_color = "Checking...", ft.Colors.GREY
+        elif not nas_state["reachable"]:
+            nas_status, nas_color = "Offline", ft.Colors.RED
+        else:
+            nas_status = f"{nas_state['latency_ms']:.0f} ms"
+            nas_color = ft.Colors.GREEN if nas_state["writable"] else ft.Colors.ORANGE
 
         refresh_button = ft.ElevatedButton(
             "Refresh",
@@ -218,6 +224,7 @@ def admin_panel(page: ft.Page, username: Optional[str], initial_tab: int = 0):
                     card(ft.Icons.PEOPLE, "Total Users", str(total_users)),
                     card(ft.Icons.PERSON, "Active Users", str(active_users), icon_color=ft.Colors.GREEN),
                     card(ft.Icons.HISTORY, "Recent Activities", str(recent_activity_count), icon_color=ft.Colors.BLUE),
+                    card(ft.Icons.STORAGE, "NAS Status", nas_status, icon_color=nas_color),
                 ],
                 spacing=20,
                 alignment=ft.MainAxisAlignment.CENTER,
@@ -269,7 +276,7 @@ def admin_panel(page: ft.Page, username: Optional[str], initial_tab: int = 0):
                     "team": team_str,
                 }
 
-        last_10_logs = list(reversed(fresh_logs[-10:]))
+        last_10_logs = load_recent_logs(10)
 
         activities_table = ft.DataTable(
             columns=[
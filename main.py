@@ -158,11 +158,9 @@ def main(page: ft.Page):
     page.theme_mode = ft.ThemeMode.LIGHT
 
     # Ensure data directories exist using centralized path management
+    # (network directories are ensured by the background prober once the NAS is reachable)
     DATA_PATHS.ensure_local_dirs()
-    if DATA_PATHS.is_network_available():
-        DATA_PATHS.ensure_network_dirs()
-    else:
-        print(f"Warning: Network directory {NETWORK_DATA_DIR} is not accessible")
+    DATA_PATHS.start_network_monitoring()
 
     # Attempt session restore
     if not restore_session(page):
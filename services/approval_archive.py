@@ -0,0 +1,586 @@
+"""
+Time-partitioned archive of processed approval records
+
+approved_files.json / rejected_files.json / tl_rejected_files.json used to be
+rewritten in full on every archive call, re-sorted, and truncated to the
+newest 1000 entries - older history was silently lost.
+
+Each archive kind is now a directory of monthly, append-only JSON Lines
+segments (archived/<kind>/<YYYY-MM>.jsonl) plus a small manifest.json with
+the record count, date range and per-team counts of every segment.
+Archiving appends a few lines and updates the manifest - constant time, no
+matter how much history there is. Readers walk the segments newest first,
+skip segments without the requested teams and stop once they have enough,
+and segments are parsed incrementally (only the bytes appended since the
+last read). Re-archiving a file appends a new line; readers return only the
+newest record per file_id.
+
+The legacy single-file archives are split into segments on first use and
+kept as <name>.migrated.
+
+query() serves the history views one page at a time from in-memory per-field
+indexes (team, user, reviewer, month, and one sort order per sort key), kept
+in step with the manifest counts so only newly appended lines are indexed.
+
+Segment lines are written before the manifest is saved, so a failed save or a
+crash leaves lines the manifest does not count. The next append to that
+segment recounts it first, and a query that finds more lines than counted
+recounts it under the manifest lock (reconcile), so such lines are never
+skipped for good.
+"""
+
+import os
+import json
+import heapq
+import threading
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.jsonl import JsonlTailReader, append_jsonl, write_jsonl
+from utils.atomic_write import atomic_write_json
+
+MANIFEST_VERSION = 1
+
+# Sort keys of the history views -> (key function, newest/largest first)
+SORT_KEYS: Dict[str, Tuple[Callable[[Dict], object], bool]] = {
+    'archived_date': (lambda record: record.get('archived_date') or '', True),
+    'submission_date': (lambda record: record.get('submission_date') or '', True),
+    'original_filename': (lambda record: (record.get('original_filename') or '').lower(), False),
+    'user_id': (lambda record: (record.get('user_id') or '').lower(), False),
+    'file_size': (lambda record: record.get('file_size') or 0, True),
+}
+
+# Fields holding the name of whoever reviewed a file
+REVIEWER_FIELDS = ('approved_by', 'rejected_by', 'tl_approved_by', 'tl_rejected_by')
+
+FilterValue = Optional[Union[str, Iterable[str]]]
+
+
+def sort_records(records: List[Dict], sort: str = 'archived_date') -> List[Dict]:
+    """Sort records the way query() orders them"""
+    key, descending = SORT_KEYS.get(sort, SORT_KEYS['archived_date'])
+    return sorted(records, key=key, reverse=descending)
+
+
+def _as_filter_set(value: FilterValue) -> Optional[set]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+class _KindIndex:
+    """Latest record per file_id of one archive kind, with posting lists per field"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.records: Dict[str, Dict] = {}
+        self.consumed: Dict[str, int] = {}        # month -> records of that segment indexed
+        # field -> value -> file_ids; 'reviewer' is any of REVIEWER_FIELDS, which are also indexed one by one
+        self.postings: Dict[str, Dict[str, set]] = {
+            field: {} for field in ('team', 'user', 'month', 'reviewer') + REVIEWER_FIELDS}
+        self.sorted: Dict[str, List[str]] = {}    # sort key -> file_ids in sort order
+        self._synthetic = 0
+
+    @staticmethod
+    def _terms(record: Dict, month: str) -> Dict[str, List[str]]:
+        terms = {
+            'team': [record.get('user_team') or ''],
+            'user': [record.get('user_id') or ''],
+            'month': [month],
+            'reviewer': list({record[field] for field in REVIEWER_FIELDS if record.get(field)}),
+        }
+        for field in REVIEWER_FIELDS:
+            terms[field] = [record[field]] if record.get(field) else []
+        return terms
+
+    def add(self, month: str, record: Dict):
+        file_id = record.get('file_id')
+        if not file_id:
+            self._synthetic += 1
+            file_id = f"_{month}_{self._synthetic}"
+        current = self.records.get(file_id)
+        if current is not None:
+            if (current.get('archived_date') or '') > (record.get('archived_date') or ''):
+                return      # an older copy indexed after a newer one (e.g. migrated history)
+            for field, values in self._terms(current, current['_archive_month']).items():
+                for value in values:
+                    self.postings[field].get(value, set()).discard(file_id)
+        record = dict(record, _archive_month=month)
+        self.records[file_id] = record
+        for field, values in self._terms(record, month).items():
+            for value in values:
+                self.postings[field].setdefault(value, set()).add(file_id)
+        self.sorted.clear()
+
+    def sorted_ids(self, sort: str) -> List[str]:
+        if sort not in self.sorted:
+            key, descending = SORT_KEYS[sort]
+            self.sorted[sort] = sorted(self.records, key=lambda file_id: key(self.records[file_id]),
+                                       reverse=descending)
+        return self.sorted[sort]
+
+
+class ApprovalArchive:
+    """Monthly append-only archive segments with a manifest, one set per kind"""
+
+    # Archive kind -> legacy single-file archive it replaces
+    KINDS = {
+        'approved': 'approved_files.json',
+        'rejected_admin': 'rejected_files.json',
+        'rejected_team_leader': 'tl_rejected_files.json',
+    }
+
+    def __init__(self, archive_dir: str = None):
+        self.archive_dir = archive_dir or os.path.join(DATA_PATHS.approvals_dir, "archived")
+        self._committers: Dict[str, GroupCommitter] = {}
+        self._segment_reader = JsonlTailReader("ARCHIVE")
+        self._indexes: Dict[str, _KindIndex] = {}
+        self._guard = threading.Lock()
+
+    # ---- layout ----
+
+    def _kind_dir(self, kind: str) -> str:
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown archive kind: {kind}")
+        return os.path.join(self.archive_dir, kind)
+
+    def _manifest_file(self, kind: str) -> str:
+        return os.path.join(self._kind_dir(kind), "manifest.json")
+
+    def _segment_file(self, kind: str, month: str) -> str:
+        return os.path.join(self._kind_dir(kind), f"{month}.jsonl")
+
+    @staticmethod
+    def _month_of(record: Dict) -> str:
+        for field in ('archived_date', 'admin_reviewed_at', 'tl_reviewed_at', 'submitted_at'):
+            value = record.get(field)
+            if isinstance(value, str) and len(value) >= 7 and value[4] == '-':
+                return value[:7]
+        return datetime.now().strftime("%Y-%m")
+
+    def _committer(self, kind: str) -> GroupCommitter:
+        with self._guard:
+            if kind not in self._committers:
+                manifest_file = self._manifest_file(kind)
+                self._committers[kind] = GroupCommitter(
+                    get_file_lock(f"{manifest_file}.lock"),
+                    lambda: self._read_manifest(kind),
+                    lambda manifest: self._write_manifest(kind, manifest),
+                    name=f"{kind} archive")
+            return self._committers[kind]
+
+    # ---- manifest ----
+
+    @staticmethod
+    def _empty_manifest() -> Dict:
+        return {'version': MANIFEST_VERSION, 'total': 0, 'teams': {}, 'segments': {}}
+
+    def _read_manifest(self, kind: str) -> Dict:
+        manifest_file = self._manifest_file(kind)
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if content.strip():
+                return json.loads(content)
+        manifest = self._empty_manifest()
+        self._migrate_legacy(kind, manifest)
+        return manifest
+
+    def _write_manifest(self, kind: str, manifest: Dict):
+        manifest_file = self._manifest_file(kind)
+        atomic_write_json(manifest_file, manifest, indent=2)
+        get_json_cache().invalidate(manifest_file)
+
+    def get_manifest(self, kind: str) -> Dict:
+        """Cached, read-only view of a kind's manifest"""
+        manifest = load_json_cached(self._manifest_file(kind), None, copy_result=False)
+        if manifest is None:
+            legacy_file = os.path.join(self.archive_dir, self.KINDS[kind])
+            if os.path.exists(legacy_file):
+                # Not migrated yet - an empty commit runs the migration
+                self._committer(kind).submit(lambda manifest: True)
+                manifest = load_json_cached(self._manifest_file(kind), None, copy_result=False)
+        return manifest or self._empty_manifest()
+
+    @staticmethod
+    def _count(manifest: Dict, month: str, segment_name: str, record: Dict):
+        segment = manifest['segments'].setdefault(month, {
+            'file': segment_name, 'count': 0, 'first_archived': None, 'last_archived': None, 'teams': {}
+        })
+        archived_date = record.get('archived_date') or ''
+        team = record.get('user_team') or ''
+        segment['count'] += 1
+        if archived_date and (not segment['first_archived'] or archived_date < segment['first_archived']):
+            segment['first_archived'] = archived_date
+        if archived_date and (not segment['last_archived'] or archived_date > segment['last_archived']):
+            segment['last_archived'] = archived_date
+        segment['teams'][team] = segment['teams'].get(team, 0) + 1
+        manifest['total'] = manifest.get('total', 0) + 1
+        manifest['teams'][team] = manifest['teams'].get(team, 0) + 1
+
+    # ---- writing ----
+
+    def append(self, kind: str, files: List[Dict]) -> bool:
+        """Append records (each with an 'archived_date') to their monthly segments"""
+        if not files:
+            return True
+        by_month: Dict[str, List[Dict]] = {}
+        for record in files:
+            by_month.setdefault(self._month_of(record), []).append(record)
+
+        def apply(manifest):
+            for month, records in sorted(by_month.items()):
+                segment_file = self._segment_file(kind, month)
+                # Lines of an earlier append whose manifest save failed are counted first,
+                # so the count never falls behind the segment for good
+                self._recount_segment(manifest, month, segment_file)
+                append_jsonl(segment_file, records)
+                for record in records:
+                    self._count(manifest, month, os.path.basename(segment_file), record)
+            return True
+
+        if not self._committer(kind).submit(apply):
+            print(f"[ARCHIVE] Failed to archive {len(files)} {kind} record(s)")
+            return False
+        return True
+
+    def _migrate_legacy(self, kind: str, manifest: Dict):
+        """Split a legacy single-file archive into monthly segments (under the manifest lock)"""
+        legacy_file = os.path.join(self.archive_dir, self.KINDS[kind])
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            legacy = json.loads(content) if content.strip() else {}
+        except Exception as e:
+            print(f"[ARCHIVE] Could not read legacy archive {legacy_file}: {e}")
+            return
+        records = list(legacy.values()) if isinstance(legacy, dict) else list(legacy)
+        records.sort(key=lambda record: record.get('archived_date', ''))
+
+        by_month: Dict[str, List[Dict]] = {}
+        for record in records:
+            by_month.setdefault(self._month_of(record), []).append(record)
+        for month, month_records in by_month.items():
+            segment_file = self._segment_file(kind, month)
+            # Whole-file write: a migration interrupted before the manifest was saved just runs again
+            write_jsonl(segment_file, month_records)
+            for record in month_records:
+                self._count(manifest, month, os.path.basename(segment_file), record)
+
+        # Save the manifest before retiring the legacy file so the segments are never orphaned
+        self._write_manifest(kind, manifest)
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+        print(f"[ARCHIVE] Migrated {len(records)} record(s) from {self.KINDS[kind]} into {len(by_month)} segment(s)")
+
+    def _recount_segment(self, manifest: Dict, month: str, segment_file: str) -> bool:
+        """Recount one segment if its lines and its manifest count differ (under the manifest lock)"""
+        records = self._read_segment(segment_file)
+        old = manifest['segments'].get(month)
+        if len(records) == (old or {}).get('count', 0):
+            return False
+        if old:
+            del manifest['segments'][month]
+            manifest['total'] = manifest.get('total', 0) - old.get('count', 0)
+            for team, count in old.get('teams', {}).items():
+                remaining = manifest['teams'].get(team, 0) - count
+                if remaining > 0:
+                    manifest['teams'][team] = remaining
+                else:
+                    manifest['teams'].pop(team, None)
+        for record in records:
+            self._count(manifest, month, os.path.basename(segment_file), record)
+        print(f"[ARCHIVE] Recounted segment {segment_file}: {(old or {}).get('count', 0)} -> {len(records)} record(s)")
+        return True
+
+    def reconcile(self, kind: str, months: Iterable[str]) -> bool:
+        """Recount the given segments of a kind whose manifest counts fell behind their lines"""
+        months = sorted(months)
+
+        def apply(manifest):
+            changed = False
+            for month in months:
+                changed = self._recount_segment(manifest, month, self._segment_file(kind, month)) or changed
+            return changed
+
+        return self._committer(kind).submit(apply)
+
+    def rebuild_manifest(self, kind: str) -> Dict:
+        """Recount every segment (e.g. after a crash between an append and its manifest update)"""
+        kind_dir = self._kind_dir(kind)
+
+        def apply(manifest):
+            fresh = self._empty_manifest()
+            if os.path.isdir(kind_dir):
+                for name in sorted(os.listdir(kind_dir)):
+                    if name.endswith('.jsonl'):
+                        for record in self._read_segment(os.path.join(kind_dir, name)):
+                            self._count(fresh, name[:-len('.jsonl')], name, record)
+            manifest.clear()
+            manifest.update(fresh)
+            return True
+
+        self._committer(kind).submit(apply)
+        return self.get_manifest(kind)
+
+    # ---- reading ----
+
+    def _read_segment(self, segment_file: str) -> List[Dict]:
+        """Records of one segment; only bytes appended since the last read are parsed"""
+        return self._segment_reader.read(segment_file)
+
+    def segments(self, kind: str, newest_first: bool = True) -> List[Tuple[str, Dict]]:
+        """(month, segment info) pairs from the manifest"""
+        return sorted(self.get_manifest(kind).get('segments', {}).items(), reverse=newest_first)
+
+    def iter_records(self, kind: str, teams: Optional[List[str]] = None,
+                     since: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Archived records, newest first, one per file_id (the latest). Segments
+        that hold none of `teams` or end before `since` (ISO date) are not read.
+        Records are shared with the cache - copy before modifying.
+        """
+        seen = set()
+        for month, info in self.segments(kind):
+            if teams is not None and not any(info.get('teams', {}).get(team) for team in teams):
+                continue
+            if since and info.get('last_archived') and info['last_archived'] < since:
+                break
+            records = self._read_segment(os.path.join(self._kind_dir(kind), info.get('file', f"{month}.jsonl")))
+            for record in reversed(records):
+                file_id = record.get('file_id')
+                if file_id:
+                    if file_id in seen:
+                        continue
+                    seen.add(file_id)
+                if teams is not None and record.get('user_team') not in teams:
+                    continue
+                if since and record.get('archived_date', '') < since:
+                    continue
+                yield record
+
+    def get_records(self, kind: str, teams: Optional[List[str]] = None, limit: Optional[int] = None,
+                    predicate: Optional[Callable[[Dict], bool]] = None, since: Optional[str] = None) -> List[Dict]:
+        """Copies of the newest archived records matching teams/predicate (at most limit)"""
+        results = []
+        for record in self.iter_records(kind, teams, since):
+            if predicate is not None and not predicate(record):
+                continue
+            results.append(dict(record))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def get_count(self, kind: str, team: Optional[str] = None) -> int:
+        """Records archived so far (from the manifest; re-archived files count again)"""
+        manifest = self.get_manifest(kind)
+        if team is None:
+            return manifest.get('total', 0)
+        return manifest.get('teams', {}).get(team, 0)
+
+
+    # ---- indexed queries ----
+
+    def _index(self, kind: str, reconcile: bool = True) -> _KindIndex:
+        """Per-kind index, brought up to date with the manifest"""
+        with self._guard:
+            index = self._indexes.setdefault(kind, _KindIndex())
+        segments = self.get_manifest(kind).get('segments', {})
+        behind = []
+        with index.lock:
+            # A segment that shrank or vanished means the archive was rebuilt - start over
+            if any(segments.get(month, {}).get('count', 0) < consumed
+                   for month, consumed in index.consumed.items()):
+                index.reset()
+            for month, info in sorted(segments.items()):
+                consumed = index.consumed.get(month, 0)
+                count = info.get('count', 0)
+                if consumed >= count:
+                    continue    # nothing appended since the last query - not even a stat
+                records = self._read_segment(os.path.join(self._kind_dir(kind), info.get('file', f"{month}.jsonl")))
+                # Only up to the manifest count: lines appended ahead of their manifest
+                # update (or left behind by a crash) must not run consumed past count
+                # and make every later query look like a rebuild
+                for record in records[consumed:count]:
+                    index.add(month, record)
+                index.consumed[month] = min(len(records), count)
+                if len(records) > count:
+                    behind.append(month)
+        if behind and reconcile:
+            # More lines than counted - an append whose manifest save failed (or one in
+            # progress elsewhere); recount under the lock and index what was missed
+            self.reconcile(kind, behind)
+            return self._index(kind, reconcile=False)
+        return index
+
+    @staticmethod
+    def _months_between(index: _KindIndex, date_from: Optional[str], date_to: Optional[str]) -> List[str]:
+        return [month for month in index.postings['month']
+                if (not date_from or month >= date_from[:7]) and (not date_to or month <= date_to[:7])]
+
+    def _candidates(self, index: _KindIndex, teams: Optional[set], users: Optional[set], reviewers: Optional[set],
+                    reviewer_field: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> Optional[set]:
+        """Intersect the posting lists of the indexed filters (None = every record)"""
+        postings = index.postings
+        selections = []
+        for field, values in (('team', teams), ('user', users), (reviewer_field or 'reviewer', reviewers)):
+            if values is not None:
+                selections.append(set().union(*(postings[field].get(value, ()) for value in values)))
+        if date_from or date_to:
+            months = self._months_between(index, date_from, date_to)
+            selections.append(set().union(*(postings['month'][month] for month in months)))
+        if not selections:
+            return None
+        selections.sort(key=len)
+        return selections[0].intersection(*selections[1:])
+
+    @staticmethod
+    def _residual_filter(date_from: Optional[str], date_to: Optional[str], filename: Optional[str],
+                         search: Optional[str], exclude_ids: Optional[set]) -> Optional[Callable[[str, Dict], bool]]:
+        """Checks the indexes cannot answer (exact dates within a month, substrings, exclusions)"""
+        filename = filename.lower() if filename else None
+        search = search.lower() if search else None
+        if not any((date_from, date_to, filename, search, exclude_ids)):
+            return None
+
+        def accept(file_id: str, record: Dict) -> bool:
+            if exclude_ids and file_id in exclude_ids:
+                return False
+            archived_date = record.get('archived_date') or ''
+            if date_from and archived_date < date_from:
+                return False
+            # A bare date includes the whole day
+            if date_to and archived_date[:len(date_to)] > date_to:
+                return False
+            if filename and filename not in (record.get('original_filename') or '').lower():
+                return False
+            if search and not (search in (record.get('original_filename') or '').lower() or
+                               search in (record.get('user_id') or '').lower() or
+                               search in (record.get('description') or '').lower()):
+                return False
+            return True
+        return accept
+
+    def _iter_kind(self, kind: str, sort: str, filters: Dict) -> Tuple[Iterator[Dict], int]:
+        """(records of one kind in sort order, their total) for query filters"""
+        index = self._index(kind)
+        with index.lock:
+            candidates = self._candidates(index, filters['teams'], filters['users'], filters['reviewers'],
+                                          filters['reviewer_field'], filters['date_from'], filters['date_to'])
+            accept = self._residual_filter(filters['date_from'], filters['date_to'], filters['filename'],
+                                           filters['search'], filters['exclude_ids'])
+            records = index.records
+            if candidates is not None and len(candidates) * 8 < len(records):
+                # Few matches - sorting them beats walking the full sort order
+                key, descending = SORT_KEYS[sort]
+                ordered = sorted(candidates, key=lambda file_id: key(records[file_id]), reverse=descending)
+            else:
+                ordered = [file_id for file_id in index.sorted_ids(sort)
+                           if candidates is None or file_id in candidates]
+            if accept is not None:
+                ordered = [file_id for file_id in ordered if accept(file_id, records[file_id])]
+            matches = [records[file_id] for file_id in ordered]
+        return iter(matches), len(matches)
+
+    def query(self, kinds: FilterValue = None, teams: FilterValue = None, reviewer: FilterValue = None,
+              reviewer_field: Optional[str] = None, user_id: FilterValue = None, date_from: Optional[str] = None,
+              date_to: Optional[str] = None, filename: Optional[str] = None, search: Optional[str] = None,
+              sort: str = 'archived_date', page: int = 1, limit: Optional[int] = 50,
+              exclude_ids: Optional[Iterable[str]] = None, merge_with: Optional[List[Dict]] = None) -> Dict:
+        """
+        One page of archived records.
+
+        kinds: archive kinds ('approved', 'rejected_admin', 'rejected_team_leader'; default all)
+        teams / user_id / reviewer: str or list; reviewer matches any of REVIEWER_FIELDS
+            unless reviewer_field names one
+        date_from / date_to: ISO dates (inclusive) on archived_date
+        filename: substring of the file name; search: substring of name, user or description
+        sort: a SORT_KEYS key; page is 1-based, limit None returns everything
+        merge_with: records from elsewhere (e.g. the live queue), already filtered, to be
+            merged into the same sort order and counted in the total
+
+        Returns {'items': [...copies...], 'total', 'page', 'limit', 'pages',
+        'totals': {kind: archived matches}}.
+        """
+        sort = sort if sort in SORT_KEYS else 'archived_date'
+        key, descending = SORT_KEYS[sort]
+        reviewer_field = reviewer_field if reviewer_field in REVIEWER_FIELDS else None
+        kinds = sorted(self.KINDS if kinds is None else _as_filter_set(kinds))
+        filters = {
+            'teams': _as_filter_set(teams),
+            'users': _as_filter_set(user_id),
+            'reviewers': _as_filter_set(reviewer),
+            'reviewer_field': reviewer_field,
+            'date_from': date_from,
+            'date_to': date_to,
+            'filename': filename,
+            'search': search,
+            'exclude_ids': set(exclude_ids) if exclude_ids else None,
+        }
+
+        streams = []
+        totals = {}
+        if merge_with:
+            streams.append(iter(sort_records(merge_with, sort)))
+        for kind in kinds:
+            records, totals[kind] = self._iter_kind(kind, sort, filters)
+            streams.append(records)
+        total = len(merge_with or ()) + sum(totals.values())
+
+        page = max(1, int(page or 1))
+        merged = heapq.merge(*streams, key=key, reverse=descending)
+        if limit:
+            merged = islice(merged, (page - 1) * limit, page * limit)
+        items = []
+        for record in merged:
+            item = dict(record)
+            item.pop('_archive_month', None)
+            items.append(item)
+        return {
+            'items': items,
+            'total': total,
+            'page': page,
+            'limit': limit,
+            'pages': max(1, -(-total // limit)) if limit else 1,
+            'totals': totals,
+        }
+
+    def count(self, kinds: FilterValue = None, teams: FilterValue = None, reviewer: FilterValue = None,
+              reviewer_field: Optional[str] = None, user_id: FilterValue = None, **filters) -> int:
+        """Number of distinct archived files matching the query() filters"""
+        if filters:
+            return self.query(kinds, teams, reviewer, reviewer_field, user_id, limit=1, **filters)['total']
+        # Indexed filters only - the size of the posting-list intersection
+        reviewer_field = reviewer_field if reviewer_field in REVIEWER_FIELDS else None
+        total = 0
+        for kind in sorted(self.KINDS if kinds is None else _as_filter_set(kinds)):
+            index = self._index(kind)
+            with index.lock:
+                candidates = self._candidates(index, _as_filter_set(teams), _as_filter_set(user_id),
+                                              _as_filter_set(reviewer), reviewer_field, None, None)
+                total += len(index.records) if candidates is None else len(candidates)
+        return total
+
+
+# Global archive instance
+_approval_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_approval_archive() -> ApprovalArchive:
+    """Get global approval archive instance"""
+    global _approval_archive
+    if _approval_archive is None:
+        with _archive_lock:
+            if _approval_archive is None:
+                _approval_archive = ApprovalArchive()
+    return _approval_archive
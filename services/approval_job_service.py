@@ -0,0 +1,594 @@
+"""
+Approval Job Service
+
+Admin approvals used to run the whole file move (network access probe, copy
+across NAS shares, metadata, archive, notifications) on the Flet UI thread.
+approve_file now records a persistent job in approvals/approval_jobs.json and
+returns immediately; a small worker pool claims queued jobs, runs the move and
+its side effects through FileApprovalService, and retries failed moves with
+exponential backoff.
+
+Job states: queued -> moving -> done | failed
+(a failed move goes back to queued while attempts remain - and always once the
+source has been removed, since only the bookkeeping is left; a queued job is
+cancelled when its file is rejected - see cancel_approvals)
+
+The current job state is mirrored on the queue record as "approval_job" so the
+admin table can show it without reading the job file.
+
+Each job also carries the step markers of its file move ("steps": planned,
+copied, verified, source_removed, metadata_written, user_notified, archived,
+queue_updated - see MoveSteps). Every step is persisted as it completes, so
+when the app is closed mid-move the resumer (run when the workers start and
+periodically after that) finds the orphaned "moving" job and either rolls it
+back (nothing verified yet: partial copy removed) or requeues it to finish
+from its last completed step. The workers start when an admin signs in
+(start_approval_jobs), not when the approval panel is first opened.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock, process_alive
+from utils.json_cache import get_json_cache
+from utils.tracing import span
+from utils.atomic_write import atomic_write_json
+from services.approval_queue_store import get_approval_queue_store
+from services.enhanced_file_movement_service import MoveSteps, get_enhanced_file_movement_service
+
+JOB_QUEUED = "queued"
+JOB_MOVING = "moving"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_JOB_STATES = (JOB_QUEUED, JOB_MOVING)
+
+
+class ApprovalJobService:
+    """Persistent approval job queue with a background worker pool"""
+
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 30        # seconds before the first retry, doubled per attempt
+    RETRY_MAX_DELAY = 900
+    POLL_INTERVAL = 5            # idle workers re-check the job file this often
+    BATCH_SIZE = 10              # jobs of one admin claimed together
+    KEEP_FINISHED = 24 * 3600    # done/failed jobs are pruned after a day
+    LEASE_SECONDS = 30 * 60      # a moving job of another host with no step for this long is orphaned
+    PROGRESS_INTERVAL = 1.0      # listeners hear about copy progress at most this often per file
+    RESUME_INTERVAL = 60         # workers look for orphaned jobs this often
+
+    def __init__(self, jobs_file: str = None, workers: int = None, max_attempts: int = None):
+        self.jobs_file = jobs_file or os.path.join(DATA_PATHS.approvals_dir, "approval_jobs.json")
+        self.lock = get_file_lock(f"{self.jobs_file}.lock")
+        self._committer = GroupCommitter(self.lock, self._read, self._write,
+                                         name=os.path.basename(self.jobs_file))
+        self.queue_store = get_approval_queue_store()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        config_workers, config_attempts = 2, self.MAX_ATTEMPTS
+        try:
+            from utils.config_loader import get_config
+            config = get_config()
+            config_workers = int(config.get_config_value("approval_job_workers", config_workers))
+            config_attempts = int(config.get_config_value("approval_job_max_attempts", config_attempts))
+        except Exception as e:
+            print(f"[APPROVAL_JOBS] Could not read job config: {e}")
+        self.workers = max(1, workers or config_workers)
+        self.max_attempts = max(1, max_attempts or config_attempts)
+
+        self._approval_service = None
+        self._threads: List[threading.Thread] = []
+        self._threads_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self._listeners_lock = threading.Lock()
+        self._resume_lock = threading.Lock()
+        self._last_resume = 0.0
+        self._progress: Dict[str, Dict] = {}
+        self._progress_lock = threading.Lock()
+
+    # ---- persistence ----
+
+    def _read(self) -> Dict[str, Dict]:
+        if os.path.exists(self.jobs_file):
+            with open(self.jobs_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return json.loads(content) if content.strip() else {}
+        return {}
+
+    def _write(self, jobs: Dict[str, Dict]):
+        atomic_write_json(self.jobs_file, jobs, indent=2)
+        get_json_cache().invalidate(self.jobs_file)
+
+    @property
+    def approval_service(self):
+        # Imported lazily - approval_service enqueues through this module
+        if self._approval_service is None:
+            from services.approval_service import FileApprovalService
+            self._approval_service = FileApprovalService()
+        return self._approval_service
+
+    # ---- public API ----
+
+    def enqueue_approvals(self, file_ids: Iterable[str], admin_user: str) -> Dict[str, Optional[str]]:
+        """
+        Queue approval jobs for files in the approval queue.
+        Returns {file_id: job_id} (None for files that are missing from the queue).
+        Files that already have an active job keep that job.
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        records = self.queue_store.get_records(file_ids)
+        job_ids: Dict[str, Optional[str]] = {file_id: None for file_id in file_ids}
+        created: List[Dict] = []
+
+        def add_jobs(jobs):
+            active = {job['file_id']: job_id for job_id, job in jobs.items()
+                      if job.get('state') in ACTIVE_JOB_STATES}
+            now = time.time()
+            for file_id in records:
+                if file_id in active:
+                    job_ids[file_id] = active[file_id]
+                    continue
+                job = {
+                    'job_id': str(uuid.uuid4()),
+                    'type': 'approve',
+                    'file_id': file_id,
+                    'admin_user': admin_user,
+                    'state': JOB_QUEUED,
+                    'attempts': 0,
+                    'max_attempts': self.max_attempts,
+                    'next_attempt_at': now,
+                    'created_at': datetime.now().isoformat(),
+                    'updated_at': datetime.now().isoformat(),
+                    'last_error': None
+                }
+                jobs[job['job_id']] = job
+                job_ids[file_id] = job['job_id']
+                created.append(job)
+            return bool(created)
+
+        if not records:
+            return job_ids
+        if not self._committer.submit(add_jobs):
+            print(f"[APPROVAL_JOBS] Failed to queue approval jobs for {list(records)}")
+            return {file_id: None for file_id in file_ids}
+
+        if created:
+            self._mirror_job_state(created)
+            print(f"[APPROVAL_JOBS] Queued {len(created)} approval job(s) by {admin_user}")
+            self._wake.set()
+            self._notify_listeners([job['file_id'] for job in created])
+        return job_ids
+
+    def get_jobs(self, file_ids: Iterable[str] = None) -> List[Dict]:
+        """Get jobs (optionally only those for the given file_ids)"""
+        try:
+            jobs = list(self._read().values())
+        except Exception as e:
+            print(f"[APPROVAL_JOBS] Error reading jobs: {e}")
+            return []
+        if file_ids is not None:
+            wanted = set(file_ids)
+            jobs = [job for job in jobs if job.get('file_id') in wanted]
+        return jobs
+
+    def retry_job(self, job_id: str) -> bool:
+        """Put a failed job back in the queue for another round of attempts"""
+        retried = []
+
+        def requeue(jobs):
+            job = jobs.get(job_id)
+            if not job or job.get('state') != JOB_FAILED:
+                return False
+            job.update(state=JOB_QUEUED, attempts=0, next_attempt_at=time.time(),
+                       updated_at=datetime.now().isoformat())
+            retried.append(dict(job))
+            return True
+
+        if self._committer.submit(requeue) and retried:
+            self._mirror_job_state(retried)
+            self._wake.set()
+            self._notify_listeners([retried[0]['file_id']])
+            return True
+        return False
+
+    def cancel_approvals(self, file_ids: Iterable[str], reason: str = None) -> List[str]:
+        """
+        Cancel the queued approval jobs of files that are about to be rejected.
+
+        Jobs being moved right now - or queued for a retry after their file was
+        already moved into the project directory - cannot be cancelled.
+        Returns the file_ids whose approval is still in progress; those files
+        must not be rejected. Reservations of cancelled moves are rolled back.
+        """
+        file_ids = set(file_ids)
+        busy: List[str] = []
+        cancelled: List[Dict] = []
+
+        def cancel(jobs):
+            for job in jobs.values():
+                if job.get('file_id') not in file_ids or job.get('state') not in ACTIVE_JOB_STATES:
+                    continue
+                if job['state'] == JOB_MOVING or MoveSteps.VERIFIED in job.get('steps', {}):
+                    busy.append(job['file_id'])
+                    continue
+                job['state'] = JOB_CANCELLED
+                job['last_error'] = f"Cancelled: {reason}" if reason else "Cancelled"
+                job['updated_at'] = datetime.now().isoformat()
+                cancelled.append(dict(job))
+            return bool(cancelled)
+
+        if not file_ids:
+            return busy
+        if not self._committer.submit(cancel):
+            # Job state unknown - treat every file as busy rather than race a worker
+            return sorted(file_ids)
+
+        file_movement_service = get_enhanced_file_movement_service()
+        for job in cancelled:
+            if job.get('steps'):
+                try:
+                    file_movement_service.rollback_approved_move(self._job_steps(job['job_id'], job['steps']))
+                except Exception as e:
+                    print(f"[APPROVAL_JOBS] Rollback failed for cancelled job {job['job_id']}: {e}")
+        if cancelled:
+            print(f"[APPROVAL_JOBS] Cancelled {len(cancelled)} queued approval job(s)")
+            self._mirror_job_state(cancelled)
+            self._notify_listeners([job['file_id'] for job in cancelled])
+        return busy
+
+    def get_progress(self, file_id: str) -> Optional[Dict]:
+        """Copy progress of a file being moved by this process: {'done', 'total', 'percent'} or None"""
+        with self._progress_lock:
+            entry = self._progress.get(file_id)
+            return dict(entry) if entry else None
+
+    def _report_progress(self, job_id: str, file_id: str, done: int, total: int):
+        """Copy progress from a worker - throttled listener updates and lease renewal"""
+        now = time.time()
+        with self._progress_lock:
+            entry = self._progress.setdefault(file_id, {'notified_at': 0.0, 'heartbeat_at': now})
+            entry.update(done=done, total=total, percent=int(done * 100 / total) if total else 100)
+            notify = now - entry['notified_at'] >= self.PROGRESS_INTERVAL or done >= total
+            if notify:
+                entry['notified_at'] = now
+            heartbeat = now - entry['heartbeat_at'] >= self.LEASE_SECONDS / 3
+            if heartbeat:
+                entry['heartbeat_at'] = now
+
+        if heartbeat:
+            # A long copy records no steps - keep the lease alive so it is not taken over
+            def touch(jobs):
+                job = jobs.get(job_id)
+                if not job or job.get('state') != JOB_MOVING:
+                    return False
+                job['heartbeat_at'] = now
+                return True
+            self._committer.submit(touch)
+        if notify:
+            self._notify_listeners([file_id])
+
+    def add_listener(self, callback: Callable[[List[str]], None]):
+        """Register a callback invoked with the file_ids whose job state changed"""
+        with self._listeners_lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[List[str]], None]):
+        with self._listeners_lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify_listeners(self, file_ids: List[str]):
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(file_ids)
+            except Exception as e:
+                print(f"[APPROVAL_JOBS] Listener error: {e}")
+
+    # ---- workers ----
+
+    def start(self):
+        """Start the worker pool (idempotent); the first worker loop resumes orphaned jobs"""
+        with self._threads_lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads:
+                return
+            self._stop.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"ApprovalJobWorker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"[APPROVAL_JOBS] Started {self.workers} approval worker(s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            if time.time() - self._last_resume >= self.RESUME_INTERVAL:
+                try:
+                    self.resume_incomplete_jobs()
+                except Exception as e:
+                    print(f"[APPROVAL_JOBS] Error resuming jobs: {e}")
+            try:
+                batch = self._claim_batch()
+            except Exception as e:
+                print(f"[APPROVAL_JOBS] Error claiming jobs: {e}")
+                batch = []
+
+            if not batch:
+                self._wake.wait(self.POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run_batch(batch)
+
+    def _claim_batch(self) -> List[Dict]:
+        """Atomically move up to BATCH_SIZE due jobs of one admin from queued to moving"""
+        claimed: List[Dict] = []
+
+        def claim(jobs):
+            now = time.time()
+            changed = self._prune_finished(jobs, now)
+            due = sorted((job for job in jobs.values()
+                          if job.get('state') == JOB_QUEUED and job.get('next_attempt_at', 0) <= now),
+                         key=lambda job: job.get('next_attempt_at', 0))
+            if not due:
+                return changed
+            admin_user = due[0].get('admin_user')
+            for job in due:
+                if job.get('admin_user') != admin_user:
+                    continue
+                job['state'] = JOB_MOVING
+                job['attempts'] = job.get('attempts', 0) + 1
+                job['claimed_by'] = self.owner
+                job['started_at'] = datetime.now().isoformat()
+                job['updated_at'] = job['started_at']
+                job['heartbeat_at'] = now
+                claimed.append(dict(job))
+                if len(claimed) >= self.BATCH_SIZE:
+                    break
+            return True
+
+        self._committer.submit(claim)
+        if claimed:
+            self._mirror_job_state(claimed)
+            self._notify_listeners([job['file_id'] for job in claimed])
+        return claimed
+
+    def _prune_finished(self, jobs: Dict[str, Dict], now: float) -> bool:
+        cutoff = datetime.fromtimestamp(now - self.KEEP_FINISHED).isoformat()
+        stale = [job_id for job_id, job in jobs.items()
+                 if job.get('state') in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+                 and job.get('updated_at', '') < cutoff]
+        for job_id in stale:
+            del jobs[job_id]
+        return bool(stale)
+
+    def _run_batch(self, batch: List[Dict]):
+        admin_user = batch[0].get('admin_user')
+        file_ids = [job['file_id'] for job in batch]
+        # Failed moves are left pending for a retry until the job's last attempt
+        retryable = [job['file_id'] for job in batch
+                     if job.get('attempts', 0) < job.get('max_attempts', self.max_attempts)]
+
+        move_steps = {job['file_id']: self._job_steps(job['job_id'], job.get('steps')) for job in batch}
+        job_ids = {job['file_id']: job['job_id'] for job in batch}
+
+        def progress(file_id, done, total):
+            self._report_progress(job_ids[file_id], file_id, done, total)
+
+        try:
+            with span("approval_job_batch", "approval", files=len(file_ids), admin=admin_user,
+                      job_ids=list(job_ids.values())):
+                results = self.approval_service._execute_approvals(
+                    file_ids, admin_user, retry_failed_moves=retryable, move_steps=move_steps, progress=progress)
+        except Exception as e:
+            print(f"[APPROVAL_JOBS] Approval batch failed: {e}")
+            results = {file_id: {'success': False, 'retry': True, 'message': str(e)} for file_id in file_ids}
+        finally:
+            with self._progress_lock:
+                for file_id in file_ids:
+                    self._progress.pop(file_id, None)
+
+        outcomes: Dict[str, Dict] = {}
+        for job in batch:
+            result = results.get(job['file_id'], {'success': False, 'message': 'No result'})
+            # Once the source is gone only bookkeeping is left - keep retrying it past max_attempts
+            can_retry = (job['file_id'] in retryable
+                         or move_steps[job['file_id']].done(MoveSteps.SOURCE_REMOVED))
+            if result.get('moved'):
+                outcomes[job['job_id']] = {'state': JOB_DONE, 'last_error': None}
+            elif result.get('retry') and can_retry:
+                delay = min(self.RETRY_BASE_DELAY * (2 ** (job.get('attempts', 1) - 1)), self.RETRY_MAX_DELAY)
+                outcomes[job['job_id']] = {'state': JOB_QUEUED, 'last_error': result.get('message'),
+                                           'next_attempt_at': time.time() + delay}
+                print(f"[APPROVAL_JOBS] Move failed for {job['file_id']}, retrying in {delay}s: {result.get('message')}")
+            else:
+                outcomes[job['job_id']] = {'state': JOB_FAILED, 'last_error': result.get('message')}
+                print(f"[APPROVAL_JOBS] Approval job for {job['file_id']} failed: {result.get('message')}")
+
+        finished: List[Dict] = []
+
+        def record(jobs):
+            for job_id, outcome in outcomes.items():
+                job = jobs.get(job_id)
+                if not job:
+                    continue
+                job.update(outcome)
+                job['updated_at'] = datetime.now().isoformat()
+                job.pop('claimed_by', None)
+                finished.append(dict(job))
+            return bool(finished)
+
+        if not self._committer.submit(record):
+            print(f"[APPROVAL_JOBS] Could not record results for {len(batch)} job(s)")
+        self._mirror_job_state([job for job in finished if job['state'] != JOB_DONE])
+        self._notify_listeners(file_ids)
+
+    # ---- step markers and crash recovery ----
+
+    def _job_steps(self, job_id: str, steps: Dict[str, Dict] = None) -> MoveSteps:
+        """MoveSteps for a job whose markers are written to the job file as they change"""
+        return MoveSteps(steps, on_mark=lambda step, data: self._record_step(job_id, step, data))
+
+    def _record_step(self, job_id: str, step: str, data: Optional[Dict]):
+        """Persist one step marker (also renews the job's lease)"""
+        def apply(jobs):
+            job = jobs.get(job_id)
+            if not job:
+                return False
+            steps = job.setdefault('steps', {})
+            if data is None:
+                steps.pop(step, None)
+            else:
+                steps[step] = data
+            job['heartbeat_at'] = time.time()
+            job['updated_at'] = datetime.now().isoformat()
+            return True
+
+        if not self._committer.submit(apply):
+            # Raising stops the move here - a step that is not recorded must not be built upon
+            raise IOError(f"Could not record step '{step}' for approval job {job_id}")
+
+    def _is_orphaned(self, job: Dict, now: float) -> bool:
+        """A moving job whose worker process is gone (or silent past the lease on another host)"""
+        if job.get('state') != JOB_MOVING:
+            return False
+        claimed_by = job.get('claimed_by') or ''
+        if claimed_by == self.owner:
+            return False
+        host, _, pid = claimed_by.rpartition(':')
+        if host == socket.gethostname():
+            return not (pid.isdigit() and process_alive(int(pid)))
+        return now - job.get('heartbeat_at', 0) > self.LEASE_SECONDS
+
+    def resume_incomplete_jobs(self) -> int:
+        """
+        Recover approval jobs left in "moving" by a process that crashed or was closed.
+
+        Jobs whose queue update already happened are marked done; moves that were
+        not verified yet are rolled back (partial target removed) and restarted;
+        verified moves are requeued and finish from their last completed step.
+        The interrupted attempt is not counted. Returns the number of jobs recovered.
+        """
+        if not self._resume_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_resume = time.time()
+            recovered: List[Dict] = []
+
+            def adopt(jobs):
+                now = time.time()
+                for job in jobs.values():
+                    if not self._is_orphaned(job, now):
+                        continue
+                    # Take the job over so no other worker starts it while it is being recovered
+                    job['claimed_by'] = self.owner
+                    job['heartbeat_at'] = now
+                    recovered.append(dict(job))
+                return bool(recovered)
+
+            if not self._committer.submit(adopt) or not recovered:
+                return 0
+
+            file_movement_service = get_enhanced_file_movement_service()
+            for job in recovered:
+                steps = self._job_steps(job['job_id'], job.get('steps'))
+                try:
+                    if not steps.done(MoveSteps.QUEUE_UPDATED):
+                        file_movement_service.rollback_approved_move(steps)
+                except Exception as e:
+                    print(f"[APPROVAL_JOBS] Rollback failed for job {job['job_id']}: {e}")
+
+            ids = {job['job_id'] for job in recovered}
+            resumed: List[Dict] = []
+
+            def requeue(jobs):
+                for job_id in ids:
+                    job = jobs.get(job_id)
+                    if not job or job.get('claimed_by') != self.owner:
+                        continue
+                    if MoveSteps.QUEUE_UPDATED in job.get('steps', {}):
+                        job['state'] = JOB_DONE
+                    else:
+                        job['state'] = JOB_QUEUED
+                        job['attempts'] = max(0, job.get('attempts', 1) - 1)
+                        job['next_attempt_at'] = time.time()
+                    job['resumed_at'] = datetime.now().isoformat()
+                    job['updated_at'] = job['resumed_at']
+                    job.pop('claimed_by', None)
+                    resumed.append(dict(job))
+                return bool(resumed)
+
+            if not self._committer.submit(requeue):
+                print(f"[APPROVAL_JOBS] Could not requeue {len(ids)} recovered job(s)")
+                return 0
+
+            print(f"[APPROVAL_JOBS] Recovered {len(resumed)} interrupted approval job(s)")
+            self._mirror_job_state([job for job in resumed if job['state'] != JOB_DONE])
+            self._wake.set()
+            self._notify_listeners([job['file_id'] for job in resumed])
+            return len(resumed)
+        finally:
+            self._resume_lock.release()
+
+    def _mirror_job_state(self, jobs: List[Dict]):
+        """Copy job state onto the queue records (one queue write, missing records skipped)"""
+        if not jobs:
+            return
+        by_file = {job['file_id']: job for job in jobs}
+
+        def stamp(record):
+            job = by_file[record['file_id']]
+            record['approval_job'] = {
+                'job_id': job['job_id'],
+                'state': job['state'],
+                'attempts': job.get('attempts', 0),
+                'max_attempts': job.get('max_attempts', self.max_attempts),
+                'last_error': job.get('last_error'),
+                'updated_at': job.get('updated_at')
+            }
+
+        self.queue_store.update_records(list(by_file), stamp)
+
+
+# Global job service instance
+_approval_job_service = None
+_job_service_lock = threading.Lock()
+
+
+def get_approval_job_service(start: bool = True) -> ApprovalJobService:
+    """Get global approval job service instance (workers started unless start=False)"""
+    global _approval_job_service
+    if _approval_job_service is None:
+        with _job_service_lock:
+            if _approval_job_service is None:
+                _approval_job_service = ApprovalJobService()
+    if start:
+        _approval_job_service.start()
+    return _approval_job_service
+
+
+def start_approval_jobs() -> Optional[ApprovalJobService]:
+    """
+    Start the approval workers at admin startup, so jobs queued before a
+    restart (and moves a crash interrupted) are picked up and recovered
+    without waiting for the approval panel to be opened.
+    """
+    try:
+        return get_approval_job_service(start=True)
+    except Exception as e:
+        print(f"[APPROVAL_JOBS] Could not start approval workers: {e}")
+        return None
@@ -0,0 +1,873 @@
+"""
+Approval Queue Store
+
+Pluggable storage backends for the global approval queue.
+
+The queue used to live only in approvals/file_approvals.json, and every
+submit / withdraw / approve / reject loaded and rewrote the whole document.
+This module hides the storage behind a small record-oriented interface:
+
+- JsonQueueStore:      compatibility backend, keeps file_approvals.json as-is
+- JournaledQueueStore: file_approvals.json snapshot + append-only mutation
+                       journal, compacted in the background
+- SqliteQueueStore:    one row per file_id with indexes on status,
+                       user_team and user_id, so one approval touches one row
+
+SQLite's WAL mode needs shared memory on a single host and does not work over
+network filesystems, so a database on the NAS (a UNC path or a mapped network
+drive) uses the rollback journal (journal_mode=DELETE, synchronous=FULL); WAL
+is only used for a database on a local disk.
+
+Backend is selected with the "approval_queue_backend" config value
+("json" by default, "journal" or "sqlite" to opt in).
+"""
+
+import os
+import copy
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, LockTimeoutError, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.atomic_write import atomic_write_json
+
+# Fields promoted to indexed columns in the SQLite backend
+INDEXED_FIELDS = ("status", "user_team", "user_id")
+
+FilterValue = Optional[Union[str, Iterable[str]]]
+
+
+def _as_filter_set(value: FilterValue) -> Optional[set]:
+    """Normalize a str / iterable filter value into a set (None = no filter)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+class ApprovalQueueStore:
+    """Common interface for global approval queue backends"""
+
+    backend_name = "base"
+
+    def load_all(self) -> Dict[str, Dict]:
+        """Return the whole queue as {file_id: record}"""
+        raise NotImplementedError
+
+    def save_all(self, queue: Dict[str, Dict]) -> bool:
+        """Replace the whole queue (legacy full-document writers)"""
+        raise NotImplementedError
+
+    def get_record(self, file_id: str) -> Optional[Dict]:
+        """Get a single queue record by file_id"""
+        raise NotImplementedError
+
+    def upsert_records(self, records: List[Dict]) -> bool:
+        """Insert or replace records keyed by their file_id"""
+        raise NotImplementedError
+
+    def delete_records(self, file_ids: List[str]) -> int:
+        """Delete records, returns number removed (-1 on failure)"""
+        raise NotImplementedError
+
+    def update_record(self, file_id: str, mutator: Callable[[Dict], Optional[bool]]) -> Optional[Dict]:
+        """
+        Atomically read-modify-write one record.
+        The mutator edits the record in place; returning False aborts the write.
+        Returns the updated record, or None if missing/aborted/failed.
+        """
+        raise NotImplementedError
+
+    def query(self, status: FilterValue = None, user_team: FilterValue = None,
+              user_id: FilterValue = None) -> List[Dict]:
+        """Get records matching status / user_team / user_id (each a str or list)"""
+        raise NotImplementedError
+
+    def get_records(self, file_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Get several records in one read, as {file_id: record} (missing ids omitted)"""
+        raise NotImplementedError
+
+    def commit_batch(self, upserts: List[Dict] = None, deletes: List[str] = None,
+                     updates: List[Dict] = None) -> bool:
+        """
+        Apply upserts, deletes and updates together as one atomic write (bulk actions).
+        updates replace records only if they are still in the queue - a record
+        deleted meanwhile (e.g. rejected) is not brought back.
+        """
+        raise NotImplementedError
+
+    def update_records(self, file_ids: Iterable[str], mutator: Callable[[Dict], Optional[bool]]) -> int:
+        """
+        Atomically read-modify-write several records in one write.
+        Missing records are skipped (never re-created); returns the number updated (-1 on failure).
+        """
+        raise NotImplementedError
+
+    # Convenience wrappers
+    def upsert_record(self, record: Dict) -> bool:
+        return self.upsert_records([record])
+
+    def delete_record(self, file_id: str) -> bool:
+        return self.delete_records([file_id]) >= 0
+
+    @staticmethod
+    def _matches(record: Dict, status: Optional[set], user_team: Optional[set],
+                 user_id: Optional[set]) -> bool:
+        if status is not None and record.get("status", "") not in status:
+            return False
+        if user_team is not None and record.get("user_team", "") not in user_team:
+            return False
+        if user_id is not None and record.get("user_id", "") not in user_id:
+            return False
+        return True
+
+
+class JsonQueueStore(ApprovalQueueStore):
+    """Compatibility backend - whole queue in file_approvals.json"""
+
+    backend_name = "json"
+
+    def __init__(self, queue_file: str = None):
+        self.queue_file = queue_file or DATA_PATHS.file_approvals_file
+        self.lock_file = f"{self.queue_file}.lock"
+        self.lock = get_file_lock(self.lock_file)
+        # Concurrent mutations from this process share one lock/load/save cycle
+        self._committer = GroupCommitter(self.lock, self._read, self._write,
+                                         name=os.path.basename(self.queue_file))
+
+    def _read(self) -> Dict[str, Dict]:
+        if os.path.exists(self.queue_file):
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _write(self, queue: Dict[str, Dict]):
+        # Write-then-rename so lock-free readers never see a half-written queue
+        atomic_write_json(self.queue_file, queue, indent=2)
+        get_json_cache().invalidate(self.queue_file)
+
+    def _load_shared(self) -> Dict[str, Dict]:
+        """Cached, read-only view of the queue document"""
+        return load_json_cached(self.queue_file, {}, copy_result=False) or {}
+
+    def _mutate(self, mutator: Callable[[Dict[str, Dict]], bool]) -> bool:
+        """Locked, group-committed read-modify-write; mutator returns True when the queue changed"""
+        return self._committer.submit(mutator)
+
+    def load_all(self) -> Dict[str, Dict]:
+        try:
+            return copy.deepcopy(self._load_shared())
+        except Exception as e:
+            print(f"Error loading global queue: {e}")
+            return {}
+
+    def save_all(self, queue: Dict[str, Dict]) -> bool:
+        def replace(current):
+            current.clear()
+            current.update(queue)
+            return True
+        return self._mutate(replace)
+
+    def get_record(self, file_id: str) -> Optional[Dict]:
+        record = self._load_shared().get(file_id)
+        return copy.deepcopy(record) if record is not None else None
+
+    def upsert_records(self, records: List[Dict]) -> bool:
+        def apply(queue):
+            for record in records:
+                queue[record["file_id"]] = record
+            return bool(records)
+        return self._mutate(apply)
+
+    def delete_records(self, file_ids: List[str]) -> int:
+        removed = []
+
+        def apply(queue):
+            for file_id in file_ids:
+                if queue.pop(file_id, None) is not None:
+                    removed.append(file_id)
+            return bool(removed)
+
+        return len(removed) if self._mutate(apply) else -1
+
+    def update_record(self, file_id: str, mutator: Callable[[Dict], Optional[bool]]) -> Optional[Dict]:
+        result = {}
+
+        def apply(queue):
+            record = copy.deepcopy(queue.get(file_id))
+            if record is None or mutator(record) is False:
+                return False
+            queue[file_id] = record
+            result["record"] = record
+            return True
+
+        if self._mutate(apply):
+            return result.get("record")
+        return None
+
+    def query(self, status: FilterValue = None, user_team: FilterValue = None,
+              user_id: FilterValue = None) -> List[Dict]:
+        status_set = _as_filter_set(status)
+        team_set = _as_filter_set(user_team)
+        user_set = _as_filter_set(user_id)
+        return [copy.deepcopy(record) for record in self._load_shared().values()
+                if self._matches(record, status_set, team_set, user_set)]
+
+    def get_records(self, file_ids: Iterable[str]) -> Dict[str, Dict]:
+        queue = self._load_shared()
+        return {file_id: copy.deepcopy(queue[file_id]) for file_id in file_ids if file_id in queue}
+
+    def commit_batch(self, upserts: List[Dict] = None, deletes: List[str] = None,
+                     updates: List[Dict] = None) -> bool:
+        upserts = upserts or []
+        deletes = deletes or []
+        updates = updates or []
+
+        def apply(queue):
+            for record in upserts:
+                queue[record["file_id"]] = record
+            updated = [record for record in updates if record["file_id"] in queue]
+            for record in updated:
+                queue[record["file_id"]] = record
+            removed = [file_id for file_id in deletes if queue.pop(file_id, None) is not None]
+            return bool(upserts or updated or removed)
+
+        if not upserts and not deletes and not updates:
+            return True
+        return self._mutate(apply)
+
+    def update_records(self, file_ids: Iterable[str], mutator: Callable[[Dict], Optional[bool]]) -> int:
+        file_ids = list(file_ids)
+        updated = []
+
+        def apply(queue):
+            for file_id in file_ids:
+                record = copy.deepcopy(queue.get(file_id))
+                if record is None or mutator(record) is False:
+                    continue
+                queue[file_id] = record
+                updated.append(file_id)
+            return bool(updated)
+
+        if not file_ids:
+            return 0
+        return len(updated) if self._mutate(apply) else -1
+
+
+class _JournalBatch:
+    """Mutations collected for one group commit of the journal"""
+
+    def __init__(self, state: Dict[str, Dict]):
+        self.state = state
+        self.overlay: Dict[str, Optional[Dict]] = {}
+        self.entries: List[Dict] = []
+
+    def __deepcopy__(self, memo):
+        # GroupCommitter copies the document per mutator - the replayed state is
+        # only read here, so just the pending mutations need copying
+        clone = _JournalBatch(self.state)
+        clone.overlay = copy.deepcopy(self.overlay, memo)
+        clone.entries = copy.deepcopy(self.entries, memo)
+        return clone
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        if file_id in self.overlay:
+            return self.overlay[file_id]
+        return self.state.get(file_id)
+
+    def upsert(self, record: Dict):
+        self.overlay[record["file_id"]] = record
+        self.entries.append({"op": "upsert", "file_id": record["file_id"],
+                             "status": record.get("status", ""), "record": record})
+
+    def delete(self, file_ids: List[str]) -> List[str]:
+        present = [file_id for file_id in file_ids if self.get(file_id) is not None]
+        for file_id in present:
+            self.overlay[file_id] = None
+        if present:
+            self.entries.append({"op": "delete", "file_ids": present})
+        return present
+
+
+class JournaledQueueStore(JsonQueueStore):
+    """
+    file_approvals.json as a snapshot plus an append-only mutation journal.
+
+    Every mutation appends one JSON line to file_approvals.journal.jsonl
+    instead of rewriting the whole queue. Readers load the snapshot and
+    replay the journal tail (incrementally, from the last byte offset they
+    consumed). A background compactor folds the journal into a new snapshot
+    and moves the replayed journal to approvals/journal_history/, so the
+    full history of queue mutations stays replayable.
+    """
+
+    backend_name = "journal"
+
+    # Compact when the journal grows past this size, or when it has
+    # entries older than COMPACT_MAX_AGE seconds
+    COMPACT_MAX_BYTES = 256 * 1024
+    COMPACT_MAX_AGE = 300
+    COMPACT_CHECK_INTERVAL = 30
+
+    def __init__(self, queue_file: str = None):
+        super().__init__(queue_file)
+        base, _ = os.path.splitext(self.queue_file)
+        self.journal_file = f"{base}.journal.jsonl"
+        self.history_prefix = os.path.basename(base)
+        self.history_dir = os.path.join(os.path.dirname(self.queue_file) or ".", "journal_history")
+
+        # Reader state: snapshot signature + journal bytes already replayed
+        self._state: Dict[str, Dict] = {}
+        self._snapshot_sig = None
+        self._journal_offset = 0
+        self._state_lock = threading.RLock()
+
+        # Journal appends from concurrent threads are group committed too
+        self._journal_committer = GroupCommitter(
+            self.lock, lambda: _JournalBatch(self._refresh()),
+            lambda batch: self._append_locked(batch.entries),
+            name=os.path.basename(self.journal_file))
+
+        self._compactor_thread = None
+        self._compactor_stop = threading.Event()
+
+    # ---- journal primitives ----
+
+    @staticmethod
+    def _apply_entry(state: Dict[str, Dict], entry: Dict):
+        op = entry.get("op")
+        if op == "upsert":
+            record = entry.get("record") or {}
+            if record.get("file_id"):
+                state[record["file_id"]] = record
+        elif op == "delete":
+            for file_id in entry.get("file_ids", []):
+                state.pop(file_id, None)
+
+    def _file_sig(self, path: str):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime, stat.st_size)
+        except OSError:
+            return None
+
+    def _replay_journal(self, state: Dict[str, Dict], offset: int) -> int:
+        """Apply complete journal lines after offset, returns the new offset"""
+        if not os.path.exists(self.journal_file):
+            return 0
+        with open(self.journal_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Ignore a trailing partial line (writer mid-append)
+        end = data.rfind(b"\n")
+        if end < 0:
+            return offset
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply_entry(state, json.loads(line.decode('utf-8')))
+            except Exception as e:
+                print(f"[QUEUE_JOURNAL] Skipping unreadable journal entry: {e}")
+        return offset + end + 1
+
+    def _refresh(self) -> Dict[str, Dict]:
+        """Bring the in-memory state up to date with snapshot + journal tail"""
+        with self._state_lock:
+            snapshot_sig = self._file_sig(self.queue_file)
+            journal_size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+
+            # Snapshot rewritten or journal rotated -> full reload
+            if snapshot_sig != self._snapshot_sig or journal_size < self._journal_offset:
+                self._state = self._read()
+                self._snapshot_sig = snapshot_sig
+                self._journal_offset = 0
+
+            if journal_size > self._journal_offset:
+                self._journal_offset = self._replay_journal(self._state, self._journal_offset)
+            return self._state
+
+    def _append_locked(self, entries: List[Dict]):
+        os.makedirs(os.path.dirname(self.journal_file) or ".", exist_ok=True)
+        timestamp = datetime.now().isoformat()
+        lines = []
+        for entry in entries:
+            entry.setdefault("timestamp", timestamp)
+            lines.append(json.dumps(entry, separators=(',', ':')) + "\n")
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ---- ApprovalQueueStore interface ----
+
+    def load_all(self) -> Dict[str, Dict]:
+        try:
+            return copy.deepcopy(self._refresh())
+        except Exception as e:
+            print(f"Error loading global queue: {e}")
+            return {}
+
+    def get_record(self, file_id: str) -> Optional[Dict]:
+        try:
+            record = self._refresh().get(file_id)
+            return copy.deepcopy(record) if record is not None else None
+        except Exception as e:
+            print(f"[QUEUE_JOURNAL] Error reading record {file_id}: {e}")
+            return None
+
+    def query(self, status: FilterValue = None, user_team: FilterValue = None,
+              user_id: FilterValue = None) -> List[Dict]:
+        status_set = _as_filter_set(status)
+        team_set = _as_filter_set(user_team)
+        user_set = _as_filter_set(user_id)
+        try:
+            return [copy.deepcopy(record) for record in self._refresh().values()
+                    if self._matches(record, status_set, team_set, user_set)]
+        except Exception as e:
+            print(f"[QUEUE_JOURNAL] Error querying queue: {e}")
+            return []
+
+    def upsert_records(self, records: List[Dict]) -> bool:
+        def apply(batch):
+            for record in records:
+                batch.upsert(record)
+            return bool(records)
+        return self._journal_committer.submit(apply)
+
+    def delete_records(self, file_ids: List[str]) -> int:
+        removed = []
+
+        def apply(batch):
+            removed.extend(batch.delete(file_ids))
+            return bool(removed)
+
+        return len(removed) if self._journal_committer.submit(apply) else -1
+
+    def update_record(self, file_id: str, mutator: Callable[[Dict], Optional[bool]]) -> Optional[Dict]:
+        result = {}
+
+        def apply(batch):
+            record = copy.deepcopy(batch.get(file_id))
+            if record is None or mutator(record) is False:
+                return False
+            batch.upsert(record)
+            result["record"] = record
+            return True
+
+        if self._journal_committer.submit(apply):
+            return result.get("record")
+        return None
+
+    def get_records(self, file_ids: Iterable[str]) -> Dict[str, Dict]:
+        try:
+            state = self._refresh()
+            return {file_id: copy.deepcopy(state[file_id]) for file_id in file_ids if file_id in state}
+        except Exception as e:
+            print(f"[QUEUE_JOURNAL] Error reading records: {e}")
+            return {}
+
+    def commit_batch(self, upserts: List[Dict] = None, deletes: List[str] = None,
+                     updates: List[Dict] = None) -> bool:
+        upserts = upserts or []
+        deletes = deletes or []
+        updates = updates or []
+
+        def apply(batch):
+            for record in upserts:
+                batch.upsert(record)
+            updated = [record for record in updates if batch.get(record["file_id"]) is not None]
+            for record in updated:
+                batch.upsert(record)
+            removed = batch.delete(deletes) if deletes else []
+            return bool(upserts or updated or removed)
+
+        if not upserts and not deletes and not updates:
+            return True
+        return self._journal_committer.submit(apply)
+
+    def update_records(self, file_ids: Iterable[str], mutator: Callable[[Dict], Optional[bool]]) -> int:
+        file_ids = list(file_ids)
+        updated = []
+
+        def apply(batch):
+            for file_id in file_ids:
+                record = copy.deepcopy(batch.get(file_id))
+                if record is None or mutator(record) is False:
+                    continue
+                batch.upsert(record)
+                updated.append(file_id)
+            return bool(updated)
+
+        if not file_ids:
+            return 0
+        return len(updated) if self._journal_committer.submit(apply) else -1
+
+    def save_all(self, queue: Dict[str, Dict]) -> bool:
+        """Full replace - written straight to a new snapshot"""
+        return self.compact(replacement=queue)
+
+    # ---- compaction ----
+
+    def compact(self, replacement: Optional[Dict[str, Dict]] = None) -> bool:
+        """Fold the journal into a fresh snapshot and archive the replayed journal"""
+        try:
+            with self.lock:
+                if replacement is None:
+                    state = self._read()
+                    self._replay_journal(state, 0)
+                else:
+                    state = replacement
+
+                # Atomic snapshot replace; a crash before the journal is rotated
+                # only means the (idempotent) entries get replayed again
+                atomic_write_json(self.queue_file, state, indent=2)
+                get_json_cache().invalidate(self.queue_file)
+
+                if os.path.exists(self.journal_file):
+                    os.makedirs(self.history_dir, exist_ok=True)
+                    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                    os.replace(self.journal_file,
+                               os.path.join(self.history_dir, f"{self.history_prefix}.{stamp}.jsonl"))
+
+                with self._state_lock:
+                    self._state = copy.deepcopy(state)
+                    self._snapshot_sig = self._file_sig(self.queue_file)
+                    self._journal_offset = 0
+                print(f"[QUEUE_JOURNAL] Compacted queue snapshot ({len(state)} records)")
+                return True
+        except LockTimeoutError:
+            print("[QUEUE_JOURNAL] Could not acquire lock for compaction")
+        except Exception as e:
+            print(f"[QUEUE_JOURNAL] Error compacting journal: {e}")
+        return False
+
+    def needs_compaction(self) -> bool:
+        """Journal too large, or holding entries older than COMPACT_MAX_AGE"""
+        sig = self._file_sig(self.journal_file)
+        if not sig or sig[1] == 0:
+            return False
+        if sig[1] >= self.COMPACT_MAX_BYTES:
+            return True
+        snapshot_sig = self._file_sig(self.queue_file)
+        snapshot_mtime = snapshot_sig[0] if snapshot_sig else 0
+        return time.time() - snapshot_mtime >= self.COMPACT_MAX_AGE
+
+    def start_compactor(self):
+        """Start the background compaction thread (idempotent)"""
+        if self._compactor_thread and self._compactor_thread.is_alive():
+            return
+        self._compactor_stop.clear()
+
+        def run():
+            while not self._compactor_stop.wait(self.COMPACT_CHECK_INTERVAL):
+                try:
+                    if self.needs_compaction():
+                        self.compact()
+                except Exception as e:
+                    print(f"[QUEUE_JOURNAL] Compactor error: {e}")
+
+        self._compactor_thread = threading.Thread(target=run, name="QueueJournalCompactor", daemon=True)
+        self._compactor_thread.start()
+
+    def stop_compactor(self):
+        self._compactor_stop.set()
+
+
+class SqliteQueueStore(ApprovalQueueStore):
+    """Row-per-file backend with indexed lookups (SQLite; rollback journal on network paths, WAL locally)"""
+
+    backend_name = "sqlite"
+
+    def __init__(self, db_file: str = None, legacy_json_file: str = None):
+        self.db_file = db_file or os.path.join(DATA_PATHS.approvals_dir, "file_approvals.db")
+        self.legacy_json_file = legacy_json_file or DATA_PATHS.file_approvals_file
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+        self._init_schema()
+        self._import_legacy_json()
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)
+            if self._is_network_path(self.db_file):
+                # WAL's shared-memory index cannot be shared between client PCs
+                conn.execute("PRAGMA journal_mode=DELETE")
+                conn.execute("PRAGMA synchronous=FULL")
+            else:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _is_network_path(path: str) -> bool:
+        """True for UNC paths and (on Windows) files on mapped network drives"""
+        if path.startswith(("\\\\", "//")):
+            return True
+        if os.name == 'nt':
+            drive = os.path.splitdrive(os.path.abspath(path))[0]
+            if drive:
+                import ctypes
+                return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == 4  # DRIVE_REMOTE
+        return False
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS approval_queue (
+                file_id TEXT PRIMARY KEY,
+                status TEXT,
+                user_team TEXT,
+                user_id TEXT,
+                submission_date TEXT,
+                data TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_status ON approval_queue(status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_team ON approval_queue(user_team)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_user ON approval_queue(user_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _import_legacy_json(self):
+        """One-time import of an existing file_approvals.json"""
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM store_meta WHERE key = 'legacy_json_imported'").fetchone():
+            return
+        try:
+            queue = {}
+            if os.path.exists(self.legacy_json_file):
+                with open(self.legacy_json_file, 'r', encoding='utf-8') as f:
+                    queue = json.load(f)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_rows(conn, list(queue.values()))
+                conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('legacy_json_imported', ?)",
+                             (str(time.time()),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"[QUEUE_STORE] Imported {len(queue)} records from {self.legacy_json_file}")
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error importing legacy queue: {e}")
+
+    @staticmethod
+    def _row_values(record: Dict) -> tuple:
+        return (
+            record["file_id"],
+            record.get("status", ""),
+            record.get("user_team", ""),
+            record.get("user_id", ""),
+            record.get("submission_date", ""),
+            json.dumps(record)
+        )
+
+    def _insert_rows(self, conn: sqlite3.Connection, records: List[Dict]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO approval_queue "
+            "(file_id, status, user_team, user_id, submission_date, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [self._row_values(record) for record in records if record.get("file_id")]
+        )
+
+    def _write(self, operation: Callable[[sqlite3.Connection], object]):
+        """Run operation inside an IMMEDIATE transaction"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load_all(self) -> Dict[str, Dict]:
+        try:
+            rows = self._connect().execute("SELECT file_id, data FROM approval_queue").fetchall()
+            return {file_id: json.loads(data) for file_id, data in rows}
+        except Exception as e:
+            print(f"Error loading global queue: {e}")
+            return {}
+
+    def save_all(self, queue: Dict[str, Dict]) -> bool:
+        try:
+            def replace(conn):
+                conn.execute("DELETE FROM approval_queue")
+                self._insert_rows(conn, list(queue.values()))
+            self._write(replace)
+            return True
+        except Exception as e:
+            print(f"Error saving global queue: {e}")
+            return False
+
+    def get_record(self, file_id: str) -> Optional[Dict]:
+        try:
+            row = self._connect().execute(
+                "SELECT data FROM approval_queue WHERE file_id = ?", (file_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error reading record {file_id}: {e}")
+            return None
+
+    def upsert_records(self, records: List[Dict]) -> bool:
+        try:
+            self._write(lambda conn: self._insert_rows(conn, records))
+            return True
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error upserting records: {e}")
+            return False
+
+    def delete_records(self, file_ids: List[str]) -> int:
+        try:
+            def remove(conn):
+                cursor = conn.executemany("DELETE FROM approval_queue WHERE file_id = ?",
+                                          [(file_id,) for file_id in file_ids])
+                return cursor.rowcount
+            return self._write(remove)
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error deleting records: {e}")
+            return -1
+
+    def update_record(self, file_id: str, mutator: Callable[[Dict], Optional[bool]]) -> Optional[Dict]:
+        try:
+            def apply(conn):
+                row = conn.execute("SELECT data FROM approval_queue WHERE file_id = ?", (file_id,)).fetchone()
+                if not row:
+                    return None
+                record = json.loads(row[0])
+                if mutator(record) is False:
+                    return None
+                self._insert_rows(conn, [record])
+                return record
+            return self._write(apply)
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error updating record {file_id}: {e}")
+            return None
+
+    def query(self, status: FilterValue = None, user_team: FilterValue = None,
+              user_id: FilterValue = None) -> List[Dict]:
+        clauses = []
+        params = []
+        filters = {"status": status, "user_team": user_team, "user_id": user_id}
+        for column in INDEXED_FIELDS:
+            values = _as_filter_set(filters[column])
+            if values is None:
+                continue
+            if not values:
+                return []
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(sorted(values))
+
+        sql = "SELECT data FROM approval_queue"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        try:
+            return [json.loads(row[0]) for row in self._connect().execute(sql, params).fetchall()]
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error querying queue: {e}")
+            return []
+
+    def get_records(self, file_ids: Iterable[str]) -> Dict[str, Dict]:
+        file_ids = list(dict.fromkeys(file_ids))
+        if not file_ids:
+            return {}
+        try:
+            conn = self._connect()
+            records = {}
+            # Stay well below SQLITE_MAX_VARIABLE_NUMBER
+            for start in range(0, len(file_ids), 500):
+                chunk = file_ids[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT file_id, data FROM approval_queue WHERE file_id IN ({', '.join('?' for _ in chunk)})",
+                    chunk).fetchall()
+                records.update({file_id: json.loads(data) for file_id, data in rows})
+            return records
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error reading records: {e}")
+            return {}
+
+    def commit_batch(self, upserts: List[Dict] = None, deletes: List[str] = None,
+                     updates: List[Dict] = None) -> bool:
+        upserts = upserts or []
+        deletes = deletes or []
+        updates = updates or []
+        if not upserts and not deletes and not updates:
+            return True
+        try:
+            def apply(conn):
+                self._insert_rows(conn, upserts)
+                self._insert_rows(conn, [
+                    record for record in updates
+                    if conn.execute("SELECT 1 FROM approval_queue WHERE file_id = ?",
+                                    (record["file_id"],)).fetchone()
+                ])
+                conn.executemany("DELETE FROM approval_queue WHERE file_id = ?",
+                                 [(file_id,) for file_id in deletes])
+            self._write(apply)
+            return True
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error committing batch: {e}")
+            return False
+
+    def update_records(self, file_ids: Iterable[str], mutator: Callable[[Dict], Optional[bool]]) -> int:
+        file_ids = list(file_ids)
+        if not file_ids:
+            return 0
+        try:
+            def apply(conn):
+                updated = []
+                for file_id in file_ids:
+                    row = conn.execute("SELECT data FROM approval_queue WHERE file_id = ?", (file_id,)).fetchone()
+                    if not row:
+                        continue
+                    record = json.loads(row[0])
+                    if mutator(record) is False:
+                        continue
+                    updated.append(record)
+                self._insert_rows(conn, updated)
+                return len(updated)
+            return self._write(apply)
+        except Exception as e:
+            print(f"[QUEUE_STORE] Error updating records: {e}")
+            return -1
+
+
+# Global store instance
+_approval_queue_store = None
+_store_lock = threading.Lock()
+
+
+def get_approval_queue_store() -> ApprovalQueueStore:
+    """Get the configured approval queue store (singleton)"""
+    global _approval_queue_store
+    if _approval_queue_store is None:
+        with _store_lock:
+            if _approval_queue_store is None:
+                backend = "json"
+                try:
+                    from utils.config_loader import get_config
+                    backend = str(get_config().get_config_value("approval_queue_backend", "json")).lower()
+                except Exception as e:
+                    print(f"[QUEUE_STORE] Could not read backend config: {e}")
+
+                if backend == "sqlite":
+                    try:
+                        _approval_queue_store = SqliteQueueStore()
+                    except Exception as e:
+                        print(f"[QUEUE_STORE] SQLite backend unavailable, using JSON: {e}")
+                elif backend == "journal":
+                    _approval_queue_store = JournaledQueueStore()
+                    _approval_queue_store.start_compactor()
+
+                if _approval_queue_store is None:
+                    _approval_queue_store = JsonQueueStore()
+                print(f"[QUEUE_STORE] Using {_approval_queue_store.backend_name} backend")
+    return _approval_queue_store
@@ -4,13 +4,21 @@ import uuid
 import time
 import threading
 from datetime import datetime
-from typing import List, Dict, Optional, Callable, Tuple
+from typing import List, Dict, Iterable, Optional, Callable, Tuple
 from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from utils.logger import log_action
+from utils.log_writer import flush_logs
 from utils.session_logger import log_activity
+from utils.tracing import span
 from utils.path_config import DATA_PATHS
-from services.enhanced_file_movement_service import get_enhanced_file_movement_service
+from services.enhanced_file_movement_service import get_enhanced_file_movement_service, MoveSteps
+from services.approval_archive import get_approval_archive
+from services.approval_queue_store import get_approval_queue_store
+from services.blob_store import get_blob_store
+from services.notification_log import get_notification_log
+from services.change_feed import publish_event
+from services.comment_store import get_comment_store
 
 class ApprovalStatus(Enum):
     """Approval status enumeration"""
@@ -146,26 +154,13 @@ class ApprovalFileService:
             return False
     
     def load_notifications(self) -> List[Dict]:
-        """Load user's approval notifications"""
+        """Load user's approval notifications (newest first, each with its 'read' flag)"""
         try:
-            if os.path.exists(self.notifications_file):
-                with open(self.notifications_file, 'r') as f:
-                    notifications = json.load(f)
-                    return notifications if isinstance(notifications, list) else []
+            return get_notification_log(self.username).get_notifications()
         except Exception as e:
             print(f"Error loading notifications: {e}")
         return []
     
-    def save_notifications(self, notifications: List[Dict]) -> bool:
-        """Save user's approval notifications"""
-        try:
-            with open(self.notifications_file, 'w') as f:
-                json.dump(notifications, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error saving notifications: {e}")
-            return False
-    
     def get_uploaded_files(self) -> List[Dict]:
         """🚨 ENHANCED: Get all files including processed ones that have been moved/deleted from uploads"""
         files = []
@@ -338,77 +333,35 @@ class ApprovalFileService:
             print(f"Async logging error: {e}")
     
     def add_to_global_queue(self, filename: str, file_id: str, description: str, tags: List[str]):
-        """Add file to global approval queue with file locking"""
+        """Add file to global approval queue (single-record upsert)"""
         try:
-            # Ensure global approvals directory exists on network
-            global_approvals_dir = DATA_PATHS.approvals_dir
-            os.makedirs(global_approvals_dir, exist_ok=True)
-            
-            global_queue_file = DATA_PATHS.file_approvals_file
+            # Get file info
+            file_path = os.path.join(self.user_folder, filename)
+            file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
             
-            # Simple file locking mechanism
-            lock_file = f"{global_queue_file}.lock"
-            max_attempts = 10
+            # Add new submission with correct initial status
+            submission_data = {
+                "file_id": file_id,
+                "original_filename": filename,
+                "user_id": self.username,
+                "user_team": self.user_team,
+                "file_size": file_size,
+                "submission_date": datetime.now().isoformat(),
+                "status": "pending_team_leader",  # Start with team leader review
+                "description": description,
+                "tags": tags,
+                "admin_comments": [],
+                "team_leader_comments": [],
+                "status_history": [{
+                    "status": "pending_team_leader",
+                    "timestamp": datetime.now().isoformat(),
+                    "comment": "File submitted for team leader review"
+                }],
+                "file_path": file_path  # Store path for admin access
+            }
             
-            for attempt in range(max_attempts):
-                try:
-                    if not os.path.exists(lock_file):
-                        # Create lock
-                        with open(lock_file, 'w') as f:
-                            f.write(str(time.time()))
-                        
-                        # Load existing queue
-                        queue = {}
-                        if os.path.exists(global_queue_file):
-                            with open(global_queue_file, 'r') as f:
-                                queue = json.load(f)
-                        
-                        # Get file info
-                        file_path = os.path.join(self.user_folder, filename)
-                        file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                        
-                        # Add new submission with correct initial status
-                        submission_data = {
-                            "file_id": file_id,
-                            "original_filename": filename,
-                            "user_id": self.username,
-                            "user_team": self.user_team,
-                            "file_size": file_size,
-                            "submission_date": datetime.now().isoformat(),
-                            "status": "pending_team_leader",  # Start with team leader review
-                            "description": description,
-                            "tags": tags,
-                            "admin_comments": [],
-                            "team_leader_comments": [],
-                            "status_history": [{
-                                "status": "pending_team_leader",
-                                "timestamp": datetime.now().isoformat(),
-                                "comment": "File submitted for team leader review"
-                            }],
-                            "file_path": file_path  # Store path for admin access
-                        }
-                        
-                        queue[file_id] = submission_data
-                        
-                        # Save updated queue
-                        with open(global_queue_file, 'w') as f:
-                            json.dump(queue, f, indent=2)
-                        
-                        # Remove lock
-                        os.remove(lock_file)
-                        break
-                        
-                except Exception:
-                    # Wait before retry
-                    time.sleep(0.05)
-                    continue
-                finally:
-                    # Clean up lock if it exists
-                    try:
-                        if os.path.exists(lock_file):
-                            os.remove(lock_file)
-                    except:
-                        pass
+            if not get_approval_queue_store().upsert_record(submission_data):
+                print(f"Error adding to global queue: could not store {file_id}")
                         
         except Exception as e:
             print(f"Error adding to global queue: {e}")
@@ -471,49 +424,9 @@ class ApprovalFileService:
             print(f"Logging error: {e}")
     
     def remove_from_global_queue(self, file_id: str):
-        """Remove submission from global approval queue with file locking"""
+        """Remove submission from global approval queue"""
         try:
-            global_queue_file = DATA_PATHS.file_approvals_file
-            if not os.path.exists(global_queue_file):
-                return
-            
-            # File locking for thread safety
-            lock_file = f"{global_queue_file}.lock"
-            max_attempts = 10
-            
-            for attempt in range(max_attempts):
-                try:
-                    if not os.path.exists(lock_file):
-                        # Create lock
-                        with open(lock_file, 'w') as f:
-                            f.write(str(time.time()))
-                        
-                        # Read, modify, write
-                        with open(global_queue_file, 'r') as f:
-                            queue = json.load(f)
-                        
-                        if file_id in queue:
-                            del queue[file_id]
-                            
-                            with open(global_queue_file, 'w') as f:
-                                json.dump(queue, f, indent=2)
-                        
-                        # Remove lock
-                        os.remove(lock_file)
-                        break
-                        
-                except Exception:
-                    # Wait before retry
-                    time.sleep(0.05)
-                    continue
-                finally:
-                    # Clean up lock if it exists
-                    try:
-                        if os.path.exists(lock_file):
-                            os.remove(lock_file)
-                    except:
-                        pass
-                        
+            get_approval_queue_store().delete_record(file_id)
         except Exception as e:
             print(f"Error removing from global queue: {e}")
     
@@ -559,102 +472,125 @@ class ApprovalFileService:
     
     def update_file_status(self, filename: str, new_status: str, admin_comment: str = "", admin_id: str = ""):
         """🚨 ENHANCED: Update file status and preserve original file info for processed files"""
+        return self.update_file_statuses([{
+            "filename": filename,
+            "new_status": new_status,
+            "admin_comment": admin_comment,
+            "admin_id": admin_id
+        }]).get(filename, False)
+    
+    def update_file_statuses(self, updates: List[Dict]) -> Dict[str, bool]:
+        """
+        Update several files with one status-file write and one notifications write.
+        Each update is a dict with filename, new_status, admin_comment and admin_id.
+        Returns {filename: success}.
+        """
+        results = {update["filename"]: False for update in updates}
         try:
             approval_data = self.load_approval_status()
+            notifications = []
             
-            if filename in approval_data:
-                old_status = approval_data[filename].get("status", "unknown")
-                
-                # 🚨 CRITICAL: Preserve original file information if file is being processed
-                if new_status in ["approved", "rejected"] and old_status not in ["approved", "rejected"]:
-                    # File is being processed - preserve original file info
-                    file_path = os.path.join(self.user_folder, filename)
-                    if os.path.exists(file_path):
-                        try:
-                            stat = os.stat(file_path)
-                            approval_data[filename]["original_file_size"] = stat.st_size
-                            approval_data[filename]["original_upload_date"] = datetime.fromtimestamp(stat.st_mtime).isoformat()
-                            print(f"[INFO] Preserved original file info for {filename} before processing")
-                        except Exception as e:
-                            print(f"[WARNING] Could not preserve original file info for {filename}: {e}")
-                
-                approval_data[filename]["status"] = new_status
-                approval_data[filename]["last_updated"] = datetime.now().isoformat()
-                
-                # Add admin comment if provided
-                if admin_comment:
-                    if "admin_comments" not in approval_data[filename]:
-                        approval_data[filename]["admin_comments"] = []
-                    
-                    approval_data[filename]["admin_comments"].append({
-                        "admin_id": admin_id,
-                        "comment": admin_comment,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                
-                # Add to status history
-                if "status_history" not in approval_data[filename]:
-                    approval_data[filename]["status_history"] = []
-                
-                approval_data[filename]["status_history"].append({
-                    "status": new_status,
-                    "timestamp": datetime.now().isoformat(),
-                    "admin_id": admin_id,
-                    "comment": admin_comment
-                })
-                
+            for update in updates:
+                notification = self._apply_status_update(
+                    approval_data, update["filename"], update["new_status"],
+                    update.get("admin_comment", ""), update.get("admin_id", ""))
+                if notification:
+                    notifications.append(notification)
+                    results[update["filename"]] = True
+            
+            if notifications:
                 self.save_approval_status(approval_data)
-                
-                # Add notification
-                self.add_notification({
-                    "type": "status_update",
-                    "filename": filename,
-                    "old_status": old_status,
-                    "new_status": new_status,
-                    "admin_id": admin_id,
-                    "comment": admin_comment,
-                    "timestamp": datetime.now().isoformat(),
-                    "read": False
-                })
-                
-                print(f"[SUCCESS] Updated file status: {filename} -> {old_status} to {new_status}")
-                return True
+                self.add_notifications(notifications)
         except Exception as e:
             print(f"[ERROR] Error updating file status: {e}")
             import traceback
             traceback.print_exc()
-        return False
+            return {filename: False for filename in results}
+        return results
+    
+    def _apply_status_update(self, approval_data: Dict, filename: str, new_status: str,
+                             admin_comment: str, admin_id: str) -> Optional[Dict]:
+        """Apply one status change to loaded approval data, returns the notification to send"""
+        if filename not in approval_data:
+            return None
+        
+        old_status = approval_data[filename].get("status", "unknown")
+        
+        # 🚨 CRITICAL: Preserve original file information if file is being processed
+        if new_status in ["approved", "rejected"] and old_status not in ["approved", "rejected"]:
+            # File is being processed - preserve original file info
+            file_path = os.path.join(self.user_folder, filename)
+            if os.path.exists(file_path):
+                try:
+                    stat = os.stat(file_path)
+                    approval_data[filename]["original_file_size"] = stat.st_size
+                    approval_data[filename]["original_upload_date"] = datetime.fromtimestamp(stat.st_mtime).isoformat()
+                    print(f"[INFO] Preserved original file info for {filename} before processing")
+                except Exception as e:
+                    print(f"[WARNING] Could not preserve original file info for {filename}: {e}")
+        
+        approval_data[filename]["status"] = new_status
+        approval_data[filename]["last_updated"] = datetime.now().isoformat()
+        
+        # Add admin comment if provided
+        if admin_comment:
+            if "admin_comments" not in approval_data[filename]:
+                approval_data[filename]["admin_comments"] = []
+            
+            approval_data[filename]["admin_comments"].append({
+                "admin_id": admin_id,
+                "comment": admin_comment,
+                "timestamp": datetime.now().isoformat()
+            })
+        
+        # Add to status history
+        if "status_history" not in approval_data[filename]:
+            approval_data[filename]["status_history"] = []
+        
+        approval_data[filename]["status_history"].append({
+            "status": new_status,
+            "timestamp": datetime.now().isoformat(),
+            "admin_id": admin_id,
+            "comment": admin_comment
+        })
+        
+        print(f"[SUCCESS] Updated file status: {filename} -> {old_status} to {new_status}")
+        return {
+            "type": "status_update",
+            "filename": filename,
+            "old_status": old_status,
+            "new_status": new_status,
+            "admin_id": admin_id,
+            "comment": admin_comment,
+            "timestamp": datetime.now().isoformat(),
+            "read": False
+        }
     
     def add_notification(self, notification: Dict):
         """Add notification with better performance"""
+        self.add_notifications([notification])
+    
+    def add_notifications(self, new_notifications: List[Dict]):
+        """Add several notifications with a single log append (newest last in the input)"""
         try:
-            notifications = self.load_notifications()
-            notifications.insert(0, notification)
-            
-            # Keep only last 50 notifications for better performance
-            notifications = notifications[:50]
-            
-            self.save_notifications(notifications)
+            get_notification_log(self.username).append(new_notifications)
         except Exception as e:
             print(f"Error adding notification: {e}")
     
     def mark_notification_read(self, notification_index: int):
-        """Mark notification as read"""
+        """Mark notification as read (index into load_notifications)"""
         try:
             notifications = self.load_notifications()
             if 0 <= notification_index < len(notifications):
-                notifications[notification_index]["read"] = True
-                self.save_notifications(notifications)
-                return True
+                return get_notification_log(self.username).mark_read([notifications[notification_index]["id"]])
         except Exception as e:
             print(f"Error marking notification as read: {e}")
         return False
     
     def get_unread_notification_count(self) -> int:
-        """Get unread notification count (optimized)"""
+        """Get unread notification count (counter read, the log is not parsed)"""
         try:
-            notifications = self.load_notifications()
-            return sum(1 for n in notifications if not n.get("read", False))
+            return get_notification_log(self.username).get_unread_count()
         except:
             return 0
     
@@ -738,6 +674,7 @@ class ApprovalFileService:
             self.executor.shutdown(wait=False)
         except:
             pass
+        flush_logs()
 
 
 class FileApprovalService:
@@ -745,79 +682,35 @@ class FileApprovalService:
     
     def __init__(self):
         self.global_queue_file = DATA_PATHS.file_approvals_file
-        self.comments_file = DATA_PATHS.comments_file
         os.makedirs(DATA_PATHS.approvals_dir, exist_ok=True)
+        self.queue_store = get_approval_queue_store()
     
     def load_global_queue(self) -> Dict:
         """Load global approval queue"""
-        try:
-            if os.path.exists(self.global_queue_file):
-                with open(self.global_queue_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading global queue: {e}")
-        return {}
+        return self.queue_store.load_all()
     
     def save_global_queue(self, queue: Dict) -> bool:
-        """Save global approval queue"""
-        try:
-            with open(self.global_queue_file, 'w') as f:
-                json.dump(queue, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error saving global queue: {e}")
-            return False
-    
-    def load_comments(self) -> Dict:
-        """Load comments data"""
-        try:
-            if os.path.exists(self.comments_file):
-                with open(self.comments_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading comments: {e}")
-        return {}
-    
-    def save_comments(self, comments: Dict) -> bool:
-        """Save comments data"""
-        try:
-            with open(self.comments_file, 'w') as f:
-                json.dump(comments, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error saving comments: {e}")
-            return False
+        """Save global approval queue (full replace - prefer per-record store methods)"""
+        return self.queue_store.save_all(queue)
     
     def get_pending_files_by_team(self, team: str, user_role: str = 'USER') -> List[Dict]:
         """Get pending files for a specific team based on user role"""
-        queue = self.load_global_queue()
-        pending_files = []
-        
-        for file_id, file_data in queue.items():
-            file_status = file_data.get('status')
-            # Filter files based on role and status
-            if user_role == 'ADMIN':
-                # Admin sees files pending admin approval
-                if file_status == 'pending_admin':
-                    pending_files.append(file_data)
-            elif user_role == 'TEAM_LEADER':
-                # Team leader sees files pending team leader approval from their team
-                if file_status == 'pending_team_leader' and file_data.get('user_team') == team:
-                    pending_files.append(file_data)
+        # Filter files based on role and status (indexed lookup in the queue store)
+        if user_role == 'ADMIN':
+            # Admin sees files pending admin approval
+            return self.queue_store.query(status='pending_admin')
+        elif user_role == 'TEAM_LEADER':
+            # Team leader sees files pending team leader approval from their team
+            return self.queue_store.query(status='pending_team_leader', user_team=team)
         
-        return pending_files
+        return []
     
     def get_all_files_by_team(self, team: str, user_role: str = 'USER') -> List[Dict]:
         """Get all files for a specific team based on user role"""
-        queue = self.load_global_queue()
-        team_files = []
-        
-        for file_id, file_data in queue.items():
-            # ADMIN can see all files, TEAM_LEADER only their team files
-            if user_role == 'ADMIN' or file_data.get('user_team') == team:
-                team_files.append(file_data)
-        
-        return team_files
+        # ADMIN can see all files, TEAM_LEADER only their team files
+        if user_role == 'ADMIN':
+            return list(self.load_global_queue().values())
+        return self.queue_store.query(user_team=team)
     
     def get_approved_files_by_team(self, team: str, user_role: str = 'USER') -> List[Dict]:
         """Get approved files for a specific team - Note: approved files are moved out of queue"""
@@ -832,15 +725,70 @@ class FileApprovalService:
         return []
     
     def approve_file(self, file_id: str, admin_user: str) -> bool:
-        """🚨 ENHANCED: Approve a file - moves it to project directory AND cleans up from user uploads"""
+        """🚨 ENHANCED: Approve a file - queues the move to the project directory and returns immediately"""
+        with span("approve_file", "approval", file_id=file_id, admin=admin_user):
+            return self.approve_files([file_id], admin_user)[file_id]['success']
+    
+    def approve_files(self, file_ids: List[str], admin_user: str) -> Dict[str, Dict]:
+        """
+        Approve several files at once.
+        
+        Queues one persistent approval job per file and returns immediately; the
+        approval job workers move the files and apply the side effects
+        (see services/approval_job_service.py).
+        Returns {file_id: {'success': bool, 'message': str, 'job_id': str}}.
+        """
+        from services.approval_job_service import get_approval_job_service
+        with span("enqueue_approvals", "approval", files=len(file_ids)):
+            job_ids = get_approval_job_service().enqueue_approvals(file_ids, admin_user)
+        
+        results = {}
+        for file_id in file_ids:
+            job_id = job_ids.get(file_id)
+            if job_id:
+                log_action(admin_user, f"Queued approval for file {file_id} (job {job_id})")
+                results[file_id] = {'success': True, 'message': 'Queued for approval', 'job_id': job_id}
+            else:
+                results[file_id] = {'success': False, 'message': 'File not found in approval queue', 'job_id': None}
+        return results
+    
+    def _execute_approvals(self, file_ids: List[str], admin_user: str, max_workers: int = 4,
+                           retry_failed_moves: Iterable[str] = (),
+                           move_steps: Dict[str, MoveSteps] = None,
+                           progress: Callable[[str, int, int], None] = None) -> Dict[str, Dict]:
+        """
+        Carry out approvals (run by the approval job workers).
+        
+        The queue is read once and written once for the whole batch, file moves
+        run in parallel, and user status / notification writes are grouped per user.
+        Files in retry_failed_moves whose move fails are left untouched so the job
+        can retry; other failed moves stay in the queue as approved with move_error.
+        move_steps holds the persisted step markers of each file's job: completed
+        steps are skipped, so a batch interrupted by a crash can simply be re-run.
+        progress(file_id, bytes_done, total_bytes) is called while files are copied.
+        Returns {file_id: {'success': bool, 'moved': bool, 'retry': bool, 'message': str}}.
+        """
+        retry_failed_moves = set(retry_failed_moves)
+        move_steps = move_steps or {}
+        results = {file_id: {'success': False, 'moved': False, 'retry': False,
+                             'message': 'File not found in approval queue'}
+                   for file_id in file_ids}
         try:
-            queue = self.load_global_queue()
+            with span("queue_load", "approval", files=len(file_ids)) as load_span:
+                records = self.queue_store.get_records(file_ids)
+                load_span.set_tag("records", len(records))
             
-            if file_id in queue:
-                file_data = queue[file_id]
-                original_filename = file_data.get('original_filename')
-                user_id = file_data.get('user_id')
-                
+            # Moved by an earlier run that stopped right after its queue write
+            for file_id in file_ids:
+                steps = move_steps.get(file_id)
+                if file_id not in records and steps and steps.done(MoveSteps.SOURCE_REMOVED):
+                    steps.mark(MoveSteps.QUEUE_UPDATED)
+                    results[file_id] = {'success': True, 'moved': True, 'retry': False,
+                                        'message': 'Move already completed'}
+            if not records:
+                return results
+            
+            for file_data in records.values():
                 file_data['status'] = ApprovalStatus.APPROVED.value
                 file_data['approved_by'] = admin_user
                 file_data['approved_date'] = datetime.now().isoformat()
@@ -855,12 +803,18 @@ class FileApprovalService:
                     'admin_id': admin_user,
                     'comment': 'File approved by admin - processing physical file movement'
                 })
-                
-                # 🚨 CRITICAL: Move approved file from user uploads to project directory
-                # This will DELETE the file from user uploads folder after successful move
-                file_movement_service = get_enhanced_file_movement_service()
-                move_success, move_message, new_file_path = file_movement_service.move_approved_file_with_access_management(
-                    file_data, admin_user)
+            
+            # 🚨 CRITICAL: Move approved files from user uploads to project directory
+            # This will DELETE each file from user uploads folder after successful move
+            moves = self._move_approved_files(list(records.values()), admin_user, max_workers, move_steps, progress)
+            
+            moved_files = []
+            failed_moves = []
+            status_updates = []
+            for file_id, file_data in records.items():
+                original_filename = file_data.get('original_filename')
+                user_id = file_data.get('user_id')
+                move_success, move_message, new_file_path = moves[file_id]
                 
                 if move_success:
                     # Update file path in data
@@ -869,54 +823,179 @@ class FileApprovalService:
                     file_data['move_message'] = move_message
                     file_data['file_cleaned_from_uploads'] = True
                     
-                    # 🚨 CRITICAL: Update user's approval status with new file location info
-                    self._update_user_status(file_data, ApprovalStatus.APPROVED.value, admin_user, 
-                                           f"File approved and moved to project directory: {move_message}. Original file removed from uploads.")
-                    
-                    # Archive the approved file before removing from queue
-                    self._archive_file(file_data, 'approved')
-                    
-                    # Remove from global queue (approved files are processed)
-                    del queue[file_id]
+                    if not self._step_done(move_steps, file_id, MoveSteps.USER_NOTIFIED):
+                        status_updates.append((file_data, ApprovalStatus.APPROVED.value,
+                                               f"File approved and moved to project directory: {move_message}. Original file removed from uploads."))
+                    moved_files.append(file_data)
                     
                     log_action(admin_user, f"APPROVED and MOVED file: {original_filename} from user {user_id} uploads to project directory - {move_message}")
                     print(f"[APPROVAL_SUCCESS] File {original_filename} approved and moved to project, cleaned from user uploads")
-                    
+                    file_data.pop('approval_job', None)
+                    results[file_id] = {'success': True, 'moved': True, 'retry': False, 'message': move_message}
+                elif file_id in retry_failed_moves:
+                    # Leave the queue record as it is - the approval job retries the move.
+                    # Give back the reserved target name meanwhile so no placeholder sits in the
+                    # project folder through the backoff; the next attempt plans and reserves again.
+                    self._rollback_move(move_steps, file_id, original_filename)
+                    print(f"[WARNING] Move failed for {original_filename}, will retry: {move_message}")
+                    results[file_id] = {'success': False, 'moved': False, 'retry': True, 'message': move_message}
                 else:
+                    # No more retries - give back the target name the move reserved
+                    self._rollback_move(move_steps, file_id, original_filename)
+                    
                     # File approval succeeded but move failed - keep file in user uploads for now
                     file_data['moved_to_project'] = False
                     file_data['move_error'] = move_message
                     file_data['file_cleaned_from_uploads'] = False
                     
-                    # Update user's approval status (still approved, but file move failed)
-                    self._update_user_status(file_data, ApprovalStatus.APPROVED.value, admin_user, 
-                                           f"File approved but move failed: {move_message}. File remains in your uploads folder until issue is resolved.")
+                    # Still approved, but file move failed
+                    status_updates.append((file_data, ApprovalStatus.APPROVED.value,
+                                           f"File approved but move failed: {move_message}. File remains in your uploads folder until issue is resolved."))
                     
                     # Keep in queue with approved status for manual handling
+                    failed_moves.append(file_data)
                     print(f"[WARNING] File {original_filename} approved but move failed: {move_message}")
                     log_action(admin_user, f"Approved file with move error: {original_filename} - {move_message}")
-                
-                return self.save_global_queue(queue)
+                    results[file_id] = {'success': True, 'moved': False, 'retry': False,
+                                        'message': f"Approved but move failed: {move_message}"}
+            
+            # 🚨 CRITICAL: Update users' approval status with new file location info
+            with span("update_user_statuses", "approval", updates=len(status_updates)):
+                self._update_user_statuses(status_updates, admin_user)
+            self._mark_steps(move_steps, [f['file_id'] for f in moved_files], MoveSteps.USER_NOTIFIED)
+            
+            # Archive the approved files before removing them from the queue
+            # (archive readers keep the newest record per file_id, so repeating this after a crash is harmless)
+            with span("archive", "approval", files=len(moved_files)):
+                archived = self._archive_files(moved_files, 'approved')
+            unarchived = []
+            if archived:
+                self._mark_steps(move_steps, [f['file_id'] for f in moved_files], MoveSteps.ARCHIVED)
+            else:
+                # Keep them in the queue until they are in the archive - the retry archives them again
+                for file_data in moved_files:
+                    results[file_data['file_id']] = {'success': False, 'moved': False, 'retry': True,
+                                                     'message': 'Failed to archive approved file'}
+                unarchived, moved_files = moved_files, []
+            
+            # One queue write: processed files leave the queue, failed moves stay as approved
+            # (updates, not upserts - a record removed meanwhile must not come back)
+            with span("queue_commit", "approval", updates=len(failed_moves), deletes=len(moved_files)):
+                committed = self.queue_store.commit_batch(updates=failed_moves,
+                                                          deletes=[f['file_id'] for f in moved_files])
+            if not committed:
+                # The moved files are already in the project folder - only the queue write is
+                # missing, and the retry resumes from the step markers to finish it
+                for file_data in moved_files + unarchived:
+                    results[file_data['file_id']] = {'success': False, 'moved': False, 'retry': True,
+                                                     'message': 'Failed to update approval queue'}
+                for file_data in failed_moves:
+                    results[file_data['file_id']] = {'success': False, 'moved': False, 'retry': False,
+                                                     'message': 'Failed to update approval queue'}
+            else:
+                self._mark_steps(move_steps, [f['file_id'] for f in moved_files], MoveSteps.QUEUE_UPDATED)
             
         except Exception as e:
-            print(f"[ERROR] Error approving file {file_id}: {e}")
+            print(f"[ERROR] Error approving files {file_ids}: {e}")
             import traceback
             traceback.print_exc()
+            for file_id in file_ids:
+                if not results[file_id]['success']:
+                    self._rollback_move(move_steps, file_id, file_id)
+                    results[file_id].update(message=str(e), retry=True)
         
-        return False
+        return results
+    
+    @staticmethod
+    def _rollback_move(move_steps: Dict[str, MoveSteps], file_id: str, original_filename: str):
+        """Undo a failed move that never got past the copy (releases its reserved target name)"""
+        if file_id not in move_steps:
+            return
+        try:
+            get_enhanced_file_movement_service().rollback_approved_move(move_steps[file_id])
+        except Exception as e:
+            print(f"[WARNING] Could not roll back the move of {original_filename}: {e}")
+    
+    @staticmethod
+    def _step_done(move_steps: Dict[str, MoveSteps], file_id: str, step: str) -> bool:
+        steps = move_steps.get(file_id)
+        return bool(steps and steps.done(step))
+    
+    @staticmethod
+    def _mark_steps(move_steps: Dict[str, MoveSteps], file_ids: List[str], step: str):
+        for file_id in file_ids:
+            steps = move_steps.get(file_id)
+            if steps and not steps.done(step):
+                steps.mark(step)
+    
+    def _move_approved_files(self, files: List[Dict], admin_user: str, max_workers: int,
+                             move_steps: Dict[str, MoveSteps] = None,
+                             progress: Callable[[str, int, int], None] = None) -> Dict[str, Tuple[bool, str, Optional[str]]]:
+        """
+        Move approved files to the project directories in parallel.
+        Target names are reserved atomically by the filename allocator, so files
+        sharing an original filename can be moved at the same time.
+        """
+        file_movement_service = get_enhanced_file_movement_service()
+        workers = max(1, min(max_workers, len(files)))
+        
+        with span("move_files", "approval", files=len(files), workers=workers) as parent:
+            def move_one(file_data: Dict) -> Tuple[str, Tuple[bool, str, Optional[str]]]:
+                file_id = file_data['file_id']
+                file_progress = (lambda done, total: progress(file_id, done, total)) if progress else None
+                # Runs on a pool thread - attach to the batch span explicitly
+                with span("move_file", "approval", parent=parent, file_id=file_id,
+                          path=file_data.get('file_path'), size=file_data.get('file_size')) as move_span:
+                    try:
+                        outcome = file_movement_service.move_approved_file_with_access_management(
+                            file_data, admin_user, (move_steps or {}).get(file_id), file_progress)
+                    except Exception as e:
+                        outcome = (False, f"Error moving file: {e}", None)
+                    move_span.set_tags(success=outcome[0], target=outcome[2])
+                return file_id, outcome
+            
+            moves = {}
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                moves.update(executor.map(move_one, files))
+        return moves
     
     def reject_file(self, file_id: str, admin_user: str, reason: str, request_changes: bool = False) -> bool:
         """🚨 ENHANCED: Reject a file or request changes - deletes file from user uploads"""
+        with span("reject_file", "approval", file_id=file_id, admin=admin_user, request_changes=request_changes):
+            return self.reject_files([file_id], admin_user, reason, request_changes)[file_id]['success']
+    
+    def reject_files(self, file_ids: List[str], admin_user: str, reason: str,
+                     request_changes: bool = False) -> Dict[str, Dict]:
+        """
+        Reject several files (or request changes) at once.
+        
+        One queue read and one queue write for the whole batch; user status and
+        notification writes are grouped per user and the archive is written once.
+        Queued approval jobs of the files are cancelled first; files an approval
+        job is already moving are left alone and reported as failed.
+        Returns {file_id: {'success': bool, 'message': str}}.
+        """
+        results = {file_id: {'success': False, 'message': 'File not found in approval queue'}
+                   for file_id in file_ids}
         try:
-            queue = self.load_global_queue()
+            from services.approval_job_service import get_approval_job_service
+            busy = set(get_approval_job_service().cancel_approvals(file_ids, reason))
+            for file_id in busy:
+                results[file_id]['message'] = 'File is being approved and moved - it can no longer be rejected'
+            
+            with span("queue_load", "approval", files=len(file_ids)) as load_span:
+                records = self.queue_store.get_records([file_id for file_id in file_ids if file_id not in busy])
+                load_span.set_tag("records", len(records))
+            if not records:
+                return results
             
-            if file_id in queue:
-                file_data = queue[file_id]
+            status = ApprovalStatus.CHANGES_REQUESTED.value if request_changes else ApprovalStatus.REJECTED.value
+            status_updates = []
+            
+            for file_id, file_data in records.items():
                 original_filename = file_data.get('original_filename')
                 user_id = file_data.get('user_id')
                 
-                status = ApprovalStatus.CHANGES_REQUESTED.value if request_changes else ApprovalStatus.REJECTED.value
-                
                 file_data['status'] = status
                 file_data['rejected_by'] = admin_user
                 file_data['rejection_date'] = datetime.now().isoformat()
@@ -938,53 +1017,71 @@ class FileApprovalService:
                     # For changes requested, keep file in user uploads for resubmission
                     file_data['file_cleaned_from_uploads'] = False
                     
-                    # Update user's approval status (file remains in uploads for changes)
-                    self._update_user_status(file_data, status, admin_user, 
-                                           f"Changes requested: {reason}. File remains in your uploads folder for resubmission after making changes.")
+                    status_updates.append((file_data, status,
+                                           f"Changes requested: {reason}. File remains in your uploads folder for resubmission after making changes."))
                     
                     print(f"[CHANGES_REQUESTED] File {original_filename} kept in user uploads for resubmission")
                     log_action(admin_user, f"Requested changes for file: {original_filename} from user {user_id} - file kept in uploads")
+                    results[file_id] = {'success': True, 'message': 'Changes requested'}
                     
                 else:
                     # For rejected files, delete from user uploads
-                    file_cleanup_success, cleanup_message = self._delete_rejected_file_from_uploads(file_data, admin_user, reason)
+                    with span("delete_upload", "approval", file_id=file_id, path=file_data.get('file_path'),
+                              size=file_data.get('file_size')):
+                        file_cleanup_success, cleanup_message = self._delete_rejected_file_from_uploads(file_data, admin_user, reason)
                     
                     if file_cleanup_success:
                         file_data['file_cleaned_from_uploads'] = True
                         file_data['cleanup_message'] = cleanup_message
                         
-                        # Update user's approval status with file deletion info
-                        self._update_user_status(file_data, status, admin_user, 
-                                               f"File rejected: {reason}. File has been removed from your uploads folder.")
+                        status_updates.append((file_data, status,
+                                               f"File rejected: {reason}. File has been removed from your uploads folder."))
                         
                         print(f"[REJECTION_SUCCESS] File {original_filename} rejected and deleted from user uploads")
                         log_action(admin_user, f"REJECTED and DELETED file: {original_filename} from user {user_id} uploads - {reason}")
+                        results[file_id] = {'success': True, 'message': cleanup_message}
                         
                     else:
                         file_data['file_cleaned_from_uploads'] = False
                         file_data['cleanup_error'] = cleanup_message
                         
-                        # Update user's approval status (rejected but file deletion failed)
-                        self._update_user_status(file_data, status, admin_user, 
-                                               f"File rejected: {reason}. Warning: File deletion from uploads failed: {cleanup_message}")
+                        # Rejected but file deletion failed
+                        status_updates.append((file_data, status,
+                                               f"File rejected: {reason}. Warning: File deletion from uploads failed: {cleanup_message}"))
                         
                         print(f"[WARNING] File {original_filename} rejected but deletion from uploads failed: {cleanup_message}")
                         log_action(admin_user, f"Rejected file with cleanup error: {original_filename} - {cleanup_message}")
-                
-                # Archive the rejected file before removing from queue
-                self._archive_file(file_data, 'rejected_admin')
-                
-                # Remove from global queue
-                del queue[file_id]
-                
-                return self.save_global_queue(queue)
+                        results[file_id] = {'success': True, 'message': f"Rejected but cleanup failed: {cleanup_message}"}
+            
+            # Update users' approval status (grouped per user)
+            with span("update_user_statuses", "approval", updates=len(status_updates)):
+                self._update_user_statuses(status_updates, admin_user)
+            
+            # Archive the rejected files before removing them from the queue
+            with span("archive", "approval", files=len(records)):
+                archived = self._archive_files(list(records.values()), 'rejected_admin')
+            if not archived:
+                # Removing them now would lose the records - they stay queued for another try
+                for file_id in records:
+                    results[file_id] = {'success': False, 'message': 'Failed to archive rejected file'}
+                return results
+            
+            # Remove from global queue in one write
+            with span("queue_commit", "approval", deletes=len(records)):
+                committed = self.queue_store.commit_batch(deletes=list(records.keys()))
+            if not committed:
+                for file_id in records:
+                    results[file_id] = {'success': False, 'message': 'Failed to update approval queue'}
             
         except Exception as e:
-            print(f"[ERROR] Error rejecting file {file_id}: {e}")
+            print(f"[ERROR] Error rejecting files {file_ids}: {e}")
             import traceback
             traceback.print_exc()
+            for file_id in file_ids:
+                if not results[file_id]['success']:
+                    results[file_id]['message'] = str(e)
         
-        return False
+        return results
     
     def _delete_rejected_file_from_uploads(self, file_data: Dict, admin_user: str, reason: str) -> Tuple[bool, str]:
         """
@@ -1009,7 +1106,7 @@ class FileApprovalService:
                 return True, f"File {original_filename} already removed from uploads directory"
             
             # Delete the file
-            os.remove(current_file_path)
+            get_blob_store().remove(current_file_path)
             
             # Verify deletion
             if os.path.exists(current_file_path):
@@ -1039,18 +1136,20 @@ class FileApprovalService:
     def add_comment(self, file_id: str, admin_user: str, comment: str) -> bool:
         """Add comment to a file"""
         try:
-            comments = self.load_comments()
-            
-            if file_id not in comments:
-                comments[file_id] = []
-            
-            comments[file_id].append({
+            file_data = self.queue_store.get_record(file_id) or {}
+            stored = get_comment_store().add_comment(file_id, {
                 'admin_id': admin_user,
                 'comment': comment,
-                'timestamp': datetime.now().isoformat()
-            })
+                'timestamp': datetime.now().isoformat(),
+                'source': 'general'
+            }, recipient=file_data.get('user_id'))
+            if not stored:
+                return False
             
-            return self.save_comments(comments)
+            publish_event('comment_added', file_id=file_id, user_id=file_data.get('user_id'),
+                          filename=file_data.get('original_filename'), author=admin_user,
+                          author_role='admin', comment=comment, notified=False)
+            return True
             
         except Exception as e:
             print(f"Error adding comment: {e}")
@@ -1059,103 +1158,110 @@ class FileApprovalService:
     
     def _update_user_status(self, file_data: Dict, status: str, admin_user: str, comment: str = ""):
         """Update user's local approval status and send notifications"""
-        try:
+        self._update_user_statuses([(file_data, status, comment)], admin_user)
+    
+    def _update_user_statuses(self, updates: List[Tuple[Dict, str, str]], admin_user: str):
+        """
+        Update users' local approval status and send notifications for
+        (file_data, status, comment) tuples - one status write and one
+        notification write per user.
+        """
+        by_user: Dict[str, List[Tuple[str, str, str]]] = {}
+        for file_data, status, comment in updates:
             user_id = file_data.get('user_id')
             original_filename = file_data.get('original_filename')
             
             if not user_id or not original_filename:
                 print(f"[ERROR] Missing user_id ({user_id}) or filename ({original_filename}) for status update")
-                return
-            
-            # Create a user approval service instance to update their data
-            user_upload_folder = DATA_PATHS.get_user_upload_dir(user_id)
-            if os.path.exists(user_upload_folder):
-                print(f"[INFO] Updating user status for {user_id}: {original_filename} -> {status}")
+                continue
+            by_user.setdefault(user_id, []).append((original_filename, status, comment))
+        
+        for user_id, user_updates in by_user.items():
+            try:
+                # Create a user approval service instance to update their data
+                user_upload_folder = DATA_PATHS.get_user_upload_dir(user_id)
+                if not os.path.exists(user_upload_folder):
+                    print(f"[WARNING] User upload folder not found: {user_upload_folder}")
+                    continue
+                
+                print(f"[INFO] Updating user status for {user_id}: {len(user_updates)} file(s)")
                 user_approval_service = ApprovalFileService(user_upload_folder, user_id)
                 
-                # Update the file status
-                success = user_approval_service.update_file_status(original_filename, status, comment, admin_user)
+                # Update the file statuses
+                with span("user_status_write", "approval", user=user_id, files=len(user_updates)):
+                    outcomes = user_approval_service.update_file_statuses([{
+                        "filename": filename,
+                        "new_status": status,
+                        "admin_comment": comment,
+                        "admin_id": admin_user
+                    } for filename, status, comment in user_updates])
                 
-                if success:
-                    print(f"[SUCCESS] Status updated for user {user_id}: {original_filename}")
-                    
-                    # Send notification using the notification service
-                    from services.notification_service import NotificationService
-                    notification_service = NotificationService()
+                # Create appropriate notification messages
+                notifications = []
+                for filename, status, comment in user_updates:
+                    if not outcomes.get(filename):
+                        print(f"[WARNING] Failed to update status for user {user_id}: {filename}")
+                        continue
+                    print(f"[SUCCESS] Status updated for user {user_id}: {filename}")
                     
-                    # Create appropriate notification message
                     if status == "approved":
-                        notification_service.notify_approval_status(
-                            user_id, original_filename, "approved", admin_user, 
-                            f"Your file has been approved and moved to the project directory. {comment}")
+                        notifications.append((filename, "approved",
+                                              f"Your file has been approved and moved to the project directory. {comment}"))
                     elif status == "rejected_admin":
-                        notification_service.notify_approval_status(
-                            user_id, original_filename, "rejected", admin_user, 
-                            f"Your file has been rejected. Reason: {comment}")
+                        notifications.append((filename, "rejected", f"Your file has been rejected. Reason: {comment}"))
                     elif status == "pending_admin":
-                        notification_service.notify_approval_status(
-                            user_id, original_filename, "approved_by_team_leader", admin_user,
-                            f"Your file has been approved by the team leader and is now pending admin review.")
+                        notifications.append((filename, "approved_by_team_leader",
+                                              f"Your file has been approved by the team leader and is now pending admin review."))
                     elif status == "rejected_team_leader":
-                        notification_service.notify_approval_status(
-                            user_id, original_filename, "rejected_by_team_leader", admin_user,
-                            f"Your file has been rejected by the team leader. Reason: {comment}")
-                    
-                    print(f"[SUCCESS] Notification sent to user {user_id} for file {original_filename}")
-                else:
-                    print(f"[WARNING] Failed to update status for user {user_id}: {original_filename}")
-            else:
-                print(f"[WARNING] User upload folder not found: {user_upload_folder}")
+                        notifications.append((filename, "rejected_by_team_leader",
+                                              f"Your file has been rejected by the team leader. Reason: {comment}"))
                 
-        except Exception as e:
-            print(f"[ERROR] Error updating user status: {e}")
-            import traceback
-            traceback.print_exc()
+                if notifications:
+                    # Send notifications using the notification service
+                    from services.notification_service import NotificationService
+                    notification_service = NotificationService()
+                    with span("notification_write", "approval", user=user_id, notifications=len(notifications)):
+                        notification_service.notify_approval_statuses(user_id, [{
+                            'filename': filename,
+                            'status': status,
+                            'admin_id': admin_user,
+                            'reason': reason
+                        } for filename, status, reason in notifications])
+                    print(f"[SUCCESS] {len(notifications)} notification(s) sent to user {user_id}")
+                    
+            except Exception as e:
+                print(f"[ERROR] Error updating user status: {e}")
+                import traceback
+                traceback.print_exc()
     
-    def _archive_file(self, file_data: Dict, status: str):
+    def _archive_file(self, file_data: Dict, status: str) -> bool:
         """Archive approved/rejected files for admin panel display"""
+        return self._archive_files([file_data], status)
+    
+    def _archive_files(self, files: List[Dict], status: str) -> bool:
+        """Archive several approved/rejected files with a single archive append (False if it failed)"""
+        if not files:
+            return True
         try:
-            archive_dir = os.path.join(DATA_PATHS.SHARED_BASE, "approvals", "archived")
-            os.makedirs(archive_dir, exist_ok=True)
-            
-            # Determine archive file based on status
-            if status == 'approved':
-                archive_file = os.path.join(archive_dir, 'approved_files.json')
-            elif status == 'rejected_admin':
-                archive_file = os.path.join(archive_dir, 'rejected_files.json')
-            else:
-                return  # Don't archive other statuses
-            
-            # Load existing archived files
-            archived_files = {}
-            if os.path.exists(archive_file):
-                try:
-                    with open(archive_file, 'r', encoding='utf-8') as f:
-                        archived_files = json.load(f)
-                except Exception as e:
-                    print(f"[WARNING] Error loading archive file {archive_file}: {e}")
-                    archived_files = {}
-            
-            # Add current file to archive
-            file_id = file_data.get('file_id', str(uuid.uuid4()))
-            file_data['archived_date'] = datetime.now().isoformat()
-            archived_files[file_id] = file_data
+            # Only approved and admin-rejected files are archived here
+            if status not in ('approved', 'rejected_admin'):
+                return True  # Don't archive other statuses
             
-            # Keep only last 1000 archived files per status
-            if len(archived_files) > 1000:
-                # Sort by archived_date and keep newest 1000
-                sorted_files = sorted(archived_files.items(), 
-                                     key=lambda x: x[1].get('archived_date', ''), 
-                                     reverse=True)
-                archived_files = dict(sorted_files[:1000])
+            archived_date = datetime.now().isoformat()
+            for file_data in files:
+                file_data.setdefault('file_id', str(uuid.uuid4()))
+                file_data['archived_date'] = archived_date
             
-            # Save updated archive
-            with open(archive_file, 'w', encoding='utf-8') as f:
-                json.dump(archived_files, f, indent=2)
+            # Monthly append-only segments - history is no longer truncated
+            if not get_approval_archive().append(status, files):
+                return False
             
-            print(f"[INFO] Archived file {file_data.get('original_filename')} with status {status}")
+            for file_data in files:
+                print(f"[INFO] Archived file {file_data.get('original_filename')} with status {status}")
+            return True
             
         except Exception as e:
             print(f"[ERROR] Error archiving file: {e}")
             import traceback
-            traceback.print_exc()
\ No newline at end of file
+            traceback.print_exc()
+            return False
\ No newline at end of file
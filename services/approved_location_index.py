@@ -0,0 +1,232 @@
+"""
+Approved File Location Index
+
+The TL panel and the user file list showed where each approved file lives by
+calling DATA_PATHS.find_approved_file for every archived row on every refresh -
+up to three os.path.exists probes plus a full os.listdir per file over SMB.
+
+The index maps file_id -> final location and is written when a move completes.
+Listing approved files is one (cached) read of approvals/approved_file_locations.json.
+Rows the index does not know yet are filled in incrementally - from the stored
+project_file_path when there is one, otherwise with a single legacy probe - and
+written back in one commit. Entries are trusted for VERIFY_INTERVAL: after
+that a listing checks a stored path with one stat (and searches again if the
+file is gone), and files that could not be found are probed again. Opening a
+file verifies its entry right away (locate(..., verify=True)), so a file moved
+by hand is found again without waiting for the interval.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.atomic_write import atomic_write_json
+
+
+class ApprovedLocationIndex:
+    """Persistent file_id -> location index for approved files"""
+
+    VERIFY_INTERVAL = timedelta(hours=1)   # how long a "not found" (or verified) result is trusted
+
+    def __init__(self, index_file: str = None):
+        self.index_file = index_file or os.path.join(DATA_PATHS.approvals_dir, "approved_file_locations.json")
+        self.lock = get_file_lock(f"{self.index_file}.lock")
+        self._committer = GroupCommitter(self.lock, self._read, self._write,
+                                         name=os.path.basename(self.index_file))
+
+    # ---- persistence ----
+
+    def _read(self) -> Dict[str, Dict]:
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return json.loads(content) if content.strip() else {}
+        return {}
+
+    def _write(self, index: Dict[str, Dict]):
+        atomic_write_json(self.index_file, index, indent=2)
+        get_json_cache().invalidate(self.index_file)
+
+    def _load(self) -> Dict[str, Dict]:
+        """Cached, read-only view of the index"""
+        return load_json_cached(self.index_file, {}, copy_result=False) or {}
+
+    # ---- public API ----
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        entry = self._load().get(file_id)
+        return dict(entry) if entry else None
+
+    def lookup(self, file_id: str) -> Optional[str]:
+        """Indexed location of a file (not verified - see verify())"""
+        return (self._load().get(file_id) or {}).get('path')
+
+    def record(self, file_id: str, path: Optional[str], **info) -> bool:
+        """Record where an approved file is (path None = searched and not found)"""
+        return self.record_many({file_id: dict(info, path=path)})
+
+    def record_many(self, entries: Dict[str, Dict]) -> bool:
+        """Record several entries ({file_id: {'path': ..., ...}}) in one write"""
+        if not entries:
+            return True
+        now = datetime.now().isoformat()
+
+        def apply(index):
+            for file_id, entry in entries.items():
+                if not file_id:
+                    continue
+                current = index.get(file_id) or {}
+                current.update(entry)
+                current['indexed_at'] = now
+                index[file_id] = current
+            return True
+
+        if not self._committer.submit(apply):
+            print(f"[LOCATION_INDEX] Failed to record {len(entries)} location(s)")
+            return False
+        return True
+
+    def forget(self, file_ids: Iterable[str]) -> bool:
+        file_ids = list(file_ids)
+
+        def apply(index):
+            removed = [index.pop(file_id, None) for file_id in file_ids]
+            return any(entry is not None for entry in removed)
+
+        return self._committer.submit(apply)
+
+    def locate_many(self, files: List[Dict], probe: Callable[[Dict], Optional[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Locations for approved file records (keyed by their 'file_id').
+
+        Recently checked files cost nothing beyond the index read. Entries past
+        VERIFY_INTERVAL have their stored path checked with one stat. Unknown
+        files, and files whose path is gone, are added from their
+        'project_file_path' or, failing that, by calling probe(file_data) once
+        (search() by default); new entries are written back together.
+        """
+        probe = probe or self.search
+        index = self._load()
+        now = datetime.now()
+        results: Dict[str, Optional[str]] = {}
+        new_entries: Dict[str, Dict] = {}
+
+        for file_data in files:
+            file_id = file_data.get('file_id')
+            if not file_id:
+                continue
+            entry = index.get(file_id)
+            if entry and not self._is_stale(entry, now):
+                results[file_id] = entry.get('path')
+                continue
+            indexed_path = (entry or {}).get('path')
+            if indexed_path and os.path.exists(indexed_path):
+                results[file_id] = indexed_path
+                new_entries[file_id] = {'checked_at': now.isoformat()}
+                continue
+
+            path = file_data.get('project_file_path')
+            if path and path == indexed_path:
+                path = None     # the stored path is the one that just went missing
+            if not path and probe is not None:
+                try:
+                    path = probe(file_data)
+                except Exception as e:
+                    print(f"[LOCATION_INDEX] Probe failed for {file_id}: {e}")
+                    path = None
+            results[file_id] = path
+            new_entries[file_id] = {
+                'path': path,
+                'original_filename': file_data.get('original_filename'),
+                'user_id': file_data.get('user_id'),
+                'team_tag': file_data.get('user_team'),
+                'checked_at': now.isoformat()
+            }
+
+        if new_entries:
+            self.record_many(new_entries)
+        return results
+
+    def locate(self, file_data: Dict, probe: Callable[[Dict], Optional[str]] = None,
+               verify: bool = False) -> Optional[str]:
+        """
+        Location of one approved file record, through the index like locate_many.
+        verify=True (before opening or downloading the file) checks the indexed
+        path now instead of trusting it for VERIFY_INTERVAL.
+        """
+        probe = probe or self.search
+        file_id = file_data.get('file_id')
+        if not file_id:
+            # Nothing to index it under - search directly
+            return probe(file_data)
+        if verify and self.get(file_id):
+            return self.verify(file_id, lambda: probe(file_data))
+        return self.locate_many([file_data], probe).get(file_id)
+
+    @staticmethod
+    def search(file_data: Dict) -> Optional[str]:
+        """
+        The slow path for a file the index cannot answer: its stored locations,
+        then DATA_PATHS.find_approved_file for this year and the last.
+        """
+        for key in ('project_file_path', 'moved_to_location'):
+            stored_path = file_data.get(key)
+            if stored_path and os.path.exists(stored_path):
+                return stored_path
+        original_filename = file_data.get('original_filename')
+        if not original_filename:
+            return None
+        team_tag = file_data.get('user_team') or 'DEFAULT'
+        current_year = datetime.now().year
+        for year in (str(current_year), str(current_year - 1)):
+            found = DATA_PATHS.find_approved_file(original_filename, team_tag, year)
+            if found:
+                return found
+        return None
+
+    def verify(self, file_id: str, probe: Callable[[], Optional[str]] = None) -> Optional[str]:
+        """
+        Confirm the indexed location still exists (one stat). If it does not,
+        search again with probe() and update the index.
+        """
+        entry = self.get(file_id) or {}
+        path = entry.get('path')
+        if path and os.path.exists(path):
+            if self._is_stale(entry, datetime.now()):
+                self.record(file_id, path, checked_at=datetime.now().isoformat())
+            return path
+
+        found = None
+        if probe is not None:
+            try:
+                found = probe()
+            except Exception as e:
+                print(f"[LOCATION_INDEX] Probe failed for {file_id}: {e}")
+        if found != path or not entry:
+            self.record(file_id, found, checked_at=datetime.now().isoformat())
+        return found
+
+    def _is_stale(self, entry: Dict, now: datetime) -> bool:
+        try:
+            return now - datetime.fromisoformat(entry.get('checked_at', '')) > self.VERIFY_INTERVAL
+        except ValueError:
+            return True
+
+
+# Global index instance
+_approved_location_index = None
+_index_lock = threading.Lock()
+
+
+def get_approved_location_index() -> ApprovedLocationIndex:
+    """Get global approved file location index"""
+    global _approved_location_index
+    if _approved_location_index is None:
+        with _index_lock:
+            if _approved_location_index is None:
+                _approved_location_index = ApprovedLocationIndex()
+    return _approved_location_index
@@ -0,0 +1,228 @@
+"""
+Content-addressed blob store for KMTI uploads
+
+Users often upload the same drawing several times under different names.
+With the blob store enabled (config "upload_blob_store"), every uploaded file
+is stored once under blobs/<sha256[:2]>/<sha256> on the NAS and the file in
+the user's uploads folder is a hard link to that blob, so a duplicate upload
+costs no extra storage and no transfer - only a local SHA-256 pass.
+
+Reference counting is the filesystem's own link count: a blob whose link
+count drops to 1 (only the store's own entry) is garbage. Shared content is
+kept read-only so editing one upload in place can never change another;
+remove() and detach() are used instead of os.remove for files that may be
+links. Approved files renamed into approved_files_fallback stay linked,
+files that reach PROJECTS are detached into private, writable copies.
+When hard links are not supported the upload is copied as before.
+"""
+
+import os
+import stat
+import time
+import uuid
+import threading
+from typing import Dict, Optional
+from utils.path_config import DATA_PATHS
+from utils.json_cache import load_json_cached
+from utils.file_copy import ProgressCallback, copy_file, hash_file
+
+READ_ONLY = stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH
+WRITABLE = stat.S_IREAD | stat.S_IWRITE | stat.S_IRGRP | stat.S_IROTH
+
+
+class BlobStore:
+    """Hard-link based content-addressed storage, keyed by SHA-256"""
+
+    PARTIAL_MAX_AGE = 3600       # unfinished blob uploads older than this are garbage
+
+    def __init__(self, root: str = None, enabled: bool = None):
+        self.root = root or os.path.join(DATA_PATHS.SHARED_BASE, "blobs")
+        if enabled is None:
+            enabled = False
+            try:
+                from utils.config_loader import get_config
+                enabled = bool(get_config().get_config_value("upload_blob_store", False))
+            except Exception as e:
+                print(f"[BLOB_STORE] Could not read blob store config: {e}")
+        self.enabled = enabled
+        self._links_supported: Optional[bool] = None
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def has_blob(self, sha256: str) -> bool:
+        return os.path.exists(self.blob_path(sha256))
+
+    @staticmethod
+    def recorded_sha256(path: str) -> Optional[str]:
+        """Content hash recorded for an uploaded file in its folder's files_metadata.json"""
+        metadata = load_json_cached(os.path.join(os.path.dirname(path), "files_metadata.json"), {}) or {}
+        entry = metadata.get(os.path.basename(path))
+        return entry.get("sha256") if isinstance(entry, dict) else None
+
+    @staticmethod
+    def is_linked(path: str) -> bool:
+        try:
+            return os.stat(path).st_nlink > 1
+        except OSError:
+            return False
+
+    def store(self, source_path: str, target_path: str, sha256: str = None,
+              progress: Optional[ProgressCallback] = None) -> Dict:
+        """
+        Put source at target_path, sharing storage with identical content.
+
+        sha256 may be passed when already known (e.g. from duplicate detection).
+        Returns {'sha256', 'size', 'deduplicated': bool, 'linked': bool};
+        deduplicated means no bytes were transferred.
+        """
+        sha256 = sha256 or hash_file(source_path)
+        size = os.path.getsize(source_path)
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+
+        if not self.enabled or self._links_supported is False:
+            result = copy_file(source_path, target_path, progress)
+            return {'sha256': result['sha256'], 'size': result['size'], 'deduplicated': False, 'linked': False}
+
+        blob = self.blob_path(sha256)
+        deduplicated = os.path.exists(blob)
+        if not deduplicated:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            temp_blob = f"{blob}.{uuid.uuid4().hex}.partial"
+            try:
+                result = copy_file(source_path, temp_blob, progress)
+                if result['sha256'] != sha256:
+                    raise IOError(f"Source changed while uploading: {source_path}")
+                os.chmod(temp_blob, READ_ONLY)
+                if os.path.exists(blob):
+                    # Another upload of the same content won the race
+                    deduplicated = True
+                else:
+                    os.replace(temp_blob, blob)
+            finally:
+                self._remove_quietly(temp_blob)
+
+        try:
+            os.link(blob, target_path)
+            self._links_supported = True
+            if deduplicated:
+                print(f"[BLOB_STORE] Deduplicated {os.path.basename(target_path)} ({size} bytes)")
+            return {'sha256': sha256, 'size': size, 'deduplicated': deduplicated, 'linked': True}
+        except OSError as e:
+            print(f"[BLOB_STORE] Hard links not available, copying instead: {e}")
+            self._links_supported = False
+            result = copy_file(source_path, target_path, progress)
+            self.release(sha256)
+            return {'sha256': result['sha256'], 'size': result['size'], 'deduplicated': False, 'linked': False}
+
+    def remove(self, path: str, sha256: str = None):
+        """Delete a file that may be a link to a blob, then release the blob"""
+        sha256 = sha256 or self.recorded_sha256(path)
+        if self.is_linked(path):
+            # Read-only files cannot be deleted on Windows; the attribute is shared by all links
+            os.chmod(path, WRITABLE)
+            try:
+                os.remove(path)
+            finally:
+                self._protect(sha256)
+        else:
+            os.remove(path)
+        self.release(sha256)
+
+    def detach(self, path: str, sha256: str = None) -> bool:
+        """Replace a linked file by a private, writable copy. Returns True if it was linked."""
+        if not self.is_linked(path):
+            return False
+        sha256 = sha256 or self.recorded_sha256(path)
+        temp_path = f"{path}.{uuid.uuid4().hex}.detach"
+        try:
+            copy_file(path, temp_path)
+            os.chmod(path, WRITABLE)
+            try:
+                os.replace(temp_path, path)
+            finally:
+                self._protect(sha256)
+        finally:
+            self._remove_quietly(temp_path)
+        self.release(sha256)
+        return True
+
+    def release(self, sha256: Optional[str]) -> bool:
+        """Drop a blob nobody links to any more. Returns True if it was removed."""
+        if not sha256:
+            return False
+        blob = self.blob_path(sha256)
+        try:
+            if os.stat(blob).st_nlink <= 1:
+                os.chmod(blob, WRITABLE)
+                os.remove(blob)
+                return True
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[BLOB_STORE] Could not release blob {sha256}: {e}")
+        return False
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """Remove every unreferenced blob and leftover partial upload"""
+        removed = freed = 0
+        if not os.path.isdir(self.root):
+            return {'removed': 0, 'bytes_freed': 0}
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            with os.scandir(prefix_dir) as entries:
+                for entry in entries:
+                    try:
+                        entry_stat = entry.stat()
+                        if entry.name.endswith('.partial'):
+                            # Leave uploads that may still be running alone
+                            if time.time() - entry_stat.st_mtime < self.PARTIAL_MAX_AGE:
+                                continue
+                        elif entry_stat.st_nlink > 1:
+                            continue
+                        os.chmod(entry.path, WRITABLE)
+                        os.remove(entry.path)
+                        removed += 1
+                        freed += entry_stat.st_size
+                    except OSError as e:
+                        print(f"[BLOB_STORE] Could not collect {entry.path}: {e}")
+        if removed:
+            print(f"[BLOB_STORE] Collected {removed} blob(s), {freed} bytes freed")
+        return {'removed': removed, 'bytes_freed': freed}
+
+    def _protect(self, sha256: Optional[str]):
+        """Make shared content read-only again (after a link was made writable to delete it)"""
+        if not sha256:
+            return
+        try:
+            blob = self.blob_path(sha256)
+            if os.path.exists(blob):
+                os.chmod(blob, READ_ONLY)
+        except OSError as e:
+            print(f"[BLOB_STORE] Could not protect blob {sha256}: {e}")
+
+    @staticmethod
+    def _remove_quietly(path: str):
+        try:
+            if os.path.exists(path):
+                os.chmod(path, WRITABLE)
+                os.remove(path)
+        except OSError as e:
+            print(f"[BLOB_STORE] Could not remove {path}: {e}")
+
+
+# Global blob store instance
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Get global blob store instance"""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore()
+    return _blob_store
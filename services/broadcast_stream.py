@@ -0,0 +1,113 @@
+"""
+Shared broadcast stream for company-wide notifications
+
+NotificationService.broadcast_notification used to write the announcement
+into every user's notification file, one NAS read and rewrite per user.
+
+A broadcast is now a single line appended to notifications/broadcasts.jsonl
+(with a small broadcasts_head.json holding the last sequence number). Users'
+notification logs merge the stream lazily when they are read and keep their
+own read and dismissal cursors into it (see NotificationLog), so nothing is
+written per user until that user reads or dismisses a broadcast.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.jsonl import JsonlTailReader, append_jsonl
+from utils.atomic_write import atomic_write_json
+from services.change_feed import publish_event
+
+
+class BroadcastStream:
+    """Append-only stream of broadcasts shared by all users"""
+
+    def __init__(self, notifications_dir: str = None):
+        self.notifications_dir = notifications_dir or DATA_PATHS.notifications_dir
+        self.stream_file = os.path.join(self.notifications_dir, "broadcasts.jsonl")
+        self.head_file = os.path.join(self.notifications_dir, "broadcasts_head.json")
+        self._committer = GroupCommitter(
+            get_file_lock(f"{self.head_file}.lock"),
+            self._load_head,
+            self._save_head,
+            name="broadcast stream")
+        self._stream_reader = JsonlTailReader("BROADCAST")
+
+    # ---- head ----
+
+    def _load_head(self) -> Dict:
+        if os.path.exists(self.head_file):
+            with open(self.head_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if content.strip():
+                return json.loads(content)
+        return {'last_seq': 0}
+
+    def _save_head(self, head: Dict):
+        atomic_write_json(self.head_file, head)
+        get_json_cache().invalidate(self.head_file)
+
+    def get_last_seq(self) -> int:
+        """Sequence number of the newest broadcast (a cached head read)"""
+        head = load_json_cached(self.head_file, None, copy_result=False)
+        return head.get('last_seq', 0) if head else 0
+
+    # ---- writing ----
+
+    def broadcast(self, title: str, message: str, notification_type: str = "broadcast",
+                  sender: str = None) -> Optional[Dict]:
+        """Append one broadcast for every user; returns it with its 'seq'"""
+        stored = []
+
+        def apply(head):
+            head['last_seq'] += 1
+            broadcast = {
+                'seq': head['last_seq'],
+                'type': notification_type,
+                'title': title,
+                'message': message,
+                'sender': sender,
+                'timestamp': datetime.now().isoformat()
+            }
+            append_jsonl(self.stream_file, [broadcast])
+            stored.append(broadcast)
+            return True
+
+        if not self._committer.submit(apply) or not stored:
+            print(f"[BROADCAST] Failed to broadcast '{title}'")
+            return None
+        publish_event('broadcast_added', seq=stored[0]['seq'], title=title)
+        return stored[0]
+
+    # ---- reading ----
+
+    def _read_stream(self) -> List[Dict]:
+        """Broadcasts oldest first; only bytes appended since the last read are parsed"""
+        return self._stream_reader.read(self.stream_file)
+
+    def get_since(self, cursor: int) -> List[Dict]:
+        """Broadcasts with seq > cursor, oldest first"""
+        last_seq = self.get_last_seq()
+        if last_seq <= cursor:
+            return []
+        return [broadcast for broadcast in self._read_stream() if cursor < broadcast['seq'] <= last_seq]
+
+
+# Global broadcast stream instance
+_broadcast_stream = None
+_broadcast_stream_lock = threading.Lock()
+
+
+def get_broadcast_stream() -> BroadcastStream:
+    """Get global broadcast stream instance"""
+    global _broadcast_stream
+    if _broadcast_stream is None:
+        with _broadcast_stream_lock:
+            if _broadcast_stream is None:
+                _broadcast_stream = BroadcastStream()
+    return _broadcast_stream
@@ -0,0 +1,319 @@
+"""
+Shared change feed for the KMTI panels
+
+Every open user panel used to run CommentMonitor: a thread that woke every
+5 seconds, stat'ed both comment files and, whenever either had changed,
+re-parsed every comment of every user, built an ApprovalFileService,
+rescanned the uploads folder and matched comments to files by filename.
+
+Writers now publish small events ({'seq', 'type', 'timestamp', ...payload})
+to a monotonically sequenced log on the share (data/events): JSON Lines
+segments named after their first sequence number plus a head.json holding
+the last sequence number. Sequence numbers are assigned under the head lock,
+so they are unique and ordered across every machine writing to the share.
+
+Each process runs one dispatcher. It wakes on a watchdog notification for
+the events directory (when watchdog is available) or on an adaptive poll
+of head.json - 0.5s right after activity, backing off to 10s when idle - and
+hands each new event to the subscriptions whose types (and filter) match.
+Subscriptions keep their own cursor and only ever see events after it.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.jsonl import JsonlTailReader, append_jsonl
+from utils.atomic_write import atomic_write_json
+
+EventCallback = Callable[[Dict], None]
+EventFilter = Callable[[Dict], bool]
+
+SEGMENT_EVENTS = 5000       # events per segment before rolling to a new one
+KEEP_SEGMENTS = 20          # older segments are pruned when a new one is started
+POLL_MIN = 0.5              # seconds between polls right after activity
+POLL_MAX = 10.0             # seconds between polls when idle
+WATCHED_POLL = 30.0         # safety poll while a watchdog observer is running
+
+
+class Subscription:
+    """A subscriber's event types, filter, callback and cursor"""
+
+    def __init__(self, event_types: Optional[Iterable[str]], callback: EventCallback,
+                 event_filter: Optional[EventFilter], cursor: int, name: str):
+        self.event_types = set(event_types) if event_types is not None else None
+        self.callback = callback
+        self.event_filter = event_filter
+        self.cursor = cursor
+        self.name = name
+        self.active = True
+
+    def matches(self, event: Dict) -> bool:
+        if self.event_types is not None and event.get('type') not in self.event_types:
+            return False
+        return self.event_filter is None or bool(self.event_filter(event))
+
+
+class ChangeFeed:
+    """Sequenced event log on the share with a per-process dispatcher"""
+
+    def __init__(self, events_dir: str = None):
+        self.events_dir = events_dir or os.path.join(DATA_PATHS.SHARED_BASE, "events")
+        self.head_file = os.path.join(self.events_dir, "head.json")
+        self._committer = GroupCommitter(
+            get_file_lock(f"{self.head_file}.lock"),
+            self._load_head,
+            self._save_head,
+            name="change feed")
+        self._segment_reader = JsonlTailReader("CHANGE_FEED")
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    # ---- head ----
+
+    @staticmethod
+    def _empty_head() -> Dict:
+        return {'last_seq': 0, 'segment_start': 1, 'segment_count': 0}
+
+    def _load_head(self) -> Dict:
+        if os.path.exists(self.head_file):
+            with open(self.head_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if content.strip():
+                return json.loads(content)
+        return self._empty_head()
+
+    def _save_head(self, head: Dict):
+        atomic_write_json(self.head_file, head)
+        get_json_cache().invalidate(self.head_file)
+
+    def get_last_seq(self) -> int:
+        """Sequence number of the newest event (0 when the feed is empty)"""
+        head = load_json_cached(self.head_file, None, copy_result=False)
+        return head.get('last_seq', 0) if head else 0
+
+    def _segment_file(self, start_seq: int) -> str:
+        return os.path.join(self.events_dir, f"{start_seq:012d}.jsonl")
+
+    def _segment_starts(self) -> List[int]:
+        try:
+            names = os.listdir(self.events_dir)
+        except OSError:
+            return []
+        return sorted(int(name[:-len('.jsonl')]) for name in names
+                      if name.endswith('.jsonl') and name[:-len('.jsonl')].isdigit())
+
+    # ---- publishing ----
+
+    def publish(self, event_type: str, **payload) -> bool:
+        """Publish one event"""
+        return self.publish_many([dict(payload, type=event_type)])
+
+    def publish_many(self, events: List[Dict]) -> bool:
+        """Publish several events (each with a 'type') with one lock round-trip"""
+        if not events:
+            return True
+
+        def apply(head):
+            timestamp = datetime.now().isoformat()
+            lines = []
+            for event in events:
+                if head['segment_count'] >= SEGMENT_EVENTS:
+                    append_jsonl(self._segment_file(head['segment_start']), lines)
+                    lines = []
+                    head['segment_start'] = head['last_seq'] + 1
+                    head['segment_count'] = 0
+                    self._prune()
+                head['last_seq'] += 1
+                head['segment_count'] += 1
+                lines.append(dict(event, seq=head['last_seq'], timestamp=event.get('timestamp') or timestamp))
+            append_jsonl(self._segment_file(head['segment_start']), lines)
+            return True
+
+        if not self._committer.submit(apply):
+            print(f"[CHANGE_FEED] Failed to publish {len(events)} event(s)")
+            return False
+        self._wake.set()    # local subscribers see our own events without waiting for the poll
+        return True
+
+    def _prune(self):
+        """Drop the oldest segments beyond KEEP_SEGMENTS (under the head lock)"""
+        starts = self._segment_starts()
+        for start in starts[:max(0, len(starts) - KEEP_SEGMENTS)]:
+            try:
+                os.remove(self._segment_file(start))
+            except OSError as e:
+                print(f"[CHANGE_FEED] Could not prune segment {start}: {e}")
+
+    # ---- reading ----
+
+    def _read_segment(self, segment_file: str) -> List[Dict]:
+        """Events of one segment; only bytes appended since the last read are parsed"""
+        return self._segment_reader.read(segment_file)
+
+    def read_since(self, cursor: int, limit: Optional[int] = None) -> List[Dict]:
+        """Events with seq > cursor, oldest first"""
+        last_seq = self.get_last_seq()
+        if last_seq <= cursor:
+            return []
+        starts = self._segment_starts()
+        # Start with the segment holding cursor + 1 (or the oldest one kept)
+        first = 0
+        for i, start in enumerate(starts):
+            if start <= cursor + 1:
+                first = i
+        self._segment_reader.retain(self._segment_file(start) for start in starts)
+
+        events = []
+        for start in starts[first:]:
+            for event in self._read_segment(self._segment_file(start)):
+                if cursor < event.get('seq', 0) <= last_seq:
+                    events.append(event)
+                    if limit is not None and len(events) >= limit:
+                        return events
+        return events
+
+    # ---- subscriptions ----
+
+    def subscribe(self, event_types: Optional[Iterable[str]], callback: EventCallback,
+                  event_filter: Optional[EventFilter] = None, from_seq: Optional[int] = None,
+                  name: str = "subscriber") -> Subscription:
+        """
+        Call callback(event) on the dispatcher thread for every new event of the
+        given types (all types when None) that passes event_filter. Delivery
+        starts after from_seq, or after the newest event when not given.
+        """
+        cursor = self.get_last_seq() if from_seq is None else from_seq
+        subscription = Subscription(event_types, callback, event_filter, cursor, name)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.active = False
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    # ---- dispatcher ----
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    def _start_watcher(self) -> bool:
+        """Wake the dispatcher on file system events for the events directory (needs watchdog)"""
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print("[CHANGE_FEED] watchdog not available - polling for events")
+            return False
+
+        feed = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                feed._wake.set()
+
+        try:
+            os.makedirs(self.events_dir, exist_ok=True)
+            observer = Observer()
+            observer.schedule(_Handler(), self.events_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+            return True
+        except Exception as e:
+            print(f"[CHANGE_FEED] Could not watch {self.events_dir}, polling instead: {e}")
+            return False
+
+    def _run(self):
+        watched = self._start_watcher()
+        interval = POLL_MIN
+        while not self._stopped.is_set():
+            woken = self._wake.wait(WATCHED_POLL if watched else interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                delivered = self._dispatch()
+            except Exception as e:
+                print(f"[CHANGE_FEED] Dispatch failed: {e}")
+                delivered = 0
+            # Adaptive polling: stay quick while events flow, back off when idle
+            interval = POLL_MIN if (delivered or woken) else min(POLL_MAX, interval * 2)
+
+    def _dispatch(self) -> int:
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.active]
+        if not subscriptions:
+            return 0
+        last_seq = self.get_last_seq()
+        cursor = min(subscription.cursor for subscription in subscriptions)
+        if last_seq <= cursor:
+            return 0
+
+        delivered = 0
+        for event in self.read_since(cursor):
+            seq = event['seq']
+            for subscription in subscriptions:
+                if not subscription.active or seq <= subscription.cursor:
+                    continue
+                subscription.cursor = seq
+                try:
+                    if subscription.matches(event):
+                        subscription.callback(event)
+                        delivered += 1
+                except Exception as e:
+                    print(f"[CHANGE_FEED] Subscriber {subscription.name} failed on event {seq}: {e}")
+        for subscription in subscriptions:
+            subscription.cursor = max(subscription.cursor, last_seq)
+        return delivered
+
+
+# Global change feed instance
+_change_feed = None
+_change_feed_lock = threading.Lock()
+
+
+def get_change_feed() -> ChangeFeed:
+    """Get global change feed instance"""
+    global _change_feed
+    if _change_feed is None:
+        with _change_feed_lock:
+            if _change_feed is None:
+                _change_feed = ChangeFeed()
+    return _change_feed
+
+
+def publish_event(event_type: str, **payload) -> bool:
+    """Publish an event to the shared change feed (failures are logged, never raised)"""
+    try:
+        return get_change_feed().publish(event_type, **payload)
+    except Exception as e:
+        print(f"[CHANGE_FEED] Could not publish {event_type}: {e}")
+        return False
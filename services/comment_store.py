@@ -0,0 +1,250 @@
+"""
+Unified comment store, sharded by file_id
+
+Comments used to be split between approvals/approval_comments.json (admin
+and team leader comments from the panels) and approvals/comments.json
+(FileApprovalService.add_comment). Both were rewritten in full for every
+comment, and every preview click loaded, merged and sorted both files.
+
+Each file's comments now live in their own small JSON Lines shard
+(approvals/comments/shards/<2 hex chars>/<file_id>.jsonl), so opening a
+preview reads one shard. approvals/comments/index.json holds:
+
+    last_seq   store-wide comment sequence number (the since-cursor)
+    files      file_id -> {'count', 'last_seq', 'last_timestamp', 'recipient'}
+    people     author or recipient -> file_ids they commented on / received
+
+comments_since(file_ids, cursor) only opens the shards whose last_seq is past
+the cursor. The legacy files are imported on first use and kept as
+<name>.migrated.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.jsonl import append_jsonl, read_jsonl, write_jsonl
+from utils.atomic_write import atomic_write_json
+
+INDEX_VERSION = 1
+
+# Legacy single-file comment stores -> source tag of their comments
+LEGACY_FILES = {
+    'approval_comments.json': 'approval',
+    'comments.json': 'general',
+}
+
+
+def comment_author(comment: Dict) -> str:
+    """Whoever wrote a comment (admin, team leader or user)"""
+    return comment.get('admin_id') or comment.get('tl_id') or comment.get('user_id') or comment.get('reviewer') or ''
+
+
+class CommentStore:
+    """Per-file comment shards with a file/person index"""
+
+    def __init__(self, approvals_dir: str = None):
+        self.approvals_dir = approvals_dir or DATA_PATHS.approvals_dir
+        self.store_dir = os.path.join(self.approvals_dir, "comments")
+        self.index_file = os.path.join(self.store_dir, "index.json")
+        self._committer = GroupCommitter(
+            get_file_lock(f"{self.index_file}.lock"),
+            self._load_index,
+            self._save_index,
+            name="comment index")
+        self._guard = threading.Lock()
+
+    # ---- layout ----
+
+    def _shard_file(self, file_id: str) -> str:
+        safe_id = "".join(c for c in file_id if c.isalnum() or c in ("-", "_")) or "_"
+        bucket = hashlib.sha1(file_id.encode('utf-8')).hexdigest()[:2]
+        return os.path.join(self.store_dir, "shards", bucket, f"{safe_id}.jsonl")
+
+    # ---- index ----
+
+    @staticmethod
+    def _empty_index() -> Dict:
+        return {'version': INDEX_VERSION, 'last_seq': 0, 'files': {}, 'people': {}}
+
+    def _load_index(self) -> Dict:
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if content.strip():
+                return json.loads(content)
+        index = self._empty_index()
+        self._migrate_legacy(index)
+        return index
+
+    def _save_index(self, index: Dict):
+        atomic_write_json(self.index_file, index)
+        get_json_cache().invalidate(self.index_file)
+
+    def get_index(self) -> Dict:
+        """Cached, read-only view of the index"""
+        index = load_json_cached(self.index_file, None, copy_result=False)
+        if index is None and any(os.path.exists(os.path.join(self.approvals_dir, name)) for name in LEGACY_FILES):
+            # Not migrated yet - an empty commit runs the migration
+            self._committer.submit(lambda index: True)
+            index = load_json_cached(self.index_file, None, copy_result=False)
+        return index or self._empty_index()
+
+    @staticmethod
+    def _count(index: Dict, comment: Dict, recipient: Optional[str]):
+        file_id = comment['file_id']
+        entry = index['files'].setdefault(file_id, {
+            'count': 0, 'last_seq': 0, 'last_timestamp': None, 'recipient': None})
+        entry['count'] += 1
+        entry['last_seq'] = comment['seq']
+        if comment.get('timestamp') and (not entry['last_timestamp'] or comment['timestamp'] > entry['last_timestamp']):
+            entry['last_timestamp'] = comment['timestamp']
+        if recipient and not entry['recipient']:
+            entry['recipient'] = recipient
+        for person in (comment_author(comment), entry['recipient']):
+            if person:
+                file_ids = index['people'].setdefault(person, [])
+                if file_id not in file_ids:
+                    file_ids.append(file_id)
+
+    @staticmethod
+    def _recipient_of(file_id: str) -> Optional[str]:
+        """Owner of the file a comment is on (from the approval queue)"""
+        try:
+            from services.approval_queue_store import get_approval_queue_store
+            record = get_approval_queue_store().get_record(file_id)
+            return record.get('user_id') if record else None
+        except Exception as e:
+            print(f"[COMMENTS] Could not look up owner of {file_id}: {e}")
+            return None
+
+    # ---- writing ----
+
+    def add_comment(self, file_id: str, comment: Dict, recipient: str = None) -> Optional[Dict]:
+        """
+        Add a comment ({'admin_id' | 'tl_id' | 'user_id', 'comment', ...}) to a
+        file. recipient is the file's owner (looked up in the approval queue
+        when not given). Returns the stored comment with its 'seq'.
+        """
+        if recipient is None:
+            recipient = self._recipient_of(file_id)
+        stored = []
+
+        def apply(index):
+            index['last_seq'] += 1
+            record = dict(comment, file_id=file_id, seq=index['last_seq'])
+            record.setdefault('timestamp', datetime.now().isoformat())
+            append_jsonl(self._shard_file(file_id), [record])
+            self._count(index, record, recipient)
+            stored.append(record)
+            return True
+
+        if not self._committer.submit(apply) or not stored:
+            print(f"[COMMENTS] Failed to add comment to {file_id}")
+            return None
+        return stored[0]
+
+    def _migrate_legacy(self, index: Dict):
+        """Import approval_comments.json and comments.json into shards (under the index lock)"""
+        legacy_paths = [(os.path.join(self.approvals_dir, name), source) for name, source in LEGACY_FILES.items()]
+        comments = []
+        for path, source in legacy_paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                legacy = json.loads(content) if content.strip() else {}
+            except Exception as e:
+                print(f"[COMMENTS] Could not read legacy comments {path}: {e}")
+                return
+            for file_id, file_comments in (legacy.items() if isinstance(legacy, dict) else []):
+                for comment in file_comments or []:
+                    comments.append(dict(comment, file_id=file_id, source=comment.get('source', source)))
+        if not comments:
+            return
+
+        comments.sort(key=lambda comment: comment.get('timestamp', ''))
+        by_file: Dict[str, List[Dict]] = {}
+        recipients: Dict[str, Optional[str]] = {}
+        for comment in comments:
+            index['last_seq'] += 1
+            comment['seq'] = index['last_seq']
+            by_file.setdefault(comment['file_id'], []).append(comment)
+        for file_id, file_comments in by_file.items():
+            # Whole-file write: a migration interrupted before the index was saved just runs again
+            write_jsonl(self._shard_file(file_id), file_comments)
+            recipients[file_id] = self._recipient_of(file_id)
+        for comment in comments:
+            self._count(index, comment, recipients.get(comment['file_id']))
+
+        # Save the index before retiring the legacy files so the shards are never orphaned
+        self._save_index(index)
+        for path, source in legacy_paths:
+            if os.path.exists(path):
+                os.replace(path, f"{path}.migrated")
+        print(f"[COMMENTS] Migrated {len(comments)} comment(s) on {len(by_file)} file(s) into shards")
+
+    # ---- reading ----
+
+    def _read_shard(self, file_id: str) -> List[Dict]:
+        return read_jsonl(self._shard_file(file_id), "COMMENTS")
+
+    def get_comments(self, file_id: str) -> List[Dict]:
+        """Comments on one file, oldest first (reads one shard)"""
+        if file_id not in self.get_index()['files']:
+            return []
+        comments = self._read_shard(file_id)
+        comments.sort(key=lambda comment: (comment.get('timestamp', ''), comment.get('seq', 0)))
+        return comments
+
+    def get_cursor(self) -> int:
+        """Current since-cursor (sequence number of the newest comment)"""
+        return self.get_index().get('last_seq', 0)
+
+    def comments_since(self, file_ids: Optional[Iterable[str]], cursor: int) -> Tuple[List[Dict], int]:
+        """
+        Comments with seq > cursor on the given files (all files when None),
+        oldest first, and the cursor to pass next time.
+        """
+        index = self.get_index()
+        files = index['files']
+        candidates = files.keys() if file_ids is None else [file_id for file_id in file_ids if file_id in files]
+        comments = []
+        for file_id in candidates:
+            if files[file_id]['last_seq'] > cursor:
+                comments.extend(comment for comment in self._read_shard(file_id) if comment.get('seq', 0) > cursor)
+        comments.sort(key=lambda comment: comment['seq'])
+        return comments, index['last_seq']
+
+    def files_for(self, person: str) -> List[str]:
+        """file_ids a person commented on or received comments on"""
+        return list(self.get_index()['people'].get(person, []))
+
+    def comments_for_person_since(self, person: str, cursor: int) -> Tuple[List[Dict], int]:
+        """comments_since() over the files a person is involved in"""
+        return self.comments_since(self.files_for(person), cursor)
+
+    def get_comment_count(self, file_id: str) -> int:
+        entry = self.get_index()['files'].get(file_id)
+        return entry['count'] if entry else 0
+
+
+# Global comment store instance
+_comment_store = None
+_comment_store_lock = threading.Lock()
+
+
+def get_comment_store() -> CommentStore:
+    """Get global comment store instance"""
+    global _comment_store
+    if _comment_store is None:
+        with _comment_store_lock:
+            if _comment_store is None:
+                _comment_store = CommentStore()
+    return _comment_store
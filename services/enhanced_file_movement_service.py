@@ -1,17 +1,26 @@
 """
 Enhanced File Movement Service for KMTI File Approval System
 Handles network access validation, approved/rejected file movement, and fallback mechanisms
+
+Approved file moves run as idempotent steps (planned -> copied -> verified ->
+source_removed -> metadata_written) recorded through MoveSteps, so a move that
+was interrupted by a crash can be resumed from its last completed step.
 """
 
 import os
-import shutil
 import tempfile
 from pathlib import Path
-from typing import Dict, Tuple, Optional, List
+from typing import Callable, Dict, Tuple, Optional, List
 from datetime import datetime
 from utils.logger import log_action
 from utils.metadata_manager import get_metadata_manager
 from utils.path_config import DATA_PATHS
+from utils.network_health import get_network_prober
+from utils.tracing import span
+from services.blob_store import get_blob_store
+from services.approved_location_index import get_approved_location_index
+from utils.filename_allocator import get_filename_allocator
+from utils.file_copy import ProgressCallback, copy_file, hash_file, move_file, same_filesystem, verify_file
 
 class NetworkAccessManager:
     """Manages network access and provides fallback mechanisms"""
@@ -20,52 +29,42 @@ class NetworkAccessManager:
         # Updated to use shared public as primary path instead of database path
         self.project_base = os.path.join(DATA_PATHS.NETWORK_BASE, "PROJECTS")  # Now uses shared public
         self.fallback_base = r"\\KMTI-NAS\Database\PROJECTS"  # Old primary becomes fallback
-        self.access_cache = {}
         
-        # Ensure fallback directory exists
-        try:
-            os.makedirs(self.fallback_base, exist_ok=True)
-            print(f"[ACCESS_MANAGER] Fallback directory ready: {self.fallback_base}")
-        except Exception as e:
-            print(f"[ACCESS_MANAGER] Warning: Could not create fallback directory: {e}")
+        # Share health comes from the background prober (shared by every caller);
+        # the probe also creates the project directories when they are missing
+        self.prober = get_network_prober()
+        self.prober.add_target(self.project_base, name="Projects", create=True)
+        self.prober.add_target(self.fallback_base, name="Projects (fallback)", create=True)
     
     def test_network_access(self, path: str, username: str = None) -> Tuple[bool, str]:
         """
-        Test if user has access to a network path
+        Test if user has access to a network path (creating it if needed)
         Returns (has_access, message)
-        """
-        cache_key = f"{username}_{path}" if username else path
-        
-        # Check cache first (valid for 5 minutes)
-        if cache_key in self.access_cache:
-            cached_time, cached_result = self.access_cache[cache_key]
-            if (datetime.now() - cached_time).seconds < 300:  # 5 minutes
-                return cached_result
         
-        try:
-            # Try to create a test directory
-            test_dir = os.path.join(path, f"access_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-            os.makedirs(test_dir, exist_ok=True)
-            
-            # If successful, clean up test directory
+        A share the prober last saw down or read-only is rejected without
+        touching the network; otherwise the path is created, which is the
+        access test itself.
+        """
+        state = self.prober.get_state(path)
+        if state and not state['reachable']:
+            result = (False, state['error'] or f"Path not found: {path}")
+        elif state and not state['writable']:
+            result = (False, state['error'] or f"Access denied to {path}")
+        else:
             try:
-                os.rmdir(test_dir)
-            except:
-                pass
-            
-            result = (True, "Access granted")
-            
-        except PermissionError:
-            result = (False, f"Access denied to {path}")
-        except FileNotFoundError:
-            result = (False, f"Path not found: {path}")
-        except Exception as e:
-            result = (False, f"Network error: {str(e)}")
-        
-        # Cache result
-        self.access_cache[cache_key] = (datetime.now(), result)
+                os.makedirs(path, exist_ok=True)
+                result = (True, "Access granted")
+            except PermissionError:
+                result = (False, f"Access denied to {path}")
+            except FileNotFoundError:
+                result = (False, f"Path not found: {path}")
+            except Exception as e:
+                result = (False, f"Network error: {str(e)}")
+            if not result[0]:
+                # The share may have just gone away - have the prober look again
+                self.prober.request_probe()
         
-        if username:
+        if username and not result[0]:
             log_action(username, f"Network access test for {path}: {result[1]}")
         
         return result
@@ -104,6 +103,50 @@ class NetworkAccessManager:
             return False, f"No accessible path - Primary: {message}, Fallback: {fallback_message}, Local fallback: {e}", "failed"
 
 
+class MoveSteps:
+    """
+    Step markers for one file move.
+    
+    Completed steps are kept as {step: data}; on_mark(step, data) is called on
+    every change so the owner (the approval job) can persist it. data is None
+    when a step is cleared again.
+    """
+    
+    PLANNED = "planned"
+    COPIED = "copied"
+    VERIFIED = "verified"
+    SOURCE_REMOVED = "source_removed"
+    METADATA_WRITTEN = "metadata_written"
+    USER_NOTIFIED = "user_notified"
+    ARCHIVED = "archived"
+    QUEUE_UPDATED = "queue_updated"
+    
+    ORDER = (PLANNED, COPIED, VERIFIED, SOURCE_REMOVED, METADATA_WRITTEN,
+             USER_NOTIFIED, ARCHIVED, QUEUE_UPDATED)
+    
+    def __init__(self, steps: Dict[str, Dict] = None,
+                 on_mark: Optional[Callable[[str, Optional[Dict]], None]] = None):
+        self.steps: Dict[str, Dict] = dict(steps or {})
+        self._on_mark = on_mark
+    
+    def done(self, step: str) -> bool:
+        return step in self.steps
+    
+    def get(self, step: str) -> Dict:
+        return self.steps.get(step) or {}
+    
+    def mark(self, step: str, **data):
+        self.steps[step] = dict(data, at=datetime.now().isoformat())
+        if self._on_mark:
+            self._on_mark(step, self.steps[step])
+    
+    def clear_from(self, step: str):
+        """Forget step and every later step (used when a step has to be redone)"""
+        for later in self.ORDER[self.ORDER.index(step):]:
+            if self.steps.pop(later, None) is not None and self._on_mark:
+                self._on_mark(later, None)
+
+
 class EnhancedFileMovementService:
     """Enhanced file movement service with admin access management for both approved and rejected files"""
     
@@ -127,10 +170,33 @@ class EnhancedFileMovementService:
             print(f"Error getting user team tag: {e}")
         return "DEFAULT"
     
-    def move_approved_file_with_access_management(self, file_data: Dict, approved_by: str) -> Tuple[bool, str, Optional[str]]:
+    def move_approved_file_with_access_management(self, file_data: Dict, approved_by: str,
+                                                  steps: Optional[MoveSteps] = None,
+                                                  progress: Optional[ProgressCallback] = None) -> Tuple[bool, str, Optional[str]]:
         """
         Move approved file from user uploads to project directory with proper access management and fallback
+        
+        Each step is skipped when already marked in `steps`, so calling this again
+        for an interrupted move finishes it instead of starting over.
+        Across shares the file is streamed with SHA-256 hashing and the target is
+        re-read and verified before the upload is deleted; progress(done, total)
+        is called while copying. Within one filesystem the file is renamed.
+        Without `steps` nobody can resume a failed move, so its reserved target
+        name is released right away (job-owned steps are rolled back by the job).
         """
+        if steps is not None:
+            return self._move_approved_file(file_data, approved_by, steps, progress)
+        steps = MoveSteps()
+        outcome = self._move_approved_file(file_data, approved_by, steps, progress)
+        if not outcome[0]:
+            try:
+                self.rollback_approved_move(steps)
+            except Exception as e:
+                print(f"[FILE_MOVEMENT] Could not release reserved target: {e}")
+        return outcome
+    
+    def _move_approved_file(self, file_data: Dict, approved_by: str, steps: MoveSteps,
+                            progress: Optional[ProgressCallback] = None) -> Tuple[bool, str, Optional[str]]:
         try:
             # Get file information
             original_filename = file_data.get('original_filename')
@@ -140,38 +206,78 @@ class EnhancedFileMovementService:
             if not all([original_filename, current_file_path, user_id]):
                 return False, "Missing file information", None
             
-            if not os.path.exists(current_file_path):
+            if not steps.done(MoveSteps.COPIED) and not os.path.exists(current_file_path):
                 return False, f"Source file not found: {current_file_path}", None
             
-            # Get user's team tag
-            team_tag = self.get_user_team_tag(user_id)
-            current_year = str(datetime.now().year)
-            
-            print(f"[FILE_MOVEMENT] Moving approved file for team: {team_tag}, year: {current_year}")
-            
-            # Get accessible project path
-            has_access, project_dir, access_type = self.access_manager.get_accessible_project_path(
-                team_tag, current_year, approved_by)
-            
-            if not has_access:
-                # Create fallback in network data directory if primary fails
-                fallback_dir = os.path.join(DATA_PATHS.NETWORK_BASE, "approved_files_fallback", team_tag, current_year)
-                try:
-                    os.makedirs(fallback_dir, exist_ok=True)
-                    project_dir = fallback_dir
-                    access_type = "fallback"
-                except Exception as fallback_error:
-                    return False, f"All access methods failed: {project_dir} | Fallback: {fallback_error}", None
-            
-            # Generate unique filename if conflict exists
-            new_filename = self._generate_unique_filename(project_dir, original_filename)
-            new_file_path = os.path.join(project_dir, new_filename)
-            
-            # Move the file (this deletes from user uploads)
-            shutil.move(current_file_path, new_file_path)
+            if not steps.done(MoveSteps.PLANNED):
+                with span("plan_move", "file_movement", path=current_file_path):
+                    success, message = self._plan_approved_move(file_data, approved_by, steps)
+                if not success:
+                    return False, message, None
+            
+            plan = steps.get(MoveSteps.PLANNED)
+            team_tag, current_year, access_type = plan['team_tag'], plan['year'], plan['access_type']
+            new_file_path = plan['target_path']
+            new_filename = os.path.basename(new_file_path)
+            
+            # Copy next to the target first so a crash never leaves a half-written target
+            if not steps.done(MoveSteps.COPIED):
+                reserved = self._is_placeholder(new_file_path)
+                if os.path.exists(new_file_path) and not reserved and not self._is_copy_of(current_file_path, new_file_path):
+                    # Target name was taken since planning - pick a new one
+                    steps.clear_from(MoveSteps.PLANNED)
+                    return self._move_approved_file(file_data, approved_by, steps, progress)
+                if os.path.exists(new_file_path) and not reserved:
+                    # Copied before an interruption - only the marker was lost
+                    steps.mark(MoveSteps.COPIED, size=os.path.getsize(new_file_path),
+                               sha256=hash_file(current_file_path))
+                else:
+                    with span("copy", "file_movement", path=current_file_path, target=new_file_path,
+                              size=plan.get('source_size')) as copy_span:
+                        copied = self._copy_to_target(current_file_path, new_file_path,
+                                                      plan.get('same_filesystem', False), progress)
+                        copy_span.set_tags(renamed=copied['renamed'],
+                                           bytes_written=0 if copied['renamed'] else copied.get('size'))
+                    if copied['renamed'] and access_type != "local_fallback":
+                        # Project files must stay editable - give them their own copy of shared content
+                        get_blob_store().detach(new_file_path, plan.get('sha256'))
+                    steps.mark(MoveSteps.COPIED, **copied)
+            
+            if not steps.done(MoveSteps.VERIFIED):
+                copied = steps.get(MoveSteps.COPIED)
+                # Copies are re-read and hashed; renames only need a stat
+                with span("verify", "file_movement", path=new_file_path,
+                          bytes_read=0 if copied.get('renamed') else copied.get('size')):
+                    verified, verify_message = self._verify_copy(new_file_path, plan, copied)
+                if not verified:
+                    self._remove_quietly(new_file_path)
+                    steps.clear_from(MoveSteps.COPIED)
+                    return False, f"Copy verification failed: {verify_message}", None
+                steps.mark(MoveSteps.VERIFIED)
+            
+            # Only now is it safe to delete from user uploads
+            if not steps.done(MoveSteps.SOURCE_REMOVED):
+                if os.path.exists(current_file_path):
+                    # The upload may be a link to a shared blob
+                    with span("remove_source", "file_movement", path=current_file_path):
+                        get_blob_store().remove(current_file_path, plan.get('sha256'))
+                steps.mark(MoveSteps.SOURCE_REMOVED)
             
             # Create metadata file
-            self._create_approved_file_metadata(new_file_path, file_data, approved_by, team_tag, current_year, access_type)
+            if not steps.done(MoveSteps.METADATA_WRITTEN):
+                with span("metadata_write", "file_movement", path=new_file_path):
+                    metadata_written = self._create_approved_file_metadata(
+                        new_file_path, file_data, approved_by, team_tag, current_year, access_type)
+                if metadata_written:
+                    steps.mark(MoveSteps.METADATA_WRITTEN)
+            
+            # Index the final location so listings do not have to search for it
+            if file_data.get('file_id'):
+                with span("location_index", "file_movement", file_id=file_data['file_id']):
+                    get_approved_location_index().record(
+                        file_data['file_id'], new_file_path, original_filename=original_filename,
+                        user_id=user_id, team_tag=team_tag, year=current_year, access_type=access_type,
+                        checked_at=datetime.now().isoformat())
             
             # Log successful movement
             log_action(approved_by, f"Moved approved file {original_filename} to {access_type} path: {team_tag}/{current_year}")
@@ -189,6 +295,131 @@ class EnhancedFileMovementService:
             print(f"[FILE_MOVEMENT] Error: {error_msg}")
             return False, error_msg, None
     
+    def _plan_approved_move(self, file_data: Dict, approved_by: str, steps: MoveSteps) -> Tuple[bool, str]:
+        """Pick the project directory and target filename and record them as the 'planned' step"""
+        current_file_path = file_data.get('file_path')
+        
+        # Get user's team tag
+        team_tag = self.get_user_team_tag(file_data.get('user_id'))
+        current_year = str(datetime.now().year)
+        
+        print(f"[FILE_MOVEMENT] Moving approved file for team: {team_tag}, year: {current_year}")
+        
+        # Get accessible project path
+        with span("access_probe", "file_movement", team=team_tag, year=current_year) as probe_span:
+            has_access, project_dir, access_type = self.access_manager.get_accessible_project_path(
+                team_tag, current_year, approved_by)
+            probe_span.set_tags(access_type=access_type, has_access=has_access)
+        
+        if not has_access:
+            # Create fallback in network data directory if primary fails
+            fallback_dir = os.path.join(DATA_PATHS.NETWORK_BASE, "approved_files_fallback", team_tag, current_year)
+            try:
+                os.makedirs(fallback_dir, exist_ok=True)
+                project_dir = fallback_dir
+                access_type = "fallback"
+            except Exception as fallback_error:
+                return False, f"All access methods failed: {project_dir} | Fallback: {fallback_error}"
+        
+        # Generate unique filename if conflict exists
+        new_filename = self._generate_unique_filename(project_dir, file_data.get('original_filename'))
+        source_stat = os.stat(current_file_path)
+        steps.mark(MoveSteps.PLANNED,
+                   source_path=current_file_path,
+                   target_path=os.path.join(project_dir, new_filename),
+                   team_tag=team_tag, year=current_year, access_type=access_type,
+                   source_size=source_stat.st_size,
+                   sha256=get_blob_store().recorded_sha256(current_file_path),
+                   same_filesystem=same_filesystem(current_file_path, project_dir))
+        return True, "Planned"
+    
+    @staticmethod
+    def partial_path(target_path: str) -> str:
+        """Temporary name a target is written under until the copy is complete"""
+        return f"{target_path}.partial"
+    
+    def _copy_to_target(self, source_path: str, target_path: str, rename: bool,
+                        progress: Optional[ProgressCallback] = None) -> Dict:
+        """
+        Put the source at target_path: a rename within one filesystem, otherwise a
+        hashed streaming copy via a .partial file (removed again on failure).
+        Returns the data for the 'copied' step marker.
+        """
+        if rename:
+            try:
+                size = os.path.getsize(source_path)
+                # replace, not rename - the target name is held by an empty placeholder
+                os.replace(source_path, target_path)
+                return {'size': size, 'sha256': None, 'renamed': True}
+            except OSError as e:
+                print(f"[FILE_MOVEMENT] Rename failed, copying instead: {e}")
+        
+        partial = self.partial_path(target_path)
+        try:
+            result = copy_file(source_path, partial, progress)
+            os.replace(partial, target_path)
+        except Exception:
+            self._remove_quietly(partial)
+            raise
+        return dict(result, renamed=False)
+    
+    def _verify_copy(self, target_path: str, plan: Dict, copied: Dict) -> Tuple[bool, str]:
+        """Check the target's size (and SHA-256 for copies) before the source is deleted"""
+        if copied.get('renamed'):
+            # A rename moves the same file - size is enough
+            return verify_file(target_path, plan.get('source_size', copied.get('size')))
+        return verify_file(target_path, copied.get('size'), copied.get('sha256'))
+    
+    @staticmethod
+    def _is_placeholder(path: str) -> bool:
+        """True for the placeholder _generate_unique_filename reserves a name with"""
+        return get_filename_allocator().is_reservation(path)
+    
+    @staticmethod
+    def _is_copy_of(source_path: str, target_path: str) -> bool:
+        """True if target looks like our copy of source (copy2 keeps size and mtime)"""
+        try:
+            source_stat, target_stat = os.stat(source_path), os.stat(target_path)
+        except OSError:
+            return False
+        return (source_stat.st_size == target_stat.st_size
+                and abs(source_stat.st_mtime - target_stat.st_mtime) < 2)
+    
+    @staticmethod
+    def _remove_quietly(path: str):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"[FILE_MOVEMENT] Could not remove {path}: {e}")
+    
+    def rollback_approved_move(self, steps: MoveSteps) -> bool:
+        """
+        Undo an interrupted move that never got past the copy.
+        
+        Removes the partial file and an unverified target that is a copy of the
+        still existing source (so neither the last copy of a file nor someone
+        else's file is ever deleted) and clears the plan.
+        Returns True if the move was rolled back.
+        """
+        if steps.done(MoveSteps.VERIFIED):
+            return False
+        plan = steps.get(MoveSteps.PLANNED)
+        target_path = plan.get('target_path')
+        source_path = plan.get('source_path') or ''
+        if target_path:
+            self._remove_quietly(self.partial_path(target_path))
+            if self._is_copy_of(source_path, target_path) or self._is_placeholder(target_path):
+                self._remove_quietly(target_path)
+            elif (steps.get(MoveSteps.COPIED).get('renamed') or plan.get('same_filesystem')) \
+                    and not os.path.exists(source_path) and os.path.exists(target_path) \
+                    and os.path.getsize(target_path) == plan.get('source_size'):
+                # Renamed before the interruption - put the file back in uploads
+                os.rename(target_path, source_path)
+        steps.clear_from(MoveSteps.PLANNED)
+        print(f"[FILE_MOVEMENT] Rolled back interrupted move to {target_path}")
+        return True
+    
     def move_rejected_file_to_archive(self, file_data: Dict, rejected_by: str, rejection_reason: str) -> Tuple[bool, str, Optional[str]]:
         """
         Move rejected file from user uploads to archive directory and clean up from user uploads
@@ -219,8 +450,12 @@ class EnhancedFileMovementService:
             new_filename = self._generate_unique_filename(rejected_dir, original_filename)
             new_file_path = os.path.join(rejected_dir, new_filename)
             
-            # Move the file to rejected archive (this deletes from user uploads)
-            shutil.move(current_file_path, new_file_path)
+            # Move the file to rejected archive (this deletes from user uploads after verifying the copy)
+            try:
+                move_file(current_file_path, new_file_path, remove=get_blob_store().remove)
+            except Exception:
+                get_filename_allocator().release(new_file_path)
+                raise
             
             # Create metadata file for rejected file
             self._create_rejected_file_metadata(new_file_path, file_data, rejected_by, rejection_reason, team_tag, current_year)
@@ -239,26 +474,15 @@ class EnhancedFileMovementService:
             return False, error_msg, None
     
     def _generate_unique_filename(self, directory: str, filename: str) -> str:
-        """Generate unique filename if conflict exists"""
-        if not os.path.exists(os.path.join(directory, filename)):
-            return filename
-        
-        name, ext = os.path.splitext(filename)
-        counter = 1
-        
-        while True:
-            new_filename = f"{name}_{counter:03d}{ext}"
-            if not os.path.exists(os.path.join(directory, new_filename)):
-                return new_filename
-            counter += 1
-            
-            if counter > 999:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                return f"{name}_{timestamp}{ext}"
+        """
+        Generate unique filename if conflict exists
+        The name is reserved as an empty placeholder file that the move replaces.
+        """
+        return get_filename_allocator().allocate(directory, filename)
     
     def _create_approved_file_metadata(self, file_path: str, file_data: Dict, approved_by: str, 
-                                     team_tag: str, year: str, access_type: str):
-        """Create metadata file for approved file using metadata manager"""
+                                     team_tag: str, year: str, access_type: str) -> bool:
+        """Create metadata file for approved file using metadata manager (returns True if saved)"""
         try:
             metadata = {
                 "original_submission": {
@@ -301,9 +525,11 @@ class EnhancedFileMovementService:
                 print(f"[METADATA] {message}")
             else:
                 print(f"[METADATA] Error: {message}")
+            return success
                 
         except Exception as e:
             print(f"Error creating approved file metadata: {e}")
+            return False
     
     def _create_rejected_file_metadata(self, file_path: str, file_data: Dict, rejected_by: str, 
                                      rejection_reason: str, team_tag: str, year: str):
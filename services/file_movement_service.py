@@ -1,11 +1,12 @@
 import os
-import shutil
 import json
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Tuple, Optional
 from utils.metadata_manager import get_metadata_manager
 from utils.path_config import DATA_PATHS
+from utils.filename_allocator import get_filename_allocator
+from utils.file_copy import move_file
 from utils.logger import log_action
 from typing import List
 
@@ -98,8 +99,12 @@ class FileMovementService:
             new_filename = self._generate_unique_filename(project_dir, original_filename)
             new_file_path = os.path.join(project_dir, new_filename)
             
-            # Move the file
-            shutil.move(current_file_path, new_file_path)
+            # Move the file (replaces the reserved placeholder; copies are verified before the source is deleted)
+            try:
+                move_file(current_file_path, new_file_path)
+            except Exception:
+                get_filename_allocator().release(new_file_path)
+                raise
             
             # Create metadata file for the moved file
             self._create_file_metadata(new_file_path, file_data, approved_by, team_tag, current_year)
@@ -116,23 +121,11 @@ class FileMovementService:
             return False, f"Error moving file: {str(e)}", None
     
     def _generate_unique_filename(self, directory: str, filename: str) -> str:
-        """Generate unique filename if conflict exists"""
-        if not os.path.exists(os.path.join(directory, filename)):
-            return filename
-        
-        name, ext = os.path.splitext(filename)
-        counter = 1
-        
-        while True:
-            new_filename = f"{name}_{counter:03d}{ext}"
-            if not os.path.exists(os.path.join(directory, new_filename)):
-                return new_filename
-            counter += 1
-            
-            # Safety limit
-            if counter > 999:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                return f"{name}_{timestamp}{ext}"
+        """
+        Generate unique filename if conflict exists
+        The name is reserved as an empty placeholder file that the move replaces.
+        """
+        return get_filename_allocator().allocate(directory, filename)
     
     def _create_file_metadata(self, file_path: str, file_data: Dict, approved_by: str, team_tag: str, year: str):
         """Create metadata file for the moved file using metadata manager"""
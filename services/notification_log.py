@@ -0,0 +1,445 @@
+"""
+Per-user append-only notification log
+
+Every notification used to be a read-modify-write of the user's whole
+approval_notifications.json: duplicate detection scanned the list, anything
+past the newest 50-100 entries was silently dropped, and the 5-second unread
+badge refresh parsed the whole file just to count unread entries.
+
+Notifications are now appended to user_approvals/<user>/notifications.jsonl,
+one JSON line each with a unique id and a per-user sequence number. Read
+state lives in a small notification_state.json next to it:
+
+    read_cursor   every notification with seq <= read_cursor is read
+    read_mask     bitmap (hex) of read notifications above the cursor;
+                  bit i is seq read_cursor + 1 + i, and the cursor advances
+                  over leading read bits so the bitmap stays small
+    deleted       seqs dismissed by the user (dropped on compaction)
+    total/unread  counters kept in step by every write
+    dedupe        recent dedupe keys -> [seq, epoch seconds]
+    broadcast_*   read and dismissal cursors into the shared broadcast
+                  stream, with the seqs read/dismissed above each cursor
+                  (a new user's cursors start at the end of the stream)
+
+get_unread_count() is a counter read from the (cached) state file plus the
+broadcast stream's head, and the log is parsed incrementally - only lines
+appended since the last read. Broadcasts are merged into get_notifications()
+lazily, with ids of the form "broadcast:<seq>". The legacy
+approval_notifications.json is converted on first use and kept as
+approval_notifications.json.migrated.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.jsonl import JsonlTailReader, append_jsonl, write_jsonl
+from utils.atomic_write import atomic_write_json
+from services.change_feed import publish_event
+from services.broadcast_stream import get_broadcast_stream
+
+STATE_VERSION = 1
+DEDUPE_KEEP = 500           # dedupe keys remembered per user
+COMPACT_MIN_DELETED = 100   # rewrite the log once this many deleted lines make up half of it
+BROADCAST_PREFIX = "broadcast:"
+
+
+class NotificationLog:
+    """Append-only notification log of one user with cursor-based read state"""
+
+    def __init__(self, username: str, user_dir: str = None):
+        self.username = username
+        self.user_dir = user_dir or DATA_PATHS.get_user_approval_dir(username)
+        self.log_file = os.path.join(self.user_dir, "notifications.jsonl")
+        self.state_file = os.path.join(self.user_dir, "notification_state.json")
+        self.legacy_file = os.path.join(self.user_dir, "approval_notifications.json")
+        self._committer = GroupCommitter(
+            get_file_lock(f"{self.state_file}.lock"),
+            self._load_state,
+            self._save_state,
+            name=f"{username} notifications")
+        self._log_reader = JsonlTailReader("NOTIFICATIONS")
+
+    # ---- state ----
+
+    @staticmethod
+    def _empty_state() -> Dict:
+        return {
+            'version': STATE_VERSION,
+            'last_seq': 0,
+            'total': 0,
+            'unread': 0,
+            'read_cursor': 0,
+            'read_mask': '0',
+            'deleted': [],
+            'by_type': {},
+            'dedupe': {},
+            'broadcast_read_cursor': 0,
+            'broadcast_read': [],
+            'broadcast_dismissed_cursor': 0,
+            'broadcast_dismissed': []
+        }
+
+    def _load_state(self) -> Dict:
+        state = None
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if content.strip():
+                state = json.loads(content)
+        if state is None:
+            state = self._empty_state()
+            if os.path.exists(self.legacy_file):
+                self._migrate_legacy(state)
+            else:
+                # A new user starts at the end of the broadcast stream - earlier
+                # broadcasts were sent before they had an account
+                broadcast_last = get_broadcast_stream().get_last_seq()
+                state['broadcast_read_cursor'] = broadcast_last
+                state['broadcast_dismissed_cursor'] = broadcast_last
+        self._reconcile(state)
+        return state
+
+    def _save_state(self, state: Dict):
+        atomic_write_json(self.state_file, state, indent=2)
+        get_json_cache().invalidate(self.state_file)
+
+    def get_state(self) -> Dict:
+        """Cached, read-only view of the state file"""
+        state = load_json_cached(self.state_file, None, copy_result=False)
+        if state is None:
+            # First use - an empty commit converts the legacy file or pins the
+            # broadcast cursors of a new user
+            self._committer.submit(lambda state: True)
+            state = load_json_cached(self.state_file, None, copy_result=False)
+        return state or self._empty_state()
+
+    @staticmethod
+    def _is_read(state: Dict, seq: int) -> bool:
+        offset = seq - state['read_cursor'] - 1
+        return offset < 0 or bool((int(state['read_mask'], 16) >> offset) & 1)
+
+    @staticmethod
+    def _set_read(state: Dict, seqs: Iterable[int]):
+        cursor = state['read_cursor']
+        mask = int(state['read_mask'], 16)
+        for seq in seqs:
+            if seq > cursor:
+                mask |= 1 << (seq - cursor - 1)
+        # Advance the cursor over the leading run of read (or deleted) notifications
+        deleted = set(state['deleted'])
+        while cursor < state['last_seq'] and (mask & 1 or cursor + 1 in deleted):
+            mask >>= 1
+            cursor += 1
+        state['read_cursor'] = cursor
+        state['read_mask'] = format(mask, 'x')
+
+    @staticmethod
+    def _split_ids(ids: Iterable[str]) -> Tuple[List[str], List[int]]:
+        """Personal notification ids and broadcast seqs"""
+        personal, broadcasts = [], []
+        for notification_id in ids:
+            if isinstance(notification_id, str) and notification_id.startswith(BROADCAST_PREFIX):
+                broadcasts.append(int(notification_id[len(BROADCAST_PREFIX):]))
+            else:
+                personal.append(notification_id)
+        return personal, broadcasts
+
+    @staticmethod
+    def _broadcast_mark(state: Dict, field: str, seqs: Iterable[int], last_seq: int) -> bool:
+        """Add seqs to a broadcast cursor + set pair ('read' or 'dismissed') and advance the cursor"""
+        cursor = state.get(f'broadcast_{field}_cursor', 0)
+        above = set(state.get(f'broadcast_{field}', []))
+        before = (cursor, len(above))
+        above.update(seq for seq in seqs if cursor < seq <= last_seq)
+        while cursor + 1 in above:
+            cursor += 1
+            above.discard(cursor)
+        state[f'broadcast_{field}_cursor'] = cursor
+        state[f'broadcast_{field}'] = sorted(above)
+        return (cursor, len(above)) != before
+
+    @staticmethod
+    def _broadcast_unread(state: Dict, last_seq: int) -> int:
+        read_above = [seq for seq in state.get('broadcast_read', []) if seq <= last_seq]
+        return max(0, last_seq - state.get('broadcast_read_cursor', 0) - len(read_above))
+
+    def _reconcile(self, state: Dict):
+        """Count lines appended by a writer that died before saving the state"""
+        for entry in self._read_log():
+            if entry['seq'] > state['last_seq']:
+                state['last_seq'] = entry['seq']
+                state['total'] += 1
+                state['unread'] += 1
+                notification_type = entry.get('type', 'system')
+                state['by_type'][notification_type] = state['by_type'].get(notification_type, 0) + 1
+
+    def _migrate_legacy(self, state: Dict):
+        """Convert approval_notifications.json (newest first, 'read' flags) into the log (under the lock)"""
+        if not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            legacy = json.loads(content) if content.strip() else []
+        except Exception as e:
+            print(f"[NOTIFICATIONS] Could not read legacy notifications for {self.username}: {e}")
+            return
+        if not isinstance(legacy, list):
+            legacy = []
+
+        entries = []
+        read_seqs = []
+        for seq, notification in enumerate(reversed(legacy), start=1):
+            entry = dict(notification, seq=seq)
+            entry.setdefault('id', str(uuid.uuid4()))
+            if entry.pop('read', False):
+                read_seqs.append(seq)
+            entries.append(entry)
+
+        # Whole-file write: a conversion interrupted before the state was saved just runs again
+        write_jsonl(self.log_file, entries)
+
+        state['last_seq'] = len(entries)
+        state['total'] = len(entries)
+        state['unread'] = len(entries) - len(read_seqs)
+        for entry in entries:
+            notification_type = entry.get('type', 'system')
+            state['by_type'][notification_type] = state['by_type'].get(notification_type, 0) + 1
+        self._set_read(state, read_seqs)
+
+        # Save the state before retiring the legacy file so the log is never orphaned
+        self._save_state(state)
+        os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+        print(f"[NOTIFICATIONS] Converted {len(entries)} notification(s) for {self.username}")
+
+    # ---- log ----
+
+    def _read_log(self) -> List[Dict]:
+        """Entries of the log, oldest first; only bytes appended since the last read are parsed"""
+        return self._log_reader.read(self.log_file)
+
+    def _compact(self, state: Dict):
+        """Rewrite the log without deleted lines (under the lock)"""
+        deleted = set(state['deleted'])
+        write_jsonl(self.log_file, [entry for entry in self._read_log() if entry['seq'] not in deleted])
+        state['deleted'] = []
+        print(f"[NOTIFICATIONS] Compacted log for {self.username}: dropped {len(deleted)} deleted line(s)")
+
+    # ---- writing ----
+
+    def append(self, notifications: List[Dict], dedupe_window: Optional[float] = None) -> int:
+        """
+        Append notifications (oldest first). A notification with a 'dedupe_key'
+        is skipped if the same key was logged within dedupe_window seconds
+        (ever, when None). Returns the number of notifications added.
+        """
+        if not notifications:
+            return 0
+        added = []
+
+        def apply(state):
+            now = time.time()
+            entries = []
+            for notification in notifications:
+                dedupe_key = notification.get('dedupe_key')
+                if dedupe_key:
+                    seen = state['dedupe'].get(dedupe_key)
+                    if seen and (dedupe_window is None or now - seen[1] < dedupe_window):
+                        print(f"[NOTIFICATIONS] Duplicate notification skipped for {self.username}: {dedupe_key}")
+                        continue
+                state['last_seq'] += 1
+                entry = {key: value for key, value in notification.items() if key not in ('read', 'dedupe_key')}
+                entry.setdefault('id', str(uuid.uuid4()))
+                entry.setdefault('timestamp', datetime.now().isoformat())
+                entry['seq'] = state['last_seq']
+                entries.append(entry)
+                if dedupe_key:
+                    state['dedupe'].pop(dedupe_key, None)
+                    state['dedupe'][dedupe_key] = [entry['seq'], now]
+            if not entries:
+                return False
+
+            append_jsonl(self.log_file, entries)
+            state['total'] += len(entries)
+            state['unread'] += len(entries)
+            for entry in entries:
+                notification_type = entry.get('type', 'system')
+                state['by_type'][notification_type] = state['by_type'].get(notification_type, 0) + 1
+            for key in list(state['dedupe'])[:max(0, len(state['dedupe']) - DEDUPE_KEEP)]:
+                del state['dedupe'][key]
+            added.extend(entries)
+            return True
+
+        if not self._committer.submit(apply):
+            print(f"[NOTIFICATIONS] Failed to log {len(notifications)} notification(s) for {self.username}")
+            return 0
+        if added:
+            publish_event('notification_added', user=self.username, count=len(added))
+        return len(added)
+
+    def _seqs_for(self, ids: Iterable[str]) -> List[int]:
+        wanted = set(ids)
+        return [entry['seq'] for entry in self._read_log() if entry.get('id') in wanted]
+
+    def mark_read(self, ids: Iterable[str]) -> bool:
+        """Mark notifications (and broadcasts) read by id"""
+        personal_ids, broadcast_seqs = self._split_ids(ids)
+        seqs = self._seqs_for(personal_ids) if personal_ids else []
+        if not seqs and not broadcast_seqs:
+            return False
+        broadcast_last = get_broadcast_stream().get_last_seq() if broadcast_seqs else 0
+
+        def apply(state):
+            deleted = set(state['deleted'])
+            newly_read = [seq for seq in seqs if seq not in deleted and not self._is_read(state, seq)]
+            changed = self._broadcast_mark(state, 'read', broadcast_seqs, broadcast_last)
+            if not newly_read:
+                return changed
+            self._set_read(state, newly_read)
+            state['unread'] = max(0, state['unread'] - len(newly_read))
+            return True
+
+        return self._committer.submit(apply)
+
+    def mark_all_read(self) -> bool:
+        """Mark every notification and broadcast read (moves the cursors to the newest ones)"""
+        broadcast_last = get_broadcast_stream().get_last_seq()
+
+        def apply(state):
+            if (state['unread'] == 0 and state['read_cursor'] == state['last_seq']
+                    and self._broadcast_unread(state, broadcast_last) == 0):
+                return False
+            state['read_cursor'] = state['last_seq']
+            state['read_mask'] = '0'
+            state['unread'] = 0
+            state['broadcast_read_cursor'] = max(state.get('broadcast_read_cursor', 0), broadcast_last)
+            state['broadcast_read'] = []
+            return True
+
+        return self._committer.submit(apply)
+
+    def delete(self, ids: Iterable[str]) -> bool:
+        """Dismiss notifications (and broadcasts) by id (lines are dropped on the next compaction)"""
+        personal_ids, broadcast_seqs = self._split_ids(ids)
+        wanted = set(personal_ids)
+        targets = [(entry['seq'], entry.get('type', 'system')) for entry in self._read_log()
+                   if entry.get('id') in wanted] if wanted else []
+        if not targets and not broadcast_seqs:
+            return False
+        broadcast_last = get_broadcast_stream().get_last_seq() if broadcast_seqs else 0
+
+        def apply(state):
+            deleted = set(state['deleted'])
+            # A dismissed broadcast also counts as read
+            changed = self._broadcast_mark(state, 'dismissed', broadcast_seqs, broadcast_last)
+            self._broadcast_mark(state, 'read', broadcast_seqs, broadcast_last)
+            for seq, notification_type in targets:
+                if seq in deleted:
+                    continue
+                if not self._is_read(state, seq):
+                    state['unread'] = max(0, state['unread'] - 1)
+                state['total'] = max(0, state['total'] - 1)
+                state['by_type'][notification_type] = max(0, state['by_type'].get(notification_type, 0) - 1)
+                state['deleted'].append(seq)
+                deleted.add(seq)
+                changed = True
+            if not changed:
+                return False
+            self._set_read(state, [])
+            if (len(state['deleted']) >= COMPACT_MIN_DELETED
+                    and len(state['deleted']) * 2 >= state['total'] + len(state['deleted'])):
+                self._compact(state)
+            return True
+
+        return self._committer.submit(apply)
+
+    def clear(self) -> bool:
+        """Dismiss every notification and broadcast (truncates the log)"""
+        broadcast_last = get_broadcast_stream().get_last_seq()
+
+        def apply(state):
+            state.update(broadcast_read_cursor=max(state.get('broadcast_read_cursor', 0), broadcast_last),
+                         broadcast_read=[],
+                         broadcast_dismissed_cursor=max(state.get('broadcast_dismissed_cursor', 0), broadcast_last),
+                         broadcast_dismissed=[])
+            if os.path.exists(self.log_file):
+                write_jsonl(self.log_file, [])
+            state.update(total=0, unread=0, read_cursor=state['last_seq'], read_mask='0',
+                         deleted=[], by_type={})
+            return True
+
+        return self._committer.submit(apply)
+
+    # ---- reading ----
+
+    def _get_broadcasts(self, state: Dict) -> List[Dict]:
+        """Broadcasts this user has not dismissed, newest first, in notification form"""
+        dismissed = set(state.get('broadcast_dismissed', []))
+        read_cursor = state.get('broadcast_read_cursor', 0)
+        read_above = set(state.get('broadcast_read', []))
+        broadcasts = []
+        for broadcast in get_broadcast_stream().get_since(state.get('broadcast_dismissed_cursor', 0)):
+            seq = broadcast['seq']
+            if seq in dismissed:
+                continue
+            broadcasts.append(dict(broadcast, id=f"{BROADCAST_PREFIX}{seq}", broadcast=True,
+                                   read=seq <= read_cursor or seq in read_above))
+        broadcasts.reverse()
+        return broadcasts
+
+    def get_notifications(self, limit: Optional[int] = None) -> List[Dict]:
+        """Notifications and broadcasts newest first, each with its 'read' flag"""
+        state = self.get_state()
+        deleted = set(state.get('deleted', []))
+        notifications = []
+        for entry in reversed(self._read_log()):
+            if entry['seq'] in deleted or entry['seq'] > state['last_seq']:
+                continue
+            notifications.append(dict(entry, read=self._is_read(state, entry['seq'])))
+            if limit is not None and len(notifications) >= limit:
+                break
+        broadcasts = self._get_broadcasts(state)
+        if broadcasts:
+            # Stable sort - personal notifications with equal timestamps keep their order
+            notifications = sorted(notifications + broadcasts, key=lambda n: n.get('timestamp') or '', reverse=True)
+            if limit is not None:
+                notifications = notifications[:limit]
+        return notifications
+
+    def get_unread_count(self) -> int:
+        """Unread notifications and broadcasts (counter reads - the logs are not parsed)"""
+        state = self.get_state()
+        return state.get('unread', 0) + self._broadcast_unread(state, get_broadcast_stream().get_last_seq())
+
+    def get_summary(self) -> Dict:
+        """Total/unread counters and per-type counts (broadcasts under 'broadcast')"""
+        state = self.get_state()
+        broadcast_last = get_broadcast_stream().get_last_seq()
+        dismissed_above = [seq for seq in state.get('broadcast_dismissed', []) if seq <= broadcast_last]
+        broadcasts = max(0, broadcast_last - state.get('broadcast_dismissed_cursor', 0) - len(dismissed_above))
+        by_type = dict(state.get('by_type', {}))
+        if broadcasts:
+            by_type['broadcast'] = by_type.get('broadcast', 0) + broadcasts
+        return {'total': state.get('total', 0) + broadcasts,
+                'unread': state.get('unread', 0) + self._broadcast_unread(state, broadcast_last),
+                'by_type': by_type}
+
+
+# Per-user log instances
+_notification_logs: Dict[str, NotificationLog] = {}
+_notification_logs_lock = threading.Lock()
+
+
+def get_notification_log(username: str) -> NotificationLog:
+    """Get the notification log of a user"""
+    with _notification_logs_lock:
+        if username not in _notification_logs:
+            _notification_logs[username] = NotificationLog(username)
+        return _notification_logs[username]
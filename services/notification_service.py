@@ -1,7 +1,8 @@
 import os
-import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List
+from services.notification_log import get_notification_log
+from services.broadcast_stream import get_broadcast_stream
 
 class NotificationService:
     """Service to handle notifications between admin and users"""
@@ -12,41 +13,32 @@ class NotificationService:
     
     def notify_approval_status(self, username: str, filename: str, status: str, admin_id: str, reason: str = ""):
         """Send approval status notification to user"""
+        return self.notify_approval_statuses(username, [{
+            'filename': filename,
+            'status': status,
+            'admin_id': admin_id,
+            'reason': reason
+        }])
+    
+    def notify_approval_statuses(self, username: str, items: List[Dict]) -> bool:
+        """Send several approval status notifications to one user with a single log append"""
+        if not items:
+            return True
         try:
-            # Use centralized data folder for notifications
-            user_data_folder = os.path.join(r"\\KMTI-NAS\Shared\data", "user_approvals", username)
-            notifications_file = os.path.join(user_data_folder, "approval_notifications.json")
-            
-            # Load existing notifications
-            notifications = []
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r') as f:
-                    data = json.load(f)
-                    notifications = data if isinstance(data, list) else []
-            
-            # Create notification
-            notification = {
+            timestamp = datetime.now().isoformat()
+            added = get_notification_log(username).append([{
                 'type': 'approval_status',
-                'filename': filename,
-                'status': status,
-                'admin_id': admin_id,
-                'reason': reason,
-                'timestamp': datetime.now().isoformat(),
-                'read': False
-            }
-            
-            # Add to beginning of list
-            notifications.insert(0, notification)
-            
-            # Keep only last 100 notifications
-            notifications = notifications[:100]
-            
-            # Save notifications
-            os.makedirs(user_data_folder, exist_ok=True)
-            with open(notifications_file, 'w') as f:
-                json.dump(notifications, f, indent=2)
+                'filename': item.get('filename'),
+                'status': item.get('status'),
+                'admin_id': item.get('admin_id'),
+                'reason': item.get('reason', ""),
+                'timestamp': timestamp
+            } for item in items])
+            if not added:
+                return False
             
-            print(f"Notification sent to {username}: {filename} - {status}")
+            for item in items:
+                print(f"Notification sent to {username}: {item.get('filename')} - {item.get('status')}")
             return True
             
         except Exception as e:
@@ -56,17 +48,6 @@ class NotificationService:
     def notify_comment_added(self, username: str, filename: str, comment_author_role: str, comment_author: str, comment: str):
         """🚨 ENHANCED: Send comment notification to user with role support"""
         try:
-            # Use centralized data folder for notifications
-            user_data_folder = os.path.join(r"\\KMTI-NAS\Shared\data", "user_approvals", username)
-            notifications_file = os.path.join(user_data_folder, "approval_notifications.json")
-            
-            # Load existing notifications
-            notifications = []
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    notifications = data if isinstance(data, list) else []
-            
             # Create role-specific display text
             role_display = {
                 'admin': 'Admin',
@@ -74,16 +55,10 @@ class NotificationService:
                 'user': 'User'
             }.get(comment_author_role, comment_author_role.title())
             
-            # Create notification with comment ID to prevent duplicates
+            # Comment ID doubles as the dedupe key - the log skips a comment it has already seen
             comment_id = f"{filename}_{comment_author}_{comment[:20]}_{datetime.now().strftime('%Y%m%d_%H%M')}"
             
-            # Check for duplicate notifications
-            existing_ids = [n.get('comment_id') for n in notifications if n.get('type') == 'comment_added']
-            if comment_id in existing_ids:
-                print(f"[INFO] Duplicate comment notification prevented for {username}: {comment_id}")
-                return True
-            
-            notification = {
+            added = get_notification_log(username).append([{
                 'type': 'comment_added',
                 'filename': filename,
                 'comment_author': comment_author,
@@ -91,20 +66,12 @@ class NotificationService:
                 'role_display': role_display,
                 'comment': comment,
                 'comment_id': comment_id,
-                'timestamp': datetime.now().isoformat(),
-                'read': False
-            }
-            
-            # Add to beginning of list
-            notifications.insert(0, notification)
-            
-            # Keep only last 100 notifications
-            notifications = notifications[:100]
-            
-            # Save notifications
-            os.makedirs(user_data_folder, exist_ok=True)
-            with open(notifications_file, 'w', encoding='utf-8') as f:
-                json.dump(notifications, f, indent=2)
+                'dedupe_key': f"comment:{comment_id}",
+                'timestamp': datetime.now().isoformat()
+            }])
+            if not added:
+                print(f"[INFO] Duplicate comment notification prevented for {username}: {comment_id}")
+                return True
             
             print(f"[SUCCESS] Comment notification sent to {username}: {role_display} {comment_author} commented on {filename}")
             return True
@@ -114,38 +81,20 @@ class NotificationService:
             return False
     
     def get_user_notifications(self, username: str) -> List[Dict]:
-        """Get all notifications for a user"""
+        """Get all notifications for a user (newest first)"""
         try:
-            # Use centralized data folder for notifications
-            user_data_folder = os.path.join(r"\\KMTI-NAS\Shared\data", "user_approvals", username)
-            notifications_file = os.path.join(user_data_folder, "approval_notifications.json")
-            
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r') as f:
-                    data = json.load(f)
-                    return data if isinstance(data, list) else []
-            
+            return get_notification_log(username).get_notifications()
         except Exception as e:
             print(f"Error getting notifications for {username}: {e}")
         
         return []
     
     def mark_notification_read(self, username: str, notification_index: int) -> bool:
-        """Mark a specific notification as read"""
+        """Mark a specific notification as read (index into get_user_notifications)"""
         try:
-            user_folder = f"data/uploads/{username}"
-            notifications_file = os.path.join(user_folder, "approval_notifications.json")
-            
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r') as f:
-                    notifications = json.load(f)
-                    if isinstance(notifications, list) and 0 <= notification_index < len(notifications):
-                        notifications[notification_index]['read'] = True
-                        
-                        with open(notifications_file, 'w') as f:
-                            json.dump(notifications, f, indent=2)
-                        
-                        return True
+            notifications = self.get_user_notifications(username)
+            if 0 <= notification_index < len(notifications):
+                return get_notification_log(username).mark_read([notifications[notification_index]['id']])
             
         except Exception as e:
             print(f"Error marking notification as read for {username}: {e}")
@@ -155,31 +104,16 @@ class NotificationService:
     def mark_all_notifications_read(self, username: str) -> bool:
         """Mark all notifications as read for a user"""
         try:
-            user_folder = f"data/uploads/{username}"
-            notifications_file = os.path.join(user_folder, "approval_notifications.json")
-            
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r') as f:
-                    notifications = json.load(f)
-                    if isinstance(notifications, list):
-                        for notification in notifications:
-                            notification['read'] = True
-                        
-                        with open(notifications_file, 'w') as f:
-                            json.dump(notifications, f, indent=2)
-                        
-                        return True
-            
+            return get_notification_log(username).mark_all_read()
         except Exception as e:
             print(f"Error marking all notifications as read for {username}: {e}")
         
         return False
     
     def get_unread_count(self, username: str) -> int:
-        """Get count of unread notifications for a user"""
+        """Get count of unread notifications for a user (counter read, the log is not parsed)"""
         try:
-            notifications = self.get_user_notifications(username)
-            return len([n for n in notifications if not n.get('read', False)])
+            return get_notification_log(username).get_unread_count()
         except Exception as e:
             print(f"Error getting unread count for {username}: {e}")
             return 0
@@ -187,35 +121,14 @@ class NotificationService:
     def send_system_notification(self, username: str, title: str, message: str, notification_type: str = "system"):
         """Send a system notification to a user"""
         try:
-            user_folder = f"data/uploads/{username}"
-            notifications_file = os.path.join(user_folder, "approval_notifications.json")
-            
-            # Load existing notifications
-            notifications = []
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r') as f:
-                    data = json.load(f)
-                    notifications = data if isinstance(data, list) else []
-            
-            # Create system notification
-            notification = {
+            added = get_notification_log(username).append([{
                 'type': notification_type,
                 'title': title,
                 'message': message,
-                'timestamp': datetime.now().isoformat(),
-                'read': False
-            }
-            
-            # Add to beginning of list
-            notifications.insert(0, notification)
-            
-            # Keep only last 100 notifications
-            notifications = notifications[:100]
-            
-            # Save notifications
-            os.makedirs(user_folder, exist_ok=True)
-            with open(notifications_file, 'w') as f:
-                json.dump(notifications, f, indent=2)
+                'timestamp': datetime.now().isoformat()
+            }])
+            if not added:
+                return False
             
             print(f"System notification sent to {username}: {title}")
             return True
@@ -225,24 +138,14 @@ class NotificationService:
             return False
     
     def broadcast_notification(self, title: str, message: str, notification_type: str = "broadcast"):
-        """Send notification to all users"""
+        """Send notification to all users (one append to the shared broadcast stream)"""
         try:
-            users_file = "data/users.json"
-            if not os.path.exists(users_file):
+            broadcast = get_broadcast_stream().broadcast(title, message, notification_type)
+            if not broadcast:
                 return False
             
-            with open(users_file, 'r') as f:
-                users = json.load(f)
-            
-            success_count = 0
-            for email, user_data in users.items():
-                username = user_data.get('username')
-                if username:
-                    if self.send_system_notification(username, title, message, notification_type):
-                        success_count += 1
-            
-            print(f"Broadcast notification sent to {success_count} users")
-            return success_count > 0
+            print(f"Broadcast notification #{broadcast['seq']} sent to all users: {title}")
+            return True
             
         except Exception as e:
             print(f"Error broadcasting notification: {e}")
@@ -251,33 +154,20 @@ class NotificationService:
     def cleanup_old_notifications(self, username: str, days: int = 30) -> bool:
         """Clean up old notifications for a user"""
         try:
-            user_folder = f"data/uploads/{username}"
-            notifications_file = os.path.join(user_folder, "approval_notifications.json")
-            
-            if os.path.exists(notifications_file):
-                with open(notifications_file, 'r') as f:
-                    notifications = json.load(f)
-                    if isinstance(notifications, list):
-                        cutoff_date = datetime.now()
-                        cutoff_date = cutoff_date.replace(day=cutoff_date.day - days)
-                        
-                        # Filter out old notifications
-                        filtered_notifications = []
-                        for notification in notifications:
-                            try:
-                                timestamp = datetime.fromisoformat(notification['timestamp'])
-                                if timestamp >= cutoff_date:
-                                    filtered_notifications.append(notification)
-                            except:
-                                # Keep notifications with invalid timestamps
-                                filtered_notifications.append(notification)
-                        
-                        if len(filtered_notifications) != len(notifications):
-                            with open(notifications_file, 'w') as f:
-                                json.dump(filtered_notifications, f, indent=2)
-                            print(f"Cleaned up {len(notifications) - len(filtered_notifications)} old notifications for {username}")
-                        
-                        return True
+            cutoff_date = datetime.now() - timedelta(days=days)
+            old_ids = []
+            for notification in self.get_user_notifications(username):
+                try:
+                    if datetime.fromisoformat(notification['timestamp']) < cutoff_date:
+                        old_ids.append(notification['id'])
+                except (KeyError, ValueError):
+                    # Keep notifications with invalid timestamps
+                    continue
+            
+            if old_ids:
+                get_notification_log(username).delete(old_ids)
+                print(f"Cleaned up {len(old_ids)} old notifications for {username}")
+            return True
             
         except Exception as e:
             print(f"Error cleaning up notifications for {username}: {e}")
@@ -285,32 +175,21 @@ class NotificationService:
         return False
     
     def get_notification_summary(self, username: str) -> Dict:
-        """Get summary of notifications for a user"""
+        """Get summary of notifications for a user (from the log counters)"""
         try:
-            notifications = self.get_user_notifications(username)
-            
-            summary = {
-                'total': len(notifications),
-                'unread': 0,
-                'approval_status': 0,
-                'comments': 0,
-                'system': 0
+            counters = get_notification_log(username).get_summary()
+            by_type = counters['by_type']
+            approval_status = by_type.get('approval_status', 0)
+            comments = by_type.get('comment_added', 0)
+            
+            return {
+                'total': counters['total'],
+                'unread': counters['unread'],
+                'approval_status': approval_status,
+                'comments': comments,
+                'system': max(0, counters['total'] - approval_status - comments)
             }
             
-            for notification in notifications:
-                if not notification.get('read', False):
-                    summary['unread'] += 1
-                
-                notification_type = notification.get('type', 'system')
-                if notification_type == 'approval_status':
-                    summary['approval_status'] += 1
-                elif notification_type == 'comment_added':
-                    summary['comments'] += 1
-                else:
-                    summary['system'] += 1
-            
-            return summary
-            
         except Exception as e:
             print(f"Error getting notification summary for {username}: {e}")
             return {'total': 0, 'unread': 0, 'approval_status': 0, 'comments': 0, 'system': 0}
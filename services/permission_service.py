@@ -1,6 +1,7 @@
 import os
 import json
 from typing import List, Dict
+from utils.json_cache import load_json_cached
 
 class PermissionService:
     """Service to handle permissions and team access for file approvals"""
@@ -10,21 +11,21 @@ class PermissionService:
         self.permissions_file = r"\\KMTI-NAS\Shared\data\permissions.json"
     
     def load_users(self) -> Dict:
-        """Load users data"""
+        """Load users data (stat-validated cache)"""
         try:
-            if os.path.exists(self.users_file):
-                with open(self.users_file, 'r') as f:
-                    return json.load(f)
+            users = load_json_cached(self.users_file)
+            if users is not None:
+                return users
         except Exception as e:
             print(f"Error loading users: {e}")
         return {}
     
     def load_permissions(self) -> Dict:
-        """Load permissions configuration"""
+        """Load permissions configuration (stat-validated cache)"""
         try:
-            if os.path.exists(self.permissions_file):
-                with open(self.permissions_file, 'r') as f:
-                    return json.load(f)
+            permissions = load_json_cached(self.permissions_file)
+            if permissions is not None:
+                return permissions
         except Exception as e:
             print(f"Error loading permissions: {e}")
         
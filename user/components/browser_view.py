@@ -5,6 +5,7 @@ import threading
 from pathlib import Path
 from typing import Optional
 from utils.config_loader import get_base_dir
+from utils.tracing import span
 from utils.dialog import show_confirm_dialog
 from admin.components.details_pane import DetailsPane
 
@@ -17,11 +18,13 @@ search_lock = threading.Lock()
 
 def build_index(base_dir: Path):
     index = []
-    for root, dirs, files in os.walk(base_dir):
-        for d in dirs:
-            index.append(str(Path(root) / d))
-        for f in files:
-            index.append(str(Path(root) / f))
+    with span("build_index", "index", path=str(base_dir)) as index_span:
+        for root, dirs, files in os.walk(base_dir):
+            for d in dirs:
+                index.append(str(Path(root) / d))
+            for f in files:
+                index.append(str(Path(root) / f))
+        index_span.set_tag("entries", len(index))
     return index
 
 
@@ -1,6 +1,5 @@
 import flet as ft
 import os
-import shutil
 import time
 import threading
 from datetime import datetime
@@ -192,15 +191,15 @@ class FilesView:
         for file in files:
             try:
                 unique_filename = self.generate_unique_filename(file.name)
-                dest_path = os.path.join(self.file_service.user_folder, unique_filename)
-                shutil.copy2(file.path, dest_path)
+                result = self.file_service.store_upload(file.path, unique_filename)
                 
                 uploaded_files.append({
                     'original': file.name,
-                    'saved_as': unique_filename
+                    'saved_as': result['saved_as'],
+                    'duplicate': bool(result['duplicate_of'])
                 })
                 
-                print(f"DEBUG: Uploaded '{file.name}' as '{unique_filename}'")
+                print(f"DEBUG: Uploaded '{file.name}' as '{result['saved_as']}'")
                 
             except Exception as ex:
                 print(f"DEBUG: Failed to upload {file.name}: {str(ex)}")
@@ -367,7 +366,9 @@ class FilesView:
                 if uploaded_files:
                     success_messages = []
                     for file_info in uploaded_files[:3]:
-                        if file_info['original'] != file_info['saved_as']:
+                        if file_info.get('duplicate'):
+                            success_messages.append(f"'{file_info['original']}' already uploaded as '{file_info['saved_as']}'")
+                        elif file_info['original'] != file_info['saved_as']:
                             success_messages.append(f"'{file_info['original']}' → '{file_info['saved_as']}'")
                         else:
                             success_messages.append(f"'{file_info['original']}'")
@@ -717,9 +718,14 @@ class FilesView:
         
         # 🚨 ENHANCED: File opening with moved file support
         def handle_file_open(e, file_data=file_info):
-            if is_moved and current_location and os.path.exists(current_location):
+            location = current_location
+            if is_moved and not (location and os.path.exists(location)):
+                # Listed location is gone - check the location index and search again
+                location = self.approval_service._find_approved_file_location(
+                    file_data["name"], self.approval_service.get_file_approval_status(file_data["name"]))
+            if is_moved and location and os.path.exists(location):
                 # Open from moved location
-                self.open_file_from_path(current_location, file_data["name"])
+                self.open_file_from_path(location, file_data["name"])
             else:
                 # Open from original location
                 self.open_file(file_data["name"])
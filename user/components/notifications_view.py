@@ -218,17 +218,14 @@ class NotificationsView:
     
     def mark_all_notifications_read(self):
         """Mark all notifications as read"""
-        notifications = self.approval_service.load_notifications()
-        for notification in notifications:
-            notification["read"] = True
-        self.approval_service.save_notifications(notifications)
+        self.approval_service.mark_all_notifications_read()
         self.refresh_notifications()
     
     def create_header_section(self):
         """Create header with stats and actions"""
         notifications = self.approval_service.load_notifications()
         total_count = len(notifications)
-        unread_count = len([n for n in notifications if not n.get("read", False)])
+        unread_count = self.approval_service.get_unread_notification_count()
         
         return ft.Container(
             content=ft.Row([
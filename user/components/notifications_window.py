@@ -273,18 +273,14 @@ class NotificationsWindow:
                 filename = notification_to_delete.get('filename', 'Unknown')
                 print(f"DEBUG: Deleting notification: {filename}")
                 
-                # Remove the notification
-                deleted_notification = notifications.pop(index)
-                print(f"DEBUG: Notification removed from list")
-                
-                # Save updated notifications
-                success = self.approval_service.save_notifications(notifications)
+                # Dismiss the notification
+                success = self.approval_service.delete_notification(notification_to_delete.get('id'))
                 if not success:
-                    print(f"DEBUG: Failed to save notifications")
+                    print(f"DEBUG: Failed to delete notification")
                     self.show_error_message("Failed to save notifications")
                     return
                 
-                print(f"DEBUG: Notifications saved successfully, {len(notifications)} remaining")
+                print(f"DEBUG: Notification deleted successfully, {len(notifications) - 1} remaining")
                 
                 # Show success animation
                 self.show_delete_success_animation(filename)
@@ -334,7 +330,7 @@ class NotificationsWindow:
             def do_delete_all():
                 try:
                     # Clear all notifications
-                    success = self.approval_service.save_notifications([])
+                    success = self.approval_service.clear_notifications()
                     if not success:
                         self.show_error_message("Failed to delete all notifications")
                         return
@@ -472,10 +468,10 @@ class NotificationsWindow:
             timestamp = "Unknown"
         
         # Get notification details
-        filename = notification.get("filename", "Unknown file")
+        filename = notification.get("filename") or notification.get("title", "Unknown file")
         old_status = notification.get("old_status", "unknown")
         new_status = notification.get("new_status", "unknown")
-        admin_id = notification.get("admin_id", "admin")
+        admin_id = notification.get("admin_id") or notification.get("sender") or "admin"
         
         # Create display filename (limit for UI)
         display_filename = filename[:30] + "..." if len(filename) > 30 else filename
@@ -522,7 +518,7 @@ class NotificationsWindow:
                             ft.Container(height=3),
                             # Status message
                             ft.Text(
-                                f"Status: {old_status} → {new_status}",
+                                notification["message"] if notification.get("message") else f"Status: {old_status} → {new_status}",
                                 size=13,
                                 color=ft.Colors.GREY_700,
                                 overflow=ft.TextOverflow.ELLIPSIS,
@@ -652,18 +648,14 @@ class NotificationsWindow:
     def mark_all_read(self, e):
         """Mark all notifications as read with improved error handling"""
         try:
-            notifications = self.approval_service.load_notifications()
-            unread_count = len([n for n in notifications if not n.get("read", False)])
+            unread_count = self.approval_service.get_unread_notification_count()
             
             if unread_count == 0:
                 self.show_info_message("No unread notifications to mark")
                 return
             
             # Mark all as read
-            for notification in notifications:
-                notification["read"] = True
-            
-            success = self.approval_service.save_notifications(notifications)
+            success = self.approval_service.mark_all_notifications_read()
             if not success:
                 self.show_error_message("Failed to mark notifications as read")
                 return
@@ -702,7 +694,7 @@ class NotificationsWindow:
         try:
             notifications = self.approval_service.load_notifications()
             total_count = len(notifications)
-            unread_count = len([n for n in notifications if not n.get("read", False)])
+            unread_count = self.approval_service.get_unread_notification_count()
             
             print(f"DEBUG: Creating window content with {total_count} notifications ({unread_count} unread)")
             
@@ -7,7 +7,11 @@ from datetime import datetime
 from typing import List, Dict, Optional, Callable
 from concurrent.futures import ThreadPoolExecutor
 from utils.logger import log_action
+from utils.log_writer import flush_logs
 from utils.session_logger import log_activity
+from services.approval_queue_store import get_approval_queue_store
+from services.approved_location_index import get_approved_location_index
+from services.notification_log import get_notification_log
 
 class ApprovalFileService:
     """Fixed service - system files stored in data folder, not user upload folder"""
@@ -135,24 +139,27 @@ class ApprovalFileService:
             return False
     
     def load_notifications(self) -> List[Dict]:
-        """Load user's approval notifications"""
+        """Load user's approval notifications (newest first, each with its 'read' flag)"""
         try:
-            if os.path.exists(self.notifications_file):
-                with open(self.notifications_file, 'r') as f:
-                    notifications = json.load(f)
-                    return notifications if isinstance(notifications, list) else []
+            return get_notification_log(self.username).get_notifications()
         except Exception as e:
             print(f"Error loading notifications: {e}")
         return []
     
-    def save_notifications(self, notifications: List[Dict]) -> bool:
-        """Save user's approval notifications"""
+    def delete_notification(self, notification_id: str) -> bool:
+        """Dismiss one notification"""
         try:
-            with open(self.notifications_file, 'w') as f:
-                json.dump(notifications, f, indent=2)
-            return True
+            return get_notification_log(self.username).delete([notification_id])
         except Exception as e:
-            print(f"Error saving notifications: {e}")
+            print(f"Error deleting notification: {e}")
+            return False
+    
+    def clear_notifications(self) -> bool:
+        """Dismiss all notifications"""
+        try:
+            return get_notification_log(self.username).clear()
+        except Exception as e:
+            print(f"Error clearing notifications: {e}")
             return False
     
     def get_uploaded_files(self) -> List[Dict]:
@@ -209,28 +216,38 @@ class ApprovalFileService:
                     files.append(file_info)
             
             # 🚨 NEW: Add approved/moved files that no longer exist in upload folder
-            for filename, file_approval in approval_data.items():
-                # Skip if file is already in the physical files list
-                if any(f['filename'] == filename for f in files):
-                    continue
-                
+            physical_files = {f['filename'] for f in files}
+            moved_files = {
+                filename: file_approval for filename, file_approval in approval_data.items()
                 # Only include files that were submitted and approved/moved
-                if file_approval.get('submitted_for_approval') and file_approval.get('status') in ['approved', 'moved']:
-                    # Try to find the file in its new location
-                    moved_location = self._find_approved_file_location(filename, file_approval)
-                    
-                    file_info = {
-                        "filename": filename,
-                        "file_path": moved_location or f"MOVED: {filename}",  # Fallback if location unknown
-                        "file_size": file_approval.get('original_file_size', 0),
-                        "upload_date": file_approval.get('original_upload_date', ''),
-                        "current_location": moved_location,  # New location if found
-                        "is_moved": True,  # File has been moved
-                        "display_status": "approved_and_moved",  # Special status for display
-                        **file_approval  # Merge approval data
-                    }
-                    files.append(file_info)
-                    print(f"[DEBUG] Added moved/approved file to list: {filename} -> {moved_location}")
+                if filename not in physical_files and file_approval.get('submitted_for_approval')
+                and file_approval.get('status') in ['approved', 'moved']
+            }
+            
+            # Locations come from the approved file location index (one read); files it
+            # does not know yet are searched once and added to it
+            locations = get_approved_location_index().locate_many(
+                [dict(file_approval, original_filename=filename, user_id=self.username, user_team=self.user_team)
+                 for filename, file_approval in moved_files.items()])
+            
+            for filename, file_approval in moved_files.items():
+                # Try to find the file in its new location
+                file_id = file_approval.get('file_id')
+                moved_location = (locations.get(file_id) if file_id
+                                  else self._find_approved_file_location(filename, file_approval))
+                
+                file_info = {
+                    "filename": filename,
+                    "file_path": moved_location or f"MOVED: {filename}",  # Fallback if location unknown
+                    "file_size": file_approval.get('original_file_size', 0),
+                    "upload_date": file_approval.get('original_upload_date', ''),
+                    "current_location": moved_location,  # New location if found
+                    "is_moved": True,  # File has been moved
+                    "display_status": "approved_and_moved",  # Special status for display
+                    **file_approval  # Merge approval data
+                }
+                files.append(file_info)
+                print(f"[DEBUG] Added moved/approved file to list: {filename} -> {moved_location}")
                 
             # Sort files by upload time (newest first)
             files.sort(key=lambda x: x.get("upload_date", ""), reverse=True)
@@ -241,32 +258,14 @@ class ApprovalFileService:
         return files
     
     def _find_approved_file_location(self, filename: str, file_approval: Dict) -> Optional[str]:
-        """🚨 NEW: Find approved file in its moved location using path_config."""
+        """🚨 NEW: Find approved file in its moved location (through the location index)."""
         try:
-            from utils.path_config import DATA_PATHS
-            
-            # Get user's team for project directory structure
-            user_team = self.user_team
-            
-            # Try current year first, then previous years
-            from datetime import datetime
-            current_year = str(datetime.now().year)
-            years_to_check = [current_year, str(int(current_year) - 1)]
-            
-            for year in years_to_check:
-                found_location = DATA_PATHS.find_approved_file(filename, user_team, year)
-                if found_location:
-                    print(f"[DEBUG] Found approved file {filename} at: {found_location}")
-                    return found_location
-            
-            # Check for specific moved location stored in file metadata
-            moved_location = file_approval.get('moved_to_location')
-            if moved_location and os.path.exists(moved_location):
-                print(f"[DEBUG] Found approved file at stored location: {moved_location}")
-                return moved_location
-            
-            print(f"[DEBUG] Could not find approved file location for: {filename}")
-            return None
+            found_location = get_approved_location_index().locate(
+                dict(file_approval, original_filename=filename, user_id=self.username, user_team=self.user_team),
+                verify=True)
+            if not found_location:
+                print(f"[DEBUG] Could not find approved file location for: {filename}")
+            return found_location
             
         except Exception as e:
             print(f"Error finding approved file location for {filename}: {e}")
@@ -344,76 +343,34 @@ class ApprovalFileService:
             print(f"Async logging error: {e}")
     
     def add_to_global_queue(self, filename: str, file_id: str, description: str, tags: List[str]):
-        """Add file to global approval queue with file locking"""
+        """Add file to global approval queue (single-record upsert)"""
         try:
-            # Ensure global approvals directory exists on network
-            global_approvals_dir = os.path.join(r"\\KMTI-NAS\Shared\data", "approvals")
-            os.makedirs(global_approvals_dir, exist_ok=True)
-            
-            global_queue_file = os.path.join(global_approvals_dir, "file_approvals.json")
+            # Get file info
+            file_path = os.path.join(self.user_folder, filename)
+            file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
             
-            # Simple file locking mechanism
-            lock_file = f"{global_queue_file}.lock"
-            max_attempts = 10
+            # Add new submission
+            submission_data = {
+                "file_id": file_id,
+                "original_filename": filename,
+                "user_id": self.username,
+                "user_team": self.user_team,
+                "file_size": file_size,
+                "submission_date": datetime.now().isoformat(),
+                "status": "pending",
+                "description": description,
+                "tags": tags,
+                "admin_comments": [],
+                "status_history": [{
+                    "status": "pending",
+                    "timestamp": datetime.now().isoformat(),
+                    "comment": "File submitted for approval"
+                }],
+                "file_path": file_path  # Store path for admin access
+            }
             
-            for attempt in range(max_attempts):
-                try:
-                    if not os.path.exists(lock_file):
-                        # Create lock
-                        with open(lock_file, 'w') as f:
-                            f.write(str(time.time()))
-                        
-                        # Load existing queue
-                        queue = {}
-                        if os.path.exists(global_queue_file):
-                            with open(global_queue_file, 'r') as f:
-                                queue = json.load(f)
-                        
-                        # Get file info
-                        file_path = os.path.join(self.user_folder, filename)
-                        file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                        
-                        # Add new submission
-                        submission_data = {
-                            "file_id": file_id,
-                            "original_filename": filename,
-                            "user_id": self.username,
-                            "user_team": self.user_team,
-                            "file_size": file_size,
-                            "submission_date": datetime.now().isoformat(),
-                            "status": "pending",
-                            "description": description,
-                            "tags": tags,
-                            "admin_comments": [],
-                            "status_history": [{
-                                "status": "pending",
-                                "timestamp": datetime.now().isoformat(),
-                                "comment": "File submitted for approval"
-                            }],
-                            "file_path": file_path  # Store path for admin access
-                        }
-                        
-                        queue[file_id] = submission_data
-                        
-                        # Save updated queue
-                        with open(global_queue_file, 'w') as f:
-                            json.dump(queue, f, indent=2)
-                        
-                        # Remove lock
-                        os.remove(lock_file)
-                        break
-                        
-                except Exception:
-                    # Wait before retry
-                    time.sleep(0.05)
-                    continue
-                finally:
-                    # Clean up lock if it exists
-                    try:
-                        if os.path.exists(lock_file):
-                            os.remove(lock_file)
-                    except:
-                        pass
+            if not get_approval_queue_store().upsert_record(submission_data):
+                print(f"Error adding to global queue: could not store {file_id}")
                         
         except Exception as e:
             print(f"Error adding to global queue: {e}")
@@ -475,49 +432,9 @@ class ApprovalFileService:
             print(f"Logging error: {e}")
     
     def remove_from_global_queue(self, file_id: str):
-        """Remove submission from global approval queue with file locking"""
+        """Remove submission from global approval queue"""
         try:
-            global_queue_file = os.path.join(r"\\KMTI-NAS\Shared\data", "approvals", "file_approvals.json")
-            if not os.path.exists(global_queue_file):
-                return
-            
-            # File locking for thread safety
-            lock_file = f"{global_queue_file}.lock"
-            max_attempts = 10
-            
-            for attempt in range(max_attempts):
-                try:
-                    if not os.path.exists(lock_file):
-                        # Create lock
-                        with open(lock_file, 'w') as f:
-                            f.write(str(time.time()))
-                        
-                        # Read, modify, write
-                        with open(global_queue_file, 'r') as f:
-                            queue = json.load(f)
-                        
-                        if file_id in queue:
-                            del queue[file_id]
-                            
-                            with open(global_queue_file, 'w') as f:
-                                json.dump(queue, f, indent=2)
-                        
-                        # Remove lock
-                        os.remove(lock_file)
-                        break
-                        
-                except Exception:
-                    # Wait before retry
-                    time.sleep(0.05)
-                    continue
-                finally:
-                    # Clean up lock if it exists
-                    try:
-                        if os.path.exists(lock_file):
-                            os.remove(lock_file)
-                    except:
-                        pass
-                        
+            get_approval_queue_store().delete_record(file_id)
         except Exception as e:
             print(f"Error removing from global queue: {e}")
     
@@ -563,10 +480,40 @@ class ApprovalFileService:
     
     def update_file_status(self, filename: str, new_status: str, admin_comment: str = "", admin_id: str = "", old_status: str = "", source_system: str = "admin", skip_notification: bool = False, moved_to_location: str = None):
         """🚨 ENHANCED: Update file status with optional moved location tracking"""
+        return self.update_file_statuses([{
+            "filename": filename,
+            "new_status": new_status,
+            "admin_comment": admin_comment,
+            "admin_id": admin_id,
+            "old_status": old_status,
+            "source_system": source_system,
+            "skip_notification": skip_notification,
+            "moved_to_location": moved_to_location
+        }]).get(filename, False)
+    
+    def update_file_statuses(self, updates: List[Dict]) -> Dict[str, bool]:
+        """
+        Update several files with one status-file write and one notifications write.
+        Each update takes the same keys as update_file_status's arguments.
+        Returns {filename: success}.
+        """
+        results = {update["filename"]: False for update in updates}
         try:
             approval_data = self.load_approval_status()
+            notifications = []
             
-            if filename in approval_data:
+            for update in updates:
+                filename = update["filename"]
+                if filename not in approval_data:
+                    continue
+                
+                new_status = update["new_status"]
+                admin_comment = update.get("admin_comment", "")
+                admin_id = update.get("admin_id", "")
+                old_status = update.get("old_status", "")
+                source_system = update.get("source_system", "admin")
+                moved_to_location = update.get("moved_to_location")
+                
                 current_status = approval_data[filename].get("status", "unknown")
                 approval_data[filename]["status"] = new_status
                 approval_data[filename]["last_updated"] = datetime.now().isoformat()
@@ -608,63 +555,55 @@ class ApprovalFileService:
                     "source_system": source_system
                 })
                 
-                self.save_approval_status(approval_data)
-                
                 # Add notification with duplication prevention
-                if not skip_notification:
-                    self._add_status_notification(filename, old_status or current_status, new_status, admin_id, admin_comment, source_system)
-                
-                return True
+                if not update.get("skip_notification", False):
+                    notifications.append((filename, old_status or current_status, new_status,
+                                          admin_id, admin_comment, source_system))
+                results[filename] = True
+            
+            if any(results.values()):
+                self.save_approval_status(approval_data)
+                self._add_status_notifications(notifications)
         except Exception as e:
             print(f"Error updating file status: {e}")
-        return False
+            return {filename: False for filename in results}
+        return results
     
     def _add_status_notification(self, filename: str, old_status: str, new_status: str, admin_id: str, admin_comment: str, source_system: str):
         """Add status notification with duplication checking and debouncing"""
+        self._add_status_notifications([(filename, old_status, new_status, admin_id, admin_comment, source_system)])
+    
+    def _add_status_notifications(self, items: List[tuple]):
+        """
+        Add status notifications for (filename, old_status, new_status, admin_id,
+        admin_comment, source_system) tuples with a single notifications write
+        """
+        if not items:
+            return
         try:
-            notifications = self.load_notifications()
             current_time = datetime.now().isoformat()
+            notifications = []
+            for filename, old_status, new_status, admin_id, admin_comment, source_system in items:
+                # Create proper status transition text
+                status_text = self._format_status_transition(old_status, new_status)
+                
+                notifications.append({
+                    "id": str(uuid.uuid4()),
+                    "type": "status_update",
+                    "filename": filename,
+                    "old_status": old_status,
+                    "new_status": new_status,
+                    "status_transition": status_text,
+                    "admin_id": admin_id,
+                    "comment": admin_comment,
+                    "source_system": source_system,
+                    "timestamp": current_time,
+                    # Same transition within 30 seconds is a duplicate
+                    "dedupe_key": f"status_update:{filename}:{new_status}"
+                })
             
-            # Check for recent duplicate notifications (within last 30 seconds)
-            recent_threshold = datetime.now().timestamp() - 30
-            
-            for notif in notifications[:5]:  # Check only the 5 most recent notifications
-                if (notif.get("filename") == filename and 
-                    notif.get("new_status") == new_status and
-                    notif.get("type") == "status_update"):
-                    try:
-                        notif_time = datetime.fromisoformat(notif.get("timestamp", "")).timestamp()
-                        if notif_time > recent_threshold:
-                            print(f"[NOTIFICATION] Skipping duplicate notification for {filename}: {old_status} → {new_status}")
-                            return  # Skip duplicate notification
-                    except ValueError:
-                        continue
-            
-            # Create proper status transition text
-            status_text = self._format_status_transition(old_status, new_status)
-            
-            # Add single clean notification
-            notification = {
-                "id": str(uuid.uuid4()),
-                "type": "status_update",
-                "filename": filename,
-                "old_status": old_status,
-                "new_status": new_status,
-                "status_transition": status_text,
-                "admin_id": admin_id,
-                "comment": admin_comment,
-                "source_system": source_system,
-                "timestamp": current_time,
-                "read": False
-            }
-            
-            notifications.insert(0, notification)
-            
-            # Keep only last 50 notifications
-            notifications = notifications[:50]
-            
-            self.save_notifications(notifications)
-            print(f"[NOTIFICATION] Added clean notification: {filename} {status_text}")
+            added = get_notification_log(self.username).append(notifications, dedupe_window=30)
+            print(f"[NOTIFICATION] Added {added} of {len(notifications)} status notification(s)")
             
         except Exception as e:
             print(f"Error adding status notification: {e}")
@@ -703,34 +642,32 @@ class ApprovalFileService:
                     notification.get("source_system", "admin")
                 )
             else:
-                # For other notification types, use the original method
-                notifications = self.load_notifications()
-                notifications.insert(0, notification)
-                
-                # Keep only last 50 notifications for better performance
-                notifications = notifications[:50]
-                
-                self.save_notifications(notifications)
+                get_notification_log(self.username).append([notification])
         except Exception as e:
             print(f"Error adding notification: {e}")
     
     def mark_notification_read(self, notification_index: int):
-        """Mark notification as read"""
+        """Mark notification as read (index into load_notifications)"""
         try:
             notifications = self.load_notifications()
             if 0 <= notification_index < len(notifications):
-                notifications[notification_index]["read"] = True
-                self.save_notifications(notifications)
-                return True
+                return get_notification_log(self.username).mark_read([notifications[notification_index]["id"]])
         except Exception as e:
             print(f"Error marking notification as read: {e}")
         return False
     
+    def mark_all_notifications_read(self) -> bool:
+        """Mark all notifications as read"""
+        try:
+            return get_notification_log(self.username).mark_all_read()
+        except Exception as e:
+            print(f"Error marking notifications as read: {e}")
+            return False
+    
     def get_unread_notification_count(self) -> int:
-        """Get unread notification count (optimized)"""
+        """Get unread notification count (counter read, the log is not parsed)"""
         try:
-            notifications = self.load_notifications()
-            return sum(1 for n in notifications if not n.get("read", False))
+            return get_notification_log(self.username).get_unread_count()
         except:
             return 0
     
@@ -992,51 +929,11 @@ class ApprovalFileService:
         return results
     
     def _batch_remove_from_global_queue(self, file_ids: List[str]):
-        """Remove multiple files from global queue efficiently"""
+        """Remove multiple files from global queue in one store transaction"""
         try:
-            global_queue_file = os.path.join(r"\\KMTI-NAS\Shared\data", "approvals", "file_approvals.json")
-            if not os.path.exists(global_queue_file):
-                return
-            
-            lock_file = f"{global_queue_file}.lock"
-            max_attempts = 10
-            
-            for attempt in range(max_attempts):
-                try:
-                    if not os.path.exists(lock_file):
-                        # Create lock
-                        with open(lock_file, 'w') as f:
-                            f.write(str(time.time()))
-                        
-                        # Read and modify
-                        with open(global_queue_file, 'r') as f:
-                            queue = json.load(f)
-                        
-                        # Remove all file_ids in batch
-                        removed_count = 0
-                        for file_id in file_ids:
-                            if file_id in queue:
-                                del queue[file_id]
-                                removed_count += 1
-                        
-                        # Write back if changes were made
-                        if removed_count > 0:
-                            with open(global_queue_file, 'w') as f:
-                                json.dump(queue, f, indent=2)
-                        
-                        # Remove lock
-                        os.remove(lock_file)
-                        break
-                        
-                except Exception:
-                    time.sleep(0.05)
-                    continue
-                finally:
-                    try:
-                        if os.path.exists(lock_file):
-                            os.remove(lock_file)
-                    except:
-                        pass
+            removed_count = get_approval_queue_store().delete_records(file_ids)
+            if removed_count < 0:
+                print(f"Batch global queue removal failed for {len(file_ids)} files")
                         
         except Exception as e:
             print(f"Batch global queue removal error: {e}")
@@ -1056,4 +953,5 @@ class ApprovalFileService:
         try:
             self.executor.shutdown(wait=False)
         except:
-            pass
\ No newline at end of file
+            pass
+        flush_logs()
\ No newline at end of file
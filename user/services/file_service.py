@@ -3,10 +3,11 @@ import json
 import shutil
 from datetime import datetime
 from typing import List, Dict, Optional
-from utils.file_manager import save_file
 from utils.logger import log_action
 from utils.session_logger import log_activity
 from utils.path_config import DATA_PATHS
+from utils.file_copy import hash_file
+from services.blob_store import get_blob_store
 
 class FileService:
     """Fixed service - comprehensive system file filtering to prevent system files from showing in user file view"""
@@ -160,8 +161,59 @@ class FileService:
         """Get list of user files (now scans actual files and excludes system files)"""
         return self.scan_user_files()
     
-    def upload_files(self, files):
-        """Handle file upload with real file saving"""
+    def find_duplicate(self, sha256: str, metadata: Dict = None) -> Optional[str]:
+        """Name of an uploaded file with this content hash, if the user already has one"""
+        metadata = metadata if metadata is not None else self.get_file_metadata()
+        for filename, file_metadata in metadata.items():
+            if not isinstance(file_metadata, dict) or file_metadata.get("sha256") != sha256:
+                continue
+            try:
+                # A file changed since upload no longer matches its recorded hash
+                if os.path.getsize(os.path.join(self.user_folder, filename)) == file_metadata.get("size_bytes"):
+                    return filename
+            except OSError:
+                continue
+        return None
+    
+    def store_upload(self, source_path: str, filename: str) -> Dict:
+        """
+        Store one uploaded file as `filename` in the user folder.
+        
+        The content hash is computed locally first: a file the user already
+        uploaded is not stored again (duplicate_of names the existing file),
+        and with the blob store enabled identical content uploaded by anyone
+        is linked instead of transferred.
+        Returns {'saved_as': str, 'duplicate_of': str or None, 'deduplicated': bool}.
+        """
+        sha256 = hash_file(source_path)
+        metadata = self.get_file_metadata()
+        duplicate = self.find_duplicate(sha256, metadata)
+        if duplicate:
+            print(f"[UPLOAD] {filename} is already uploaded as {duplicate}")
+            return {'saved_as': duplicate, 'duplicate_of': duplicate, 'deduplicated': True}
+        
+        dest_path = os.path.join(self.user_folder, filename)
+        if os.path.exists(dest_path):
+            # Same name, different content - replace it like a plain copy would
+            get_blob_store().remove(dest_path, (metadata.get(filename) or {}).get("sha256"))
+        result = get_blob_store().store(source_path, dest_path, sha256)
+        
+        file_metadata = metadata.get(filename) or {
+            "description": "",
+            "tags": [],
+        }
+        file_metadata.update(uploaded_date=datetime.now().isoformat(),
+                             sha256=result['sha256'], size_bytes=result['size'])
+        metadata[filename] = file_metadata
+        self.save_file_metadata(metadata)
+        return {'saved_as': filename, 'duplicate_of': None, 'deduplicated': result['deduplicated']}
+    
+    def upload_files(self, files) -> Dict[str, List]:
+        """
+        Handle file upload with real file saving
+        Returns {'uploaded': [names], 'duplicates': [(name, existing name)]}
+        """
+        outcome = {'uploaded': [], 'duplicates': []}
         if files:
             for f in files:
                 try:
@@ -171,24 +223,20 @@ class FileService:
                         log_action(self.username, f"Blocked system file upload: {f.name}")
                         continue
                     
-                    # Save file using existing file manager
-                    save_file(f, self.user_folder)
+                    result = self.store_upload(f.path, f.name)
+                    if result['duplicate_of']:
+                        outcome['duplicates'].append((f.name, result['duplicate_of']))
+                        log_action(self.username, f"Skipped duplicate upload: {f.name} (already uploaded as {result['duplicate_of']})")
+                        continue
+                    
+                    outcome['uploaded'].append(f.name)
                     log_action(self.username, f"Uploaded file: {f.name}")
                     log_activity(self.username, f"Uploaded file: {f.name}")
-                    
-                    # Initialize metadata for new file
-                    metadata = self.get_file_metadata()
-                    if f.name not in metadata:
-                        metadata[f.name] = {
-                            "description": "",
-                            "tags": [],
-                            "uploaded_date": datetime.now().isoformat()
-                        }
-                        self.save_file_metadata(metadata)
                         
                 except Exception as e:
                     print(f"Error uploading file {f.name}: {e}")
                     log_action(self.username, f"Failed to upload file: {f.name} - {str(e)}")
+        return outcome
     
     def delete_file(self, filename: str) -> bool:
         """Delete a file permanently - with system file protection"""
@@ -202,11 +250,12 @@ class FileService:
             file_path = os.path.join(self.user_folder, filename)
             
             if os.path.exists(file_path):
-                # Delete the actual file
-                os.remove(file_path)
+                # Delete the actual file (and its shared blob if this was the last link)
+                metadata = self.get_file_metadata()
+                file_metadata = metadata.get(filename)
+                get_blob_store().remove(file_path, file_metadata.get("sha256") if isinstance(file_metadata, dict) else None)
                 
                 # Remove from metadata
-                metadata = self.get_file_metadata()
                 if filename in metadata:
                     del metadata[filename]
                     self.save_file_metadata(metadata)
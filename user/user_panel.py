@@ -17,7 +17,7 @@ from utils.logger import log_action
 from utils.session_logger import log_activity, log_panel_access
 from admin.components.role_colors import create_role_badge, get_role_color
 from utils.path_config import DATA_PATHS
-from utils.session_logger import get_comment_metadata_for_monitoring, detect_new_comments_for_user
+from services.change_feed import get_change_feed
 
 # Use consistent session management with login_window.py
 SESSION_ROOT = DATA_PATHS.local_sessions_dir
@@ -62,99 +62,70 @@ def clear_session(username: str):
 
 
 class CommentMonitor:
-    """🚨 NEW: Monitor centralized comment files for new comments and trigger notifications."""
+    """🚨 Subscribe to the shared change feed for this user's notifications and comments."""
     
     def __init__(self, username: str, approval_service):
         self.username = username
         self.approval_service = approval_service
-        self.monitoring = False
-        self.monitor_thread = None
-        self.last_metadata = None
+        self.subscription = None
         self.notification_callback = None
     
     def start_monitoring(self, on_new_comments_detected=None):
-        """Start monitoring for new comments."""
-        if self.monitoring:
+        """Start receiving change feed events for this user."""
+        if self.subscription:
             return
         
-        self.monitoring = True
         self.notification_callback = on_new_comments_detected
-        self.last_metadata = get_comment_metadata_for_monitoring()
-        
-        # Start monitoring thread
-        import threading
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        self.subscription = get_change_feed().subscribe(
+            ['comment_added', 'notification_added', 'broadcast_added'],
+            self._on_event,
+            event_filter=lambda event: (event['type'] == 'broadcast_added'
+                                        or self.username in (event.get('user'), event.get('user_id'))),
+            name=f"user panel {self.username}"
+        )
         
         print(f"[DEBUG] Started comment monitoring for user {self.username}")
     
     def stop_monitoring(self):
-        """Stop comment monitoring."""
-        self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=1.0)
+        """Stop receiving change feed events."""
+        if self.subscription:
+            get_change_feed().unsubscribe(self.subscription)
+            self.subscription = None
         print(f"[DEBUG] Stopped comment monitoring for user {self.username}")
     
-    def _monitor_loop(self):
-        """Main monitoring loop - runs in background thread."""
-        import time
+    def _on_event(self, event: dict):
+        """Handle one change feed event (runs on the dispatcher thread)."""
+        if event['type'] == 'comment_added':
+            # Don't notify user about their own comments; writers that already notified say so
+            if event.get('author') == self.username or event.get('notified'):
+                return
+            self._process_new_comment(event)
+            return
         
-        while self.monitoring:
+        # Trigger UI update callback
+        if self.notification_callback:
             try:
-                time.sleep(5.0)  # Check every 5 seconds
-                
-                if not self.monitoring:
-                    break
-                
-                # Detect new comments
-                new_comments = detect_new_comments_for_user(self.username, self.last_metadata)
-                
-                if new_comments:
-                    self._process_new_comments(new_comments)
-                    
-                    # Update metadata for next check
-                    self.last_metadata = get_comment_metadata_for_monitoring()
-                    
-                    # Trigger UI update callback
-                    if self.notification_callback:
-                        try:
-                            self.notification_callback()
-                        except Exception as e:
-                            print(f"Error in notification callback: {e}")
-            
+                self.notification_callback()
             except Exception as e:
-                print(f"Error in comment monitoring loop: {e}")
-                time.sleep(10.0)  # Wait longer on error
+                print(f"Error in notification callback: {e}")
     
-    def _process_new_comments(self, new_comments: list):
-        """Process detected new comments and send notifications."""
+    def _process_new_comment(self, event: dict):
+        """Send the notification for a comment whose writer did not notify the user."""
         try:
             from services.notification_service import NotificationService
             notification_service = NotificationService()
             
-            for comment_info in new_comments:
-                filename = comment_info.get('filename')
-                comment_data = comment_info.get('comment', {})
-                comment_author = comment_info.get('comment_author')
-                comment_text = comment_info.get('comment_text')
-                
-                # Determine comment author role
-                comment_author_role = 'user'  # default
-                if comment_data.get('admin_id'):
-                    comment_author_role = 'admin'
-                elif comment_data.get('tl_id'):
-                    comment_author_role = 'team_leader'
-                
-                # Send notification
-                success = notification_service.notify_comment_added(
-                    self.username, filename, comment_author_role, comment_author, comment_text
-                )
+            # Send notification (its notification_added event refreshes the badge)
+            success = notification_service.notify_comment_added(
+                self.username, event.get('filename') or 'Unknown', event.get('author_role') or 'user',
+                event.get('author') or 'Unknown', event.get('comment') or 'No comment text'
+            )
+            
+            if success:
+                print(f"[SUCCESS] Notified {self.username} about new comment on {event.get('filename')} by {event.get('author')}")
+            else:
+                print(f"[WARNING] Failed to notify {self.username} about new comment")
                 
-                if success:
-                    print(f"[SUCCESS] Notified {self.username} about new comment on {filename} by {comment_author}")
-                else:
-                    print(f"[WARNING] Failed to notify {self.username} about new comment")
-                    
         except Exception as e:
             print(f"Error processing new comments for {self.username}: {e}")
 
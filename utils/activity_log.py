@@ -0,0 +1,457 @@
+"""
+Day-rotated activity log
+
+log_action and log_activity used to load the whole of
+logs/activity_logs.json, append one entry and rewrite it, and every reader
+(the Activity Logs page, the admin dashboard, the online check) loaded and
+scanned all of it again.
+
+Entries are now appended to one JSON Lines file per day
+(logs/activity/<YYYY-MM-DD>.jsonl) while holding the index lock only for that
+single append. logs/activity/index.json holds:
+
+    total          number of entries across all days
+    days           YYYY-MM-DD -> {'count', 'users': {username: n}, 'roles': {role: n}}
+    last_by_user   username -> {'date', 'activity'} of their newest entry
+
+so counts, the dashboard's "recent activity" and is-online checks are answered
+from the index, and readers only open the day files for the range and the
+users or roles they ask for. Free-text search goes through per-day inverted
+indexes in logs/activity/search (see utils/log_search.py); a day's 'gen'
+counter changes whenever its file is rewritten. The legacy file is imported
+on first use and kept as activity_logs.json.migrated.
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from utils.path_config import DATA_PATHS
+from utils.file_lock import GroupCommitter, get_file_lock
+from utils.json_cache import get_json_cache, load_json_cached
+from utils.jsonl import JsonlTailReader, append_jsonl, write_jsonl
+from utils.atomic_write import atomic_write_json
+from utils.log_search import ActivitySearchIndex, parse_query
+
+INDEX_VERSION = 1
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Parsed day files kept in memory (past days never change, today only grows)
+DAY_CACHE_SIZE = 31
+
+FilterValue = Optional[Union[str, Iterable[str]]]
+
+
+def _as_filter_set(value: FilterValue) -> Optional[Set[str]]:
+    """None (no filter) or the set of accepted values"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+def entry_day(entry: Dict) -> str:
+    """YYYY-MM-DD bucket of an entry (its 'date' is '%Y-%m-%d %H:%M:%S')"""
+    date = str(entry.get("date") or "")
+    try:
+        datetime.strptime(date[:10], "%Y-%m-%d")
+        return date[:10]
+    except ValueError:
+        return datetime.now().strftime("%Y-%m-%d")
+
+
+class ActivityLog:
+    """Append-only activity entries, one JSONL file per day, with a per-day index"""
+
+    def __init__(self, logs_dir: str = None):
+        self.logs_dir = logs_dir or os.path.join(DATA_PATHS.SHARED_BASE, "logs")
+        self.log_dir = os.path.join(self.logs_dir, "activity")
+        self.index_file = os.path.join(self.log_dir, "index.json")
+        self.legacy_file = os.path.join(self.logs_dir, "activity_logs.json")
+        self._committer = GroupCommitter(
+            get_file_lock(f"{self.index_file}.lock"),
+            self._load_index,
+            self._save_index,
+            name="activity index")
+        self._day_reader = JsonlTailReader("ACTIVITY_LOG", max_files=DAY_CACHE_SIZE)
+        self._guard = threading.Lock()
+        self._search_index: Optional[ActivitySearchIndex] = None
+
+    def _day_file(self, day: str) -> str:
+        return os.path.join(self.log_dir, f"{day}.jsonl")
+
+    # ---- index ----
+
+    @staticmethod
+    def _empty_index() -> Dict:
+        return {'version': INDEX_VERSION, 'total': 0, 'days': {}, 'last_by_user': {}}
+
+    def _load_index(self) -> Dict:
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if content.strip():
+                return json.loads(content)
+        index = self._empty_index()
+        self._migrate_legacy(index)
+        return index
+
+    def _save_index(self, index: Dict):
+        atomic_write_json(self.index_file, index)
+        get_json_cache().invalidate(self.index_file)
+
+    def get_index(self) -> Dict:
+        """Cached, read-only view of the index"""
+        index = load_json_cached(self.index_file, None, copy_result=False)
+        if index is None and os.path.exists(self.legacy_file):
+            # Not migrated yet - an empty commit runs the migration
+            self._committer.submit(lambda index: True)
+            index = load_json_cached(self.index_file, None, copy_result=False)
+        return index or self._empty_index()
+
+    @staticmethod
+    def _count(index: Dict, entry: Dict, day: str):
+        stats = index['days'].setdefault(day, {'count': 0, 'users': {}, 'roles': {}})
+        stats['count'] += 1
+        username = entry.get('username') or ''
+        role = entry.get('role') or ''
+        stats['users'][username] = stats['users'].get(username, 0) + 1
+        stats['roles'][role] = stats['roles'].get(role, 0) + 1
+        index['total'] += 1
+        last = index['last_by_user'].get(username)
+        if username and (not last or entry.get('date', '') >= last.get('date', '')):
+            index['last_by_user'][username] = {'date': entry.get('date'), 'activity': entry.get('activity')}
+
+    # ---- writing ----
+
+    def append(self, entry: Dict) -> bool:
+        """Append one entry ({'username', 'fullname', 'email', 'role', 'date', 'activity'})"""
+        return self.append_many([entry])
+
+    def append_many(self, entries: List[Dict]) -> bool:
+        """Append entries in one lock / index cycle (one write per day touched)"""
+        entries = [dict(entry) for entry in entries if entry]
+        if not entries:
+            return True
+        by_day: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            entry.setdefault('date', datetime.now().strftime(DATE_FORMAT))
+            by_day.setdefault(entry_day(entry), []).append(entry)
+
+        def apply(index):
+            for day, day_entries in by_day.items():
+                append_jsonl(self._day_file(day), day_entries)
+                for entry in day_entries:
+                    self._count(index, entry, day)
+            return True
+
+        if not self._committer.submit(apply):
+            print(f"[ACTIVITY_LOG] Failed to append {len(entries)} activity entr{'y' if len(entries) == 1 else 'ies'}")
+            return False
+        return True
+
+    def delete_where(self, predicate: Callable[[Dict], bool] = None, date_from: str = None, date_to: str = None,
+                     username: FilterValue = None, search: str = None) -> int:
+        """
+        Remove the entries matching all the filters (as for iter_entries) from
+        the days in range (inclusive YYYY-MM-DD bounds) and recount those days.
+        Returns how many were removed.
+        """
+        removed = []
+        users = _as_filter_set(username)
+        terms = parse_query(search or "")
+
+        def apply(index):
+            touched_users = set()
+            days = self._days_in(index, date_from, date_to, users)
+            for day, positions in self._candidates(index, days, terms, users, None):
+                entries = self._read_day(day)
+                if positions is None:
+                    doomed = {position for position, entry in enumerate(entries)
+                              if self._matches(entry, users, None, predicate)}
+                else:
+                    # Search positions already honour users
+                    doomed = {position for position in positions
+                              if position < len(entries) and self._matches(entries[position], None, None, predicate)}
+                keep, dropped = [], []
+                for position, entry in enumerate(entries):
+                    (dropped if position in doomed else keep).append(entry)
+                if not dropped:
+                    continue
+                write_jsonl(self._day_file(day), keep)
+                removed.append(len(dropped))
+
+                gen = index['days'][day].get('gen', 0) + 1
+                index['total'] -= index['days'][day]['count']
+                index['days'][day] = {'count': 0, 'users': {}, 'roles': {}}
+                for entry in keep:
+                    self._count(index, entry, day)
+                # Tells search indexes built over the old file to rebuild
+                index['days'][day]['gen'] = gen
+                touched_users.update(entry.get('username') or '' for entry in dropped)
+            if not removed:
+                return False
+            self._refresh_last_by_user(index, touched_users)
+            return True
+
+        if not self._committer.submit(apply):
+            print("[ACTIVITY_LOG] Failed to delete activity entries")
+            return 0
+        return sum(removed)
+
+    def _refresh_last_by_user(self, index: Dict, usernames: Iterable[str]):
+        """Recompute last_by_user for users whose entries were deleted (newest days first)"""
+        pending = {username for username in usernames if username}
+        for username in pending:
+            index['last_by_user'].pop(username, None)
+        for day in sorted(index['days'], reverse=True):
+            if not pending:
+                break
+            if not pending.intersection(index['days'][day]['users']):
+                continue
+            for entry in reversed(self._read_day(day)):
+                username = entry.get('username')
+                if username in pending:
+                    index['last_by_user'][username] = {'date': entry.get('date'), 'activity': entry.get('activity')}
+                    pending.discard(username)
+
+    def _migrate_legacy(self, index: Dict):
+        """Split activity_logs.json into day files (under the index lock)"""
+        if not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            legacy = json.loads(content) if content.strip() else []
+        except Exception as e:
+            print(f"[ACTIVITY_LOG] Could not read legacy activity log {self.legacy_file}: {e}")
+            return
+        if not isinstance(legacy, list):
+            legacy = []
+
+        by_day: Dict[str, List[Dict]] = {}
+        for entry in legacy:
+            if isinstance(entry, dict):
+                by_day.setdefault(entry_day(entry), []).append(entry)
+        for day, entries in by_day.items():
+            # Whole-file write: a migration interrupted before the index was saved just runs again
+            write_jsonl(self._day_file(day), entries)
+            for entry in entries:
+                self._count(index, entry, day)
+
+        # Save the index before retiring the legacy file so the day files are never orphaned
+        self._save_index(index)
+        os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+        print(f"[ACTIVITY_LOG] Migrated {index['total']} activity entries into {len(by_day)} day file(s)")
+
+    # ---- reading ----
+
+    def _read_day(self, day: str) -> List[Dict]:
+        """Entries of one day, oldest first; only bytes appended since the last read are parsed"""
+        return self._day_reader.read(self._day_file(day))
+
+    @staticmethod
+    def _days_in(index: Dict, date_from: str = None, date_to: str = None,
+                 users: Optional[Set[str]] = None, role: str = None) -> List[str]:
+        """Days (oldest first) in the inclusive range that have entries for any of users / role"""
+        days = []
+        for day, stats in index['days'].items():
+            if not stats['count']:
+                continue
+            if (date_from and day < date_from[:10]) or (date_to and day > date_to[:10]):
+                continue
+            if users is not None and not any(stats['users'].get(username) for username in users):
+                continue
+            if role is not None and not stats['roles'].get(role):
+                continue
+            days.append(day)
+        days.sort()
+        return days
+
+    @staticmethod
+    def _day_count(stats: Dict, users: Optional[Set[str]], role: Optional[str]) -> Optional[int]:
+        """Matches in a day known from its index counts alone (None when users and role are combined)"""
+        if users is not None and role is not None:
+            return None
+        if users is not None:
+            return sum(stats['users'].get(username, 0) for username in users)
+        if role is not None:
+            return stats['roles'].get(role, 0)
+        return stats['count']
+
+    @staticmethod
+    def _matches(entry: Dict, users: Optional[Set[str]], role: Optional[str],
+                 predicate: Optional[Callable[[Dict], bool]]) -> bool:
+        if users is not None and entry.get('username', '') not in users:
+            return False
+        if role is not None and (entry.get('role') or '') != role:
+            return False
+        return predicate is None or predicate(entry)
+
+    def get_days(self, date_from: str = None, date_to: str = None) -> List[str]:
+        """Days with entries in the inclusive YYYY-MM-DD range, oldest first"""
+        return self._days_in(self.get_index(), date_from, date_to)
+
+    def get_day_stats(self, day: str) -> Dict:
+        """{'count', 'users', 'roles'} for one day"""
+        return self.get_index()['days'].get(day, {'count': 0, 'users': {}, 'roles': {}})
+
+    @property
+    def search_index(self) -> ActivitySearchIndex:
+        """Per-day inverted indexes used for free-text search (see utils/log_search.py)"""
+        if self._search_index is None:
+            with self._guard:
+                if self._search_index is None:
+                    self._search_index = ActivitySearchIndex(self)
+        return self._search_index
+
+    def _candidates(self, index: Dict, days: List[str], terms: List[str], users: Optional[Set[str]],
+                    role: Optional[str]) -> List[Tuple[str, Optional[List[int]]]]:
+        """(day, matching positions) for searches; (day, None) - every entry is a candidate - otherwise"""
+        if not terms:
+            return [(day, None) for day in days]
+        candidates = []
+        for day in days:
+            stats = index['days'][day]
+            positions = self.search_index.match_day(day, stats.get('gen', 0), stats['count'], terms, users, role)
+            if positions:
+                candidates.append((day, positions))
+        return candidates
+
+    def _day_entries(self, day: str, positions: Optional[List[int]], users: Optional[Set[str]], role: Optional[str],
+                     predicate: Optional[Callable[[Dict], bool]], newest_first: bool) -> Iterator[Dict]:
+        entries = self._read_day(day)
+        if positions is None:
+            for entry in (reversed(entries) if newest_first else entries):
+                if self._matches(entry, users, role, predicate):
+                    yield entry
+            return
+        # Search positions already honour users and role
+        for position in (reversed(positions) if newest_first else positions):
+            if position < len(entries) and (predicate is None or predicate(entries[position])):
+                yield entries[position]
+
+    def iter_entries(self, date_from: str = None, date_to: str = None, username: FilterValue = None,
+                     role: str = None, predicate: Callable[[Dict], bool] = None, search: str = None,
+                     newest_first: bool = True) -> Iterator[Dict]:
+        """
+        Entries in the inclusive YYYY-MM-DD range, optionally for some usernames
+        (str or list), a role, a predicate and free-text search terms (all must
+        match). Only the day files that the indexes say contain matches are opened.
+        """
+        index = self.get_index()
+        users = _as_filter_set(username)
+        days = self._days_in(index, date_from, date_to, users, role)
+        if newest_first:
+            days.reverse()
+        for day, positions in self._candidates(index, days, parse_query(search or ""), users, role):
+            yield from self._day_entries(day, positions, users, role, predicate, newest_first)
+
+    def query(self, date_from: str = None, date_to: str = None, username: FilterValue = None,
+              role: str = None, predicate: Callable[[Dict], bool] = None, search: str = None,
+              page: int = 1, limit: int = 50) -> Dict:
+        """
+        One page of entries, newest first.
+
+        date_from / date_to: inclusive YYYY-MM-DD days; username: str or list
+        search: free-text terms, all of which must match (prefixes of words in
+            the activity, username, full name, email, role or teams, or day
+            buckets such as '2026-06' or 'june'); answered from the search index
+        predicate: extra per-entry filter; only the days needed to fill the page
+            are read
+        Without a predicate whole days before the page are skipped using their
+        index or search counts, without opening them.
+
+        Returns {'items', 'total', 'page', 'limit', 'pages', 'has_more'}; 'total'
+        and 'pages' are None when a predicate makes them unknowable without a scan.
+        """
+        index = self.get_index()
+        users = _as_filter_set(username)
+        page = max(1, int(page or 1))
+        limit = max(1, int(limit or 50))
+        days = self._days_in(index, date_from, date_to, users, role)
+        days.reverse()
+        candidates = self._candidates(index, days, parse_query(search or ""), users, role)
+
+        def known_count(day, positions):
+            if predicate is not None:
+                return None
+            if positions is not None:
+                return len(positions)
+            return self._day_count(index['days'][day], users, role)
+
+        counts = [known_count(day, positions) for day, positions in candidates]
+        total = sum(counts) if None not in counts else None
+
+        skip = (page - 1) * limit
+        items = []
+        has_more = False
+        for (day, positions), known in zip(candidates, counts):
+            if known is not None and skip >= known:
+                skip -= known
+                continue
+            for entry in self._day_entries(day, positions, users, role, predicate, True):
+                if skip:
+                    skip -= 1
+                    continue
+                if len(items) == limit:
+                    has_more = True
+                    break
+                items.append(entry)
+            if has_more:
+                break
+
+        pages = max(1, -(-total // limit)) if total is not None else None
+        return {
+            'items': items,
+            'total': total,
+            'page': page,
+            'limit': limit,
+            'pages': pages,
+            'has_more': page < pages if pages is not None else has_more,
+        }
+
+    def get_recent(self, limit: int = 10) -> List[Dict]:
+        """The newest entries, newest first (opens only the last few days)"""
+        recent = []
+        for entry in self.iter_entries():
+            if len(recent) >= limit:
+                break
+            recent.append(entry)
+        return recent
+
+    def count(self, date_from: str = None, date_to: str = None, username: FilterValue = None,
+              role: str = None) -> int:
+        """Number of entries matching the filters, answered from the index where possible"""
+        index = self.get_index()
+        users = _as_filter_set(username)
+        if not (date_from or date_to or users is not None or role is not None):
+            return index.get('total', 0)
+        total = 0
+        for day in self._days_in(index, date_from, date_to, users, role):
+            known = self._day_count(index['days'][day], users, role)
+            if known is None:
+                known = sum(1 for entry in self._read_day(day) if self._matches(entry, users, role, None))
+            total += known
+        return total
+
+    def get_last_entry(self, username: str) -> Optional[Dict]:
+        """{'date', 'activity'} of a user's newest entry, from the index"""
+        return self.get_index()['last_by_user'].get(username)
+
+
+# Global activity log instance
+_activity_log = None
+_activity_log_lock = threading.Lock()
+
+
+def get_activity_log() -> ActivityLog:
+    """Get global activity log instance"""
+    global _activity_log
+    if _activity_log is None:
+        with _activity_log_lock:
+            if _activity_log is None:
+                _activity_log = ActivityLog()
+    return _activity_log
@@ -0,0 +1,41 @@
+"""
+Atomic whole-file writes
+
+The JSON documents on the NAS (queue snapshot, job file, manifests, indexes,
+heads, notification state) are replaced wholesale: the new content goes to a
+temp file next to the target and os.replace swaps it in, so readers on other
+machines see either the old or the new file, never a half-written one. Each
+module used to carry its own copy of that sequence; they call these instead.
+
+The temp name carries the pid and thread id, so writers that do not hold a
+lock (metrics, traces, search indexes) cannot trample each other's temp
+file. A failed write removes its temp file and re-raises.
+"""
+
+import os
+import json
+import threading
+from typing import IO, Any, Callable
+
+
+def atomic_write(path: str, write: Callable[[IO], None], mode: str = 'w', encoding: str = 'utf-8', **open_kwargs):
+    """Call write(f) on a temp file, then replace path with it"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_file = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    if 'b' in mode:
+        encoding = None
+    try:
+        with open(temp_file, mode, encoding=encoding, **open_kwargs) as f:
+            write(f)
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs):
+    """Replace path with data as JSON (dump_kwargs go to json.dump)"""
+    atomic_write(path, lambda f: json.dump(data, f, **dump_kwargs))
@@ -150,3 +150,89 @@ def show_input_dialog(page: ft.Page, title: str, hint: str, on_submit):
 
     page.overlay.append(overlay)
     page.update()
+
+
+def show_reason_dialog(page: ft.Page, title: str, message: str, on_confirm, confirm_text: str = "Confirm"):
+    """
+    Centered overlay like show_center_sheet with a required reason field.
+    on_confirm is called with the entered reason.
+    """
+    reason_field = ft.TextField(
+        label="Reason",
+        multiline=True,
+        min_lines=2,
+        max_lines=4,
+        autofocus=True,
+    )
+
+    def close_overlay(e=None):
+        if overlay in page.overlay:
+            page.overlay.remove(overlay)
+        page.update()
+
+    def confirm_action(e):
+        reason = (reason_field.value or "").strip()
+        if not reason:
+            reason_field.error_text = "Please provide a reason"
+            page.update()
+            return
+        close_overlay()
+        if on_confirm:
+            on_confirm(reason)
+
+    overlay = ft.Container(
+        content=ft.Container(
+            content=ft.Column(
+                [
+                    ft.Text(title, size=18, weight=ft.FontWeight.BOLD),
+                    ft.Text(message, size=16),
+                    reason_field,
+                    ft.Row(
+                        [
+                            ft.ElevatedButton(
+                                "Cancel",
+                                on_click=close_overlay,
+                                style=ft.ButtonStyle(
+                                    bgcolor={ft.ControlState.DEFAULT: ft.Colors.WHITE,
+                                            ft.ControlState.HOVERED: ft.Colors.BLACK},
+                                    color={ft.ControlState.DEFAULT: ft.Colors.BLACK,
+                                        ft.ControlState.HOVERED: ft.Colors.WHITE},
+                                    side={ft.ControlState.DEFAULT: ft.BorderSide(1, ft.Colors.BLACK),
+                                        ft.ControlState.HOVERED: ft.BorderSide(1, ft.Colors.BLACK)},
+                                    shape=ft.RoundedRectangleBorder(radius=5),
+                                ),
+                            ),
+                            ft.ElevatedButton(
+                                confirm_text,
+                                on_click=confirm_action,
+                                style=ft.ButtonStyle(
+                                    bgcolor={ft.ControlState.DEFAULT: ft.Colors.RED,
+                                            ft.ControlState.HOVERED: ft.Colors.WHITE},
+                                    color={ft.ControlState.DEFAULT: ft.Colors.WHITE,
+                                        ft.ControlState.HOVERED: ft.Colors.RED},
+                                    side={ft.ControlState.DEFAULT: ft.BorderSide(1, ft.Colors.RED),
+                                        ft.ControlState.HOVERED: ft.BorderSide(1, ft.Colors.RED)},
+                                    shape=ft.RoundedRectangleBorder(radius=5),
+                                ),
+                            ),
+                        ],
+                        alignment=ft.MainAxisAlignment.END,
+                        spacing=10,
+                    ),
+                ],
+                alignment=ft.MainAxisAlignment.CENTER,
+                spacing=20,
+                tight=True,
+            ),
+            padding=20,
+            bgcolor=ft.Colors.WHITE,
+            border_radius=10,
+            width=420,
+        ),
+        alignment=ft.alignment.center,
+        bgcolor=ft.Colors.with_opacity(0.4, ft.Colors.BLACK),
+        expand=True,
+    )
+
+    page.overlay.append(overlay)
+    page.update()
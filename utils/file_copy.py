@@ -0,0 +1,127 @@
+"""
+Streaming file copy for KMTI file moves
+
+Moving uploads to the PROJECTS share used shutil.move, which falls back to
+copy + delete across shares with no progress and no integrity check.
+copy_file streams the file in large chunks, computes its SHA-256 in the same
+pass and reports progress; verify_file re-reads the destination and compares
+size and hash before the caller deletes the source. Moves within one
+filesystem are a plain rename.
+"""
+
+import os
+import hashlib
+from typing import Callable, Dict, Optional, Tuple
+
+CHUNK_SIZE = 8 * 1024 * 1024     # large reads keep SMB round trips down for big CAD files
+
+ProgressCallback = Callable[[int, int], None]   # (bytes_done, total_bytes)
+
+
+def same_filesystem(source_path: str, target_dir: str) -> bool:
+    """True if a file can be renamed from source_path into target_dir"""
+    try:
+        return os.stat(source_path).st_dev == os.stat(target_dir).st_dev
+    except OSError:
+        return False
+
+
+def hash_file(path: str, chunk_size: int = CHUNK_SIZE,
+              progress: Optional[ProgressCallback] = None) -> str:
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    total = os.path.getsize(path)
+    done = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+            done += read
+            if progress:
+                progress(done, total)
+    return digest.hexdigest()
+
+
+def copy_file(source_path: str, target_path: str, progress: Optional[ProgressCallback] = None,
+              chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Copy source to target in one streaming pass, hashing as it goes.
+
+    The target is flushed to disk and gets the source's timestamps (not its
+    permissions - a copy of read-only shared content is a normal file).
+    Returns {'size': int, 'sha256': str}. A partial target is removed on error.
+    """
+    digest = hashlib.sha256()
+    total = os.path.getsize(source_path)
+    done = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    try:
+        with open(source_path, 'rb', buffering=0) as src, open(target_path, 'wb', buffering=0) as dst:
+            while True:
+                read = src.readinto(buffer)
+                if not read:
+                    break
+                chunk = view[:read]
+                digest.update(chunk)
+                written = 0
+                while written < read:
+                    written += dst.write(chunk[written:])
+                done += read
+                if progress:
+                    progress(done, total)
+            os.fsync(dst.fileno())
+        source_stat = os.stat(source_path)
+        os.utime(target_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    except Exception:
+        try:
+            if os.path.exists(target_path):
+                os.remove(target_path)
+        except OSError:
+            pass
+        raise
+    return {'size': done, 'sha256': digest.hexdigest()}
+
+
+def verify_file(path: str, size: int, sha256: Optional[str] = None,
+                progress: Optional[ProgressCallback] = None) -> Tuple[bool, str]:
+    """Check a file against an expected size and (if given) SHA-256"""
+    if not os.path.exists(path):
+        return False, f"File missing: {path}"
+    actual_size = os.path.getsize(path)
+    if actual_size != size:
+        return False, f"Size mismatch: {actual_size} != {size} bytes"
+    if sha256 and hash_file(path, progress=progress) != sha256:
+        return False, "SHA-256 mismatch"
+    return True, "Verified"
+
+
+def move_file(source_path: str, target_path: str, progress: Optional[ProgressCallback] = None,
+              remove: Callable[[str], None] = os.remove) -> Dict:
+    """
+    Move a file: rename on the same filesystem, otherwise copy, verify and
+    only then delete the source (with `remove`). An existing target is
+    replaced - it is expected to be a reserved placeholder name.
+    Returns {'size': int, 'sha256': str or None, 'renamed': bool}.
+    """
+    if same_filesystem(source_path, os.path.dirname(target_path) or "."):
+        try:
+            size = os.path.getsize(source_path)
+            os.replace(source_path, target_path)
+            return {'size': size, 'sha256': None, 'renamed': True}
+        except OSError as e:
+            # e.g. two SMB shares on one NAS volume - fall back to copying
+            print(f"[FILE_COPY] Rename failed, copying instead: {e}")
+
+    result = copy_file(source_path, target_path, progress)
+    verified, message = verify_file(target_path, result['size'], result['sha256'])
+    if not verified:
+        os.remove(target_path)
+        raise IOError(f"Copy verification failed for {target_path}: {message}")
+    remove(source_path)
+    result['renamed'] = False
+    return result
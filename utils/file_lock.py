@@ -0,0 +1,520 @@
+"""
+Inter-process File Locking for KMTI shared JSON documents
+
+Provides:
+- InterProcessLock: atomic O_EXCL lock files with stale-lock detection,
+  FIFO ordering between threads of this process and jittered exponential
+  backoff between processes
+- GroupCommitter: batches mutations queued by concurrent threads into a
+  single lock / load / save cycle
+- Lock-wait metrics per lock file (get_lock_metrics)
+
+Staleness does not compare the NAS mtime of a lock file with the local clock
+(client and NAS clocks drift apart). A held lock file is touched by a
+heartbeat thread every HEARTBEAT_FRACTION of stale_after, and a waiter
+breaks it when its mtime has not changed for stale_after seconds of the
+waiter's own monotonic clock, when its owner is a dead process on this host,
+or when it is older than stale_after plus CLOCK_SKEW_ALLOWANCE.
+
+A holder that stalls past stale_after can have its lock broken and taken by
+another process. Every lock file therefore carries a random owner token, and
+release() removes the file only if the token is still its own - otherwise it
+reports the lock as lost and leaves the new owner's file alone.
+"""
+
+import os
+import copy
+import json
+import time
+import uuid
+import random
+import socket
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LockTimeoutError(Exception):
+    """Raised when an inter-process lock cannot be acquired in time"""
+    pass
+
+
+HEARTBEAT_FRACTION = 1 / 3        # held locks are touched this often (x stale_after)
+CLOCK_SKEW_ALLOWANCE = 120.0      # seconds of NAS/local clock drift tolerated by the mtime check
+
+_HOSTNAME = socket.gethostname()
+
+
+def process_alive(pid: int) -> bool:
+    """Check whether a local process is still running"""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows - ask the kernel instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+# Per-lock-file metrics, keyed by lock path
+_metrics: Dict[str, Dict[str, float]] = {}
+_metrics_lock = threading.Lock()
+
+
+def _record_metric(lock_path: str, **updates):
+    with _metrics_lock:
+        stats = _metrics.setdefault(lock_path, {
+            "acquisitions": 0,
+            "contended": 0,
+            "timeouts": 0,
+            "stale_breaks": 0,
+            "lost_locks": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "group_commits": 0,
+            "grouped_mutations": 0
+        })
+        for key, value in updates.items():
+            if key == "max_wait_ms":
+                stats[key] = max(stats[key], value)
+            else:
+                stats[key] += value
+
+
+def get_lock_metrics() -> Dict[str, Dict[str, float]]:
+    """Get a snapshot of lock-wait metrics for every lock file used so far"""
+    with _metrics_lock:
+        snapshot = {}
+        for path, stats in _metrics.items():
+            entry = dict(stats)
+            entry["avg_wait_ms"] = round(stats["total_wait_ms"] / stats["acquisitions"], 2) if stats["acquisitions"] else 0.0
+            snapshot[path] = entry
+        return snapshot
+
+
+class _TicketLock:
+    """FIFO lock for threads of this process (first come, first served)"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._now_serving = 0
+        self._owner = None
+        self._depth = 0
+
+        self._abandoned = set()     # tickets whose waiters timed out
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return True
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while ticket != self._now_serving:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    # Give up the place in line - it is skipped when its turn comes
+                    self._abandoned.add(ticket)
+                    return False
+                self._condition.wait(remaining)
+            self._owner = me
+            self._depth = 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._now_serving += 1
+                while self._now_serving in self._abandoned:
+                    self._abandoned.discard(self._now_serving)
+                    self._now_serving += 1
+                self._condition.notify_all()
+
+
+# One ticket lock per lock file so all InterProcessLock instances share ordering
+_local_locks: Dict[str, _TicketLock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def _local_lock_for(lock_path: str) -> _TicketLock:
+    with _local_locks_guard:
+        if lock_path not in _local_locks:
+            _local_locks[lock_path] = _TicketLock()
+        return _local_locks[lock_path]
+
+
+# Lock files held by this process, touched by the heartbeat thread
+_held_locks: Dict[str, float] = {}     # lock path -> heartbeat interval
+_held_locks_guard = threading.Lock()
+_heartbeat_thread: Optional[threading.Thread] = None
+_heartbeat_wake = threading.Event()
+
+
+def _heartbeat_loop():
+    while True:
+        with _held_locks_guard:
+            held = dict(_held_locks)
+        for path in held:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass    # released (or broken) meanwhile
+        # Woken early when a lock with a shorter interval is taken
+        _heartbeat_wake.wait(min(held.values()) if held else 60.0)
+        _heartbeat_wake.clear()
+
+
+def _start_heartbeat(lock_path: str, interval: float):
+    global _heartbeat_thread
+    with _held_locks_guard:
+        previous = min(_held_locks.values()) if _held_locks else None
+        _held_locks[lock_path] = interval
+        if previous is None or interval < previous:
+            _heartbeat_wake.set()
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="file-lock-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def _stop_heartbeat(lock_path: str):
+    with _held_locks_guard:
+        _held_locks.pop(lock_path, None)
+
+
+class InterProcessLock:
+    """
+    Lock file acquired atomically with O_CREAT | O_EXCL.
+
+    While held the lock file is touched every stale_after * HEARTBEAT_FRACTION
+    seconds. A lock file whose mtime has not moved for stale_after seconds, or
+    whose owner is a dead process on this host, is treated as left behind by a
+    crashed process and broken. Re-entrant within the owning thread.
+    """
+
+    def __init__(self, lock_path: str, timeout: float = 10.0, stale_after: float = 30.0,
+                 initial_backoff: float = 0.01, max_backoff: float = 0.5):
+        self.lock_path = os.path.abspath(lock_path)
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._local = _local_lock_for(self.lock_path)
+        self._held = threading.local()
+        # (lock file signature, monotonic time it was first seen) - only the
+        # thread holding the ticket lock waits on the file, so no extra guard
+        self._observed: Optional[tuple] = None
+
+    def _try_create(self) -> bool:
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        token = uuid.uuid4().hex
+        try:
+            owner = {"pid": os.getpid(), "host": socket.gethostname(), "acquired_at": time.time(),
+                     "token": token}
+            os.write(fd, json.dumps(owner).encode('utf-8'))
+        finally:
+            os.close(fd)
+        self._held.token = token
+        return True
+
+    @staticmethod
+    def _lock_info(path: str) -> Optional[tuple]:
+        """(mtime, owner dict) of a lock file, None if it is gone"""
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except OSError:
+            return None
+        try:
+            owner = json.loads(content) if content.strip() else {}
+        except ValueError:
+            owner = {}
+        return mtime, owner if isinstance(owner, dict) else {}
+
+    def _stale_reason(self, info: tuple) -> Optional[str]:
+        mtime, owner = info
+        if owner.get('host') == _HOSTNAME and isinstance(owner.get('pid'), int) \
+                and owner['pid'] != os.getpid() and not process_alive(owner['pid']):
+            return f"owner pid {owner['pid']} is gone"
+
+        # Heartbeats move the mtime; judge it by our own clock, not the NAS's
+        signature = (mtime, owner.get('pid'), owner.get('host'), owner.get('acquired_at'))
+        now = time.monotonic()
+        if self._observed is None or self._observed[0] != signature:
+            self._observed = (signature, now)
+        unchanged_for = now - self._observed[1]
+        if unchanged_for >= self.stale_after:
+            return f"no heartbeat for {unchanged_for:.1f}s"
+
+        age = time.time() - mtime
+        if age >= self.stale_after + CLOCK_SKEW_ALLOWANCE:
+            return f"age {age:.1f}s"
+        return None
+
+    def _break_if_stale(self) -> bool:
+        """Move a stale lock out of the way; returns True if one was broken"""
+        info = self._lock_info(self.lock_path)
+        if info is None:
+            self._observed = None
+            return False
+        reason = self._stale_reason(info)
+        if reason is None:
+            return False
+
+        # Rename first so only one breaker wins, then re-check what we grabbed
+        stale_path = f"{self.lock_path}.stale-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(self.lock_path, stale_path)
+        except OSError:
+            return False
+
+        grabbed = self._lock_info(stale_path)
+        if grabbed is not None and grabbed[1] != info[1]:
+            # Another process re-acquired between our check and rename - give it back
+            try:
+                os.rename(stale_path, self.lock_path)
+            except OSError:
+                pass
+            return False
+
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+        self._observed = None
+        print(f"[FILE_LOCK] Broke stale lock {self.lock_path} ({reason})")
+        _record_metric(self.lock_path, stale_breaks=1)
+        return True
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        depth = getattr(self._held, "depth", 0)
+        if depth:
+            self._held.depth = depth + 1
+            return True
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        if not self._local.acquire(timeout):
+            # Threads of this process ahead of us held on past the deadline
+            _record_metric(self.lock_path, timeouts=1, contended=1)
+            return False
+
+        backoff = self.initial_backoff
+        contended = False
+        try:
+            while True:
+                os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+                if self._try_create():
+                    waited_ms = (time.perf_counter() - start) * 1000
+                    _record_metric(self.lock_path, acquisitions=1, contended=int(contended),
+                                   total_wait_ms=waited_ms, max_wait_ms=waited_ms)
+                    self._held.depth = 1
+                    self._observed = None
+                    _start_heartbeat(self.lock_path, self.stale_after * HEARTBEAT_FRACTION)
+                    return True
+
+                contended = True
+                if self._break_if_stale():
+                    continue
+
+                elapsed = time.perf_counter() - start
+                if elapsed >= timeout:
+                    _record_metric(self.lock_path, timeouts=1)
+                    self._local.release()
+                    return False
+
+                # Full jitter keeps competing processes from retrying in lockstep
+                time.sleep(min(random.uniform(0, backoff), max(timeout - elapsed, 0)))
+                backoff = min(backoff * 2, self.max_backoff)
+        except Exception:
+            self._local.release()
+            raise
+
+    def release(self):
+        depth = getattr(self._held, "depth", 0)
+        if depth == 0:
+            return
+        if depth > 1:
+            self._held.depth = depth - 1
+            return
+        self._held.depth = 0
+        _stop_heartbeat(self.lock_path)
+        try:
+            self._remove_own_lock_file()
+        finally:
+            self._local.release()
+
+    def _remove_own_lock_file(self):
+        """Remove the lock file if it still carries our token (it may have been broken as stale)"""
+        token = getattr(self._held, "token", None)
+        self._held.token = None
+        # Rename first so nobody can take the lock between our check and the removal
+        released_path = f"{self.lock_path}.release-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(self.lock_path, released_path)
+        except FileNotFoundError:
+            print(f"[FILE_LOCK] Lost lock {self.lock_path}: it was broken as stale while held")
+            _record_metric(self.lock_path, lost_locks=1)
+            return
+        except OSError as e:
+            print(f"[FILE_LOCK] Error releasing {self.lock_path}: {e}")
+            return
+
+        info = self._lock_info(released_path)
+        if info is not None and info[1].get('token') != token:
+            # Broken as stale and re-acquired by someone else - give the file back
+            try:
+                os.rename(released_path, self.lock_path)
+            except OSError as e:
+                print(f"[FILE_LOCK] Could not restore {self.lock_path} for its new owner: {e}")
+            print(f"[FILE_LOCK] Lost lock {self.lock_path}: it was broken as stale and taken by "
+                  f"pid {info[1].get('pid')} on {info[1].get('host')}")
+            _record_metric(self.lock_path, lost_locks=1)
+            return
+
+        try:
+            os.remove(released_path)
+        except OSError as e:
+            print(f"[FILE_LOCK] Error releasing {self.lock_path}: {e}")
+
+    def __enter__(self):
+        if not self.acquire():
+            raise LockTimeoutError(f"Timed out waiting for lock {self.lock_path}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class _PendingMutation:
+    __slots__ = ("mutator", "done", "result")
+
+    def __init__(self, mutator):
+        self.mutator = mutator
+        self.done = threading.Event()
+        self.result = False
+
+
+class GroupCommitter:
+    """
+    Group commit for a lock-protected document.
+
+    Threads submit mutators (callables that edit the loaded document in place
+    and return True if they changed it). The first thread to arrive becomes
+    the leader: it takes the lock once, loads the document once, applies every
+    mutation queued so far, saves once and wakes the waiting threads.
+
+    Each mutator runs on a deep copy of the document, which replaces it only
+    if the mutator returns; one that raises halfway leaves no partial edits.
+    """
+
+    def __init__(self, lock: InterProcessLock, load: Callable[[], Any], save: Callable[[Any], None],
+                 after_commit: Callable[[Any], None] = None, name: str = "document"):
+        self.lock = lock
+        self.load = load
+        self.save = save
+        self.after_commit = after_commit
+        self.name = name
+        self._pending: List[_PendingMutation] = []
+        self._mutex = threading.Lock()
+        self._leader_active = False
+
+    def submit(self, mutator: Callable[[Any], bool]) -> bool:
+        """Queue a mutation and block until it has been committed (or failed)"""
+        request = _PendingMutation(mutator)
+        with self._mutex:
+            self._pending.append(request)
+            is_leader = not self._leader_active
+            if is_leader:
+                self._leader_active = True
+
+        if is_leader:
+            self._lead()
+        else:
+            request.done.wait()
+        return request.result
+
+    def _lead(self):
+        while True:
+            with self._mutex:
+                batch = self._pending
+                self._pending = []
+                if not batch:
+                    self._leader_active = False
+                    return
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[_PendingMutation]):
+        try:
+            if not self.lock.acquire():
+                print(f"[FILE_LOCK] Could not acquire lock for {self.name} ({len(batch)} mutations)")
+                return
+            try:
+                document = self.load()
+                changed = False
+                applied = []
+                for request in batch:
+                    working = copy.deepcopy(document)
+                    try:
+                        changed = bool(request.mutator(working)) or changed
+                    except Exception as e:
+                        print(f"[FILE_LOCK] Mutation on {self.name} failed: {e}")
+                        continue
+                    document = working
+                    applied.append(request)
+                if changed:
+                    self.save(document)
+                    if self.after_commit:
+                        self.after_commit(document)
+                for request in applied:
+                    request.result = True
+                _record_metric(self.lock.lock_path, group_commits=1, grouped_mutations=len(batch))
+            finally:
+                self.lock.release()
+        except Exception as e:
+            print(f"[FILE_LOCK] Error committing {self.name}: {e}")
+            for request in batch:
+                request.result = False
+        finally:
+            for request in batch:
+                request.done.set()
+
+
+# Shared lock instances - every user of a lock path must go through the same
+# InterProcessLock so re-entrancy and FIFO ordering work within the process
+_shared_locks: Dict[str, InterProcessLock] = {}
+_shared_locks_guard = threading.Lock()
+
+
+def get_file_lock(lock_path: str, **options) -> InterProcessLock:
+    """Get the shared InterProcessLock for a lock file path"""
+    key = os.path.abspath(lock_path)
+    with _shared_locks_guard:
+        if key not in _shared_locks:
+            _shared_locks[key] = InterProcessLock(key, **options)
+        return _shared_locks[key]
@@ -0,0 +1,174 @@
+"""
+Collision-free filename allocation for KMTI project directories
+
+_generate_unique_filename used to probe name, name_001, name_002, ... with one
+os.path.exists per candidate - up to 999 SMB round trips for a popular name.
+FilenameAllocator lists a directory once, keeps the taken names and the highest
+numeric suffix per stem, and revalidates that cache with a single stat of the
+directory (its mtime changes whenever an entry is added or removed).
+
+Allocation reserves the name with an exclusive create (O_CREAT | O_EXCL), so two
+admins approving same-named files at the same time can never get the same
+target. The placeholder holds a one-line RESERVATION_MARKER record (owner and
+time), so is_reservation() can tell it from a real - possibly empty - file,
+also in another process after a crash. The caller then replaces the
+placeholder with the real file (os.replace / move_file) or removes it with
+release() when the move fails - also when the move will be retried later, so a
+placeholder never sits in a project folder through a retry backoff.
+"""
+
+import os
+import re
+import socket
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+
+RESERVATION_MARKER = b"KMTI-FILENAME-RESERVATION"
+MAX_RESERVATION_SIZE = 256
+
+
+class _DirectoryEntry:
+    """Cached listing of one directory"""
+
+    def __init__(self, signature, names: Set[str]):
+        self.signature = signature
+        self.names = names                    # normcased names present in the directory
+        self.max_suffix: Dict[tuple, int] = {}  # (stem, ext, suffix_format) -> highest suffix seen
+
+
+class FilenameAllocator:
+    """Allocates unique filenames with one (cached) directory listing per directory"""
+
+    MAX_SUFFIX = 999
+
+    def __init__(self):
+        self._entries: Dict[str, _DirectoryEntry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.listings = 0
+
+    @staticmethod
+    def _key(directory: str) -> str:
+        return os.path.normcase(os.path.abspath(directory))
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _entry(self, key: str) -> _DirectoryEntry:
+        """Cached listing, re-read only if the directory changed since it was taken"""
+        stat = os.stat(key)
+        signature = (stat.st_mtime_ns, stat.st_ino)
+        entry = self._entries.get(key)
+        if entry is None or entry.signature != signature:
+            self.listings += 1
+            entry = _DirectoryEntry(signature, {os.path.normcase(name) for name in os.listdir(key)})
+            self._entries[key] = entry
+        return entry
+
+    def allocate(self, directory: str, filename: str, suffix_format: str = "_{:03d}") -> str:
+        """
+        Reserve a free name for filename in directory and return it.
+
+        The name itself is used when free, otherwise name + suffix_format.format(n)
+        + ext with n one above the highest suffix in use. Past MAX_SUFFIX a
+        timestamp is used, as before. The returned name exists as a reservation
+        placeholder (see is_reservation).
+        """
+        os.makedirs(directory, exist_ok=True)
+        key = self._key(directory)
+        name, ext = os.path.splitext(filename)
+        suffix_pattern = re.compile(
+            re.escape(os.path.normcase(name)) + re.escape(suffix_format).replace(
+                re.escape("{:03d}"), r"(\d+)") + re.escape(os.path.normcase(ext)) + "$")
+
+        with self._lock_for(key):
+            entry = self._entry(key)
+            table_key = (os.path.normcase(name), os.path.normcase(ext), suffix_format)
+            if table_key not in entry.max_suffix:
+                suffixes = [int(match.group(1)) for match in map(suffix_pattern.match, entry.names) if match]
+                entry.max_suffix[table_key] = max(suffixes, default=0)
+
+            candidate = filename
+            if os.path.normcase(candidate) in entry.names:
+                candidate = None
+            while True:
+                if candidate is None:
+                    counter = entry.max_suffix[table_key] + 1
+                    if counter > self.MAX_SUFFIX:
+                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                        candidate = f"{name}_{timestamp}{ext}"
+                    else:
+                        entry.max_suffix[table_key] = counter
+                        candidate = f"{name}{suffix_format.format(counter)}{ext}"
+                if self._reserve(os.path.join(directory, candidate)):
+                    entry.names.add(os.path.normcase(candidate))
+                    self._refresh_signature(key, entry)
+                    return candidate
+                # Taken by another process since the listing - remember it and try the next one
+                entry.names.add(os.path.normcase(candidate))
+                candidate = None
+
+    @staticmethod
+    def _reserve(path: str) -> bool:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        try:
+            owner = f" {socket.gethostname()}:{os.getpid()} {datetime.now().isoformat()}\n"
+            os.write(fd, RESERVATION_MARKER + owner.encode("utf-8"))
+        finally:
+            os.close(fd)
+        return True
+
+    @staticmethod
+    def is_reservation(path: str) -> bool:
+        """True if path is a placeholder written by allocate() (not a real file)"""
+        try:
+            if os.path.getsize(path) > MAX_RESERVATION_SIZE:
+                return False
+            with open(path, "rb") as f:
+                return f.read(len(RESERVATION_MARKER)) == RESERVATION_MARKER
+        except OSError:
+            return False
+
+    @staticmethod
+    def _refresh_signature(key: str, entry: _DirectoryEntry):
+        # Our own create changed the directory mtime - the cache already knows about it
+        try:
+            stat = os.stat(key)
+            entry.signature = (stat.st_mtime_ns, stat.st_ino)
+        except OSError:
+            pass
+
+    def release(self, path: str):
+        """Remove an unused reservation (a placeholder only - never a real file)"""
+        try:
+            if self.is_reservation(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"[FILENAME_ALLOCATOR] Could not release {path}: {e}")
+        self.invalidate(os.path.dirname(path))
+
+    def invalidate(self, directory: Optional[str] = None):
+        """Forget the cached listing of a directory (or all)"""
+        with self._guard:
+            if directory is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(directory), None)
+
+
+# Global allocator instance
+_filename_allocator = None
+
+
+def get_filename_allocator() -> FilenameAllocator:
+    """Get global filename allocator instance"""
+    global _filename_allocator
+    if _filename_allocator is None:
+        _filename_allocator = FilenameAllocator()
+    return _filename_allocator
@@ -0,0 +1,105 @@
+"""
+Process-wide JSON document cache for KMTI NAS files
+
+Every panel refresh used to re-open and re-parse users.json,
+file_approvals.json, the comment files and the archives several times.
+JsonDocumentCache keeps the parsed document per path and revalidates it
+with a single os.stat (mtime, size) per access, so unchanged files are
+only parsed once.
+"""
+
+import os
+import copy
+import json
+import threading
+from typing import Any, Dict
+
+
+class JsonDocumentCache:
+    """Parsed JSON documents keyed by absolute path, validated by (mtime, size)"""
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_parsed = 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def load(self, path: str, default: Any = None, copy_result: bool = True) -> Any:
+        """
+        Load a JSON document through the cache.
+
+        Returns `default` if the file does not exist or cannot be parsed.
+        With copy_result=False the cached object itself is returned and must
+        be treated as read-only by the caller.
+        """
+        key = self._key(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return default
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == signature:
+                self.hits += 1
+                document = entry[1]
+                return copy.deepcopy(document) if copy_result else document
+
+        try:
+            with open(key, 'r', encoding='utf-8') as f:
+                content = f.read()
+            document = json.loads(content) if content.strip() else default
+        except Exception as e:
+            print(f"[JSON_CACHE] Error parsing {path}: {e}")
+            return default
+
+        with self._lock:
+            self.misses += 1
+            self.bytes_parsed += stat.st_size
+            self._entries[key] = (signature, document)
+        return copy.deepcopy(document) if copy_result else document
+
+    def invalidate(self, path: str = None):
+        """Drop one cached document (or all when path is None)"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(path), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/bytes-parsed counters"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "documents": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+                "bytes_parsed": self.bytes_parsed
+            }
+
+
+# Global cache instance
+_json_cache = None
+
+
+def get_json_cache() -> JsonDocumentCache:
+    """Get global JSON document cache instance"""
+    global _json_cache
+    if _json_cache is None:
+        _json_cache = JsonDocumentCache()
+    return _json_cache
+
+
+def load_json_cached(path: str, default: Any = None, copy_result: bool = True) -> Any:
+    """Convenience wrapper around get_json_cache().load()"""
+    return get_json_cache().load(path, default, copy_result)
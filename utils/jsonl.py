@@ -0,0 +1,136 @@
+"""
+Append-only JSON-lines files on the NAS
+
+Notification logs, the broadcast stream, the change feed, comment shards,
+archive segments and activity day files are all JSONL files that several
+machines append to, and each of them carried its own copy of the same
+reader and appender. They share these helpers instead:
+
+- append_jsonl: appends records in one fsynced write. A torn last line left
+  by an interrupted append gets a newline first, so it cannot swallow ours.
+- write_jsonl: replaces a whole file (migrations, compactions) with
+  utils.atomic_write.
+- JsonlTailReader: incremental reads. Per file it caches (inode, offset,
+  records) and parses only the bytes appended since the last read; a file
+  that was replaced or truncated is parsed from the start again.
+- read_jsonl: one uncached read of a whole file.
+
+A line still being written has no newline yet - readers leave it for the
+next read. Corrupt lines are skipped with a message tagged by the caller.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.atomic_write import atomic_write
+
+
+def _encode(records: Iterable[Dict]) -> bytes:
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+
+
+def parse_lines(data: bytes, path: str, tag: str = "JSONL") -> Tuple[List[Dict], int]:
+    """Records of the complete lines in data, and how many bytes those lines span"""
+    # A line still being written has no newline yet - leave it for the next read
+    complete = data[:data.rfind(b"\n") + 1]
+    records = []
+    for line in complete.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            print(f"[{tag}] Skipping corrupt line in {path}")
+    return records, len(complete)
+
+
+def append_jsonl(path: str, records: List[Dict]):
+    """Append records as JSON lines with a single fsynced write"""
+    if not records:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = _encode(records)
+    with open(path, 'a+b') as f:
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Torn last line from an interrupted append - keep it from swallowing ours
+                data = b"\n" + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_jsonl(path: str, records: Iterable[Dict]):
+    """Replace path with records, one JSON line each"""
+    data = _encode(records)
+    atomic_write(path, lambda f: f.write(data), mode='wb')
+
+
+def read_jsonl(path: str, tag: str = "JSONL") -> List[Dict]:
+    """Every complete record of path (no caching)"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return []
+    return parse_lines(data, path, tag)[0]
+
+
+class JsonlTailReader:
+    """
+    Incrementally parsed JSONL files, cached per path.
+
+    read() returns the cached list itself - callers copy records before
+    modifying them. max_files bounds the cache (least recently read first out).
+    """
+
+    def __init__(self, tag: str = "JSONL", max_files: Optional[int] = None):
+        self.tag = tag
+        self.max_files = max_files
+        self._cache: "OrderedDict[str, Tuple[int, int, List[Dict]]]" = OrderedDict()
+        self._guard = threading.Lock()
+
+    def read(self, path: str) -> List[Dict]:
+        """Records of path, oldest first; only bytes appended since the last read are parsed"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return []
+        with self._guard:
+            cached = self._cache.get(path)
+        inode, offset, records = cached if cached else (stat.st_ino, 0, [])
+        if inode != stat.st_ino or stat.st_size < offset:
+            offset, records = 0, []     # replaced (migration / compaction) - parse from the start
+        if stat.st_size == offset:
+            return records
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        new_records, consumed = parse_lines(data, path, self.tag)
+        records = records + new_records
+        with self._guard:
+            self._cache[path] = (stat.st_ino, offset + consumed, records)
+            self._cache.move_to_end(path)
+            if self.max_files is not None:
+                while len(self._cache) > self.max_files:
+                    self._cache.popitem(last=False)
+        return records
+
+    def retain(self, paths: Iterable[str]):
+        """Drop the cache of every file not in paths (e.g. pruned segments)"""
+        keep = set(paths)
+        with self._guard:
+            for path in [path for path in self._cache if path not in keep]:
+                del self._cache[path]
+
+    def forget(self, path: Optional[str] = None):
+        """Drop the cache of one file (or of every file)"""
+        with self._guard:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
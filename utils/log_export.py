@@ -0,0 +1,339 @@
+"""
+Streaming export of the activity log to PDF, CSV and JSON Lines
+
+export_logs_action used to collect every filtered entry in a list and render
+it with FPDF on the UI thread, which froze the admin panel on big exports.
+
+LogExportJob streams the entries straight from the day-rotated log
+(ActivityLog.iter_entries, with the same filters as the Activity Logs page).
+It runs on a worker thread, or inline when used headless:
+
+- CSV and JSONL rows are written as they are read
+- PDF pages are laid out in chunks of rows. fpdf keeps a whole document in
+  memory until it is saved, so large exports are split into volumes of
+  PDF_ROWS_PER_FILE rows (exported_logs.pdf, exported_logs_part2.pdf, ...)
+- progress(written, total) is reported after every chunk, and cancel() stops
+  the job at the next row
+- output goes to <name>.part and is renamed only once complete, so a
+  cancelled or failed export never leaves a truncated file behind
+
+Headless (e.g. a monthly scheduled task):
+
+    python -m utils.log_export --month 2026-09 --format pdf,csv
+"""
+
+import os
+import csv
+import sys
+import json
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+from utils.path_config import DATA_PATHS
+from utils.json_cache import load_json_cached
+from utils.activity_log import get_activity_log
+
+FORMATS = ("pdf", "csv", "jsonl")
+
+COLUMNS = ["fullname", "email", "username", "role", "team", "date", "activity"]
+HEADERS = ["Full Name", "Email", "Username", "Role", "Team", "Date & Time", "Activity"]
+
+CHUNK_ROWS = 500            # rows between progress reports
+PDF_ROWS_PER_FILE = 10000   # rows per PDF volume
+
+
+def default_export_dir() -> str:
+    return os.path.join(DATA_PATHS.SHARED_BASE, "export")
+
+
+def unique_export_path(directory: str, base_filename: str, ext: str) -> str:
+    """<base><ext>, or <base>_<n><ext> for the first n not taken"""
+    counter = 0
+    path = os.path.join(directory, f"{base_filename}{ext}")
+    while os.path.exists(path):
+        counter += 1
+        path = os.path.join(directory, f"{base_filename}_{counter}{ext}")
+    return path
+
+
+def load_user_info() -> Dict[str, Dict]:
+    """username -> {'fullname', 'email', 'role', 'team'} from users.json"""
+    users = load_json_cached(DATA_PATHS.users_file, {}, copy_result=False) or {}
+    user_info = {}
+    for email, data in users.items():
+        uname = data.get("username")
+        if uname:
+            team = data.get("team_tags", [])
+            user_info[uname] = {
+                "fullname": data.get("fullname", uname),
+                "email": email,
+                "role": data.get("role", ""),
+                "team": ", ".join(team) if isinstance(team, list) else (str(team) if team else ""),
+            }
+    return user_info
+
+
+def _pdf_text(value) -> str:
+    # The core PDF fonts are latin-1 only
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+class LogExportJob:
+    """One export of filtered activity entries to a file"""
+
+    def __init__(self, fmt: str, filters: Dict = None, output_path: str = None,
+                 progress: Callable[[int, Optional[int]], None] = None,
+                 done: Callable[["LogExportJob"], None] = None,
+                 user_info: Dict[str, Dict] = None):
+        """
+        fmt: 'pdf', 'csv' or 'jsonl'
+        filters: ActivityLog.iter_entries keyword arguments (date_from, date_to,
+            username, role, search)
+        output_path: target file (default: a new exported_logs*.<fmt> in the export dir)
+        progress(written, total): called from the worker after every chunk
+        done(job): called from the worker when the job stops, whatever the outcome
+        """
+        fmt = (fmt or "").lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+        self.fmt = fmt
+        self.filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        self.output_path = output_path or unique_export_path(default_export_dir(), "exported_logs", f".{fmt}")
+        self.progress = progress
+        self.done = done
+        self.user_info = user_info
+
+        self.status = "pending"     # pending / running / completed / cancelled / failed
+        self.written = 0
+        self.total: Optional[int] = None
+        self.files: List[str] = []
+        self.error: Optional[str] = None
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- control ----
+
+    def start(self) -> "LogExportJob":
+        """Run the export on a worker thread"""
+        self._thread = threading.Thread(target=self.run, name="log-export", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.status not in ("pending", "running")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self) -> "LogExportJob":
+        """Run the export on the calling thread"""
+        self.status = "running"
+        try:
+            activity_log = get_activity_log()
+            if self.user_info is None:
+                self.user_info = load_user_info()
+            self.total = activity_log.query(limit=1, **self.filters)["total"]
+            self._report()
+
+            writer = {"csv": self._write_csv, "jsonl": self._write_jsonl, "pdf": self._write_pdf}[self.fmt]
+            writer(self._rows(activity_log))
+            self.status = "cancelled" if self.cancelled else "completed"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"[LOG_EXPORT] Export to {self.output_path} failed: {e}")
+        finally:
+            self._report()
+            if self.done:
+                try:
+                    self.done(self)
+                except Exception as e:
+                    print(f"[LOG_EXPORT] done callback failed: {e}")
+        return self
+
+    def _report(self):
+        if self.progress:
+            try:
+                self.progress(self.written, self.total)
+            except Exception as e:
+                print(f"[LOG_EXPORT] progress callback failed: {e}")
+
+    # ---- rows ----
+
+    def _rows(self, activity_log) -> Iterator[Dict]:
+        for log in activity_log.iter_entries(**self.filters):
+            if self.cancelled:
+                return
+            uname = log.get("username", "")
+            info = self.user_info.get(uname) or {
+                "fullname": log.get("fullname") or uname,
+                "email": log.get("email", ""),
+                "role": log.get("role", ""),
+                "team": "",
+            }
+            yield {
+                "fullname": info["fullname"],
+                "email": info["email"],
+                "username": uname,
+                "role": info["role"],
+                "team": info["team"],
+                "date": log.get("date", "-"),
+                "activity": log.get("activity", ""),
+            }
+
+    def _counted(self, rows: Iterator[Dict]) -> Iterator[Dict]:
+        for row in rows:
+            yield row
+            self.written += 1
+            if self.written % CHUNK_ROWS == 0:
+                self._report()
+
+    # ---- writers ----
+
+    def _finish(self, temp_file: str, path: str):
+        if self.cancelled:
+            os.remove(temp_file)
+            return
+        os.replace(temp_file, path)
+        self.files.append(path)
+
+    def _write_csv(self, rows: Iterator[Dict]):
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        temp_file = f"{self.output_path}.part"
+        try:
+            # utf-8-sig so Excel opens names in the right encoding
+            with open(temp_file, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(HEADERS)
+                for row in self._counted(rows):
+                    writer.writerow([row[column] for column in COLUMNS])
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        self._finish(temp_file, self.output_path)
+
+    def _write_jsonl(self, rows: Iterator[Dict]):
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        temp_file = f"{self.output_path}.part"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                for row in self._counted(rows):
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        self._finish(temp_file, self.output_path)
+
+    def _volume_path(self, volume: int) -> str:
+        if volume == 1:
+            return self.output_path
+        base, ext = os.path.splitext(self.output_path)
+        return f"{base}_part{volume}{ext}"
+
+    @staticmethod
+    def _new_pdf(volume: int):
+        from fpdf import FPDF
+        pdf = FPDF()
+        pdf.set_auto_page_break(True, margin=15)
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        title = "Exported Activity Logs" if volume == 1 else f"Exported Activity Logs (part {volume})"
+        pdf.cell(200, 10, txt=title, ln=True, align="C")
+        pdf.ln(5)
+        pdf.multi_cell(0, 8, " | ".join(HEADERS))
+        pdf.ln(2)
+        return pdf
+
+    def _save_pdf(self, pdf, volume: int):
+        path = self._volume_path(volume)
+        temp_file = f"{path}.part"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        pdf.output(temp_file, "F")
+        self._finish(temp_file, path)
+
+    def _write_pdf(self, rows: Iterator[Dict]):
+        volume = 1
+        pdf = self._new_pdf(volume)
+        volume_rows = 0
+        for row in self._counted(rows):
+            if volume_rows == PDF_ROWS_PER_FILE:
+                self._save_pdf(pdf, volume)
+                volume += 1
+                pdf = self._new_pdf(volume)
+                volume_rows = 0
+            pdf.multi_cell(0, 8, _pdf_text(" | ".join(str(row[column]) for column in COLUMNS)))
+            pdf.ln(1)
+            volume_rows += 1
+        if self.cancelled:
+            # Earlier volumes are complete files but only part of the export - drop them too
+            for path in self.files:
+                os.remove(path)
+            self.files = []
+            return
+        self._save_pdf(pdf, volume)
+
+
+def _previous_month() -> str:
+    first_of_month = date.today().replace(day=1)
+    return (first_of_month - timedelta(days=1)).strftime("%Y-%m")
+
+
+def _month_range(month: str):
+    start = datetime.strptime(month, "%Y-%m").date()
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+
+def main(argv: List[str] = None) -> int:
+    """Headless export, e.g. from a monthly scheduled task"""
+    parser = argparse.ArgumentParser(description="Export KMTI activity logs")
+    parser.add_argument("--format", default="pdf",
+                        help="comma separated: pdf, csv, jsonl (default: pdf)")
+    parser.add_argument("--month", help="YYYY-MM to export (default: last month unless --from/--to are given)")
+    parser.add_argument("--from", dest="date_from", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="last day, YYYY-MM-DD")
+    parser.add_argument("--user", action="append", dest="users", help="username (repeatable)")
+    parser.add_argument("--search", help="free-text search terms")
+    parser.add_argument("--output-dir", default=None, help="directory for the export files")
+    args = parser.parse_args(argv)
+
+    date_from, date_to = args.date_from, args.date_to
+    month = args.month or (None if (date_from or date_to) else _previous_month())
+    if month:
+        date_from, date_to = _month_range(month)
+
+    output_dir = args.output_dir or default_export_dir()
+    base_filename = f"activity_logs_{month}" if month else f"activity_logs_{date_from or 'start'}_{date_to or 'now'}"
+    filters = {"date_from": date_from, "date_to": date_to, "username": args.users, "search": args.search}
+
+    exit_code = 0
+    for fmt in [fmt.strip().lower() for fmt in args.format.split(",") if fmt.strip()]:
+        def progress(written, total, fmt=fmt):
+            print(f"[LOG_EXPORT] {fmt}: {written}/{total if total is not None else '?'} entries", flush=True)
+
+        try:
+            job = LogExportJob(fmt, filters, unique_export_path(output_dir, base_filename, f".{fmt}"), progress=progress)
+        except ValueError as e:
+            print(f"[LOG_EXPORT] {e}")
+            exit_code = 2
+            continue
+        job.run()
+        if job.status == "completed":
+            for path in job.files:
+                print(f"[LOG_EXPORT] Wrote {path}")
+        else:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
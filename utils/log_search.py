@@ -0,0 +1,234 @@
+"""
+Inverted full-text index for log search
+
+Searching the Activity Logs used to lowercase and substring-scan every
+entry's combined text. Search terms are now looked up in an inverted index:
+
+- InvertedIndex maps terms to the positions of the entries containing them.
+  A query is the AND of its terms, and each term matches any indexed term it
+  prefixes ("approv" finds "approved").
+- ActivitySearchIndex keeps one InvertedIndex per day of the rotated activity
+  log, stored next to it as logs/activity/search/<YYYY-MM-DD>.json. It covers
+  the activity text, username, full name, email, role and teams of each entry.
+  A day's postings are built the first time the day is searched and extended
+  with just the newly appended entries afterwards. The 'gen' counter of the
+  day in the activity index changes when a day file is rewritten (Clear
+  Filtered), which triggers a rebuild.
+- Day buckets ("2026", "2026-06", "2026-06-14", "june", "jun") are answered
+  per day without postings, so date terms and date ranges prune whole days.
+
+EnhancedLogger.get_security_events builds an in-memory InvertedIndex over the
+security audit file with the same tokenizer.
+"""
+
+import os
+import re
+import json
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from utils.path_config import DATA_PATHS
+from utils.json_cache import load_json_cached
+from utils.atomic_write import atomic_write_json
+
+SEARCH_VERSION = 1
+
+# Parsed day indexes kept in memory
+DAY_INDEX_CACHE_SIZE = 400
+
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december"]
+
+_TOKEN_RE = re.compile(r"\d{4}-\d{2}(?:-\d{2})?|\w+", re.UNICODE)
+
+# Exact-match field terms; '=' never starts a search token, so prefix lookups cannot hit them
+USER_FIELD = "=user:"
+ROLE_FIELD = "=role:"
+
+
+def tokenize(text) -> List[str]:
+    """Lowercase search tokens; ISO dates / months stay whole"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def parse_query(query: str) -> List[str]:
+    """Distinct query terms, in order"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def day_terms(day: str) -> Set[str]:
+    """Bucket terms a YYYY-MM-DD day answers to"""
+    terms = {day, day[:7], day[:4]}
+    try:
+        month = MONTH_NAMES[int(day[5:7]) - 1]
+        terms.update((month, month[:3]))
+    except (ValueError, IndexError):
+        pass
+    return terms
+
+
+class InvertedIndex:
+    """term -> sorted positions, with prefix lookup over a sorted vocabulary"""
+
+    def __init__(self, postings: Dict[str, List[int]] = None, count: int = 0):
+        self.postings: Dict[str, List[int]] = postings or {}
+        self.count = count
+        self._vocabulary: Optional[List[str]] = None
+
+    def add(self, position: int, terms: Iterable[str]):
+        """Index one entry; positions must be added in increasing order"""
+        for term in set(terms):
+            self.postings.setdefault(term, []).append(position)
+        self.count = max(self.count, position + 1)
+        self._vocabulary = None
+
+    def lookup(self, term: str, prefix: bool = True) -> Set[int]:
+        """Positions of entries with a term equal to (or starting with) term"""
+        if not prefix:
+            return set(self.postings.get(term, ()))
+        vocabulary = self._vocabulary
+        if vocabulary is None:
+            vocabulary = self._vocabulary = sorted(self.postings)
+        positions = set()
+        i = bisect.bisect_left(vocabulary, term)
+        while i < len(vocabulary) and vocabulary[i].startswith(term):
+            positions.update(self.postings[vocabulary[i]])
+            i += 1
+        return positions
+
+    def match(self, terms: Iterable[str], free_terms: Iterable[str] = ()) -> List[int]:
+        """
+        Sorted positions matching every term (AND). free_terms are already
+        satisfied by every entry (e.g. the day bucket) and are skipped.
+        """
+        free_terms = set(free_terms)
+        result = None
+        for term in terms:
+            if term in free_terms:
+                continue
+            positions = self.lookup(term)
+            result = positions if result is None else result & positions
+            if not result:
+                return []
+        if result is None:
+            return list(range(self.count))
+        return sorted(result)
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'postings': self.postings}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "InvertedIndex":
+        return cls(data.get('postings') or {}, data.get('count', 0))
+
+
+class ActivitySearchIndex:
+    """Per-day inverted indexes over the day-rotated activity log"""
+
+    def __init__(self, activity_log):
+        self.activity_log = activity_log
+        self.search_dir = os.path.join(activity_log.log_dir, "search")
+        self._cache: "OrderedDict[str, Tuple[int, InvertedIndex]]" = OrderedDict()    # day -> (gen, index)
+        self._guard = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _search_file(self, day: str) -> str:
+        return os.path.join(self.search_dir, f"{day}.json")
+
+    @staticmethod
+    def _user_terms() -> Dict[str, List[str]]:
+        """username -> email / team terms from users.json"""
+        users = load_json_cached(DATA_PATHS.users_file, {}, copy_result=False) or {}
+        terms = {}
+        for email, data in users.items():
+            username = data.get("username")
+            if not username:
+                continue
+            teams = data.get("team_tags", [])
+            teams = teams if isinstance(teams, list) else [teams]
+            terms[username] = tokenize(email) + [str(team).lower() for team in teams if team]
+        return terms
+
+    @staticmethod
+    def entry_terms(entry: Dict, user_terms: Dict[str, List[str]]) -> List[str]:
+        """Everything an entry can be found by, plus its exact username / role field terms"""
+        username = entry.get('username') or ''
+        role = entry.get('role') or ''
+        terms = tokenize(entry.get('activity'))
+        terms += tokenize(username) + tokenize(entry.get('fullname')) + tokenize(entry.get('email'))
+        terms += tokenize(role.replace('_', ' ')) + user_terms.get(username, [])
+        terms += [f"{USER_FIELD}{username}", f"{ROLE_FIELD}{role}"]
+        return terms
+
+    def _load(self, day: str) -> Optional[Tuple[int, InvertedIndex]]:
+        try:
+            with open(self._search_file(day), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != SEARCH_VERSION:
+            return None
+        return data.get('gen', 0), InvertedIndex.from_dict(data)
+
+    def _save(self, day: str, gen: int, index: InvertedIndex):
+        try:
+            os.makedirs(self.search_dir, exist_ok=True)
+            search_file = self._search_file(day)
+            atomic_write_json(search_file, dict(index.to_dict(), version=SEARCH_VERSION, gen=gen))
+        except OSError as e:
+            # Readers rebuild from the day file, so a failed save only costs time
+            print(f"[LOG_SEARCH] Could not save search index for {day}: {e}")
+
+    def day_index(self, day: str, gen: int, count: int) -> InvertedIndex:
+        """
+        The day's index, extended with entries appended since it was built.
+        count is the day's entry count from the activity index; the day file
+        is only read when the index is behind it.
+        """
+        with self._build_lock:
+            return self._day_index(day, gen, count)
+
+    def _day_index(self, day: str, gen: int, count: int) -> InvertedIndex:
+        with self._guard:
+            cached = self._cache.get(day)
+        if cached is None or cached[0] != gen:
+            cached = self._load(day)
+            if cached is None or cached[0] != gen:
+                cached = (gen, InvertedIndex())
+
+        index = cached[1]
+        if index.count < count:
+            entries = self.activity_log._read_day(day)
+            if len(entries) < index.count:
+                # Day file shrank without a gen change - rebuild
+                index = InvertedIndex()
+            user_terms = self._user_terms()
+            for position in range(index.count, len(entries)):
+                index.add(position, self.entry_terms(entries[position], user_terms))
+            index.count = len(entries)
+            self._save(day, gen, index)
+
+        with self._guard:
+            self._cache[day] = (gen, index)
+            self._cache.move_to_end(day)
+            while len(self._cache) > DAY_INDEX_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return index
+
+    def match_day(self, day: str, gen: int, count: int, terms: List[str], users: Optional[Set[str]] = None,
+                  role: Optional[str] = None) -> List[int]:
+        """Sorted positions in the day's entries matching all terms, users and role"""
+        index = self.day_index(day, gen, count)
+        positions = index.match(terms, free_terms=day_terms(day))
+        if positions and users is not None:
+            allowed = set()
+            for username in users:
+                allowed.update(index.lookup(f"{USER_FIELD}{username}", prefix=False))
+            positions = [position for position in positions if position in allowed]
+        if positions and role is not None:
+            allowed = index.lookup(f"{ROLE_FIELD}{role}", prefix=False)
+            positions = [position for position in positions if position in allowed]
+        return positions
@@ -0,0 +1,237 @@
+"""
+Asynchronous batched log writer
+
+log_action, log_activity and EnhancedLogger used to write on the caller's
+thread: a users.json lookup, the activity log append and the security /
+performance JSON rewrites all ran before submit, approve or upload could
+return to the UI, each costing NAS round-trips.
+
+Callers now only put a record on a bounded in-process queue. One writer
+thread drains it in batches (every FLUSH_INTERVAL seconds or BATCH_SIZE
+records, whichever comes first), groups the batch by sink and hands each sink
+its records in a single call, so N log lines cost one lock / write cycle.
+
+When the queue is full a caller waits up to BLOCK_TIMEOUT for room
+(backpressure) and then drops the record; both are counted in get_stats().
+flush() waits until everything queued so far has been written and is called
+from cleanup_resources and at interpreter exit.
+"""
+
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+MAX_QUEUE = 10000        # records waiting to be written
+BATCH_SIZE = 500         # records per batch before an early flush
+FLUSH_INTERVAL = 1.0     # seconds between flushes when the queue is quiet
+BLOCK_TIMEOUT = 0.05     # seconds a caller waits for room before dropping
+
+
+class _FlushMarker:
+    """Queued by flush(); set once every record queued before it is written"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AsyncLogWriter:
+    """Bounded queue + single writer thread with per-sink batch writers"""
+
+    def __init__(self, max_queue: int = MAX_QUEUE, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._sinks: Dict[str, Callable[[List[Any]], None]] = {}
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'blocked': 0,       # submits that had to wait for room
+            'failed': 0,        # records whose sink raised
+            'batches': 0,
+            'max_depth': 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stopping = False
+
+    def register_sink(self, name: str, write_batch: Callable[[List[Any]], None]):
+        """write_batch(records) is called on the writer thread with every queued record for the sink"""
+        self._sinks[name] = write_batch
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping = False
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+
+    # ---- producers ----
+
+    def submit(self, sink: str, record: Any) -> bool:
+        """Queue one record for a sink; never blocks longer than BLOCK_TIMEOUT"""
+        if sink not in self._sinks:
+            print(f"[LOG_WRITER] Unknown sink '{sink}'")
+            return False
+        self._ensure_thread()
+        item = (sink, record)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count('blocked')
+            try:
+                self._queue.put(item, timeout=BLOCK_TIMEOUT)
+            except queue.Full:
+                self._count('dropped')
+                return False
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats['max_depth']:
+                self._stats['max_depth'] = depth
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every record queued so far has been handed to its sink"""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flush and stop the writer thread"""
+        self.flush(timeout)
+        self._stopping = True
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=min(timeout, self.flush_interval * 2))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    # ---- writer thread ----
+
+    def _run(self):
+        while not self._stopping:
+            batch, markers = self._collect()
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.done.set()
+
+    def _collect(self):
+        """Block for the first item, then gather until BATCH_SIZE or FLUSH_INTERVAL"""
+        batch: List[tuple] = []
+        markers: List[_FlushMarker] = []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, markers
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, _FlushMarker):
+                # Everything before the marker is in this batch - write it now
+                markers.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch, markers
+
+    def _write(self, batch: List[tuple]):
+        by_sink: Dict[str, List[Any]] = {}
+        for sink, record in batch:
+            by_sink.setdefault(sink, []).append(record)
+        for sink, records in by_sink.items():
+            try:
+                self._sinks[sink](records)
+                self._count('written', len(records))
+            except Exception as e:
+                self._count('failed', len(records))
+                print(f"[LOG_WRITER] Sink '{sink}' failed to write {len(records)} record(s): {e}")
+        self._count('batches')
+
+
+class LogWriterHandler(logging.Handler):
+    """logging handler that hands records to a wrapped handler on the writer thread"""
+
+    def __init__(self, target: logging.Handler, writer: AsyncLogWriter = None, sink: str = None):
+        super().__init__(target.level)
+        self.target = target
+        self.writer = writer or get_log_writer()
+        self.sink = sink or f"logging:{id(self)}"
+        self.writer.register_sink(self.sink, self._write_batch)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            # Resolve the message now, the way QueueHandler does - args may change before the write
+            if record.exc_info and not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.msg = record.getMessage()
+            record.args = None
+            record.exc_info = None
+            self.writer.submit(self.sink, record)
+        except Exception:
+            self.handleError(record)
+
+    def _write_batch(self, records: List[logging.LogRecord]):
+        for record in records:
+            self.target.handle(record)
+        self.target.flush()
+
+    def close(self):
+        self.target.close()
+        super().close()
+
+
+# Global log writer instance
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> AsyncLogWriter:
+    """Get global log writer instance"""
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = AsyncLogWriter()
+                atexit.register(_flush_at_exit)
+    return _log_writer
+
+
+def flush_logs(timeout: float = 10.0) -> bool:
+    """Write out everything queued so far (used on shutdown)"""
+    return _log_writer.flush(timeout) if _log_writer is not None else True
+
+
+def _flush_at_exit():
+    try:
+        _log_writer.shutdown(timeout=5.0)
+    except Exception as e:
+        print(f"[LOG_WRITER] Flush at exit failed: {e}", file=sys.stderr)
@@ -2,28 +2,32 @@
 import json
 import logging
 import logging.handlers
-from datetime import datetime
+from datetime import datetime, timedelta
+import bisect
 import os
+import time
 from typing import Dict, Optional, List
 from pathlib import Path
+from utils.json_cache import load_json_cached
+from utils.activity_log import get_activity_log
+from utils.log_writer import get_log_writer, LogWriterHandler
+from utils.log_search import InvertedIndex, parse_query, tokenize
+from utils.perf_metrics import get_metrics_registry
+from utils.tracing import get_tracer
 
 # Your existing constants - kept unchanged
 LOG_FILE = "data/logs/activity.log"
-METADATA_FILE = r"\\KMTI-NAS\Shared\data\logs\activity_logs.json"
 USERS_FILE = r"\\KMTI-NAS\Shared\data\users.json"
 
 # New security audit log file
 SECURITY_LOG_FILE = "data/logs/security_audit.log"
-PERFORMANCE_LOG_FILE = "data/logs/performance.log"
 
 def _get_user_details(username: str):
     """Your existing function - kept unchanged for backward compatibility"""
-    if not os.path.exists(USERS_FILE):
+    users = load_json_cached(USERS_FILE, copy_result=False)
+    if not users:
         return {"fullname": username, "email": "", "role": ""}
 
-    with open(USERS_FILE, "r") as f:
-        users = json.load(f)
-
     for email, data in users.items():
         if data.get("username") == username:
             return {
@@ -38,41 +42,85 @@ def log_action(username: str, activity: str):
     Your existing log_action function - kept unchanged for backward compatibility.
     Logs activity to both:
     - A plain text log file (activity.log)
-    - A unified JSON metadata file (activity_logs.json)
+    - The shared day-rotated activity log (see utils/activity_log.py)
+    Both writes happen on the log writer thread; this only queues the entry.
+    """
+    get_log_writer().submit("action", {
+        "username": username,
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "activity": activity,
+    })
+
+def queue_activity_entry(entry: Dict):
+    """
+    Queue an entry for the shared activity log only (used by log_activity).
+    Missing fullname / email / role are filled in on the writer thread.
     """
-    details = _get_user_details(username)
-    log_line = (
-        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - "
-        f"{details['fullname']} ({details['email']}, {details['role']}) - {activity}\n"
-    )
+    get_log_writer().submit("activity", entry)
+
+def _with_user_details(entry: Dict) -> Dict:
+    if "fullname" in entry and "role" in entry:
+        return entry
+    details = _get_user_details(entry.get("username", ""))
+    return {**details, **entry}
+
+def _write_action_batch(records: List[Dict]):
+    """Writer thread: one text-log write and one activity log append per batch"""
+    entries = []
+    lines = []
+    for record in records:
+        details = _get_user_details(record["username"])
+        lines.append(
+            f"{record['date']} - "
+            f"{details['fullname']} ({details['email']}, {details['role']}) - {record['activity']}\n"
+        )
+        entries.append({
+            "username": record["username"],
+            "fullname": details["fullname"],
+            "email": details["email"],
+            "role": details["role"],
+            "date": record["date"],
+            "activity": record["activity"],
+        })
 
     # Plain text log
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
     with open(LOG_FILE, "a") as f:
-        f.write(log_line)
+        f.write("".join(lines))
 
-    # Save to structured JSON file
-    meta_entry = {
-        "username": username,
-        "fullname": details["fullname"],
-        "email": details["email"],
-        "role": details["role"],
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "activity": activity,
-    }
+    # Append to the shared day-rotated activity log
+    get_activity_log().append_many(entries)
 
-    meta_data = []
-    if os.path.exists(METADATA_FILE):
-        with open(METADATA_FILE, "r") as f:
-            try:
-                meta_data = json.load(f)
-            except json.JSONDecodeError:
-                meta_data = []
+def _write_activity_batch(entries: List[Dict]):
+    """Writer thread: activity-log-only entries from log_activity"""
+    get_activity_log().append_many([_with_user_details(entry) for entry in entries])
+
+def _append_json_log(path: str, entries: List[Dict], keep: int):
+    """Writer thread: extend a local JSON list log once per batch, keeping the newest entries"""
+    data = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            data = []
+
+    data.extend(entries)
+    if len(data) > keep:
+        data = data[-keep:]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+def _write_security_batch(entries: List[Dict]):
+    # Keep only last 1000 security events to manage file size
+    _append_json_log(SECURITY_LOG_FILE, [_with_user_details(entry) for entry in entries], 1000)
 
-    meta_data.append(meta_entry)
-    os.makedirs(os.path.dirname(METADATA_FILE), exist_ok=True)
-    with open(METADATA_FILE, "w") as f:
-        json.dump(meta_data, f, indent=4)
+_log_writer = get_log_writer()
+_log_writer.register_sink("action", _write_action_batch)
+_log_writer.register_sink("activity", _write_activity_batch)
+_log_writer.register_sink("security", _write_security_batch)
 
 class EnhancedLogger:
     """
@@ -81,6 +129,7 @@ class EnhancedLogger:
     
     def __init__(self):
         self.setup_enhanced_logging()
+        self._security_index = None
         
         # Create specialized loggers
         self.general_logger = logging.getLogger('general')
@@ -123,7 +172,8 @@ class EnhancedLogger:
             '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
         )
         file_handler.setFormatter(file_formatter)
-        root_logger.addHandler(file_handler)
+        # File writes happen on the log writer thread
+        root_logger.addHandler(LogWriterHandler(file_handler))
     
     def log_activity_enhanced(self, username: str, activity: str, activity_type: str = "GENERAL"):
         """
@@ -155,37 +205,17 @@ class EnhancedLogger:
             details: Dictionary with event details
             severity: Severity level (INFO, WARNING, ERROR, CRITICAL)
         """
-        user_details = _get_user_details(username)
-        
         security_entry = {
             "timestamp": datetime.now().isoformat(),
             "username": username,
-            "fullname": user_details["fullname"],
-            "email": user_details["email"],
-            "role": user_details["role"],
             "event_type": event_type,
             "severity": severity,
             "details": details,
             "ip_address": details.get("ip_address", "unknown")
         }
         
-        # Log to security audit file
-        security_log_data = []
-        if os.path.exists(SECURITY_LOG_FILE):
-            try:
-                with open(SECURITY_LOG_FILE, "r") as f:
-                    security_log_data = json.load(f)
-            except json.JSONDecodeError:
-                security_log_data = []
-        
-        security_log_data.append(security_entry)
-        
-        # Keep only last 1000 security events to manage file size
-        if len(security_log_data) > 1000:
-            security_log_data = security_log_data[-1000:]
-        
-        with open(SECURITY_LOG_FILE, "w") as f:
-            json.dump(security_log_data, f, indent=2)
+        # Queue for the security audit file (fullname / email / role are added on the writer thread)
+        get_log_writer().submit("security", security_entry)
         
         # Also log to system logger
         log_level = getattr(logging, severity, logging.WARNING)
@@ -289,39 +319,44 @@ class EnhancedLogger:
             duration_ms: Duration in milliseconds
             details: Additional performance details
         """
-        perf_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "component": component,
-            "operation": operation,
-            "duration_ms": duration_ms,
-            "details": details or {}
-        }
-        
-        # Log to performance file
-        perf_log_data = []
-        if os.path.exists(PERFORMANCE_LOG_FILE):
-            try:
-                with open(PERFORMANCE_LOG_FILE, "r") as f:
-                    perf_log_data = json.load(f)
-            except json.JSONDecodeError:
-                perf_log_data = []
-        
-        perf_log_data.append(perf_entry)
-        
-        # Keep only last 500 performance entries
-        if len(perf_log_data) > 500:
-            perf_log_data = perf_log_data[-500:]
-        
-        with open(PERFORMANCE_LOG_FILE, "w") as f:
-            json.dump(perf_log_data, f, indent=2)
+        # In-memory histogram; snapshots are written by the metrics registry (utils/perf_metrics.py)
+        get_metrics_registry().record(f"{component}.{operation}", duration_ms)
         
-        # Log to performance logger
-        self.performance_logger.info(
+        # Per-call detail goes to system.log at debug level only
+        self.performance_logger.debug(
             f"PERF - {component}.{operation} - Duration: {duration_ms:.2f}ms - {details}"
         )
     
+    def _load_security_index(self):
+        """Security events with an inverted index over them, rebuilt only when the file changes"""
+        try:
+            stat = os.stat(SECURITY_LOG_FILE)
+        except OSError:
+            return [], [], InvertedIndex()
+        cached = self._security_index
+        if cached and cached[0] == (stat.st_mtime, stat.st_size):
+            return cached[1:]
+
+        try:
+            with open(SECURITY_LOG_FILE, "r") as f:
+                security_events = json.load(f)
+        except json.JSONDecodeError:
+            security_events = []
+
+        index = InvertedIndex()
+        for position, event in enumerate(security_events):
+            details = event.get("details") or {}
+            detail_text = " ".join(str(value) for value in details.values()) if isinstance(details, dict) else str(details)
+            index.add(position, tokenize(" ".join(str(event.get(field) or "") for field in (
+                "event_type", "severity", "username", "fullname", "email", "role", "ip_address"
+            ))) + tokenize(detail_text))
+        # Events are appended in time order, so the cutoff is a binary search
+        timestamps = [event.get("timestamp", "") for event in security_events]
+        self._security_index = ((stat.st_mtime, stat.st_size), security_events, timestamps, index)
+        return security_events, timestamps, index
+
     def get_security_events(self, username: str = None, event_type: str = None, 
-                           hours_back: int = 24) -> List[Dict]:
+                           hours_back: int = 24, query: str = None) -> List[Dict]:
         """
         Retrieve security events for analysis.
         
@@ -329,27 +364,33 @@ class EnhancedLogger:
             username: Filter by username (optional)
             event_type: Filter by event type (optional)
             hours_back: How many hours back to search (default 24)
+            query: Free-text terms that must all match (optional, same rules
+                as the Activity Logs search)
             
         Returns:
             List of security events matching criteria
         """
-        if not os.path.exists(SECURITY_LOG_FILE):
-            return []
-        
-        try:
-            with open(SECURITY_LOG_FILE, "r") as f:
-                security_events = json.load(f)
-        except json.JSONDecodeError:
+        # Include events still waiting on the log writer
+        get_log_writer().flush()
+        security_events, timestamps, index = self._load_security_index()
+        if not security_events:
             return []
         
         # Filter events
         filtered_events = []
-        cutoff_time = datetime.now() - datetime.timedelta(hours=hours_back)
+        cutoff = (datetime.now() - timedelta(hours=hours_back)).isoformat()
+        start = bisect.bisect_left(timestamps, cutoff) if timestamps == sorted(timestamps) else 0
+        
+        # Exact username / event_type checks below; their tokens narrow the candidates first
+        terms = parse_query(" ".join(filter(None, [query, username, event_type])))
+        positions = index.match(terms) if terms else range(len(security_events))
         
-        for event in security_events:
+        for position in positions:
+            if position < start:
+                continue
+            event = security_events[position]
             try:
-                event_time = datetime.fromisoformat(event["timestamp"])
-                if event_time < cutoff_time:
+                if event["timestamp"] < cutoff:
                     continue
                 
                 if username and event.get("username") != username:
@@ -360,7 +401,7 @@ class EnhancedLogger:
                 
                 filtered_events.append(event)
                 
-            except (ValueError, KeyError):
+            except KeyError:
                 continue
         
         return filtered_events
@@ -398,19 +439,29 @@ def log_performance_metric(component: str, operation: str, duration_ms: float, d
 
 # Context manager for performance timing
 class PerformanceTimer:
-    """Context manager for automatic performance timing"""
+    """
+    Context manager for automatic performance timing.
+    Also opens a tracing span named component.operation (tagged with details),
+    so spans opened inside the block nest under it.
+    """
     
     def __init__(self, component: str, operation: str, details: Dict = None):
         self.component = component
         self.operation = operation
         self.details = details or {}
         self.start_time = None
+        self.span = None
     
     def __enter__(self):
-        self.start_time = datetime.now()
+        self.span = get_tracer().span(f"{self.component}.{self.operation}", self.component)
+        self.span.set_tags(**self.details).__enter__()
+        self.start_time = time.perf_counter()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.start_time:
-            duration_ms = (datetime.now() - self.start_time).total_seconds() * 1000
-            log_performance_metric(self.component, self.operation, duration_ms, self.details)
\ No newline at end of file
+            duration_ms = (time.perf_counter() - self.start_time) * 1000
+            self.span.__exit__(exc_type, exc_val, exc_tb)
+            log_performance_metric(self.component, self.operation, duration_ms, self.details)
+            if exc_type is not None:
+                get_metrics_registry().increment(f"{self.component}.{self.operation}.errors")
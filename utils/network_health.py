@@ -0,0 +1,260 @@
+"""
+Background network health prober for the KMTI NAS shares
+
+Checking the NAS used to happen inline: path_config called os.path.exists on
+the share at import time (blocking startup for the SMB timeout when the NAS
+was slow or down) and NetworkAccessManager created and deleted an
+access_test_<timestamp> directory before every move, cached per instance.
+
+NetworkHealthProber checks every registered share on a daemon thread: is it
+reachable, can we write to it (a small probe file, created and removed), and
+how long did that take. Callers read the last published state, which never
+blocks; listeners are told when a share goes up or down. A probe that hangs
+is abandoned after PROBE_TIMEOUT and the share is reported unreachable.
+"""
+
+import os
+import time
+import socket
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+StateListener = Callable[[str, Dict], None]   # (share path, state)
+
+
+class NetworkHealthProber:
+    """Probes NAS shares on a schedule and publishes their state"""
+
+    DEFAULT_INTERVAL = 30      # seconds between probe rounds
+    PROBE_TIMEOUT = 10         # a probe taking longer than this counts as unreachable
+
+    def __init__(self, interval: float = None):
+        self.interval = interval
+        self._targets: Dict[str, Dict] = {}       # normcased path -> {'path', 'name', 'check_write', 'create'}
+        self._state: Dict[str, Dict] = {}         # normcased path -> last published state
+        self._inflight: Dict[str, threading.Thread] = {}
+        self._listeners: List[StateListener] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._probed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.normpath(path))
+
+    # ---- registration ----
+
+    def add_target(self, path: str, name: str = None, check_write: bool = True, create: bool = False):
+        """
+        Register a share (a directory) to be probed; new targets are probed right
+        away. With create=True a missing directory is created by the probe.
+        """
+        key = self._key(path)
+        with self._lock:
+            if key in self._targets:
+                return
+            self._targets[key] = {'path': path, 'name': name or path,
+                                  'check_write': check_write, 'create': create}
+        self.request_probe()
+
+    def add_listener(self, listener: StateListener):
+        """listener(path, state) is called on the prober thread when a share goes up or down"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: StateListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    # ---- scheduling ----
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="network-health-prober", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def request_probe(self):
+        """Probe all shares as soon as possible (e.g. after an operation failed)"""
+        self._wake.set()
+
+    def _run(self):
+        if self.interval is None:
+            self.interval = self.DEFAULT_INTERVAL
+            try:
+                from utils.config_loader import get_config
+                self.interval = float(get_config().get_config_value("network_probe_interval", self.DEFAULT_INTERVAL))
+            except Exception as e:
+                print(f"[NETWORK_HEALTH] Could not read probe interval config: {e}")
+
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"[NETWORK_HEALTH] Probe round failed: {e}")
+            self._wake.wait(self.interval)
+
+    def probe_all(self):
+        """Probe every registered share (each on its own thread, bounded by PROBE_TIMEOUT)"""
+        with self._lock:
+            targets = list(self._targets.items())
+
+        started = []
+        for key, target in targets:
+            with self._lock:
+                running = self._inflight.get(key)
+                if running is not None and running.is_alive():
+                    # Still stuck in a previous probe - already reported as timed out
+                    continue
+                thread = threading.Thread(target=self._probe_target, args=(key, target),
+                                          name=f"network-probe-{target['name']}", daemon=True)
+                self._inflight[key] = thread
+            thread.start()
+            started.append((key, target, thread))
+
+        deadline = time.monotonic() + self.PROBE_TIMEOUT
+        for key, target, thread in started:
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                self._publish(key, target, {
+                    'reachable': False,
+                    'writable': False,
+                    'latency_ms': None,
+                    'error': f"Timed out after {self.PROBE_TIMEOUT}s"
+                })
+
+    def probe(self, path: str) -> Dict:
+        """Probe one registered share now, on the calling thread"""
+        key = self._key(path)
+        with self._lock:
+            target = self._targets.get(key) or {'path': path, 'name': path, 'check_write': True, 'create': False}
+        self._probe_target(key, target)
+        return self.get_state(path) or {}
+
+    def _probe_target(self, key: str, target: Dict):
+        self._publish(key, target, self._check(target['path'], target['check_write'], target['create']))
+
+    @staticmethod
+    def _check(path: str, check_write: bool, create: bool = False) -> Dict:
+        started = time.perf_counter()
+        result = {'reachable': False, 'writable': False, 'latency_ms': None, 'error': None}
+        try:
+            if create and not os.path.isdir(path):
+                os.makedirs(path, exist_ok=True)
+            if not os.path.isdir(path):
+                result['error'] = f"Path not found: {path}"
+                return result
+            result['reachable'] = True
+            if check_write:
+                probe_file = os.path.join(
+                    path, f".kmti_probe_{socket.gethostname()}_{os.getpid()}_{threading.get_ident()}")
+                fd = os.open(probe_file, os.O_CREAT | os.O_WRONLY | os.O_TRUNC)
+                try:
+                    os.write(fd, b"ok")
+                finally:
+                    os.close(fd)
+                os.remove(probe_file)
+                result['writable'] = True
+        except PermissionError:
+            result['error'] = f"Access denied to {path}"
+        except Exception as e:
+            result['error'] = f"Network error: {e}"
+        finally:
+            result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def _publish(self, key: str, target: Dict, result: Dict):
+        state = dict(result, path=target['path'], name=target['name'],
+                     checked_at=datetime.now().isoformat())
+        with self._lock:
+            previous = self._state.get(key)
+            self._state[key] = state
+            listeners = list(self._listeners)
+            self._probed.notify_all()
+
+        changed = previous is None or (previous['reachable'], previous['writable']) != (state['reachable'], state['writable'])
+        if not changed:
+            return
+        if state['reachable']:
+            print(f"[NETWORK_HEALTH] {target['name']} is up "
+                  f"({'writable' if state['writable'] else 'read-only'}, {state['latency_ms']} ms)")
+        else:
+            print(f"[NETWORK_HEALTH] {target['name']} is down: {state['error']}")
+        for listener in listeners:
+            try:
+                listener(target['path'], dict(state))
+            except Exception as e:
+                print(f"[NETWORK_HEALTH] Listener failed: {e}")
+
+    # ---- state ----
+
+    def _target_key_for(self, path: str) -> Optional[str]:
+        """Registered share containing path (longest match)"""
+        key = self._key(path)
+        best = None
+        for target_key in self._targets:
+            if key == target_key or key.startswith(target_key.rstrip(os.sep) + os.sep):
+                if best is None or len(target_key) > len(best):
+                    best = target_key
+        return best
+
+    def get_state(self, path: str = None) -> Optional[Dict]:
+        """
+        Last state of the share containing path ({'reachable', 'writable',
+        'latency_ms', 'error', 'checked_at', ...}), None if not probed yet.
+        Without a path, the states of all shares keyed by share path.
+        """
+        with self._lock:
+            if path is None:
+                return {state['path']: dict(state) for state in self._state.values()}
+            key = self._target_key_for(path)
+            state = self._state.get(key) if key else None
+            return dict(state) if state else None
+
+    def is_reachable(self, path: str, default: bool = True) -> bool:
+        state = self.get_state(path)
+        return state['reachable'] if state else default
+
+    def is_writable(self, path: str, default: bool = True) -> bool:
+        state = self.get_state(path)
+        return state['writable'] if state else default
+
+    def wait_for_state(self, path: str, timeout: float) -> Optional[Dict]:
+        """Wait up to timeout seconds for the first probe result of a share"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                key = self._target_key_for(path)
+                if key and key in self._state:
+                    return dict(self._state[key])
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._probed.wait(remaining)
+
+
+# Global prober instance
+_network_prober = None
+_network_prober_lock = threading.Lock()
+
+
+def get_network_prober() -> NetworkHealthProber:
+    """Get global network health prober (started on first use)"""
+    global _network_prober
+    if _network_prober is None:
+        with _network_prober_lock:
+            if _network_prober is None:
+                _network_prober = NetworkHealthProber()
+                _network_prober.start()
+    return _network_prober
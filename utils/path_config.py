@@ -171,11 +171,36 @@ class DataPaths:
                 print(f"Warning: Could not create directory {directory}: {e}")
     
     def is_network_available(self):
-        """Check if network directory is accessible"""
-        try:
-            return os.path.exists(self.NETWORK_BASE)
-        except:
-            return False
+        """
+        Check if network directory is accessible (last background probe result -
+        never blocks; assumed available until the first probe has finished)
+        """
+        from utils.network_health import get_network_prober
+        return get_network_prober().is_reachable(self.NETWORK_BASE)
+    
+    def start_network_monitoring(self):
+        """
+        Register the NAS shares with the background health prober. Network
+        directories are ensured whenever the shared data share comes up, so
+        a slow or missing NAS no longer blocks startup.
+        """
+        if getattr(self, '_network_monitoring', False):
+            return
+        self._network_monitoring = True
+        from utils.network_health import get_network_prober
+        prober = get_network_prober()
+        
+        def on_state(path, state):
+            if os.path.normcase(path) != os.path.normcase(self.SHARED_BASE):
+                return
+            if state['reachable']:
+                self.ensure_network_dirs()
+            else:
+                print(f"Warning: Network directory {self.SHARED_BASE} is not accessible: {state['error']}")
+        
+        prober.add_listener(on_state)
+        prober.add_target(self.NETWORK_BASE, name="Shared Public")
+        prober.add_target(self.SHARED_BASE, name="Shared Data")
     
     def get_possible_approved_file_locations(self, team_tag: str, year: str = None) -> List[str]:
         """Get all possible locations where approved files might be stored"""
@@ -242,10 +267,7 @@ DATA_PATHS = DataPaths()
 # Initialize directories
 try:
     DATA_PATHS.ensure_local_dirs()
-    if DATA_PATHS.is_network_available():
-        DATA_PATHS.ensure_network_dirs()
-    else:
-        print(f"Warning: Network directory {NETWORK_DATA_DIR} is not accessible")
+    DATA_PATHS.start_network_monitoring()
 except Exception as e:
     print(f"Error initializing directories: {e}")
 
@@ -0,0 +1,298 @@
+"""
+In-memory performance metrics with percentile histograms
+
+EnhancedLogger.log_performance_metric used to append every PerformanceTimer
+measurement to data/logs/performance.log: re-read the JSON list, append one
+entry, keep the last 500 and rewrite the file. Measuring an operation added
+disk I/O to it, and 500 raw samples said little about typical or worst-case
+latency.
+
+Measurements now go into MetricsRegistry, keyed by "component.operation":
+
+- LatencyHistogram records durations in log-linear buckets over microseconds
+  (the HdrHistogram layout: SUB_BUCKETS linear buckets per power of two, so
+  any recorded value is within ~3% of its bucket). Recording is a dict
+  increment; count / mean / p50 / p95 / p99 / max are read off the buckets.
+- Each timer keeps a histogram since start plus a ring of WINDOW_SLOTS
+  per-minute histograms, merged on demand for the last-hour view. Old slots
+  are overwritten as the ring wraps, so memory stays bounded.
+- Counters are plain named integers (increment()).
+
+A daemon thread writes a snapshot to METRICS_FILE every FLUSH_INTERVAL
+seconds when something changed, and once more at exit. The snapshot is
+compact JSON: the summary numbers plus the non-empty buckets as
+[index, count] pairs, enough to rebuild the histograms later.
+"""
+
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from utils.atomic_write import atomic_write_json
+
+METRICS_FILE = "data/logs/metrics.json"
+METRICS_VERSION = 1
+
+SUB_BUCKET_BITS = 5                  # 32 linear buckets per power of two
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+WINDOW_SECONDS = 60                  # one ring slot per minute
+WINDOW_SLOTS = 60                    # ring covers the last hour
+FLUSH_INTERVAL = 60                  # seconds between snapshot writes
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram over integer microseconds"""
+
+    __slots__ = ("buckets", "count", "total_us", "max_us")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    @staticmethod
+    def bucket_of(value_us: int) -> int:
+        # Values below 2 * SUB_BUCKETS get their own bucket; above that the
+        # low bits are dropped so every power of two spans SUB_BUCKETS buckets
+        shift = max(0, value_us.bit_length() - SUB_BUCKET_BITS - 1)
+        return (shift << SUB_BUCKET_BITS) + (value_us >> shift)
+
+    @staticmethod
+    def bucket_high(index: int) -> int:
+        """Highest value (us) that falls in a bucket"""
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = (index >> SUB_BUCKET_BITS) - 1
+        sub_bucket = index - (shift << SUB_BUCKET_BITS)
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, duration_ms: float):
+        value_us = max(0, int(duration_ms * 1000))
+        index = self.bucket_of(value_us)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentiles(self, percentiles: Iterable[float] = PERCENTILES) -> List[float]:
+        """Values (ms) at the given percentiles, in one pass over the buckets"""
+        percentiles = list(percentiles)
+        if not self.count:
+            return [0.0] * len(percentiles)
+        ranks = [max(1, -(-self.count * p // 100)) for p in percentiles]
+        results: List[Optional[float]] = [None] * len(percentiles)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            for i, rank in enumerate(ranks):
+                if results[i] is None and seen >= rank:
+                    results[i] = min(self.bucket_high(index), self.max_us) / 1000.0
+            if seen >= max(ranks):
+                break
+        return [r if r is not None else self.max_us / 1000.0 for r in results]
+
+    def summary(self) -> Dict[str, float]:
+        p50, p95, p99 = self.percentiles(PERCENTILES)
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_us / self.count / 1000.0, 2) if self.count else 0.0,
+            'p50_ms': round(p50, 2),
+            'p95_ms': round(p95, 2),
+            'p99_ms': round(p99, 2),
+            'max_ms': round(self.max_us / 1000.0, 2),
+        }
+
+    def to_dict(self) -> Dict:
+        data = self.summary()
+        data['buckets'] = sorted([index, count] for index, count in self.buckets.items())
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        histogram = cls()
+        for index, count in data.get('buckets') or []:
+            histogram.buckets[int(index)] = int(count)
+        histogram.count = sum(histogram.buckets.values())
+        histogram.total_us = int(round(data.get('mean_ms', 0.0) * 1000 * histogram.count))
+        histogram.max_us = int(round(data.get('max_ms', 0.0) * 1000))
+        return histogram
+
+
+class _Timer:
+    """Histogram since start plus a ring of per-minute histograms"""
+
+    __slots__ = ("total", "slots")
+
+    def __init__(self):
+        self.total = LatencyHistogram()
+        self.slots: List[Optional[tuple]] = [None] * WINDOW_SLOTS   # (minute, histogram)
+
+    def record(self, duration_ms: float, minute: int):
+        self.total.record(duration_ms)
+        position = minute % WINDOW_SLOTS
+        slot = self.slots[position]
+        if slot is None or slot[0] != minute:
+            slot = (minute, LatencyHistogram())
+            self.slots[position] = slot
+        slot[1].record(duration_ms)
+
+    def recent(self, minute: int) -> LatencyHistogram:
+        merged = LatencyHistogram()
+        for slot in self.slots:
+            if slot is not None and minute - slot[0] < WINDOW_SLOTS:
+                merged.merge(slot[1])
+        return merged
+
+
+class MetricsRegistry:
+    """Named latency timers and counters, flushed to METRICS_FILE in the background"""
+
+    def __init__(self, metrics_file: str = METRICS_FILE, flush_interval: float = FLUSH_INTERVAL):
+        self.metrics_file = metrics_file
+        self.flush_interval = flush_interval
+        self.started = datetime.now().isoformat()
+        self._timers: Dict[str, _Timer] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- recording ----
+
+    def record(self, name: str, duration_ms: float):
+        """Add one duration to the timer for name ("component.operation")"""
+        minute = int(time.time() // WINDOW_SECONDS)
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = _Timer()
+            timer.record(duration_ms, minute)
+            self._dirty = True
+        self._ensure_thread()
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            self._dirty = True
+        self._ensure_thread()
+
+    # ---- reading ----
+
+    def get_timer_stats(self, recent: bool = False) -> Dict[str, Dict[str, float]]:
+        """name -> count / mean / p50 / p95 / p99 / max, since start or over the last hour"""
+        minute = int(time.time() // WINDOW_SECONDS)
+        stats = {}
+        with self._lock:
+            for name, timer in sorted(self._timers.items()):
+                histogram = timer.recent(minute) if recent else timer.total
+                if histogram.count:
+                    stats[name] = histogram.summary()
+        return stats
+
+    def get_counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def snapshot(self) -> Dict:
+        """Compact snapshot of every timer (with buckets) and counter"""
+        minute = int(time.time() // WINDOW_SECONDS)
+        with self._lock:
+            timers = {
+                name: {'all': timer.total.to_dict(), 'last_hour': timer.recent(minute).to_dict()}
+                for name, timer in sorted(self._timers.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+        return {
+            'version': METRICS_VERSION,
+            'started': self.started,
+            'generated': datetime.now().isoformat(),
+            'timers': timers,
+            'counters': counters,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._dirty = True
+
+    # ---- flushing ----
+
+    def flush(self) -> bool:
+        """Write a snapshot now"""
+        with self._lock:
+            self._dirty = False
+        snapshot = self.snapshot()
+        try:
+            atomic_write_json(self.metrics_file, snapshot, separators=(",", ":"))
+            return True
+        except OSError as e:
+            with self._lock:
+                self._dirty = True
+            print(f"[PERF_METRICS] Could not write {self.metrics_file}: {e}")
+            return False
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stopped.is_set():
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="perf-metrics", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            if self._dirty:
+                self.flush()
+
+    def stop(self):
+        """Stop the flush thread and write a final snapshot"""
+        self._stopped.set()
+        if self._dirty:
+            self.flush()
+
+
+def load_snapshot(metrics_file: str = METRICS_FILE) -> Optional[Dict]:
+    """Last flushed snapshot, or None"""
+    try:
+        with open(metrics_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get('version') == METRICS_VERSION else None
+
+
+# Global metrics registry instance
+_metrics_registry = None
+_metrics_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get global metrics registry instance"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        with _metrics_registry_lock:
+            if _metrics_registry is None:
+                _metrics_registry = MetricsRegistry()
+                atexit.register(_flush_at_exit)
+    return _metrics_registry
+
+
+def _flush_at_exit():
+    try:
+        _metrics_registry.stop()
+    except Exception as e:
+        print(f"[PERF_METRICS] Flush at exit failed: {e}")
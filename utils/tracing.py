@@ -0,0 +1,256 @@
+"""
+Nested tracing spans with Chrome trace export
+
+PerformanceTimer measured one flat datetime.now() duration per block, so a
+slow "Approve" showed up as a single number with no way to tell whether the
+time went on the queue load, the access probe, the copy, the metadata write
+or the notification writes.
+
+Spans are timed with time.perf_counter and nest: a span opened inside another
+on the same thread becomes its child (each thread keeps its own span stack).
+Work handed to another thread keeps its place in the tree by passing the
+parent explicitly:
+
+    with span("move_files", files=len(files)) as parent:
+        executor.map(lambda f: move(f, parent), files)
+    ...
+    with span("move_file", parent=parent, path=path) as s:
+        s.set_tag("bytes", copied)
+
+Tags are free-form (file size, path, bytes read, counts). Finished spans are
+kept in a ring of MAX_SPANS, so tracing stays on without growing memory, and
+export_chrome_trace() writes them in the Chrome trace-event format - open the
+file in chrome://tracing or https://ui.perfetto.dev. Parents on another
+thread are linked to their children with flow arrows.
+"""
+
+import os
+import time
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from utils.atomic_write import atomic_write_json
+
+TRACE_DIR = "data/logs/traces"
+MAX_SPANS = 20000          # finished spans kept for export
+
+
+class Span:
+    """One timed, tagged section of work; use as a context manager"""
+
+    __slots__ = ("tracer", "name", "category", "tags", "span_id", "parent", "parent_id",
+                 "thread_id", "thread_name", "start", "end")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, parent: Optional["Span"], tags: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.tags = tags
+        self.span_id = 0
+        self.parent = parent
+        self.parent_id: Optional[int] = None
+        self.thread_id = 0
+        self.thread_name = ""
+        self.start = 0.0
+        self.end: Optional[float] = None
+
+    def set_tag(self, key: str, value: Any) -> "Span":
+        self.tags[key] = value
+        return self
+
+    def set_tags(self, **tags) -> "Span":
+        self.tags.update(tags)
+        return self
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def __enter__(self) -> "Span":
+        self.tracer._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.tags['error'] = f"{exc_type.__name__}: {exc_val}"
+        self.tracer._exit(self)
+        return False
+
+
+class _NullSpan:
+    """Returned while tracing is disabled; accepts tags and records nothing"""
+
+    span_id = 0
+    duration_ms = 0.0
+
+    def set_tag(self, key: str, value: Any) -> "_NullSpan":
+        return self
+
+    def set_tags(self, **tags) -> "_NullSpan":
+        return self
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Per-thread span stacks and a ring of finished spans"""
+
+    def __init__(self, max_spans: int = MAX_SPANS, enabled: bool = True):
+        self.enabled = enabled
+        self._spans: "deque[Span]" = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        # perf_counter has no fixed origin - remember the wall clock it corresponds to
+        self.origin = time.perf_counter()
+        self.origin_wall = time.time()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str, category: str = "app", parent: Optional[Span] = None, **tags):
+        """
+        A span to open with `with`. Its parent is the innermost open span of
+        the calling thread, or `parent` when the work runs on another thread.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, parent, tags)
+
+    def current_span(self) -> Optional[Span]:
+        """Innermost open span of the calling thread"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _enter(self, span: Span):
+        stack = self._stack()
+        parent = span.parent if isinstance(span.parent, Span) else (stack[-1] if stack else None)
+        span.parent = None      # only the id is kept, so finished trees can be freed
+        span.parent_id = parent.span_id if parent is not None else None
+        span.span_id = next(self._ids)
+        thread = threading.current_thread()
+        span.thread_id = thread.ident or 0
+        span.thread_name = thread.name
+        stack.append(span)
+        span.start = time.perf_counter()
+
+    def _exit(self, span: Span):
+        span.end = time.perf_counter()
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        elif span in stack:
+            # Closed out of order - drop it and anything opened inside it
+            del stack[stack.index(span):]
+        with self._lock:
+            self._spans.append(span)
+
+    def get_spans(self, since: float = None) -> List[Span]:
+        """Finished spans, oldest first; since is a perf_counter value"""
+        with self._lock:
+            spans = list(self._spans)
+        if since is not None:
+            spans = [s for s in spans if s.start >= since]
+        return spans
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    # ---- Chrome trace export ----
+
+    def _us(self, timestamp: float) -> float:
+        return round((timestamp - self.origin) * 1_000_000, 3)
+
+    def chrome_trace(self, spans: List[Span] = None) -> Dict:
+        """Trace-event JSON object: complete ('X') events plus thread names and cross-thread flows"""
+        spans = self.get_spans() if spans is None else spans
+        pid = os.getpid()
+        by_id = {s.span_id: s for s in spans}
+        threads: Dict[int, str] = {}
+        events: List[Dict] = []
+
+        for s in spans:
+            threads[s.thread_id] = s.thread_name
+            args = dict(s.tags, span_id=s.span_id)
+            if s.parent_id is not None:
+                args['parent_id'] = s.parent_id
+            events.append({
+                'name': s.name, 'cat': s.category, 'ph': 'X',
+                'ts': self._us(s.start), 'dur': self._us(s.end) - self._us(s.start),
+                'pid': pid, 'tid': s.thread_id, 'args': args,
+            })
+            parent = by_id.get(s.parent_id)
+            if parent is not None and parent.thread_id != s.thread_id:
+                # Arrow from the parent's slice to the child on the other thread
+                flow = {'name': 'spawn', 'cat': s.category, 'id': s.span_id, 'pid': pid}
+                events.append(dict(flow, ph='s', ts=max(self._us(parent.start), self._us(s.start)),
+                                   tid=parent.thread_id))
+                events.append(dict(flow, ph='f', bp='e', ts=self._us(s.start), tid=s.thread_id))
+
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                       'args': {'name': 'KMTI File Management'}})
+        for tid, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': thread_name}})
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'started': datetime.fromtimestamp(self.origin_wall).isoformat(),
+                'exported': datetime.now().isoformat(),
+                'spans': len(spans),
+            },
+        }
+
+    def export_chrome_trace(self, path: str = None, since: float = None) -> str:
+        """Write finished spans as a Chrome trace file; returns its path"""
+        if path is None:
+            path = os.path.join(TRACE_DIR, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        trace = self.chrome_trace(self.get_spans(since))
+        # Tags may hold paths or other objects - anything JSON can't encode becomes a string
+        atomic_write_json(path, trace, default=str, separators=(",", ":"))
+        return path
+
+
+# Global tracer instance
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Get global tracer instance"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def span(name: str, category: str = "app", parent: Optional[Span] = None, **tags):
+    """Convenience function: a span on the global tracer"""
+    return get_tracer().span(name, category, parent, **tags)
+
+
+def current_span() -> Optional[Span]:
+    """Convenience function: innermost open span of the calling thread"""
+    return get_tracer().current_span()
+
+
+def export_chrome_trace(path: str = None) -> str:
+    """Convenience function: write the global tracer's spans as a Chrome trace file"""
+    return get_tracer().export_chrome_trace(path)